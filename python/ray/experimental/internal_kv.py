@@ -2,24 +2,92 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import binascii
+import logging
+import threading
+
 import ray
 
+logger = logging.getLogger(__name__)
+
 _local = {}  # dict for local mode
 
+# The read-through cache of this worker, created on first use.
+_cache = None
+_cache_lock = threading.Lock()
+
+# Keyspace notifications are published on this channel prefix. Note that the
+# redis servers are configured to only send them for list and hash commands.
+_KEYSPACE_PREFIX = b"__keyspace@0__:"
+
 
 def _internal_kv_initialized():
     worker = ray.worker.get_global_worker()
     return hasattr(worker, "mode") and worker.mode is not None
 
 
-def _internal_kv_get(key):
-    """Fetch the value of a binary key."""
+def _shard_index(key, num_shards):
+    """Returns the index of the Redis shard that stores a binary key.
+
+    This must be the same in every process, so Python's salted hash() can't
+    be used.
+    """
+    return (binascii.crc32(key) & 0xffffffff) % num_shards
+
+
+def _group_by_shard(keys, num_shards):
+    """Returns a dict from shard index to the indices of the keys in it."""
+    indices = {}
+    for i, key in enumerate(keys):
+        indices.setdefault(_shard_index(key, num_shards), []).append(i)
+    return indices
+
+
+def _internal_kv_get(key, cached=False):
+    """Fetch the value of a binary key.
+
+    Args:
+        key (bytes): The key to fetch.
+        cached (bool): Whether to read through the cache of this worker.
+            Cached values are invalidated when the key is written, so they
+            lag behind writes of other processes by the notification delay.
+    """
+    return _internal_kv_multi_get([key], cached=cached)[0]
+
+
+def _internal_kv_multi_get(keys, cached=False):
+    """Fetch the values of several binary keys.
+
+    The keys are fetched with a single round trip per Redis shard.
+
+    Args:
+        keys (list): The keys to fetch.
+        cached (bool): Whether to read through the cache of this worker.
+
+    Returns:
+        The list of values of the keys, with None for missing keys.
+    """
 
     worker = ray.worker.get_global_worker()
     if worker.mode == ray.worker.LOCAL_MODE:
-        return _local.get(key)
+        return [_local.get(key) for key in keys]
+
+    if cached:
+        return _get_cache().multi_get(keys)
+    return _fetch(keys)
+
 
-    return worker.redis_client.hget(key, "value")
+def _fetch(keys):
+    redis_clients = ray.worker.global_state.redis_clients
+    values = [None] * len(keys)
+    shards = _group_by_shard(keys, len(redis_clients))
+    for shard_index, indices in shards.items():
+        pipe = redis_clients[shard_index].pipeline(transaction=False)
+        for i in indices:
+            pipe.hget(keys[i], "value")
+        for i, value in zip(indices, pipe.execute()):
+            values[i] = value
+    return values
 
 
 def _internal_kv_put(key, value, overwrite=False):
@@ -30,16 +98,133 @@ def _internal_kv_put(key, value, overwrite=False):
     Returns:
         already_exists (bool): whether the value already exists.
     """
+    return _internal_kv_multi_put([(key, value)], overwrite=overwrite)[0]
+
+
+def _internal_kv_multi_put(items, overwrite=False):
+    """Globally associates values with several binary keys.
+
+    The values are written with a single round trip per Redis shard. Keys
+    that already have a value are only updated if overwrite is True.
+
+    Args:
+        items (list): The (key, value) pairs to write.
+        overwrite (bool): Whether to replace existing values.
+
+    Returns:
+        The list of whether each key already had a value.
+    """
 
     worker = ray.worker.get_global_worker()
     if worker.mode == ray.worker.LOCAL_MODE:
-        exists = key in _local
-        if not exists or overwrite:
-            _local[key] = value
-        return exists
-
-    if overwrite:
-        updated = worker.redis_client.hset(key, "value", value)
-    else:
-        updated = worker.redis_client.hsetnx(key, "value", value)
-    return updated == 0  # already exists
+        already_exists = []
+        for key, value in items:
+            exists = key in _local
+            if not exists or overwrite:
+                _local[key] = value
+            already_exists.append(exists)
+        return already_exists
+
+    redis_clients = ray.worker.global_state.redis_clients
+    updated = [None] * len(items)
+    keys = [key for key, _ in items]
+    shards = _group_by_shard(keys, len(redis_clients))
+    for shard_index, indices in shards.items():
+        pipe = redis_clients[shard_index].pipeline(transaction=False)
+        for i in indices:
+            key, value = items[i]
+            if overwrite:
+                pipe.hset(key, "value", value)
+            else:
+                pipe.hsetnx(key, "value", value)
+        for i, result in zip(indices, pipe.execute()):
+            updated[i] = result
+
+    # Don't wait for the notifications, so that this worker reads its own
+    # writes.
+    if _cache is not None:
+        _cache.invalidate(keys)
+    return [result == 0 for result in updated]  # already exists
+
+
+def _get_cache():
+    """Returns the cache of this worker, creating it if needed."""
+    global _cache
+
+    redis_clients = ray.worker.global_state.redis_clients
+    with _cache_lock:
+        # Ray may have been restarted since the cache was created.
+        if _cache is None or _cache.redis_clients is not redis_clients:
+            _cache = _Cache(redis_clients)
+        return _cache
+
+
+class _Cache(object):
+    """A read-through cache of the internal KV store.
+
+    A daemon thread per Redis shard listens to the keyspace notifications of
+    the shard and drops the written keys from the cache. Missing keys are
+    cached as well, and dropped when they are created.
+    """
+
+    def __init__(self, redis_clients):
+        self.redis_clients = redis_clients
+        self.values = {}
+        self.lock = threading.Lock()
+        # This is incremented by every invalidation, so that values that were
+        # fetched while a key was written are not cached.
+        self.generation = 0
+        self.alive = True
+
+        for i, redis_client in enumerate(redis_clients):
+            pubsub = redis_client.pubsub()
+            pubsub.psubscribe(_KEYSPACE_PREFIX + b"*")
+            # Wait for the subscription to be confirmed, so that writes made
+            # after this returns are not missed.
+            next(pubsub.listen())
+            t = threading.Thread(
+                target=self._listen,
+                args=(pubsub, ),
+                name="ray_internal_kv_cache_{}".format(i))
+            # Making the thread a daemon causes it to exit when the main
+            # thread exits.
+            t.daemon = True
+            t.start()
+
+    def _listen(self, pubsub):
+        try:
+            for message in pubsub.listen():
+                if message["type"] == "pmessage":
+                    key = message["channel"][len(_KEYSPACE_PREFIX):]
+                    self.invalidate([key])
+        except Exception:
+            # This is to suppress errors that occur when Redis shuts down.
+            logger.debug(
+                "Stopped listening to keyspace notifications.", exc_info=True)
+        finally:
+            # Without notifications, the cached values may grow stale.
+            with self.lock:
+                self.alive = False
+                self.values.clear()
+
+    def invalidate(self, keys):
+        with self.lock:
+            self.generation += 1
+            for key in keys:
+                self.values.pop(key, None)
+
+    def multi_get(self, keys):
+        with self.lock:
+            generation = self.generation
+            values = {
+                key: self.values[key]
+                for key in keys if key in self.values
+            }
+        missing = list({key for key in keys if key not in values})
+        if missing:
+            fetched = _fetch(missing)
+            values.update(zip(missing, fetched))
+            with self.lock:
+                if self.alive and self.generation == generation:
+                    self.values.update(zip(missing, fetched))
+        return [values[key] for key in keys]
@@ -22,7 +22,9 @@ def _calculate_key(name):
 def get_actor(name):
     """Get a named actor which was previously created.
 
-    If the actor doesn't exist, an exception will be raised.
+    If the actor doesn't exist, an exception will be raised. The pickled
+    handle is read through the cache of the internal KV store, so repeated
+    lookups don't access Redis.
 
     Args:
         name: The name of the named actor.
@@ -31,7 +33,7 @@ def get_actor(name):
         The ActorHandle object corresponding to the name.
     """
     actor_name = _calculate_key(name)
-    pickled_state = _internal_kv_get(actor_name)
+    pickled_state = _internal_kv_get(actor_name, cached=True)
     if pickled_state is None:
         raise ValueError("The actor with name={} doesn't exist".format(name))
     handle = pickle.loads(pickled_state)
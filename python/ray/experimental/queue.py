@@ -3,10 +3,18 @@ from __future__ import division
 from __future__ import print_function
 
 from collections import deque
+import itertools
 import time
 
 import ray
 
+# The bounds of the interval at which blocking calls poll a parked request.
+_MIN_POLL_INTERVAL_S = 0.001
+_MAX_POLL_INTERVAL_S = 0.1
+# Parked and served requests whose caller has not polled them for this many
+# seconds, e.g. because it died, are expired.
+_REQUEST_TIMEOUT_S = 10.0
+
 
 class Empty(Exception):
     pass
@@ -19,6 +27,18 @@ class Full(Exception):
 class Queue(object):
     """Queue implementation on Ray.
 
+    A blocking call parks its request in the queue actor, which serves
+    parked requests in the order they arrived, so blocked producers and
+    consumers are served in FIFO order. The caller then polls the actor for
+    the result of its request, backing off up to _MAX_POLL_INTERVAL_S
+    between polls, so a blocking call may return up to 100ms after its
+    request is served.
+
+    A request whose caller stops polling it for _REQUEST_TIMEOUT_S, e.g.
+    because the caller died, is expired: it no longer holds up the requests
+    parked behind it, and if it was a get that was already served, its items
+    are put back into the queue.
+
     Args:
         maxsize (int): maximum size of the queue. If zero, size is unboundend.
     """
@@ -40,7 +60,7 @@ class Queue(object):
 
     def empty(self):
         """Whether the queue is empty."""
-        return ray.get(self.actor.qsize.remote())
+        return ray.get(self.actor.empty.remote())
 
     def full(self):
         """Whether the queue is full."""
@@ -49,70 +69,71 @@ class Queue(object):
     def put(self, item, block=True, timeout=None):
         """Adds an item to the queue.
 
-        Uses polling if block=True, so there is no guarantee of order if
-        multiple producers put to the same full queue.
+        Raises:
+            Full if the queue is full and blocking is False, or if the queue
+                is still full after timeout seconds.
+        """
+        self.put_batch([item], block, timeout)
+
+    def put_batch(self, items, block=True, timeout=None):
+        """Adds all of the given items to the queue at once.
+
+        The items are only added once there is room for all of them, so
+        len(items) may not exceed the maxsize of the queue.
 
         Raises:
-            Full if the queue is full and blocking is False.
+            Full if the queue does not have room for the items and blocking
+                is False, or if it still does not after timeout seconds.
         """
+        items = list(items)
+        if 0 < self.maxsize < len(items):
+            raise ValueError("Can't put more items than the queue maxsize")
         if self.maxsize <= 0:
-            self.actor.put.remote(item)
+            self.actor.put_batch.remote(items)
         elif not block:
-            if not ray.get(self.actor.put.remote(item)):
+            if not ray.get(self.actor.put_batch.remote(items)):
                 raise Full
-        elif timeout is None:
-            # Polling
-            # Use a not_full condition variable or promise?
-            while not ray.get(self.actor.put.remote(item)):
-                # Consider adding time.sleep here
-                pass
-        elif timeout < 0:
-            raise ValueError("'timeout' must be a non-negative number")
         else:
-            endtime = time.time() + timeout
-            # Polling
-            # Use a condition variable or switch to promise?
-            success = False
-            while not success and time.time() < endtime:
-                success = ray.get(self.actor.put.remote(item))
-            if not success:
+            _check_timeout(timeout)
+            if not _wait([(self.actor, self.actor.put_batch_wait, items)],
+                         timeout):
                 raise Full
 
     def get(self, block=True, timeout=None):
         """Gets an item from the queue.
 
-        Uses polling if block=True, so there is no guarantee of order if
-        multiple consumers get from the same empty queue.
-
         Returns:
             The next item in the queue.
 
         Raises:
-            Empty if the queue is empty and blocking is False.
+            Empty if the queue is empty and blocking is False, or if the
+                queue is still empty after timeout seconds.
         """
+        return self.get_batch(1, block, timeout)[0]
+
+    def get_batch(self, num_items, block=True, timeout=None):
+        """Gets the next num_items items from the queue at once.
+
+        Returns:
+            List of the next num_items items in the queue.
+
+        Raises:
+            Empty if the queue has fewer than num_items items and blocking
+                is False, or if it still does after timeout seconds.
+        """
+        if 0 < self.maxsize < num_items:
+            raise ValueError("Can't get more items than the queue maxsize")
         if not block:
-            success, item = ray.get(self.actor.get.remote())
+            success, items = ray.get(self.actor.get_batch.remote(num_items))
             if not success:
                 raise Empty
-        elif timeout is None:
-            # Polling
-            # Use a not_empty condition variable or return a promise?
-            success, item = ray.get(self.actor.get.remote())
-            while not success:
-                # Consider adding time.sleep here
-                success, item = ray.get(self.actor.get.remote())
-        elif timeout < 0:
-            raise ValueError("'timeout' must be a non-negative number")
-        else:
-            endtime = time.time() + timeout
-            # Polling
-            # Use a not_full condition variable or return a promise?
-            success = False
-            while not success and time.time() < endtime:
-                success, item = ray.get(self.actor.get.remote())
-            if not success:
-                raise Empty
-        return item
+            return items
+        _check_timeout(timeout)
+        results = _wait([(self.actor, self.actor.get_batch_wait, num_items)],
+                        timeout)
+        if not results:
+            raise Empty
+        return results[0]
 
     def put_nowait(self, item):
         """Equivalent to put(item, block=False).
@@ -131,31 +152,316 @@ class Queue(object):
         return self.get(block=False)
 
 
+class ShardedQueue(object):
+    """Unbounded queue spread over several actors for higher throughput.
+
+    Items are put to the shards in round-robin order, and there is no
+    ordering guarantee across shards. A blocking get() parks a request on
+    every shard and takes the item of the first one served. Items returned
+    by the other shards in the meantime are kept by this ShardedQueue
+    instance and returned by its next get() calls.
+
+    Args:
+        num_shards (int): Number of queue actors.
+    """
+
+    def __init__(self, num_shards):
+        self.shards = [Queue() for _ in range(num_shards)]
+        self._next_shard = itertools.cycle(range(num_shards))
+        self._buffer = deque()
+
+    def __len__(self):
+        return self.size()
+
+    def __getstate__(self):
+        # Don't copy the items held by this instance
+        return {"shards": self.shards}
+
+    def __setstate__(self, state):
+        self.__init__(0)
+        self.shards = state["shards"]
+        self._next_shard = itertools.cycle(range(len(self.shards)))
+
+    def size(self):
+        """The total size of the shards."""
+        sizes = ray.get([q.actor.qsize.remote() for q in self.shards])
+        return sum(sizes) + len(self._buffer)
+
+    def qsize(self):
+        """The total size of the shards."""
+        return self.size()
+
+    def empty(self):
+        """Whether all shards are empty."""
+        return self.size() == 0
+
+    def put(self, item, block=True, timeout=None):
+        """Adds an item to the next shard.
+
+        The shards are unbounded, so this never blocks. The block and timeout
+        arguments are only accepted for compatibility with Queue.
+        """
+        self.shards[next(self._next_shard)].put(item)
+
+    def put_batch(self, items):
+        """Adds the items to the next shard."""
+        self.shards[next(self._next_shard)].put_batch(items)
+
+    def get(self, block=True, timeout=None):
+        """Gets an item from any of the shards.
+
+        Raises:
+            Empty if all shards are empty and blocking is False, or if they
+                are still empty after timeout seconds.
+        """
+        if self._buffer:
+            return self._buffer.popleft()
+
+        # Try the shards without blocking first, starting at the next one
+        start = next(self._next_shard)
+        order = self.shards[start:] + self.shards[:start]
+        for q in order:
+            success, items = ray.get(q.actor.get_batch.remote(1))
+            if success:
+                return items[0]
+        if not block:
+            raise Empty
+
+        _check_timeout(timeout)
+        requests = [(q.actor, q.actor.get_batch_wait, 1) for q in order]
+        for items in _wait(requests, timeout):
+            self._buffer.extend(items)
+        if not self._buffer:
+            raise Empty
+        return self._buffer.popleft()
+
+    def get_nowait(self):
+        """Equivalent to get(block=False).
+
+        Raises:
+            Empty if all shards are empty.
+        """
+        return self.get(block=False)
+
+
+def _check_timeout(timeout):
+    if timeout is not None and timeout < 0:
+        raise ValueError("'timeout' must be a non-negative number")
+
+
+def _wait(requests, timeout):
+    """Parks blocking requests on queue actors until one of them is served.
+
+    The requests that are not served by then are cancelled. A request may be
+    served before its cancellation reaches the actor, in which case its
+    result is returned as well.
+
+    Args:
+        requests: List of (actor, method, arg) tuples, where method is the
+            put_batch_wait or get_batch_wait method of the queue actor.
+        timeout: The number of seconds to wait for, or None to wait until a
+            request is served.
+
+    Returns:
+        The list of results of the served requests, which is empty if the
+        wait timed out.
+    """
+    deadline = None if timeout is None else time.time() + timeout
+    results = []
+    pending = _park(requests, results)
+
+    interval = _MIN_POLL_INTERVAL_S
+    while not results:
+        if deadline is not None:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            interval = min(interval, remaining)
+        time.sleep(interval)
+        interval = min(2 * interval, _MAX_POLL_INTERVAL_S)
+        polled = ray.get(
+            [request[0].poll.remote(ticket) for request, ticket in pending])
+        results = [result for done, result in polled if done]
+        # Requests that expired because this caller could not poll them in
+        # time are parked again
+        expired = [
+            request for (request, _), (done, _) in zip(pending, polled)
+            if done is None
+        ]
+        pending = [
+            pending_request
+            for pending_request, (done, _) in zip(pending, polled)
+            if done is False
+        ] + _park(expired, results)
+
+    cancelled = ray.get(
+        [request[0].cancel.remote(ticket) for request, ticket in pending])
+    results.extend(
+        result for was_parked, result in cancelled if not was_parked)
+    return results
+
+
+def _park(requests, results):
+    """Parks requests on their queue actors.
+
+    The results of the requests that are served at once are appended to
+    results.
+
+    Returns:
+        List of (request, ticket) tuples of the requests left parked.
+    """
+    parked = ray.get([method.remote(arg) for _, method, arg in requests])
+    results.extend(result for _, done, result in parked if done)
+    return [(request, ticket)
+            for request, (ticket, done, _) in zip(requests, parked)
+            if not done]
+
+
 @ray.remote
 class _QueueActor(object):
-    def __init__(self, maxsize):
+    def __init__(self, maxsize, request_timeout=_REQUEST_TIMEOUT_S):
         self.maxsize = maxsize
+        self.request_timeout = request_timeout
         self._init(maxsize)
+        # Parked blocking requests, as (items, ticket) for puts and
+        # (num_items, ticket) for gets, served in FIFO order
+        self.put_waiters = deque()
+        self.get_waiters = deque()
+        # The results of served requests, by ticket, until they are polled
+        self.results = {}
+        # The last time each parked or served request was polled, by ticket
+        self.last_polled = {}
+        self._tickets = itertools.count()
 
     def qsize(self):
+        # Count the items of expired requests put back into the queue
+        self._serve()
         return self._qsize()
 
     def empty(self):
-        return not self._qsize()
+        return not self.qsize()
 
     def full(self):
-        return 0 < self.maxsize <= self._qsize()
+        return 0 < self.maxsize <= self.qsize()
 
     def put(self, item):
-        if self.maxsize > 0 and self._qsize() >= self.maxsize:
+        return self.put_batch([item])
+
+    def put_batch(self, items):
+        if self.put_waiters or not self._fits(len(items)):
             return False
-        self._put(item)
+        for item in items:
+            self._put(item)
+        self._serve()
         return True
 
     def get(self):
-        if not self._qsize():
+        success, items = self.get_batch(1)
+        return success, items[0] if success else None
+
+    def get_batch(self, num_items):
+        if self.get_waiters or self._qsize() < num_items:
             return False, None
-        return True, self._get()
+        items = [self._get() for _ in range(num_items)]
+        self._serve()
+        return True, items
+
+    def put_batch_wait(self, items):
+        return self._park(self.put_waiters, items)
+
+    def get_batch_wait(self, num_items):
+        return self._park(self.get_waiters, num_items)
+
+    def poll(self, ticket):
+        """Polls a parked request.
+
+        Returns:
+            (True, result) if the request was served, (False, None) if it is
+            still parked, or (None, None) if it expired.
+        """
+        self._serve()
+        if ticket in self.results:
+            del self.last_polled[ticket]
+            return True, self.results.pop(ticket)
+        if ticket in self.last_polled:
+            self.last_polled[ticket] = time.time()
+            return False, None
+        return None, None
+
+    def cancel(self, ticket):
+        """Removes a parked request.
+
+        Returns:
+            (True, None) if the request was still parked, or (False, result)
+            if it was served in the meantime. Expired requests count as
+            still parked.
+        """
+        self.last_polled.pop(ticket, None)
+        for waiters in [self.put_waiters, self.get_waiters]:
+            for waiter in waiters:
+                if waiter[1] == ticket:
+                    waiters.remove(waiter)
+                    # Requests queued behind it may be servable now
+                    self._serve()
+                    return True, None
+        if ticket in self.results:
+            return False, self.results.pop(ticket)
+        return True, None
+
+    def _park(self, waiters, arg):
+        """Parks a request, returning (ticket, served, result)."""
+        ticket = next(self._tickets)
+        waiters.append((arg, ticket))
+        self.last_polled[ticket] = time.time()
+        self._serve()
+        done, result = self.poll(ticket)
+        return ticket, done, result
+
+    def _fits(self, num_items):
+        return self.maxsize <= 0 or self._qsize() + num_items <= self.maxsize
+
+    def _expire(self):
+        """Expires the requests that have not been polled in time.
+
+        The items of expired get requests that were already served are put
+        back into the queue, while expired put requests that were already
+        served have nothing to undo.
+        """
+        deadline = time.time() - self.request_timeout
+        expired = {
+            ticket
+            for ticket, last_polled in self.last_polled.items()
+            if last_polled < deadline
+        }
+        if not expired:
+            return
+        for ticket in expired:
+            del self.last_polled[ticket]
+            result = self.results.pop(ticket, None)
+            if isinstance(result, list):
+                for item in result:
+                    self._put(item)
+        for waiters in [self.put_waiters, self.get_waiters]:
+            remaining = [w for w in waiters if w[1] not in expired]
+            waiters.clear()
+            waiters.extend(remaining)
+
+    def _serve(self):
+        """Serves parked requests until the first of each can't be."""
+        self._expire()
+        progress = True
+        while progress:
+            progress = False
+            if self.put_waiters and self._fits(len(self.put_waiters[0][0])):
+                items, ticket = self.put_waiters.popleft()
+                for item in items:
+                    self._put(item)
+                self.results[ticket] = True
+                progress = True
+            if self.get_waiters and self._qsize() >= self.get_waiters[0][0]:
+                num_items, ticket = self.get_waiters.popleft()
+                self.results[ticket] = [self._get() for _ in range(num_items)]
+                progress = True
 
     # Override these for different queue implementations
     def _init(self, maxsize):
@@ -3,17 +3,25 @@ from __future__ import division
 from __future__ import print_function
 
 from collections import defaultdict
+import itertools
 import json
+import logging
+from multiprocessing.pool import ThreadPool
 import redis
+import struct
 import sys
+import threading
 import time
 
 import ray
 import ray.gcs_utils
+import ray.metrics
 import ray.ray_constants as ray_constants
 from ray.utils import (decode, binary_to_object_id, binary_to_hex,
                        hex_to_binary)
 
+logger = logging.getLogger(__name__)
+
 
 class GlobalState(object):
     """A class used to interface with the Ray control state.
@@ -33,6 +41,13 @@ class GlobalState(object):
         self.redis_client = None
         # Clients for the redis shards, storing the object table & task table.
         self.redis_clients = None
+        # The last client table read, and the number of entries of the
+        # client log it was read at.
+        self._client_table_lock = threading.Lock()
+        self._client_table_cache = None
+        self._client_table_version = None
+        # The view of the available resources, started on first use.
+        self._resource_view = None
 
     def _check_connected(self):
         """Check that the object has been initialized before it is used.
@@ -66,6 +81,12 @@ class GlobalState(object):
             redis_port: The port that the Redis server is listening on.
             redis_password: The password of the redis server.
         """
+        if self._resource_view is not None:
+            self._resource_view.stop()
+            self._resource_view = None
+        with self._client_table_lock:
+            self._client_table_cache = None
+            self._client_table_version = None
         self.redis_client = redis.StrictRedis(
             host=redis_ip_address, port=redis_port, password=redis_password)
 
@@ -142,24 +163,106 @@ class GlobalState(object):
             result.extend(list(client.scan_iter(match=pattern)))
         return result
 
-    def _object_table(self, object_id):
-        """Fetch and parse the object table information for a single object ID.
+    def _iter_shard_table(self,
+                          shard_index,
+                          prefix_string,
+                          table_prefix,
+                          id_filter=None,
+                          batch_size=1000):
+        """Yield the IDs and raw entries of a GCS table on one Redis shard.
+
+        The keys of the shard are scanned, and looked up in pipelined batches
+        of batch_size keys, so that entries are fetched in few round trips
+        without loading the whole table at once.
 
         Args:
-            object_id_binary: A string of bytes with the object ID to get
-                information about.
+            shard_index: The index of the Redis shard.
+            prefix_string: The key prefix of the table.
+            table_prefix: The table prefix to pass to RAY.TABLE_LOOKUP.
+            id_filter: If provided, only look up the IDs for which this
+                returns True.
+            batch_size: The max number of lookups sent at once.
+        """
+        client = self.redis_clients[shard_index]
+        seen = set()
+        batch = []
+        keys = client.scan_iter(match=prefix_string + "*", count=batch_size)
+        # The trailing None flushes the last batch.
+        for key in itertools.chain(keys, [None]):
+            if key is not None:
+                entry_id_binary = key[len(prefix_string):]
+                # SCAN can return a key more than once.
+                if entry_id_binary in seen:
+                    continue
+                seen.add(entry_id_binary)
+                entry_id = binary_to_object_id(entry_id_binary)
+                if id_filter is None or id_filter(entry_id):
+                    batch.append(entry_id)
+            if batch and (key is None or len(batch) == batch_size):
+                pipeline = client.pipeline(transaction=False)
+                for entry_id in batch:
+                    pipeline.execute_command("RAY.TABLE_LOOKUP", table_prefix,
+                                             "", entry_id.id())
+                for entry_id, message in zip(batch, pipeline.execute()):
+                    # The entry may have been removed since it was scanned.
+                    if message is not None:
+                        yield entry_id, message
+                batch = []
+
+    def _iter_table(self, prefix_string, table_prefix, parse, id_filter=None):
+        """Lazily yield the IDs and parsed entries of a GCS table.
+
+        Args:
+            prefix_string: The key prefix of the table.
+            table_prefix: The table prefix to pass to RAY.TABLE_LOOKUP.
+            parse: The function used to parse an entry. Entries for which it
+                returns None are skipped.
+            id_filter: If provided, only look up the IDs for which this
+                returns True.
+        """
+        for shard_index in range(len(self.redis_clients)):
+            for entry_id, message in self._iter_shard_table(
+                    shard_index, prefix_string, table_prefix, id_filter):
+                entry = parse(message)
+                if entry is not None:
+                    yield entry_id, entry
+
+    def _fetch_table(self, prefix_string, table_prefix, parse):
+        """Fetch the IDs and parsed entries of a GCS table.
+
+        This is like _iter_table, but the Redis shards are queried in
+        parallel.
 
         Returns:
-            A dictionary with information about the object ID in question.
+            A list of (ID, entry) pairs.
         """
-        # Allow the argument to be either an ObjectID or a hex string.
-        if not isinstance(object_id, ray.ObjectID):
-            object_id = ray.ObjectID(hex_to_binary(object_id))
 
-        # Return information about a single object ID.
-        message = self._execute_command(object_id, "RAY.TABLE_LOOKUP",
-                                        ray.gcs_utils.TablePrefix.OBJECT, "",
-                                        object_id.id())
+        def fetch_shard(shard_index):
+            entries = []
+            for entry_id, message in self._iter_shard_table(
+                    shard_index, prefix_string, table_prefix):
+                entry = parse(message)
+                if entry is not None:
+                    entries.append((entry_id, entry))
+            return entries
+
+        pool = ThreadPool(len(self.redis_clients))
+        try:
+            shard_entries = pool.map(fetch_shard, range(
+                len(self.redis_clients)))
+        finally:
+            pool.close()
+        return list(itertools.chain.from_iterable(shard_entries))
+
+    def _parse_object_table_entry(self, message):
+        """Parse a GCS object table entry.
+
+        Args:
+            message: The reply of a RAY.TABLE_LOOKUP in the object table.
+
+        Returns:
+            A dictionary with information about the object.
+        """
         gcs_entry = ray.gcs_utils.GcsTableEntry.GetRootAsGcsTableEntry(
             message, 0)
 
@@ -181,6 +284,26 @@ class GlobalState(object):
 
         return object_info
 
+    def _object_table(self, object_id):
+        """Fetch and parse the object table information for a single object ID.
+
+        Args:
+            object_id_binary: A string of bytes with the object ID to get
+                information about.
+
+        Returns:
+            A dictionary with information about the object ID in question.
+        """
+        # Allow the argument to be either an ObjectID or a hex string.
+        if not isinstance(object_id, ray.ObjectID):
+            object_id = ray.ObjectID(hex_to_binary(object_id))
+
+        # Return information about a single object ID.
+        message = self._execute_command(object_id, "RAY.TABLE_LOOKUP",
+                                        ray.gcs_utils.TablePrefix.OBJECT, "",
+                                        object_id.id())
+        return self._parse_object_table_entry(message)
+
     def object_table(self, object_id=None):
         """Fetch and parse the object table info for one or more object IDs.
 
@@ -197,32 +320,47 @@ class GlobalState(object):
             return self._object_table(object_id)
         else:
             # Return the entire object table.
-            object_keys = self._keys(ray.gcs_utils.TablePrefix_OBJECT_string +
-                                     "*")
-            object_ids_binary = {
-                key[len(ray.gcs_utils.TablePrefix_OBJECT_string):]
-                for key in object_keys
-            }
+            return dict(
+                self._fetch_table(ray.gcs_utils.TablePrefix_OBJECT_string,
+                                  ray.gcs_utils.TablePrefix.OBJECT,
+                                  self._parse_object_table_entry))
 
-            results = {}
-            for object_id_binary in object_ids_binary:
-                results[binary_to_object_id(object_id_binary)] = (
-                    self._object_table(binary_to_object_id(object_id_binary)))
-            return results
+    def iter_object_table(self, task_ids=None):
+        """Lazily fetch and parse the object table.
 
-    def _task_table(self, task_id):
-        """Fetch and parse the task table information for a single task ID.
+        Args:
+            task_ids: If provided, only fetch the objects created by the tasks
+                with these binary IDs. The objects are filtered before they
+                are looked up.
+
+        Returns:
+            An iterator over pairs of object ID and information from the
+                object table.
+        """
+        self._check_connected()
+        id_filter = None
+        if task_ids is not None:
+
+            def id_filter(object_id):
+                return ray.raylet.compute_task_id(object_id).id() in task_ids
+
+        return self._iter_table(
+            ray.gcs_utils.TablePrefix_OBJECT_string,
+            ray.gcs_utils.TablePrefix.OBJECT,
+            self._parse_object_table_entry,
+            id_filter=id_filter)
+
+    def _parse_task_table_entry(self, message, driver_id=None):
+        """Parse a GCS task table entry.
 
         Args:
-            task_id_binary: A string of bytes with the task ID to get
-                information about.
+            message: The reply of a RAY.TABLE_LOOKUP in the task table.
+            driver_id: If provided, return None unless the task belongs to
+                the driver with this hex ID.
 
         Returns:
-            A dictionary with information about the task ID in question.
+            A dictionary with information about the task.
         """
-        message = self._execute_command(task_id, "RAY.TABLE_LOOKUP",
-                                        ray.gcs_utils.TablePrefix.RAYLET_TASK,
-                                        "", task_id.id())
         gcs_entries = ray.gcs_utils.GcsTableEntry.GetRootAsGcsTableEntry(
             message, 0)
 
@@ -231,11 +369,15 @@ class GlobalState(object):
         task_table_message = ray.gcs_utils.Task.GetRootAsTask(
             gcs_entries.Entries(0), 0)
 
-        execution_spec = task_table_message.TaskExecutionSpec()
         task_spec = task_table_message.TaskSpecification()
         task_spec = ray.raylet.task_from_string(task_spec)
+        task_driver_id = binary_to_hex(task_spec.driver_id().id())
+        if driver_id is not None and task_driver_id != driver_id:
+            return None
+
+        execution_spec = task_table_message.TaskExecutionSpec()
         task_spec_info = {
-            "DriverID": binary_to_hex(task_spec.driver_id().id()),
+            "DriverID": task_driver_id,
             "TaskID": binary_to_hex(task_spec.task_id().id()),
             "ParentTaskID": binary_to_hex(task_spec.parent_task_id().id()),
             "ParentCounter": task_spec.parent_counter(),
@@ -263,6 +405,21 @@ class GlobalState(object):
             "TaskSpec": task_spec_info
         }
 
+    def _task_table(self, task_id):
+        """Fetch and parse the task table information for a single task ID.
+
+        Args:
+            task_id_binary: A string of bytes with the task ID to get
+                information about.
+
+        Returns:
+            A dictionary with information about the task ID in question.
+        """
+        message = self._execute_command(task_id, "RAY.TABLE_LOOKUP",
+                                        ray.gcs_utils.TablePrefix.RAYLET_TASK,
+                                        "", task_id.id())
+        return self._parse_task_table_entry(message)
+
     def task_table(self, task_id=None):
         """Fetch and parse the task table information for one or more task IDs.
 
@@ -278,18 +435,35 @@ class GlobalState(object):
             task_id = ray.ObjectID(hex_to_binary(task_id))
             return self._task_table(task_id)
         else:
-            task_table_keys = self._keys(
-                ray.gcs_utils.TablePrefix_RAYLET_TASK_string + "*")
-            task_ids_binary = [
-                key[len(ray.gcs_utils.TablePrefix_RAYLET_TASK_string):]
-                for key in task_table_keys
-            ]
+            entries = self._fetch_table(
+                ray.gcs_utils.TablePrefix_RAYLET_TASK_string,
+                ray.gcs_utils.TablePrefix.RAYLET_TASK,
+                self._parse_task_table_entry)
+            return {
+                binary_to_hex(task_id.id()): task_info
+                for task_id, task_info in entries
+            }
 
-            results = {}
-            for task_id_binary in task_ids_binary:
-                results[binary_to_hex(task_id_binary)] = self._task_table(
-                    ray.ObjectID(task_id_binary))
-            return results
+    def iter_task_table(self, driver_id=None):
+        """Lazily fetch and parse the task table.
+
+        Args:
+            driver_id: If provided, only yield the tasks of the driver with
+                this hex ID.
+
+        Returns:
+            An iterator over pairs of hex task ID and information from the
+                task table.
+        """
+        self._check_connected()
+
+        def parse(message):
+            return self._parse_task_table_entry(message, driver_id=driver_id)
+
+        for task_id, task_info in self._iter_table(
+                ray.gcs_utils.TablePrefix_RAYLET_TASK_string,
+                ray.gcs_utils.TablePrefix.RAYLET_TASK, parse):
+            yield binary_to_hex(task_id.id()), task_info
 
     def function_table(self, function_id=None):
         """Fetch and parse the function table.
@@ -405,59 +579,116 @@ class GlobalState(object):
         Returns:
             A list of the profile events for the specified process.
         """
-        # TODO(rkn): This method should support limiting the number of log
-        # events and should also support returning a window of events.
-        message = self._execute_command(component_id, "RAY.TABLE_LOOKUP",
-                                        ray.gcs_utils.TablePrefix.PROFILE, "",
-                                        component_id.id())
+        return list(self._profile_events([component_id]))
 
-        if message is None:
-            return []
+    def _profile_table_messages(self, component_ids, batch_size=16):
+        """Yield the profile table messages of the given components.
 
-        gcs_entries = ray.gcs_utils.GcsTableEntry.GetRootAsGcsTableEntry(
-            message, 0)
+        The lookups are pipelined in batches on each Redis shard.
 
-        profile_events = []
-        for i in range(gcs_entries.EntriesLength()):
-            profile_table_message = (
-                ray.gcs_utils.ProfileTableData.GetRootAsProfileTableData(
-                    gcs_entries.Entries(i), 0))
+        Args:
+            component_ids: The identifiers of the components.
+            batch_size: The max number of lookups sent at once to a shard.
+                Each lookup returns all the events of a component, so this
+                bounds the memory used by pending replies.
+        """
+        component_ids_by_shard = defaultdict(list)
+        for component_id in component_ids:
+            shard_index = (
+                component_id.redis_shard_hash() % len(self.redis_clients))
+            component_ids_by_shard[shard_index].append(component_id)
+
+        for shard_index, shard_component_ids in (
+                component_ids_by_shard.items()):
+            client = self.redis_clients[shard_index]
+            for i in range(0, len(shard_component_ids), batch_size):
+                pipeline = client.pipeline(transaction=False)
+                for component_id in shard_component_ids[i:i + batch_size]:
+                    pipeline.execute_command("RAY.TABLE_LOOKUP",
+                                             ray.gcs_utils.TablePrefix.PROFILE,
+                                             "", component_id.id())
+                for message in pipeline.execute():
+                    if message is None:
+                        continue
+                    gcs_entries = (
+                        ray.gcs_utils.GcsTableEntry.GetRootAsGcsTableEntry(
+                            message, 0))
+                    for j in range(gcs_entries.EntriesLength()):
+                        yield (ray.gcs_utils.ProfileTableData.
+                               GetRootAsProfileTableData(
+                                   gcs_entries.Entries(j), 0))
+
+    def _profile_events(self,
+                        component_ids,
+                        start_time=None,
+                        end_time=None,
+                        component_types=None,
+                        parse_extra_data=True):
+        """Yield the profile events of the given components.
+
+        Events are filtered before their extra data is parsed, so that
+        filtered out events cost little.
 
+        Args:
+            component_ids: The identifiers of the components.
+            start_time: If set, skip the events that ended before this time.
+            end_time: If set, skip the events that started after this time.
+            component_types: If set, only yield the events of components of
+                these types.
+            parse_extra_data: If False, the extra data of the events is left
+                as a JSON string.
+        """
+        for profile_table_message in self._profile_table_messages(
+                component_ids):
             component_type = decode(profile_table_message.ComponentType())
+            if (component_types is not None
+                    and component_type not in component_types):
+                continue
             component_id = binary_to_hex(profile_table_message.ComponentId())
             node_ip_address = decode(profile_table_message.NodeIpAddress())
 
             for j in range(profile_table_message.ProfileEventsLength()):
                 profile_event_message = profile_table_message.ProfileEvents(j)
+                event_start_time = profile_event_message.StartTime()
+                event_end_time = profile_event_message.EndTime()
+                if start_time is not None and event_end_time < start_time:
+                    continue
+                if end_time is not None and event_start_time > end_time:
+                    continue
 
-                profile_event = {
+                extra_data = decode(profile_event_message.ExtraData())
+                if parse_extra_data:
+                    extra_data = json.loads(extra_data)
+
+                yield {
                     "event_type": decode(profile_event_message.EventType()),
                     "component_id": component_id,
                     "node_ip_address": node_ip_address,
                     "component_type": component_type,
-                    "start_time": profile_event_message.StartTime(),
-                    "end_time": profile_event_message.EndTime(),
-                    "extra_data": json.loads(
-                        decode(profile_event_message.ExtraData())),
+                    "start_time": event_start_time,
+                    "end_time": event_end_time,
+                    "extra_data": extra_data,
                 }
 
-                profile_events.append(profile_event)
-
-        return profile_events
-
-    def profile_table(self):
+    def _profile_component_ids(self):
+        """Get the identifiers of all components with profile events."""
         profile_table_keys = self._keys(
             ray.gcs_utils.TablePrefix_PROFILE_string + "*")
-        component_identifiers_binary = [
-            key[len(ray.gcs_utils.TablePrefix_PROFILE_string):]
+        return [
+            binary_to_object_id(
+                key[len(ray.gcs_utils.TablePrefix_PROFILE_string):])
             for key in profile_table_keys
         ]
 
-        return {
-            binary_to_hex(component_id): self._profile_table(
-                binary_to_object_id(component_id))
-            for component_id in component_identifiers_binary
+    def profile_table(self):
+        component_ids = self._profile_component_ids()
+        profile_table = {
+            component_id.hex(): []
+            for component_id in component_ids
         }
+        for event in self._profile_events(component_ids):
+            profile_table[event["component_id"]].append(event)
+        return profile_table
 
     def _seconds_to_microseconds(self, time_in_seconds):
         """A helper function for converting seconds to microseconds."""
@@ -520,7 +751,12 @@ class GlobalState(object):
         "cq_build_attempt_failed",
     ]
 
-    def chrome_tracing_dump(self, filename=None):
+    def chrome_tracing_dump(self,
+                            filename=None,
+                            start_time=None,
+                            end_time=None,
+                            component_ids=None,
+                            binary=False):
         """Return a list of profiling events that can viewed as a timeline.
 
         To view this information as a timeline, simply dump it as a json file
@@ -528,9 +764,21 @@ class GlobalState(object):
         chrome://tracing in the Chrome web browser and load the dumped file.
         Make sure to enable "Flow events" in the "View Options" menu.
 
+        When a filename is given, the events are written to the file as they
+        are read from the GCS rather than collected in memory first.
+
         Args:
             filename: If a filename is provided, the timeline is dumped to that
                 file.
+            start_time: If provided, only include the events that ended after
+                this time, in seconds since the epoch.
+            end_time: If provided, only include the events that started before
+                this time, in seconds since the epoch.
+            component_ids: If provided, only include the events of the workers
+                and drivers with these hex IDs.
+            binary: If True, dump the timeline to the file in a compact binary
+                format instead of JSON. Such a file can be read back with
+                load_chrome_tracing_dump.
 
         Returns:
             If filename is not provided, this returns a list of profiling
@@ -538,57 +786,48 @@ class GlobalState(object):
         """
         # TODO(rkn): Support including the task specification data in the
         # timeline.
-        # TODO(rkn): This should support viewing just a window of time or a
-        # limited number of events.
-
-        profile_table = self.profile_table()
-        all_events = []
-
-        for component_id_hex, component_events in profile_table.items():
-            # Only consider workers and drivers.
-            component_type = component_events[0]["component_type"]
-            if component_type not in ["worker", "driver"]:
-                continue
-
-            for event in component_events:
-                new_event = {
-                    # The category of the event.
-                    "cat": event["event_type"],
-                    # The string displayed on the event.
-                    "name": event["event_type"],
-                    # The identifier for the group of rows that the event
-                    # appears in.
-                    "pid": event["node_ip_address"],
-                    # The identifier for the row that the event appears in.
-                    "tid": event["component_type"] + ":" +
-                    event["component_id"],
-                    # The start time in microseconds.
-                    "ts": self._seconds_to_microseconds(event["start_time"]),
-                    # The duration in microseconds.
-                    "dur": self._seconds_to_microseconds(event["end_time"] -
-                                                         event["start_time"]),
-                    # What is this?
-                    "ph": "X",
-                    # This is the name of the color to display the box in.
-                    "cname": self._default_color_mapping[event["event_type"]],
-                    # The extra user-defined data.
-                    "args": event["extra_data"],
-                }
-
-                # Modify the json with the additional user-defined extra data.
-                # This can be used to add fields or override existing fields.
-                if "cname" in event["extra_data"]:
-                    new_event["cname"] = event["extra_data"]["cname"]
-                if "name" in event["extra_data"]:
-                    new_event["name"] = event["extra_data"]["name"]
-
-                all_events.append(new_event)
-
-        if filename is not None:
+        if component_ids is None:
+            component_ids = self._profile_component_ids()
+        else:
+            component_ids = [
+                binary_to_object_id(hex_to_binary(component_id))
+                for component_id in component_ids
+            ]
+        events = self._profile_events(
+            component_ids,
+            start_time=start_time,
+            end_time=end_time,
+            component_types=["worker", "driver"],
+            parse_extra_data=False)
+
+        if binary:
+            if filename is None:
+                raise ValueError("A filename is required to dump the timeline "
+                                 "in the binary format.")
+            with open(filename, "wb") as outfile:
+                _write_binary_timeline(events, outfile)
+        elif filename is not None:
             with open(filename, "w") as outfile:
-                json.dump(all_events, outfile)
+                outfile.write("[")
+                for i, event in enumerate(events):
+                    if i > 0:
+                        outfile.write(",\n")
+                    outfile.write(
+                        json.dumps(
+                            _chrome_tracing_event(
+                                event["event_type"], event["node_ip_address"],
+                                event["component_type"] + ":" +
+                                event["component_id"], event["start_time"],
+                                event["end_time"], event["extra_data"])))
+                outfile.write("]")
         else:
-            return all_events
+            return [
+                _chrome_tracing_event(
+                    event["event_type"], event["node_ip_address"],
+                    event["component_type"] + ":" + event["component_id"],
+                    event["start_time"], event["end_time"],
+                    event["extra_data"]) for event in events
+            ]
 
     def chrome_tracing_object_transfer_dump(self, filename=None):
         """Return a list of transfer events that can viewed as a timeline.
@@ -740,18 +979,38 @@ class GlobalState(object):
             return 0, 0, 0
         return overall_smallest, overall_largest, num_tasks
 
+    def _cached_client_table(self):
+        """Returns the client table, re-reading it only if it has changed.
+
+        The client table is an append-only log, so the number of entries in
+        it, which Redis returns in constant time, changes whenever a client
+        is added or removed.
+        """
+        self._check_connected()
+
+        key = (ray.gcs_utils.TablePrefix_CLIENT_string.encode("ascii") +
+               ray_constants.ID_SIZE * b"\xff")
+        # Read the version before the table, so that a table read while an
+        # entry is appended is re-read next time.
+        version = self.redis_client.zcard(key)
+        with self._client_table_lock:
+            if version != self._client_table_version:
+                self._client_table_cache = self.client_table()
+                self._client_table_version = version
+            return self._client_table_cache
+
     def cluster_resources(self):
         """Get the current total cluster resources.
 
-        Note that this information can grow stale as nodes are added to or
-        removed from the cluster.
+        The client table is only re-read when clients were added or removed
+        since the last call, so this is cheap to call repeatedly.
 
         Returns:
             A dictionary mapping resource name to the total quantity of that
                 resource in the cluster.
         """
         resources = defaultdict(int)
-        clients = self.client_table()
+        clients = self._cached_client_table()
         for client in clients:
             # Only count resources from live clients.
             if client["IsInsertion"]:
@@ -764,7 +1023,7 @@ class GlobalState(object):
         """Returns a set of client IDs corresponding to clients still alive."""
         return {
             client["ClientID"]
-            for client in self.client_table() if client["IsInsertion"]
+            for client in self._cached_client_table() if client["IsInsertion"]
         }
 
     def available_resources(self):
@@ -773,64 +1032,24 @@ class GlobalState(object):
         This is different from `cluster_resources` in that this will return
         idle (available) resources rather than total resources.
 
-        Note that this information can grow stale as tasks start and finish.
+        The available resources are kept up to date from the heartbeats of
+        the raylets by a background thread, which is started on the first
+        call. The first call blocks until every live client has sent a
+        heartbeat. The returned resources are never older than
+        ray_constants.AVAILABLE_RESOURCES_MAX_STALENESS_S seconds, but can
+        still grow stale as tasks start and finish.
 
         Returns:
             A dictionary mapping resource name to the total quantity of that
                 resource in the cluster.
         """
-        available_resources_by_id = {}
-
-        subscribe_clients = [
-            redis_client.pubsub(ignore_subscribe_messages=True)
-            for redis_client in self.redis_clients
-        ]
-        for subscribe_client in subscribe_clients:
-            subscribe_client.subscribe(ray.gcs_utils.XRAY_HEARTBEAT_CHANNEL)
-
-        client_ids = self._live_client_ids()
-
-        while set(available_resources_by_id.keys()) != client_ids:
-            for subscribe_client in subscribe_clients:
-                # Parse client message
-                raw_message = subscribe_client.get_message()
-                if (raw_message is None or raw_message["channel"] !=
-                        ray.gcs_utils.XRAY_HEARTBEAT_CHANNEL):
-                    continue
-                data = raw_message["data"]
-                gcs_entries = (
-                    ray.gcs_utils.GcsTableEntry.GetRootAsGcsTableEntry(
-                        data, 0))
-                heartbeat_data = gcs_entries.Entries(0)
-                message = (ray.gcs_utils.HeartbeatTableData.
-                           GetRootAsHeartbeatTableData(heartbeat_data, 0))
-                # Calculate available resources for this client
-                num_resources = message.ResourcesAvailableLabelLength()
-                dynamic_resources = {}
-                for i in range(num_resources):
-                    resource_id = decode(message.ResourcesAvailableLabel(i))
-                    dynamic_resources[resource_id] = (
-                        message.ResourcesAvailableCapacity(i))
-
-                # Update available resources for this client
-                client_id = ray.utils.binary_to_hex(message.ClientId())
-                available_resources_by_id[client_id] = dynamic_resources
-
-            # Update clients in cluster
-            client_ids = self._live_client_ids()
-
-            # Remove disconnected clients
-            for client_id in available_resources_by_id.keys():
-                if client_id not in client_ids:
-                    del available_resources_by_id[client_id]
-
-        # Calculate total available resources
-        total_available_resources = defaultdict(int)
-        for available_resources in available_resources_by_id.values():
-            for resource_id, num_available in available_resources.items():
-                total_available_resources[resource_id] += num_available
+        self._check_connected()
 
-        return dict(total_available_resources)
+        if self._resource_view is None:
+            self._resource_view = _ResourceView(self.redis_client,
+                                                self._live_client_ids)
+        return self._resource_view.available_resources(
+            ray_constants.AVAILABLE_RESOURCES_MAX_STALENESS_S)
 
     def _error_messages(self, job_id):
         """Get the error messages for a specific job.
@@ -889,3 +1108,236 @@ class GlobalState(object):
             binary_to_hex(job_id): self._error_messages(ray.ObjectID(job_id))
             for job_id in job_ids
         }
+
+    def metrics(self, node_ip_address=None):
+        """Get the runtime metrics of the workers and drivers of each node.
+
+        The metrics of the processes of a node are aggregated by summing
+        them. Use ray.metrics.quantile to get quantiles of the histograms.
+
+        Args:
+            node_ip_address: If set, only get the metrics of this node.
+
+        Returns:
+            A dictionary mapping node IP address to a dictionary of metrics.
+        """
+        self._check_connected()
+        return ray.metrics.node_metrics(self.redis_client, node_ip_address)
+
+
+class _ResourceView(object):
+    """The available resources of the cluster, updated in the background.
+
+    A daemon thread listens to the heartbeat batches published by the
+    monitor and keeps the latest available resources of each live client,
+    along with their sum, so that queries don't need to access Redis.
+    """
+
+    def __init__(self, redis_client, live_client_ids):
+        """Subscribe to heartbeats and start the background thread.
+
+        Args:
+            redis_client: The client of the primary Redis shard.
+            live_client_ids: A function that returns the IDs of the clients
+                that are alive.
+        """
+        self._live_client_ids = live_client_ids
+        self._condition = threading.Condition()
+        self._available_by_client = {}
+        self._total_available = {}
+        # Whether all of the live clients have sent a heartbeat.
+        self._complete = False
+        self._last_update_time = None
+        self._stopped = False
+
+        self._pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(ray.gcs_utils.XRAY_HEARTBEAT_BATCH_CHANNEL)
+        self._thread = threading.Thread(
+            target=self._run, name="ray_resource_view")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        try:
+            for message in self._pubsub.listen():
+                if self._stopped:
+                    break
+                self._update(message["data"])
+        except Exception:
+            # This is to suppress errors that occur when Redis shuts down.
+            logger.debug("Stopped listening to heartbeats.", exc_info=True)
+        finally:
+            with self._condition:
+                self._stopped = True
+                self._condition.notify_all()
+
+    def _update(self, data):
+        gcs_entries = ray.gcs_utils.GcsTableEntry.GetRootAsGcsTableEntry(
+            data, 0)
+        message = (ray.gcs_utils.HeartbeatBatchTableData.
+                   GetRootAsHeartbeatBatchTableData(gcs_entries.Entries(0), 0))
+        heartbeats = {}
+        for j in range(message.BatchLength()):
+            heartbeat = message.Batch(j)
+            client_id = ray.utils.binary_to_hex(heartbeat.ClientId())
+            heartbeats[client_id] = {
+                decode(heartbeat.ResourcesAvailableLabel(i)):
+                heartbeat.ResourcesAvailableCapacity(i)
+                for i in range(heartbeat.ResourcesAvailableLabelLength())
+            }
+        live_client_ids = self._live_client_ids()
+
+        total_available = defaultdict(int)
+        with self._condition:
+            self._available_by_client.update(heartbeats)
+            # Remove disconnected clients
+            for client_id in list(self._available_by_client):
+                if client_id not in live_client_ids:
+                    del self._available_by_client[client_id]
+            for resources in self._available_by_client.values():
+                for resource_id, num_available in resources.items():
+                    total_available[resource_id] += num_available
+            self._total_available = dict(total_available)
+            self._complete = (len(
+                self._available_by_client) == len(live_client_ids))
+            self._last_update_time = time.time()
+            self._condition.notify_all()
+
+    def available_resources(self, max_staleness):
+        """Returns the total available resources of the live clients.
+
+        Args:
+            max_staleness (float): If the last update is older than this
+                many seconds, wait for the next one.
+
+        Raises:
+            Exception: If the view stopped listening to heartbeats.
+        """
+        with self._condition:
+            while (not self._complete
+                   or time.time() - self._last_update_time > max_staleness):
+                if self._stopped:
+                    raise Exception("The resource view stopped listening to "
+                                    "heartbeats.")
+                self._condition.wait(max_staleness)
+            return dict(self._total_available)
+
+    def stop(self):
+        """Stops the background thread after its next heartbeat."""
+        self._stopped = True
+
+
+def _chrome_tracing_event(event_type, node_ip_address, tid, start_time,
+                          end_time, extra_data):
+    """Convert a profile event to the Chrome tracing format.
+
+    Args:
+        event_type: The type of the event.
+        node_ip_address: The IP address of the node of the event.
+        tid: The identifier of the component of the event.
+        start_time: The start time of the event in seconds.
+        end_time: The end time of the event in seconds.
+        extra_data: The extra data of the event, as a JSON string.
+
+    Returns:
+        A dictionary that represents the event in a Chrome tracing dump.
+    """
+    extra_data = json.loads(extra_data) if extra_data != "{}" else {}
+    event = {
+        # The category of the event.
+        "cat": event_type,
+        # The string displayed on the event.
+        "name": event_type,
+        # The identifier for the group of rows that the event appears in.
+        "pid": node_ip_address,
+        # The identifier for the row that the event appears in.
+        "tid": tid,
+        # The start time in microseconds.
+        "ts": 10**6 * start_time,
+        # The duration in microseconds.
+        "dur": 10**6 * (end_time - start_time),
+        # What is this?
+        "ph": "X",
+        # This is the name of the color to display the box in.
+        "cname": GlobalState._default_color_mapping[event_type],
+        # The extra user-defined data.
+        "args": extra_data,
+    }
+
+    # Modify the json with the additional user-defined extra data. This can
+    # be used to add fields or override existing fields.
+    if "cname" in extra_data:
+        event["cname"] = extra_data["cname"]
+    if "name" in extra_data:
+        event["name"] = extra_data["name"]
+    return event
+
+
+# The binary timeline format starts with this header, followed by records
+# that start with a one byte tag. A b"s" record defines the string with the
+# next string id, and is followed by the UTF-8 encoded string. A b"e" record
+# is an event, which refers to its event type, node IP address and component
+# by string id and is followed by its extra data as JSON.
+_BINARY_TIMELINE_HEADER = b"RAYTIMELINE1\n"
+_BINARY_TIMELINE_STRING = struct.Struct("<I")
+_BINARY_TIMELINE_EVENT = struct.Struct("<IIIddI")
+
+
+def _write_binary_timeline(events, outfile):
+    """Write profile events to a file in the binary timeline format."""
+    string_ids = {}
+
+    def string_id(string):
+        if string not in string_ids:
+            data = string.encode("utf-8")
+            outfile.write(b"s" + _BINARY_TIMELINE_STRING.pack(len(data)))
+            outfile.write(data)
+            string_ids[string] = len(string_ids)
+        return string_ids[string]
+
+    outfile.write(_BINARY_TIMELINE_HEADER)
+    for event in events:
+        extra_data = event["extra_data"].encode("utf-8")
+        component = event["component_type"] + ":" + event["component_id"]
+        fields = (string_id(event["event_type"]),
+                  string_id(event["node_ip_address"]), string_id(component),
+                  event["start_time"], event["end_time"], len(extra_data))
+        outfile.write(b"e" + _BINARY_TIMELINE_EVENT.pack(*fields))
+        outfile.write(extra_data)
+
+
+def load_chrome_tracing_dump(filename):
+    """Read a timeline dumped by chrome_tracing_dump with binary=True.
+
+    Args:
+        filename: The file the timeline was dumped to.
+
+    Returns:
+        An iterator over the profiling events of the timeline, in the format
+            returned by chrome_tracing_dump.
+    """
+    with open(filename, "rb") as infile:
+        if infile.read(
+                len(_BINARY_TIMELINE_HEADER)) != (_BINARY_TIMELINE_HEADER):
+            raise ValueError(
+                "The file {} is not a binary timeline.".format(filename))
+        strings = []
+        while True:
+            tag = infile.read(1)
+            if not tag:
+                break
+            if tag == b"s":
+                length, = _BINARY_TIMELINE_STRING.unpack(
+                    infile.read(_BINARY_TIMELINE_STRING.size))
+                strings.append(infile.read(length).decode("utf-8"))
+            elif tag == b"e":
+                (event_type, node_ip_address, tid, start_time, end_time,
+                 length) = _BINARY_TIMELINE_EVENT.unpack(
+                     infile.read(_BINARY_TIMELINE_EVENT.size))
+                yield _chrome_tracing_event(
+                    strings[event_type], strings[node_ip_address],
+                    strings[tid], start_time, end_time,
+                    infile.read(length).decode("utf-8"))
+            else:
+                raise ValueError(
+                    "Invalid record in the timeline {}.".format(filename))
@@ -3,6 +3,7 @@ from __future__ import division
 from __future__ import print_function
 
 import threading
+import time
 import traceback
 
 import redis
@@ -10,9 +11,15 @@ import redis
 import ray
 from ray import ray_constants
 from ray import cloudpickle as pickle
+from ray import metrics
 from ray import profiling
 from ray import utils
 
+_imports = metrics.get_registry().counter(
+    "ray_imports", "Number of exports imported by the import thread.")
+_import_seconds = metrics.get_registry().histogram(
+    "ray_import_seconds", "Time to import an export.")
+
 
 class ImportThread(object):
     """A thread used to import exports from the driver or other workers.
@@ -75,6 +82,12 @@ class ImportThread(object):
 
     def _process_key(self, key):
         """Process the given export key from redis."""
+        start_time = time.time()
+        self._import_key(key)
+        _imports.inc()
+        _import_seconds.observe(time.time() - start_time)
+
+    def _import_key(self, key):
         # Handle the driver case first.
         if self.mode != ray.WORKER_MODE:
             if key.startswith(b"FunctionsToRun"):
@@ -3,11 +3,17 @@ from __future__ import division
 from __future__ import print_function
 
 import argparse
+import ctypes
+import ctypes.util
+import errno
 import logging
 import os
 import redis
+import select
+import struct
 import time
 
+import ray.metrics
 import ray.ray_constants as ray_constants
 from ray.services import get_ip_address
 from ray.services import get_port
@@ -19,20 +25,98 @@ import ray.utils
 logger = logging.getLogger(__name__)
 
 
+class _Inotify(object):
+    """A minimal wrapper of the Linux inotify API, which uses ctypes.
+
+    Raises:
+        OSError or AttributeError: If inotify is not available.
+    """
+
+    IN_MODIFY = 0x00000002
+    IN_Q_OVERFLOW = 0x00004000
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self):
+        libc = ctypes.CDLL(
+            ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._inotify_add_watch = libc.inotify_add_watch
+        self._inotify_add_watch.argtypes = [
+            ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32
+        ]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        # A dictionary mapping watch descriptors to the watched paths.
+        self.paths = {}
+
+    def add_watch(self, path):
+        """Watches a file for modifications.
+
+        Args:
+            path (bytes): The path of the file.
+        """
+        watch_descriptor = self._inotify_add_watch(self.fd, path,
+                                                   self.IN_MODIFY)
+        if watch_descriptor < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.paths[watch_descriptor] = path
+
+    def wait(self, timeout):
+        """Waits until watched files are modified or the timeout expires.
+
+        Returns:
+            The set of paths of the modified files, or None if the event
+            queue overflowed, in which case any watched file may have been
+            modified.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return set()
+            raise
+        paths = set()
+        offset = 0
+        while offset < len(data):
+            watch_descriptor, mask, _, name_length = self._EVENT.unpack_from(
+                data, offset)
+            offset += self._EVENT.size + name_length
+            if watch_descriptor == -1 and mask & self.IN_Q_OVERFLOW:
+                return None
+            if watch_descriptor in self.paths:
+                paths.add(self.paths[watch_descriptor])
+        return paths
+
+
 class LogMonitor(object):
     """A monitor process for monitoring Ray log files.
 
+    On Linux, the monitor waits for the log files to be modified with
+    inotify, and only reads the files that were. Otherwise, it checks the
+    size of every log file once a second. Only the bytes appended since the
+    last read are read, and the lines of all files are pushed to Redis with
+    a single pipeline. Redis keeps the last
+    ray_constants.LOG_MONITOR_MAX_LINES_PER_FILE lines of each file.
+
     Attributes:
         node_ip_address: The IP address of the node that the log monitor
             process is running on. This will be used to determine which log
             files to track.
         redis_client: A client used to communicate with the Redis server.
-        log_filenames: A list of the names of the log files that this monitor
-            process is monitoring.
-        log_files: A dictionary mapping the name of a log file to a list of
-            strings representing its contents.
+        log_files: A dictionary mapping the name of a log file to the offset
+            up to which it has been read.
         log_file_handles: A dictionary mapping the name of a log file to a file
             handle for that file.
+        partial_lines: A dictionary mapping the name of a log file to the
+            incomplete last line read from it, if any.
+        inotify: The inotify wrapper, or None if inotify is not available.
+        files_to_check: The names of the log files that may have been
+            modified since they were last read.
     """
 
     def __init__(self,
@@ -46,7 +130,17 @@ class LogMonitor(object):
             host=redis_ip_address, port=redis_port, password=redis_password)
         self.log_files = {}
         self.log_file_handles = {}
+        self.partial_lines = {}
         self.files_to_ignore = set()
+        self.files_to_check = set()
+        # The files that can't be watched with inotify.
+        self.unwatched_files = set()
+        try:
+            self.inotify = _Inotify()
+        except (AttributeError, OSError) as e:
+            logger.info("Checking the log files periodically because inotify "
+                        "is not available: {}".format(e))
+            self.inotify = None
 
     def update_log_filenames(self):
         """Get the most up-to-date list of log files to monitor from Redis."""
@@ -57,55 +151,122 @@ class LogMonitor(object):
         for log_filename in new_log_filenames:
             logger.info("Beginning to track file {}".format(log_filename))
             assert log_filename not in self.log_files
-            self.log_files[log_filename] = []
+            self.log_files[log_filename] = 0
+            self.files_to_check.add(log_filename)
+
+    def open_log_file(self, log_filename):
+        """Open a log file and start watching it.
+
+        Returns:
+            True if the file was opened, and False if it is ignored.
+        """
+        try:
+            self.log_file_handles[log_filename] = open(log_filename, "rb")
+        except IOError as e:
+            if e.errno == errno.EMFILE:
+                logger.warning("Warning: Ignoring {} because there are too "
+                               "many open files.".format(log_filename))
+            elif e.errno == errno.ENOENT:
+                logger.warning("Warning: The file {} was not "
+                               "found.".format(log_filename))
+            else:
+                raise e
+
+            # Don't try to open this file any more.
+            self.files_to_ignore.add(log_filename)
+            return False
+
+        if self.inotify is None:
+            self.unwatched_files.add(log_filename)
+        else:
+            try:
+                self.inotify.add_watch(log_filename)
+            except OSError as e:
+                logger.warning("Warning: Checking {} periodically because it "
+                               "can't be watched: {}".format(log_filename, e))
+                self.unwatched_files.add(log_filename)
+        return True
+
+    def read_new_lines(self, log_filename):
+        """Read the complete lines appended to a log file since the last read.
+
+        At most ray_constants.LOG_MONITOR_MAX_READ_BYTES are read at once. If
+        there is more to read, the file is checked again on the next call to
+        check_log_files_and_push_updates.
+
+        Returns:
+            The list of new lines, including their line breaks.
+        """
+        log_file_handle = self.log_file_handles[log_filename]
+        offset = self.log_files[log_filename]
+        size = os.fstat(log_file_handle.fileno()).st_size
+        if size < offset:
+            # The file was truncated.
+            offset = 0
+            self.partial_lines.pop(log_filename, None)
+        if size == offset:
+            return []
+
+        max_bytes = ray_constants.LOG_MONITOR_MAX_READ_BYTES
+        log_file_handle.seek(offset)
+        data = log_file_handle.read(min(size - offset, max_bytes))
+        self.log_files[log_filename] = offset + len(data)
+        if offset + len(data) < size:
+            self.files_to_check.add(log_filename)
+
+        data = self.partial_lines.pop(log_filename, b"") + data
+        lines = data.split(b"\n")
+        partial_line = lines.pop()
+        lines = [line + b"\n" for line in lines]
+        # Don't buffer overly long lines indefinitely.
+        if len(partial_line) >= max_bytes:
+            lines.append(partial_line)
+        elif partial_line:
+            self.partial_lines[log_filename] = partial_line
+        return lines
 
     def check_log_files_and_push_updates(self):
         """Get any changes to the log files and push updates to Redis."""
-        for log_filename in self.log_files:
-            if log_filename in self.log_file_handles:
-                # Get any updates to the file.
-                new_lines = []
-                while True:
-                    current_position = (
-                        self.log_file_handles[log_filename].tell())
-                    next_line = self.log_file_handles[log_filename].readline()
-                    if next_line != "":
-                        new_lines.append(next_line)
-                    else:
-                        self.log_file_handles[log_filename].seek(
-                            current_position)
-                        break
-
-                # If there are any new lines, cache them and also push them to
-                # Redis.
-                if len(new_lines) > 0:
-                    self.log_files[log_filename] += new_lines
-                    redis_key = "LOGFILE:{}:{}".format(
-                        self.node_ip_address, ray.utils.decode(log_filename))
-                    self.redis_client.rpush(redis_key, *new_lines)
+        log_filenames = self.files_to_check | self.unwatched_files
+        self.files_to_check = set()
 
+        pipe = self.redis_client.pipeline(transaction=False)
+        num_updated_files = 0
+        for log_filename in log_filenames:
             # Pass if we already failed to open the log file.
-            elif log_filename in self.files_to_ignore:
-                pass
+            if log_filename in self.files_to_ignore:
+                continue
+            if (log_filename not in self.log_file_handles
+                    and not self.open_log_file(log_filename)):
+                continue
 
-            # Try to open this file for the first time.
-            else:
-                try:
-                    self.log_file_handles[log_filename] = open(
-                        log_filename, "r")
-                except IOError as e:
-                    if e.errno == os.errno.EMFILE:
-                        logger.warning(
-                            "Warning: Ignoring {} because there are too "
-                            "many open files.".format(log_filename))
-                    elif e.errno == os.errno.ENOENT:
-                        logger.warning("Warning: The file {} was not "
-                                       "found.".format(log_filename))
-                    else:
-                        raise e
-
-                    # Don't try to open this file any more.
-                    self.files_to_ignore.add(log_filename)
+            new_lines = self.read_new_lines(log_filename)
+            if len(new_lines) > 0:
+                redis_key = "LOGFILE:{}:{}".format(
+                    self.node_ip_address, ray.utils.decode(log_filename))
+                pipe.rpush(redis_key, *new_lines)
+                pipe.ltrim(redis_key,
+                           -ray_constants.LOG_MONITOR_MAX_LINES_PER_FILE, -1)
+                num_updated_files += 1
+
+        if num_updated_files > 0:
+            pipe.execute()
+
+    def wait_for_changes(self, timeout):
+        """Wait until log files are modified, or for timeout seconds."""
+        if self.files_to_check:
+            # There is more to read already.
+            return
+        if self.inotify is None:
+            time.sleep(timeout)
+            return
+        modified_files = self.inotify.wait(timeout)
+        if modified_files is None:
+            logger.warning("Checking all log files because the inotify "
+                           "event queue overflowed.")
+            self.files_to_check |= set(self.log_file_handles)
+        else:
+            self.files_to_check |= modified_files
 
     def run(self):
         """Run the log monitor.
@@ -116,7 +277,7 @@ class LogMonitor(object):
         while True:
             self.update_log_filenames()
             self.check_log_files_and_push_updates()
-            time.sleep(1)
+            self.wait_for_changes(1)
 
 
 if __name__ == "__main__":
@@ -166,4 +327,8 @@ if __name__ == "__main__":
         redis_port,
         args.node_ip_address,
         redis_password=args.redis_password)
+    if ray_constants.METRICS_EXPORT_PORT:
+        ray.metrics.start_metrics_server(log_monitor.redis_client,
+                                         args.node_ip_address,
+                                         ray_constants.METRICS_EXPORT_PORT)
     log_monitor.run()
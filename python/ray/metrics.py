@@ -0,0 +1,367 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import bisect
+import json
+import logging
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+import ray.ray_constants as ray_constants
+from ray.utils import binary_to_hex, decode
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds of the buckets of latency histograms.
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Upper bounds in bytes of the buckets of size histograms, from 64B to 1GB.
+SIZE_BUCKETS = tuple(4**i for i in range(3, 16))
+
+
+class Counter(object):
+    """A metric that can only go up, such as a number of calls."""
+
+    def __init__(self, name, description=""):
+        self.name = name
+        self.description = description
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, value=1):
+        with self.lock:
+            self.value += value
+
+    def snapshot(self):
+        return {
+            "type": "counter",
+            "description": self.description,
+            "value": self.value
+        }
+
+
+class Gauge(object):
+    """A metric that can go up and down, such as a number of pending calls."""
+
+    def __init__(self, name, description=""):
+        self.name = name
+        self.description = description
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, value=1):
+        with self.lock:
+            self.value += value
+
+    def dec(self, value=1):
+        self.inc(-value)
+
+    def snapshot(self):
+        return {
+            "type": "gauge",
+            "description": self.description,
+            "value": self.value
+        }
+
+
+class Histogram(object):
+    """A metric that counts observed values in fixed buckets.
+
+    Attributes:
+        buckets: The sorted upper bounds of the buckets. Values larger than
+            the last bound are counted in an extra, unbounded bucket.
+        counts: The number of values observed in each bucket.
+    """
+
+    def __init__(self, name, description="", buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "type": "histogram",
+                "description": self.description,
+                "buckets": list(self.buckets),
+                "counts": list(self.counts),
+                "sum": self.sum,
+                "count": self.count
+            }
+
+
+class MetricsRegistry(object):
+    """The metrics of a process, by name.
+
+    Examples:
+        >>> get_latency = registry.histogram("ray_get_seconds")
+        >>> get_latency.observe(0.002)
+        >>> registry.snapshot()["ray_get_seconds"]["count"]
+        1
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def counter(self, name, description=""):
+        """Returns the counter with this name, creating it if needed."""
+        return self._get_or_create(Counter, name, description)
+
+    def gauge(self, name, description=""):
+        """Returns the gauge with this name, creating it if needed."""
+        return self._get_or_create(Gauge, name, description)
+
+    def histogram(self, name, description="", buckets=LATENCY_BUCKETS):
+        """Returns the histogram with this name, creating it if needed."""
+        return self._get_or_create(Histogram, name, description, buckets)
+
+    def _get_or_create(self, cls, name, *args):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = cls(name, *args)
+                self.metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError("The metric {} is already registered as a "
+                                 "{}.".format(name,
+                                              type(metric).__name__))
+            return metric
+
+    def snapshot(self):
+        """Returns a JSON serializable copy of the current metric values."""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry():
+    """Returns the metrics registry of this process."""
+    return _registry
+
+
+def merge_snapshots(snapshots):
+    """Aggregates the metric snapshots of several processes.
+
+    Counters and gauges are summed, and histograms are summed bucket-wise.
+
+    Args:
+        snapshots (list): Results of MetricsRegistry.snapshot().
+
+    Returns:
+        A snapshot with the aggregated values.
+    """
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            if name not in merged:
+                merged[name] = dict(metric)
+                if metric["type"] == "histogram":
+                    merged[name]["counts"] = list(metric["counts"])
+                continue
+            total = merged[name]
+            if total["type"] != metric["type"]:
+                raise ValueError("The metric {} has types {} and {}.".format(
+                    name, total["type"], metric["type"]))
+            if metric["type"] == "histogram":
+                if total["buckets"] != metric["buckets"]:
+                    raise ValueError(
+                        "The histogram {} has different buckets.".format(name))
+                for i, count in enumerate(metric["counts"]):
+                    total["counts"][i] += count
+                total["sum"] += metric["sum"]
+                total["count"] += metric["count"]
+            else:
+                total["value"] += metric["value"]
+    return merged
+
+
+def quantile(histogram, q):
+    """Estimates a quantile of a histogram snapshot.
+
+    The quantile is linearly interpolated within the bucket it falls in.
+    Quantiles in the unbounded bucket are reported as its lower bound.
+
+    Args:
+        histogram (dict): The snapshot of a histogram.
+        q (float): The quantile to estimate, between 0 and 1.
+
+    Returns:
+        The estimated quantile, or NaN if the histogram is empty.
+    """
+    if histogram["count"] == 0:
+        return float("nan")
+    rank = q * histogram["count"]
+    buckets = histogram["buckets"]
+    seen = 0
+    for i, count in enumerate(histogram["counts"]):
+        if count and seen + count >= rank:
+            if i == len(buckets):
+                return buckets[-1] if buckets else float("nan")
+            lower = buckets[i - 1] if i > 0 else 0.0
+            return lower + (buckets[i] - lower) * (rank - seen) / count
+        seen += count
+    return buckets[-1]
+
+
+def to_text(snapshot, labels=None):
+    """Formats a snapshot in the Prometheus text exposition format.
+
+    Args:
+        snapshot (dict): The metrics to format.
+        labels (dict): Labels to add to every sample.
+
+    Returns:
+        The formatted metrics as a string.
+    """
+    label_pairs = ['{}="{}"'.format(k, v) for k, v in (labels or {}).items()]
+
+    def sample(name, value, extra_label=None):
+        pairs = label_pairs + ([extra_label] if extra_label else [])
+        if pairs:
+            name += "{" + ",".join(pairs) + "}"
+        return "{} {}".format(name, value)
+
+    lines = []
+    for name in sorted(snapshot):
+        metric = snapshot[name]
+        if metric["description"]:
+            lines.append("# HELP {} {}".format(name, metric["description"]))
+        lines.append("# TYPE {} {}".format(name, metric["type"]))
+        if metric["type"] != "histogram":
+            lines.append(sample(name, metric["value"]))
+            continue
+        cumulative = 0
+        bounds = [repr(float(b)) for b in metric["buckets"]] + ["+Inf"]
+        for bound, count in zip(bounds, metric["counts"]):
+            cumulative += count
+            lines.append(
+                sample(name + "_bucket", cumulative, 'le="{}"'.format(bound)))
+        lines.append(sample(name + "_sum", metric["sum"]))
+        lines.append(sample(name + "_count", metric["count"]))
+    return "\n".join(lines) + "\n"
+
+
+def push_metrics(redis_client, node_ip_address, component_id, ttl):
+    """Publishes the metrics of this process to Redis.
+
+    The metrics are stored under a key that expires after `ttl` seconds, so
+    that the metrics of processes that died are eventually dropped.
+
+    Args:
+        redis_client: The client of the primary Redis shard.
+        node_ip_address (str): The IP address of this node.
+        component_id (bytes): The ID of this worker or driver.
+        ttl (int): The number of seconds to keep the metrics for.
+    """
+    key = "Metrics:{}:{}".format(node_ip_address, binary_to_hex(component_id))
+    redis_client.set(key, json.dumps(_registry.snapshot()), ex=ttl)
+
+
+def start_push_thread(redis_client, node_ip_address, component_id):
+    """Starts a thread that periodically publishes this process' metrics."""
+
+    def push_periodically():
+        interval = ray_constants.METRICS_PUSH_INTERVAL_S
+        try:
+            while True:
+                time.sleep(interval)
+                push_metrics(redis_client, node_ip_address, component_id,
+                             3 * interval)
+        except Exception:
+            # This is to suppress errors that occur at shutdown.
+            logger.debug("Stopped pushing metrics.", exc_info=True)
+
+    t = threading.Thread(target=push_periodically, name="ray_push_metrics")
+    # Making the thread a daemon causes it to exit when the main thread exits.
+    t.daemon = True
+    t.start()
+
+
+def node_metrics(redis_client, node_ip_address=None):
+    """Aggregates the metrics published by the processes of each node.
+
+    Args:
+        redis_client: The client of the primary Redis shard.
+        node_ip_address (str): If set, only aggregate the metrics of this
+            node.
+
+    Returns:
+        A dictionary from node IP address to its aggregated snapshot.
+    """
+    pattern = "Metrics:{}:*".format(node_ip_address or "*")
+    keys = [decode(key) for key in redis_client.keys(pattern)]
+    values = redis_client.mget(keys) if keys else []
+    snapshots = {}
+    for key, value in zip(keys, values):
+        # The key may have expired since it was listed.
+        if value is not None:
+            node = key.split(":")[1]
+            snapshots.setdefault(node, []).append(json.loads(decode(value)))
+    return {
+        node: merge_snapshots(node_snapshots)
+        for node, node_snapshots in snapshots.items()
+    }
+
+
+def start_metrics_server(redis_client, node_ip_address, port):
+    """Serves the aggregated metrics of this node over HTTP.
+
+    The metrics are served in the Prometheus text format at /metrics.
+
+    Args:
+        redis_client: The client of the primary Redis shard.
+        node_ip_address (str): The IP address of this node.
+        port (int): The port to serve on.
+
+    Returns:
+        The HTTP server, which serves requests from a daemon thread.
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            snapshot = node_metrics(redis_client, node_ip_address).get(
+                node_ip_address, {})
+            body = to_text(snapshot, {"node": node_ip_address}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format, *args)
+
+    server = HTTPServer((node_ip_address, port), MetricsHandler)
+    t = threading.Thread(
+        target=server.serve_forever, name="ray_metrics_server")
+    t.daemon = True
+    t.start()
+    return server
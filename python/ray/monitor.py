@@ -14,6 +14,7 @@ import ray
 from ray.autoscaler.autoscaler import LoadMetrics, StandardAutoscaler
 import ray.cloudpickle as pickle
 import ray.gcs_utils
+import ray.spill_manager
 import ray.utils
 import ray.ray_constants as ray_constants
 from ray.services import get_ip_address, get_port
@@ -50,9 +51,16 @@ class Monitor(object):
         # Setup subscriptions to the primary Redis server and the Redis shards.
         self.primary_subscribe_client = self.redis.pubsub(
             ignore_subscribe_messages=True)
-        # Keep a mapping from local scheduler client ID to IP address to use
-        # for updating the load metrics.
+        # Keep a mapping from local scheduler binary client ID to IP address
+        # to use for updating the load metrics. This is kept up to date from
+        # the client table notifications.
         self.local_scheduler_id_to_ip_map = {}
+        # A mapping from binary client ID to the raw resources of its last
+        # heartbeat, as (available labels, available capacities, total
+        # labels, total capacities), and the dictionaries decoded from them.
+        self.heartbeat_resources = {}
+        # Resource labels, interned so that clients share the same objects.
+        self.resource_labels = {}
         self.load_metrics = LoadMetrics()
         if autoscaling_config:
             self.autoscaler = StandardAutoscaler(autoscaling_config,
@@ -96,8 +104,23 @@ class Monitor(object):
         """
         self.primary_subscribe_client.subscribe(channel)
 
-    def xray_heartbeat_batch_handler(self, unused_channel, data):
-        """Handle an xray heartbeat batch message from Redis."""
+    def xray_heartbeat_batch_handler(self,
+                                     unused_channel,
+                                     data,
+                                     seen_client_ids=None):
+        """Handle an xray heartbeat batch message from Redis.
+
+        The resources in a heartbeat are usually the same as in the previous
+        heartbeat of the client, in which case the resource dictionaries of
+        the previous heartbeat are reused.
+
+        Args:
+            unused_channel: The message channel.
+            data: The message data.
+            seen_client_ids: If set, the heartbeats of the clients in this set
+                are skipped, and the clients of the other heartbeats are added
+                to it.
+        """
 
         gcs_entries = ray.gcs_utils.GcsTableEntry.GetRootAsGcsTableEntry(
             data, 0)
@@ -108,61 +131,109 @@ class Monitor(object):
 
         for j in range(message.BatchLength()):
             heartbeat_message = message.Batch(j)
+            client_id = heartbeat_message.ClientId()
+            if seen_client_ids is not None:
+                if client_id in seen_client_ids:
+                    continue
+                seen_client_ids.add(client_id)
 
-            num_resources = heartbeat_message.ResourcesAvailableLabelLength()
-            static_resources = {}
-            dynamic_resources = {}
-            for i in range(num_resources):
-                dyn = heartbeat_message.ResourcesAvailableLabel(i)
-                static = heartbeat_message.ResourcesTotalLabel(i)
-                dynamic_resources[dyn] = (
-                    heartbeat_message.ResourcesAvailableCapacity(i))
-                static_resources[static] = (
-                    heartbeat_message.ResourcesTotalCapacity(i))
+            ip = self.local_scheduler_id_to_ip_map.get(client_id)
+            if not ip:
+                print("Warning: could not find ip for client {} in {}.".format(
+                    binary_to_hex(client_id),
+                    self.local_scheduler_id_to_ip_map))
+                continue
+
+            num_available = heartbeat_message.ResourcesAvailableLabelLength()
+            num_total = heartbeat_message.ResourcesTotalLabelLength()
+            raw_resources = (
+                tuple(
+                    heartbeat_message.ResourcesAvailableLabel(i)
+                    for i in range(num_available)),
+                tuple(
+                    heartbeat_message.ResourcesAvailableCapacity(i)
+                    for i in range(num_available)),
+                tuple(
+                    heartbeat_message.ResourcesTotalLabel(i)
+                    for i in range(num_total)),
+                tuple(
+                    heartbeat_message.ResourcesTotalCapacity(i)
+                    for i in range(num_total)),
+            )
+
+            cached = self.heartbeat_resources.get(client_id)
+            if cached is not None and cached[0] == raw_resources:
+                _, static_resources, dynamic_resources = cached
+            else:
+                labels = self.resource_labels
+                available_labels, available, total_labels, total = (
+                    raw_resources)
+                dynamic_resources = {
+                    labels.setdefault(label, label): capacity
+                    for label, capacity in zip(available_labels, available)
+                }
+                static_resources = {
+                    labels.setdefault(label, label): capacity
+                    for label, capacity in zip(total_labels, total)
+                }
+                self.heartbeat_resources[client_id] = (raw_resources,
+                                                       static_resources,
+                                                       dynamic_resources)
 
             # Update the load metrics for this local scheduler.
-            client_id = ray.utils.binary_to_hex(heartbeat_message.ClientId())
-            ip = self.local_scheduler_id_to_ip_map.get(client_id)
-            if ip:
-                self.load_metrics.update(ip, static_resources,
-                                         dynamic_resources)
+            self.load_metrics.update(ip, static_resources, dynamic_resources)
+
+    def xray_client_handler(self, unused_channel, data):
+        """Handle a notification that a client was added or removed.
+
+        Args:
+            unused_channel: The message channel.
+            data: The message data.
+        """
+        gcs_entries = ray.gcs_utils.GcsTableEntry.GetRootAsGcsTableEntry(
+            data, 0)
+        for i in range(gcs_entries.EntriesLength()):
+            client = ray.gcs_utils.ClientTableData.GetRootAsClientTableData(
+                gcs_entries.Entries(i), 0)
+            client_id = client.ClientId()
+            if client.IsInsertion():
+                ip_address = ray.utils.decode(client.NodeManagerAddress())
+                self.local_scheduler_id_to_ip_map[client_id] = (
+                    ip_address.split(":")[0])
             else:
-                print("Warning: could not find ip for client {} in {}.".format(
-                    client_id, self.local_scheduler_id_to_ip_map))
+                self.local_scheduler_id_to_ip_map.pop(client_id, None)
+                self.heartbeat_resources.pop(client_id, None)
 
     def _xray_clean_up_entries_for_driver(self, driver_id):
         """Remove this driver's object/task entries from redis.
 
         Removes control-state entries of all tasks and task return
-        objects belonging to the driver.
+        objects belonging to the driver, and lets the arguments of its tasks
+        that never ran be spilled.
 
         Args:
             driver_id: The driver id.
         """
+        ray.spill_manager.unpin_driver_tasks(self.redis, driver_id)
 
         xray_task_table_prefix = (
             ray.gcs_utils.TablePrefix_RAYLET_TASK_string.encode("ascii"))
         xray_object_table_prefix = (
             ray.gcs_utils.TablePrefix_OBJECT_string.encode("ascii"))
 
-        task_table_objects = self.state.task_table()
         driver_id_hex = binary_to_hex(driver_id)
-        driver_task_id_bins = set()
-        for task_id_hex, task_info in task_table_objects.items():
-            task_table_object = task_info["TaskSpec"]
-            task_driver_id_hex = task_table_object["DriverID"]
-            if driver_id_hex != task_driver_id_hex:
-                # Ignore tasks that aren't from this driver.
-                continue
-            driver_task_id_bins.add(hex_to_binary(task_id_hex))
+        driver_task_id_bins = {
+            hex_to_binary(task_id_hex)
+            for task_id_hex, _ in self.state.iter_task_table(
+                driver_id=driver_id_hex)
+        }
 
         # Get objects associated with the driver.
-        object_table_objects = self.state.object_table()
-        driver_object_id_bins = set()
-        for object_id, _ in object_table_objects.items():
-            task_id_bin = ray.raylet.compute_task_id(object_id).id()
-            if task_id_bin in driver_task_id_bins:
-                driver_object_id_bins.add(object_id.id())
+        driver_object_id_bins = {
+            object_id.id()
+            for object_id, _ in self.state.iter_object_table(
+                task_ids=driver_task_id_bins)
+        }
 
         def to_shard_index(id_bin):
             return binary_to_object_id(id_bin).redis_shard_hash() % len(
@@ -214,10 +285,17 @@ class Monitor(object):
         This reads messages from the subscription channels and calls the
         appropriate handlers until there are no messages left.
 
+        Only the last heartbeat of each client is used by the load metrics,
+        so the heartbeat batches read in a round are handled from the newest
+        to the oldest, and older heartbeats of the same clients are skipped.
+        This keeps the cost of a round bounded by the number of clients when
+        the monitor falls behind.
+
         Args:
             max_messages: The maximum number of messages to process before
                 returning.
         """
+        heartbeat_batches = []
         subscribe_clients = [self.primary_subscribe_client]
         for subscribe_client in subscribe_clients:
             for _ in range(max_messages):
@@ -233,11 +311,16 @@ class Monitor(object):
                 # Determine the appropriate message handler.
                 message_handler = None
                 if channel == ray.gcs_utils.XRAY_HEARTBEAT_BATCH_CHANNEL:
-                    # Similar functionality as local scheduler info channel
-                    message_handler = self.xray_heartbeat_batch_handler
+                    # Handled after the other messages, so that heartbeats of
+                    # new clients are matched with their IP address.
+                    heartbeat_batches.append(data)
+                    continue
                 elif channel == ray.gcs_utils.XRAY_DRIVER_CHANNEL:
                     # Handles driver death.
                     message_handler = self.xray_driver_removed_handler
+                elif channel == ray.gcs_utils.XRAY_CLIENT_CHANNEL:
+                    # Handles clients being added or removed.
+                    message_handler = self.xray_client_handler
                 else:
                     raise Exception("This code should be unreachable.")
 
@@ -245,16 +328,30 @@ class Monitor(object):
                 assert (message_handler is not None)
                 message_handler(channel, data)
 
+        seen_client_ids = set()
+        for data in reversed(heartbeat_batches):
+            self.xray_heartbeat_batch_handler(
+                ray.gcs_utils.XRAY_HEARTBEAT_BATCH_CHANNEL, data,
+                seen_client_ids)
+
     def update_local_scheduler_map(self):
+        """Rebuild the mapping from client ID to IP from the client table.
+
+        This is only needed at startup, after which the mapping is updated
+        by xray_client_handler.
+        """
         local_schedulers = self.state.client_table()
         self.local_scheduler_id_to_ip_map = {}
         for local_scheduler_info in local_schedulers:
+            if not local_scheduler_info["IsInsertion"]:
+                continue
             client_id = local_scheduler_info.get("DBClientID") or \
                 local_scheduler_info["ClientID"]
             ip_address = (
                 local_scheduler_info.get("AuxAddress")
                 or local_scheduler_info["NodeManagerAddress"]).split(":")[0]
-            self.local_scheduler_id_to_ip_map[client_id] = ip_address
+            self.local_scheduler_id_to_ip_map[hex_to_binary(
+                client_id)] = ip_address
 
     def _maybe_flush_gcs(self):
         """Experimental: issue a flush request to the GCS.
@@ -296,16 +393,18 @@ class Monitor(object):
         # Initialize the subscription channel.
         self.subscribe(ray.gcs_utils.XRAY_HEARTBEAT_BATCH_CHANNEL)
         self.subscribe(ray.gcs_utils.XRAY_DRIVER_CHANNEL)
+        self.subscribe(ray.gcs_utils.XRAY_CLIENT_CHANNEL)
+
+        # Initialize the mapping from local scheduler client ID to IP address,
+        # which is only used to update the load metrics for the autoscaler.
+        # Since this is done after subscribing, no client can be missed.
+        self.update_local_scheduler_map()
 
         # TODO(rkn): If there were any dead clients at startup, we should clean
         # up the associated state in the state tables.
 
         # Handle messages from the subscription channels.
         while True:
-            # Update the mapping from local scheduler client ID to IP address.
-            # This is only used to update the load metrics for the autoscaler.
-            self.update_local_scheduler_map()
-
             # Process autoscaling actions
             if self.autoscaler:
                 self.autoscaler.update()
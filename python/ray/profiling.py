@@ -3,11 +3,17 @@ from __future__ import division
 from __future__ import print_function
 
 import json
+import logging
+import random
+import struct
 import time
 import threading
 import traceback
 
 import ray
+import ray.ray_constants as ray_constants
+
+logger = logging.getLogger(__name__)
 
 LOG_POINT = 0
 LOG_SPAN_START = 1
@@ -17,9 +23,12 @@ LOG_SPAN_END = 2
 class _NullLogSpan(object):
     """A log span context manager that does nothing"""
 
-    def __enter__(self):
+    def set_attribute(self, key, value):
         pass
 
+    def __enter__(self):
+        return self
+
     def __exit__(self, type, value, tb):
         pass
 
@@ -59,21 +68,55 @@ def profile(event_type, extra_data=None, worker=None):
     """
     if worker is None:
         worker = ray.worker.global_worker
-    return RayLogSpanRaylet(worker.profiler, event_type, extra_data=extra_data)
+    profiler = worker.profiler
+    # Spans that are not recorded share a single do-nothing span, so that
+    # profiling costs close to nothing when it is disabled or sampled out.
+    if profiler.sample_rate < 1:
+        if (profiler.sample_rate <= 0
+                or random.random() >= profiler.sample_rate):
+            return NULL_LOG_SPAN
+    return RayLogSpanRaylet(profiler, event_type, extra_data=extra_data)
+
+
+# Binary layout of a buffered profile event: the id of its event type, its
+# start time and its end time.
+_EVENT_RECORD = struct.Struct("<idd")
 
 
 class Profiler(object):
     """A class that holds the profiling states.
 
+    Events are packed into a fixed-size ring buffer of binary records until
+    they are flushed. If more events than fit in the buffer are recorded
+    between two flushes, the oldest ones are dropped.
+
     Attributes:
         worker: the worker to profile.
-        events: the buffer of events.
+        sample_rate: the fraction of profile spans that are recorded.
+        buffer_size: the max number of events buffered between flushes.
+        buffer: the ring buffer of event records.
+        extra_data: the JSON extra data of the buffered events, or None.
+        num_events: the number of events recorded since the last flush.
+        num_dropped: the number of events dropped because the buffer was
+            full.
+        event_types: the list of event types, indexed by their id.
+        event_type_ids: the map from event type to its id.
         lock: the lock to protect access of events.
     """
 
-    def __init__(self, worker):
+    def __init__(self,
+                 worker,
+                 sample_rate=ray_constants.PROFILING_SAMPLE_RATE,
+                 buffer_size=ray_constants.PROFILING_BUFFER_SIZE):
         self.worker = worker
-        self.events = []
+        self.sample_rate = sample_rate
+        self.buffer_size = buffer_size
+        self.buffer = bytearray(_EVENT_RECORD.size * buffer_size)
+        self.extra_data = [None] * buffer_size
+        self.num_events = 0
+        self.num_dropped = 0
+        self.event_types = []
+        self.event_type_ids = {}
         self.lock = threading.Lock()
 
     def start_flush_thread(self):
@@ -110,9 +153,7 @@ class Profiler(object):
         aalternative, we could start thread in the background on workers that
         calls this automatically.
         """
-        with self.lock:
-            events = self.events
-            self.events = []
+        events = self.take_events()
 
         if self.worker.mode == ray.WORKER_MODE:
             component_type = "worker"
@@ -123,21 +164,78 @@ class Profiler(object):
             component_type, ray.ObjectID(self.worker.worker_id),
             self.worker.node_ip_address, events)
 
-    def add_event(self, event):
+    def take_events(self):
+        """Removes the buffered events and returns them, oldest first.
+
+        Returns:
+            A list of event dicts as expected by push_profile_events.
+        """
+        record_size = _EVENT_RECORD.size
+        with self.lock:
+            count = min(self.num_events, self.buffer_size)
+            dropped = self.num_events - count
+            oldest = self.num_events % self.buffer_size if dropped else 0
+            # Copy the records in order, so they can be decoded without
+            # holding the lock.
+            records = (self.buffer[oldest * record_size:count * record_size] +
+                       self.buffer[:oldest * record_size])
+            extra_data = (
+                self.extra_data[oldest:count] + self.extra_data[:oldest])
+            event_types = self.event_types
+            self.num_events = 0
+            self.num_dropped += dropped
+
+        if dropped:
+            logger.debug("Dropped {} profile events because the profile "
+                         "buffer was full.".format(dropped))
+
+        events = []
+        for i in range(count):
+            event_type_id, start_time, end_time = _EVENT_RECORD.unpack_from(
+                records, i * record_size)
+            events.append({
+                "event_type": event_types[event_type_id],
+                "start_time": start_time,
+                "end_time": end_time,
+                "extra_data": extra_data[i] or "{}",
+            })
+        return events
+
+    def add_event(self, event_type, start_time, end_time, extra_data=None):
+        """Records an event.
+
+        Args:
+            event_type (str): The type of the event.
+            start_time (float): The start time of the event.
+            end_time (float): The end time of the event.
+            extra_data (str): The JSON encoded extra data of the event, or
+                None if there is none.
+        """
         with self.lock:
-            self.events.append(event)
+            event_type_id = self.event_type_ids.get(event_type)
+            if event_type_id is None:
+                event_type_id = len(self.event_types)
+                self.event_types.append(event_type)
+                self.event_type_ids[event_type] = event_type_id
+            slot = self.num_events % self.buffer_size
+            _EVENT_RECORD.pack_into(self.buffer, slot * _EVENT_RECORD.size,
+                                    event_type_id, start_time, end_time)
+            self.extra_data[slot] = extra_data
+            self.num_events += 1
 
 
 class NoopProfiler(object):
     """A no-op profile used when collect_profile_data=False."""
 
+    sample_rate = 0
+
     def start_flush_thread(self):
         pass
 
     def flush_profile_data(self):
         pass
 
-    def add_event(self, event):
+    def add_event(self, event_type, start_time, end_time, extra_data=None):
         pass
 
 
@@ -149,11 +247,13 @@ class RayLogSpanRaylet(object):
         contents: Additional information to log.
     """
 
+    __slots__ = ["profiler", "event_type", "extra_data", "start_time"]
+
     def __init__(self, profiler, event_type, extra_data=None):
         """Initialize a RayLogSpanRaylet object."""
         self.profiler = profiler
         self.event_type = event_type
-        self.extra_data = extra_data if extra_data is not None else {}
+        self.extra_data = extra_data
 
     def set_attribute(self, key, value):
         """Add a key-value pair to the extra_data dict.
@@ -169,6 +269,8 @@ class RayLogSpanRaylet(object):
             raise ValueError("The arguments 'key' and 'value' must both be "
                              "strings. Instead they are {} and {}.".format(
                                  key, value))
+        if self.extra_data is None:
+            self.extra_data = {}
         self.extra_data[key] = value
 
     def __enter__(self):
@@ -184,11 +286,14 @@ class RayLogSpanRaylet(object):
 
     def __exit__(self, type, value, tb):
         """Log the end of a span event. Log any exception that occurred."""
-        for key, value in self.extra_data.items():
-            if not isinstance(key, str) or not isinstance(value, str):
-                raise ValueError("The extra_data argument must be a "
-                                 "dictionary mapping strings to strings. "
-                                 "Instead it is {}.".format(self.extra_data))
+        end_time = time.time()
+        if self.extra_data:
+            for key, value in self.extra_data.items():
+                if not isinstance(key, str) or not isinstance(value, str):
+                    raise ValueError("The extra_data argument must be a "
+                                     "dictionary mapping strings to strings. "
+                                     "Instead it is {}.".format(
+                                         self.extra_data))
 
         if type is not None:
             extra_data = json.dumps({
@@ -196,14 +301,10 @@ class RayLogSpanRaylet(object):
                 "value": str(value),
                 "traceback": str(traceback.format_exc()),
             })
-        else:
+        elif self.extra_data:
             extra_data = json.dumps(self.extra_data)
+        else:
+            extra_data = None
 
-        event = {
-            "event_type": self.event_type,
-            "start_time": self.start_time,
-            "end_time": time.time(),
-            "extra_data": extra_data,
-        }
-
-        self.profiler.add_event(event)
+        self.profiler.add_event(self.event_type, self.start_time, end_time,
+                                extra_data)
@@ -14,6 +14,12 @@ def env_integer(key, default):
     return default
 
 
+def env_float(key, default):
+    if key in os.environ:
+        return float(os.environ[key])
+    return default
+
+
 ID_SIZE = 20
 NIL_JOB_ID = ObjectID(ID_SIZE * b"\xff")
 
@@ -66,6 +72,54 @@ AUTOSCALER_UPDATE_INTERVAL_S = env_integer("AUTOSCALER_UPDATE_INTERVAL_S", 5)
 AUTOSCALER_HEARTBEAT_TIMEOUT_S = env_integer("AUTOSCALER_HEARTBEAT_TIMEOUT_S",
                                              30)
 
+# The fraction of profile spans (such as ray.get and ray.put calls) that are
+# recorded when profiling data is collected.
+PROFILING_SAMPLE_RATE = env_float("RAY_PROFILING_SAMPLE_RATE", 1.0)
+
+# The max number of profile events a worker buffers between flushes. Once the
+# buffer is full, the oldest events are dropped.
+PROFILING_BUFFER_SIZE = env_integer("RAY_PROFILING_BUFFER_SIZE", 100000)
+
+# The interval at which processes publish their runtime metrics to Redis.
+METRICS_PUSH_INTERVAL_S = env_integer("RAY_METRICS_PUSH_INTERVAL_S", 5)
+
+# If nonzero, the log monitor of each node serves the aggregated runtime
+# metrics of the node on this port at /metrics.
+METRICS_EXPORT_PORT = env_integer("RAY_METRICS_EXPORT_PORT", 0)
+
+# The number of lines of each log file that are kept in Redis.
+LOG_MONITOR_MAX_LINES_PER_FILE = env_integer(
+    "RAY_LOG_MONITOR_MAX_LINES_PER_FILE", 10000)
+
+# The max number of bytes the log monitor reads from a log file at once.
+LOG_MONITOR_MAX_READ_BYTES = env_integer("RAY_LOG_MONITOR_MAX_READ_BYTES",
+                                         1024 * 1024)
+
+# When object spilling is enabled, objects are spilled once they use more
+# than this fraction of the object store capacity, until they use less than
+# the low watermark.
+OBJECT_SPILL_HIGH_WATERMARK = env_float("RAY_OBJECT_SPILL_HIGH_WATERMARK", 0.8)
+OBJECT_SPILL_LOW_WATERMARK = env_float("RAY_OBJECT_SPILL_LOW_WATERMARK", 0.6)
+
+# Objects are also spilled once more than this fraction of the node memory is
+# used.
+OBJECT_SPILL_MEMORY_THRESHOLD = env_float("RAY_OBJECT_SPILL_MEMORY_THRESHOLD",
+                                          0.9)
+
+# The interval at which the memory usage of the object stores is checked.
+OBJECT_SPILL_CHECK_INTERVAL_S = env_float("RAY_OBJECT_SPILL_CHECK_INTERVAL_S",
+                                          0.5)
+
+# The max time in seconds to wait for spilled objects to be restored by the
+# spill managers of other nodes.
+OBJECT_SPILL_RESTORE_TIMEOUT_S = env_float(
+    "RAY_OBJECT_SPILL_RESTORE_TIMEOUT_S", 10.0)
+
+# The max age in seconds of the available resources returned by
+# ray.global_state.available_resources().
+AVAILABLE_RESOURCES_MAX_STALENESS_S = env_float(
+    "RAY_AVAILABLE_RESOURCES_MAX_STALENESS_S", 1.0)
+
 # Max number of retries to AWS (default is 5, time increases exponentially)
 BOTO_MAX_RETRIES = env_integer("BOTO_MAX_RETRIES", 12)
 
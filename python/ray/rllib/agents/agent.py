@@ -14,6 +14,8 @@ import tensorflow as tf
 import ray
 from ray.rllib.models import MODEL_DEFAULTS
 from ray.rllib.evaluation.policy_evaluator import PolicyEvaluator
+from ray.rllib.evaluation.inference_server import InferenceServer
+from ray.rllib.offline import ColumnarReader, ColumnarWriter
 from ray.rllib.optimizers.policy_optimizer import PolicyOptimizer
 from ray.rllib.utils.annotations import override
 from ray.rllib.utils import FilterManager, deep_update, merge_dicts
@@ -101,6 +103,13 @@ COMMON_CONFIG = {
     "observation_filter": "NoFilter",
     # Whether to synchronize the statistics of remote filters.
     "synchronize_filters": True,
+    # If > 1, merge the filters of remote evaluators in a tree of tasks with
+    # this fanout instead of all on the driver, which helps with many workers
+    "filter_sync_tree_fanout": 0,
+    # Whether to merge remote filters in the background while sampling (in
+    # a tree with fanout 16 if not set above). The merged filters are then
+    # applied at the start of the next iteration.
+    "async_filter_sync": False,
     # Configure TF for single-process operation by default
     "tf_session_args": {
         # note: overriden by `local_evaluator_tf_session_args`
@@ -127,6 +136,39 @@ COMMON_CONFIG = {
     # Drop metric batches from unresponsive workers after this many seconds
     "collect_metrics_timeout": 180,
 
+    # === Inference Server ===
+    # Whether remote evaluators should only step envs, and send observations
+    # to a single shared actor that batches policy evaluation across all of
+    # them. This is only supported by optimizers that compute gradients on
+    # the driver (e.g., sync samples, IMPALA, PPO).
+    "inference_server": False,
+    # Max number of observations to evaluate in one batch on the server. The
+    # server evaluates the queued requests as soon as they add up to this
+    # many observations.
+    "inference_server_max_batch_size": 512,
+    # Max time a request waits for a batch to fill up before the server
+    # evaluates a smaller batch. This is also the max interval at which
+    # evaluators poll the server for their results.
+    "inference_server_max_latency_ms": 5,
+    # Number of CPUs and GPUs to allocate for the inference server.
+    "num_cpus_for_inference_server": 1,
+    "num_gpus_for_inference_server": 0,
+
+    # === Offline Datasets ===
+    # Where to read experiences from. Either "sampler" to sample from the
+    # env, or a directory / glob of shards written via the "output" option.
+    "input": "sampler",
+    # Whether to shuffle rows read from offline input shards.
+    "input_shuffle": True,
+    # Directory to write sampled experiences to, or "logdir" to write to the
+    # agent log dir. None disables output.
+    "output": None,
+    # Columns to LZ4 compress when writing output. Uncompressed columns can
+    # be memory-mapped when read back.
+    "output_compress_columns": ["obs", "new_obs"],
+    # Number of rows to buffer per output shard.
+    "output_max_shard_rows": 10000,
+
     # === Multiagent ===
     "multiagent": {
         # Map from policy ids to tuples of (policy_graph_cls, obs_space,
@@ -183,6 +225,8 @@ class Agent(Trainable):
 
         # Vars to synchronize to evaluators on each train call
         self.global_vars = {"timestep": 0}
+        # Remote filters being merged when using async_filter_sync
+        self._pending_filters = None
 
         # Agents allow env ids to be passed directly to the constructor.
         self._env_id = _register_if_needed(env or config.get("env"))
@@ -233,10 +277,7 @@ class Agent(Trainable):
 
         if (self.config.get("observation_filter", "NoFilter") != "NoFilter"
                 and hasattr(self, "local_evaluator")):
-            FilterManager.synchronize(
-                self.local_evaluator.filters,
-                self.remote_evaluators,
-                update_remote=self.config["synchronize_filters"])
+            self._synchronize_filters()
             logger.debug("synchronized filters: {}".format(
                 self.local_evaluator.filters))
 
@@ -248,6 +289,25 @@ class Agent(Trainable):
             })
         return result
 
+    def _synchronize_filters(self):
+        fanout = self.config["filter_sync_tree_fanout"] or None
+        if not self.config["async_filter_sync"]:
+            FilterManager.synchronize(
+                self.local_evaluator.filters,
+                self.remote_evaluators,
+                update_remote=self.config["synchronize_filters"],
+                tree_fanout=fanout)
+            return
+
+        if self._pending_filters is not None:
+            FilterManager.finish_synchronize(
+                self.local_evaluator.filters,
+                self.remote_evaluators,
+                self._pending_filters,
+                update_remote=self.config["synchronize_filters"])
+        self._pending_filters = FilterManager.start_synchronize(
+            self.remote_evaluators, fanout or 16)
+
     @override(Trainable)
     def _setup(self, config):
         env = self._env_id
@@ -277,9 +337,16 @@ class Agent(Trainable):
     @override(Trainable)
     def _stop(self):
         # workaround for https://github.com/ray-project/ray/issues/1516
+        flush_output = self.config.get("output") is not None
+        if flush_output and hasattr(self, "local_evaluator"):
+            self.local_evaluator.close_output()
         if hasattr(self, "remote_evaluators"):
             for ev in self.remote_evaluators:
+                if flush_output:
+                    ev.close_output.remote()
                 ev.__ray_terminate__.remote()
+        if getattr(self, "inference_server", None):
+            self.inference_server.__ray_terminate__.remote()
         if hasattr(self, "optimizer"):
             self.optimizer.stop()
 
@@ -385,20 +452,85 @@ class Agent(Trainable):
             "resources": self.config["custom_resources_per_worker"],
         }
 
+        if self.config["inference_server"]:
+            self.inference_server = self._make_inference_server()
+        else:
+            self.inference_server = None
+
         cls = PolicyEvaluator.as_remote(**remote_args).remote
         return [
-            self._make_evaluator(cls, env_creator, policy_graph, i + 1,
-                                 self.config) for i in range(count)
+            self._make_evaluator(
+                cls,
+                env_creator,
+                policy_graph,
+                i + 1,
+                self.config,
+                inference_server=self.inference_server) for i in range(count)
         ]
 
-    def _make_evaluator(self, cls, env_creator, policy_graph, worker_index,
-                        config):
+    def _make_inference_server(self):
+        if not hasattr(self, "local_evaluator"):
+            raise ValueError(
+                "The inference server is built from the policies of the "
+                "local evaluator, which must be created first.")
+
+        config = self.config
+
+        def session_creator():
+            logger.debug("Creating TF session {}".format(
+                config["tf_session_args"]))
+            return tf.Session(
+                config=tf.ConfigProto(**config["tf_session_args"]))
+
+        cls = InferenceServer.as_remote(
+            num_cpus=config["num_cpus_for_inference_server"],
+            num_gpus=config["num_gpus_for_inference_server"])
+        return cls.remote(
+            self.local_evaluator.policy_dict,
+            self.local_evaluator.preprocessors,
+            config,
+            tf_session_creator=(session_creator
+                                if config["tf_session_args"] else None))
+
+    def _make_evaluator(self,
+                        cls,
+                        env_creator,
+                        policy_graph,
+                        worker_index,
+                        config,
+                        inference_server=None):
         def session_creator():
             logger.debug("Creating TF session {}".format(
                 config["tf_session_args"]))
             return tf.Session(
                 config=tf.ConfigProto(**config["tf_session_args"]))
 
+        if config["input"] == "sampler":
+            input_creator = None
+        else:
+
+            def input_creator():
+                return ColumnarReader(
+                    config["input"],
+                    config["sample_batch_size"] *
+                    config["num_envs_per_worker"],
+                    shuffle=config["input_shuffle"])
+
+        if config["output"] is None:
+            output_creator = None
+        else:
+            if config["output"] == "logdir":
+                output_dir = self.logdir
+            else:
+                output_dir = config["output"]
+
+            def output_creator():
+                return ColumnarWriter(
+                    output_dir,
+                    worker_index=worker_index,
+                    max_shard_rows=config["output_max_shard_rows"],
+                    compress_columns=config["output_compress_columns"])
+
         return cls(
             env_creator,
             self.config["multiagent"]["policy_graphs"] or policy_graph,
@@ -422,7 +554,10 @@ class Agent(Trainable):
             worker_index=worker_index,
             monitor_path=self.logdir if config["monitor"] else None,
             log_level=config["log_level"],
-            callbacks=config["callbacks"])
+            callbacks=config["callbacks"],
+            input_creator=input_creator,
+            output_creator=output_creator,
+            inference_server=inference_server)
 
     @classmethod
     def resource_help(cls, config):
@@ -19,6 +19,7 @@ from ray.rllib.agents.ars import policies
 from ray.rllib.agents.ars import utils
 from ray.rllib.utils.annotations import override
 from ray.rllib.utils import FilterManager
+from ray.rllib.utils import shared_noise
 
 logger = logging.getLogger(__name__)
 
@@ -45,25 +46,7 @@ DEFAULT_CONFIG = with_common_config({
 # yapf: enable
 
 
-@ray.remote
-def create_shared_noise(count):
-    """Create a large array of noise to be shared by all workers."""
-    seed = 123
-    noise = np.random.RandomState(seed).randn(count).astype(np.float32)
-    return noise
-
-
-class SharedNoiseTable(object):
-    def __init__(self, noise):
-        self.noise = noise
-        assert self.noise.dtype == np.float32
-
-    def get(self, i, dim):
-        return self.noise[i:i + dim]
-
-    def sample_index(self, dim):
-        return np.random.randint(0, len(self.noise) - dim + 1)
-
+class SharedNoiseTable(shared_noise.SharedNoiseTable):
     def get_delta(self, dim):
         idx = self.sample_index(dim)
         return idx, self.get(idx, dim)
@@ -71,10 +54,10 @@ class SharedNoiseTable(object):
 
 @ray.remote
 class Worker(object):
-    def __init__(self, config, env_creator, noise, min_task_runtime=0.2):
+    def __init__(self, config, env_creator, noise_size, min_task_runtime=0.2):
         self.min_task_runtime = min_task_runtime
         self.config = config
-        self.noise = SharedNoiseTable(noise)
+        self.noise = SharedNoiseTable(noise_size)
 
         self.env = env_creator(config["env_config"])
         from ray.rllib import models
@@ -179,15 +162,16 @@ class ARSAgent(Agent):
         self.num_rollouts = self.config["num_rollouts"]
         self.report_length = self.config["report_length"]
 
-        # Create the shared noise table.
+        # Create the shared noise table. This is generated once per node and
+        # memory-mapped by the workers, see SharedNoiseTable.
         logger.info("Creating shared noise table.")
-        noise_id = create_shared_noise.remote(self.config["noise_size"])
-        self.noise = SharedNoiseTable(ray.get(noise_id))
+        self.noise = SharedNoiseTable(self.config["noise_size"])
 
         # Create the actors.
         logger.info("Creating actors.")
         self.workers = [
-            Worker.remote(self.config, self.env_creator, noise_id)
+            Worker.remote(self.config, self.env_creator,
+                          self.config["noise_size"])
             for _ in range(self.config["num_workers"])
         ]
 
@@ -270,9 +254,12 @@ class ARSAgent(Agent):
             self.reward_list.append(eval_returns.mean())
 
         # Now sync the filters
-        FilterManager.synchronize({
-            "default": self.policy.get_filter()
-        }, self.workers)
+        FilterManager.synchronize(
+            {
+                "default": self.policy.get_filter()
+            },
+            self.workers,
+            tree_fanout=self.config["filter_sync_tree_fanout"] or None)
 
         info = {
             "weights_norm": np.square(theta).sum(),
@@ -18,6 +18,7 @@ from ray.rllib.agents.es import policies
 from ray.rllib.agents.es import utils
 from ray.rllib.utils.annotations import override
 from ray.rllib.utils import FilterManager
+from ray.rllib.utils.shared_noise import SharedNoiseTable
 
 logger = logging.getLogger(__name__)
 
@@ -45,38 +46,18 @@ DEFAULT_CONFIG = with_common_config({
 # yapf: enable
 
 
-@ray.remote
-def create_shared_noise(count):
-    """Create a large array of noise to be shared by all workers."""
-    seed = 123
-    noise = np.random.RandomState(seed).randn(count).astype(np.float32)
-    return noise
-
-
-class SharedNoiseTable(object):
-    def __init__(self, noise):
-        self.noise = noise
-        assert self.noise.dtype == np.float32
-
-    def get(self, i, dim):
-        return self.noise[i:i + dim]
-
-    def sample_index(self, dim):
-        return np.random.randint(0, len(self.noise) - dim + 1)
-
-
 @ray.remote
 class Worker(object):
     def __init__(self,
                  config,
                  policy_params,
                  env_creator,
-                 noise,
+                 noise_size,
                  min_task_runtime=0.2):
         self.min_task_runtime = min_task_runtime
         self.config = config
         self.policy_params = policy_params
-        self.noise = SharedNoiseTable(noise)
+        self.noise = SharedNoiseTable(noise_size)
 
         self.env = env_creator(config["env_config"])
         from ray.rllib import models
@@ -184,16 +165,17 @@ class ESAgent(Agent):
         self.optimizer = optimizers.Adam(self.policy, self.config["stepsize"])
         self.report_length = self.config["report_length"]
 
-        # Create the shared noise table.
+        # Create the shared noise table. This is generated once per node and
+        # memory-mapped by the workers, see SharedNoiseTable.
         logger.info("Creating shared noise table.")
-        noise_id = create_shared_noise.remote(self.config["noise_size"])
-        self.noise = SharedNoiseTable(ray.get(noise_id))
+        self.noise = SharedNoiseTable(self.config["noise_size"])
 
         # Create the actors.
         logger.info("Creating actors.")
         self.workers = [
             Worker.remote(self.config, policy_params, self.env_creator,
-                          noise_id) for _ in range(self.config["num_workers"])
+                          self.config["noise_size"])
+            for _ in range(self.config["num_workers"])
         ]
 
         self.episodes_so_far = 0
@@ -267,9 +249,12 @@ class ESAgent(Agent):
             self.reward_list.append(np.mean(eval_returns))
 
         # Now sync the filters
-        FilterManager.synchronize({
-            "default": self.policy.get_filter()
-        }, self.workers)
+        FilterManager.synchronize(
+            {
+                "default": self.policy.get_filter()
+            },
+            self.workers,
+            tree_fanout=self.config["filter_sync_tree_fanout"] or None)
 
         info = {
             "weights_norm": np.square(theta).sum(),
@@ -53,6 +53,11 @@ DEFAULT_CONFIG = with_common_config({
     # Uses the sync samples optimizer instead of the multi-gpu one. This does
     # not support minibatches.
     "simple_optimizer": False,
+    # Whether to sample and load the next train batch while doing SGD on the
+    # current one (multi-gpu optimizer only). This makes each iteration take
+    # about max(sample time, SGD time), but batches are sampled with weights
+    # that are one iteration old.
+    "pipeline_sampling": False,
 })
 # __sphinx_doc_end__
 # yapf: enable
@@ -86,6 +91,7 @@ class PPOAgent(Agent):
                     "num_gpus": self.config["num_gpus"],
                     "train_batch_size": self.config["train_batch_size"],
                     "standardize_fields": ["advantages"],
+                    "pipeline_sampling": self.config["pipeline_sampling"],
                 })
 
     @override(Agent)
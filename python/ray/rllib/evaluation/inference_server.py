@@ -0,0 +1,421 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import itertools
+import logging
+import pickle
+import time
+
+import numpy as np
+import tensorflow as tf
+
+import ray
+from ray.rllib.evaluation.policy_evaluator import _has_tensorflow_graph
+from ray.rllib.evaluation.policy_graph import PolicyGraph
+from ray.rllib.evaluation.sample_batch import DEFAULT_POLICY_ID
+from ray.rllib.evaluation.sampler import PolicyEvalColumns, \
+    compute_actions_for_columns
+from ray.rllib.models.action_dist import TupleActions
+from ray.rllib.utils import merge_dicts
+from ray.rllib.utils.annotations import override
+from ray.rllib.utils.timer import TimerStat
+from ray.rllib.utils.window_stat import WindowStat
+
+logger = logging.getLogger(__name__)
+
+# The interval at which clients first poll for the result of a request. It
+# doubles up to the max latency of the server.
+_MIN_POLL_INTERVAL_S = 0.001
+
+# Results that are not polled for this long belong to clients that died, and
+# are dropped.
+_RESULT_TIMEOUT_S = 60.0
+
+
+class InferenceServer(object):
+    """Actor that computes actions for many env-only evaluators.
+
+    In inference server mode, remote evaluators are created with the handle
+    of an InferenceServer actor. Those evaluators only step their envs and
+    send observations to the server instead of building their own copies of
+    the policy graphs (and TF sessions). The server itself only holds the
+    policy graphs, and no envs or sampler.
+
+    A client submits a request with submit(), which only queues it and
+    returns a ticket, and then polls for the result with poll(). The queued
+    requests are evaluated together, in batches of up to `max_batch_size`
+    rows with a single TFRunBuilder run each, once they add up to
+    `max_batch_size` rows or the oldest of them has waited for `max_latency`.
+    The results are kept until their clients poll for them, or dropped after
+    _RESULT_TIMEOUT_S if they never do.
+
+    The server holds the authoritative copy of the policy weights. Clients
+    forward set_weights() calls to it (see RemotePolicyGraph), and trajectory
+    postprocessing is also done on the server since it may use the policy
+    graph. Policies that depend on the `episodes` argument of
+    compute_actions(), or the `episode` argument of postprocess_trajectory(),
+    are not supported in this mode.
+    """
+
+    @classmethod
+    def as_remote(cls, num_cpus=None, num_gpus=None, resources=None):
+        return ray.remote(
+            num_cpus=num_cpus, num_gpus=num_gpus, resources=resources)(cls)
+
+    def __init__(self,
+                 policy_dict,
+                 preprocessors,
+                 policy_config=None,
+                 tf_session_creator=None):
+        """Initialize an inference server.
+
+        Arguments:
+            policy_dict (dict): Map of policy id to (PolicyGraph, obs_space,
+                action_space, config) tuples, as built by the local
+                PolicyEvaluator (see PolicyEvaluator.policy_dict).
+            preprocessors (dict): Map of policy id to the preprocessor of the
+                local PolicyEvaluator for that policy.
+            policy_config (dict): Config to pass to the policies, which is
+                merged with the per-policy configs of `policy_dict`.
+            tf_session_creator (func): A function that returns a TF session.
+        """
+
+        policy_config = policy_config or {}
+        if policy_config.get("log_level"):
+            logging.getLogger("ray.rllib").setLevel(policy_config["log_level"])
+
+        self.preprocessors = preprocessors
+        self.max_batch_size = policy_config.get(
+            "inference_server_max_batch_size", 512)
+        self.max_latency = policy_config.get("inference_server_max_latency_ms",
+                                             5) / 1000.0
+        self.tf_sess = None
+        if _has_tensorflow_graph(policy_dict):
+            with tf.Graph().as_default():
+                if tf_session_creator:
+                    self.tf_sess = tf_session_creator()
+                else:
+                    self.tf_sess = tf.Session(
+                        config=tf.ConfigProto(
+                            gpu_options=tf.GPUOptions(allow_growth=True)))
+                with self.tf_sess.as_default():
+                    self.policy_map = self._build_policy_map(
+                        policy_dict, policy_config)
+        else:
+            self.policy_map = self._build_policy_map(policy_dict,
+                                                     policy_config)
+
+        self.pending = collections.deque()
+        self.pending_size = 0
+        # The results of evaluated requests, by ticket, as (time, result)
+        # tuples in the order they were evaluated in
+        self.results = collections.OrderedDict()
+        self.tickets = itertools.count()
+        self.eval_timer = TimerStat()
+        self.batch_size = WindowStat("batch_size", 100)
+        self.num_requests = 0
+        self.num_batches = 0
+        self.num_dropped = 0
+
+    def get_policy_specs(self):
+        """Returns the info clients need to build RemotePolicyGraphs.
+
+        Returns:
+            Pickled dict of policy id to (preprocessor, observation_space,
+            action_space, initial_state) tuples.
+        """
+
+        return pickle.dumps({
+            pid: (self.preprocessors[pid], policy.observation_space,
+                  policy.action_space, policy.get_initial_state())
+            for pid, policy in self.policy_map.items()
+        })
+
+    def submit(self, eval_cols):
+        """Queues a policy evaluation request.
+
+        Arguments:
+            eval_cols (dict): Map of policy id to PolicyEvalColumns.
+
+        Returns:
+            The ticket to pass to poll().
+        """
+
+        req = _Request(
+            next(self.tickets), time.time(),
+            {pid: PolicyEvalColumns(*cols)
+             for pid, cols in eval_cols.items()})
+        self.pending.append(req)
+        self.pending_size += req.size
+        self._flush()
+        return req.ticket
+
+    def poll(self, ticket):
+        """Returns (True, result) if the request was evaluated.
+
+        The result is a dict of policy to compute_action() outputs, or the
+        exception raised while evaluating the request. (False, None) is
+        returned if the request is still queued.
+        """
+
+        self._flush()
+        if ticket in self.results:
+            return True, self.results.pop(ticket)[1]
+        return False, None
+
+    def postprocess_trajectory(self, policy_id, sample_batch,
+                               other_agent_batches):
+        other_agent_batches = {
+            agent_id: (self.policy_map[pid], batch)
+            for agent_id, (pid, batch) in other_agent_batches.items()
+        }
+        return self.policy_map[policy_id].postprocess_trajectory(
+            sample_batch, other_agent_batches)
+
+    def get_weights(self, policies=None):
+        if policies is None:
+            policies = self.policy_map.keys()
+        return {
+            pid: policy.get_weights()
+            for pid, policy in self.policy_map.items() if pid in policies
+        }
+
+    def set_weights(self, weights):
+        for pid, w in weights.items():
+            self.policy_map[pid].set_weights(w)
+
+    def for_policy(self, func, policy_id=DEFAULT_POLICY_ID):
+        """Apply the given function to the specified policy graph."""
+
+        return func(self.policy_map[policy_id])
+
+    def set_global_vars(self, global_vars):
+        for policy in self.policy_map.values():
+            policy.on_global_var_update(global_vars)
+
+    def inference_stats(self):
+        return {
+            "num_requests": self.num_requests,
+            "num_batches": self.num_batches,
+            "num_dropped": self.num_dropped,
+            "eval_time_ms": round(1000 * self.eval_timer.mean, 3),
+            "batch_size": self.batch_size.stats(),
+        }
+
+    def _build_policy_map(self, policy_dict, policy_config):
+        policy_map = {}
+        for name, (cls, _, act_space, conf) in sorted(policy_dict.items()):
+            with tf.variable_scope(name):
+                policy_map[name] = cls(
+                    self.preprocessors[name].observation_space, act_space,
+                    merge_dicts(policy_config, conf))
+        return policy_map
+
+    def _flush(self):
+        """Evaluates the requests that are due and drops orphaned results."""
+
+        now = time.time()
+        while self.pending and (
+                self.pending_size >= self.max_batch_size
+                or now - self.pending[0].submit_time >= self.max_latency):
+            self._evaluate_next_batch()
+
+        while self.results:
+            ticket = next(iter(self.results))
+            if now - self.results[ticket][0] < _RESULT_TIMEOUT_S:
+                break
+            del self.results[ticket]
+            self.num_dropped += 1
+            logger.warning("Dropping the inference result of request {}, "
+                           "which was not polled for {} seconds".format(
+                               ticket, _RESULT_TIMEOUT_S))
+
+    def _evaluate_next_batch(self):
+        requests = [self.pending.popleft()]
+        size = requests[0].size
+        while self.pending and (size + self.pending[0].size <=
+                                self.max_batch_size):
+            req = self.pending.popleft()
+            requests.append(req)
+            size += req.size
+        self.pending_size -= size
+
+        try:
+            with self.eval_timer:
+                results = _evaluate(self, requests)
+        except Exception as e:
+            logger.exception("Error evaluating inference batch")
+            results = [e] * len(requests)
+        now = time.time()
+        for req, result in zip(requests, results):
+            self.results[req.ticket] = (now, result)
+
+        self.num_requests += len(requests)
+        self.num_batches += 1
+        self.batch_size.push(size)
+
+
+class InferenceClient(object):
+    """Sends policy evaluation requests to an InferenceServer.
+
+    Arguments:
+        server (ActorHandle): The InferenceServer actor.
+        max_latency (float): The max latency of the server in seconds, which
+            is the longest interval at which the client polls for results.
+    """
+
+    def __init__(self, server, max_latency):
+        self.server = server
+        self.max_poll_interval = max(max_latency, _MIN_POLL_INTERVAL_S)
+
+    def compute_actions(self, eval_cols):
+        """Remotely evaluates policies on the given PolicyEvalColumns.
+
+        Returns:
+            eval_results: dict of policy to compute_action() outputs.
+        """
+
+        # Pass the ticket on without waiting for it, which is safe since the
+        # calls of a client run in order on the server
+        ticket = self.server.submit.remote(
+            {pid: tuple(cols)
+             for pid, cols in eval_cols.items()})
+        interval = _MIN_POLL_INTERVAL_S
+        done, result = ray.get(self.server.poll.remote(ticket))
+        while not done:
+            time.sleep(interval)
+            interval = min(2 * interval, self.max_poll_interval)
+            done, result = ray.get(self.server.poll.remote(ticket))
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class RemotePolicyGraph(PolicyGraph):
+    """Stand-in for a policy graph that lives in an InferenceServer.
+
+    Action computation is batched by the sampler through InferenceClient, so
+    this class only forwards trajectory postprocessing and (optionally)
+    weight updates to the server.
+
+    postprocess_trajectory() returns the object id of the postprocessed batch
+    without waiting for it. MultiAgentSampleBatchBuilder fetches the batches
+    when the sample batch is returned by the sampler (see _env_runner).
+    """
+
+    def __init__(self, server, policy_id, observation_space, action_space,
+                 initial_state, forward_weights):
+        PolicyGraph.__init__(self, observation_space, action_space, {})
+        self.server = server
+        self.policy_id = policy_id
+        self.initial_state = initial_state
+        self.forward_weights = forward_weights
+
+    @override(PolicyGraph)
+    def postprocess_trajectory(self,
+                               sample_batch,
+                               other_agent_batches=None,
+                               episode=None):
+        other_agent_batches = {
+            agent_id: (policy.policy_id, batch)
+            for agent_id, (policy,
+                           batch) in (other_agent_batches or {}).items()
+        }
+        return self.server.postprocess_trajectory.remote(
+            self.policy_id, sample_batch, other_agent_batches)
+
+    @override(PolicyGraph)
+    def get_initial_state(self):
+        return self.initial_state
+
+    @override(PolicyGraph)
+    def get_weights(self):
+        return ray.get(
+            self.server.for_policy.remote(lambda p: p.get_weights(),
+                                          self.policy_id))
+
+    @override(PolicyGraph)
+    def set_weights(self, weights):
+        # Weights are broadcast to every evaluator, but only one of them
+        # needs to update the shared server.
+        if self.forward_weights:
+            self.server.set_weights.remote({self.policy_id: weights})
+
+    @override(PolicyGraph)
+    def get_state(self):
+        return self.get_weights()
+
+    @override(PolicyGraph)
+    def set_state(self, state):
+        self.set_weights(state)
+
+    @override(PolicyGraph)
+    def on_global_var_update(self, global_vars):
+        if self.forward_weights:
+            self.server.set_global_vars.remote(global_vars)
+
+
+def make_remote_policy_map(server, forward_weights):
+    """Returns (policy_map, preprocessors) that proxy to the given server."""
+
+    specs = pickle.loads(ray.get(server.get_policy_specs.remote()))
+    policy_map, preprocessors = {}, {}
+    for pid, (preprocessor, obs_space, act_space,
+              initial_state) in specs.items():
+        preprocessors[pid] = preprocessor
+        policy_map[pid] = RemotePolicyGraph(server, pid, obs_space, act_space,
+                                            initial_state, forward_weights)
+    return policy_map, preprocessors
+
+
+class _Request(object):
+    def __init__(self, ticket, submit_time, eval_cols):
+        self.ticket = ticket
+        self.submit_time = submit_time
+        self.eval_cols = eval_cols
+        self.size = sum(len(c.obs) for c in eval_cols.values())
+
+
+def _evaluate(evaluator, requests):
+    """Evaluates the requests in one batch, returning their results."""
+
+    # Concatenate the columns of all requests for each policy
+    merged = {}
+    offsets = []
+    for req in requests:
+        req_offsets = {}
+        for pid, cols in req.eval_cols.items():
+            if pid not in merged:
+                merged[pid] = PolicyEvalColumns(
+                    [], [[] for _ in cols.rnn_state], [], [], None)
+            m = merged[pid]
+            start = len(m.obs)
+            m.obs.extend(cols.obs)
+            for i, col in enumerate(cols.rnn_state):
+                m.rnn_state[i].extend(col)
+            m.prev_action.extend(cols.prev_action)
+            m.prev_reward.extend(cols.prev_reward)
+            req_offsets[pid] = (start, len(m.obs))
+        offsets.append(req_offsets)
+
+    eval_results = compute_actions_for_columns(evaluator.tf_sess, merged,
+                                               evaluator.policy_map)
+
+    # Split the outputs back up into per-request results
+    return [{
+        pid: _slice_eval_result(eval_results[pid], start, end)
+        for pid, (start, end) in req_offsets.items()
+    } for req_offsets in offsets]
+
+
+def _slice_eval_result(result, start, end):
+    actions, rnn_out_cols, pi_info_cols = result
+    if isinstance(actions, TupleActions):
+        actions = TupleActions([b[start:end] for b in actions.batches])
+    else:
+        actions = np.asarray(actions)[start:end]
+    return (actions, [np.asarray(c)[start:end] for c in rnn_out_cols],
+            {k: np.asarray(v)[start:end]
+             for k, v in pi_info_cols.items()})
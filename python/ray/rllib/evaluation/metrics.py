@@ -4,7 +4,6 @@ from __future__ import print_function
 
 import logging
 import numpy as np
-import collections
 
 import ray
 from ray.rllib.evaluation.sample_batch import DEFAULT_POLICY_ID
@@ -16,10 +15,9 @@ def collect_metrics(local_evaluator, remote_evaluators=[],
                     timeout_seconds=180):
     """Gathers episode metrics from PolicyEvaluator instances."""
 
-    episodes, num_dropped = collect_episodes(
+    summary, num_dropped = collect_episode_summaries(
         local_evaluator, remote_evaluators, timeout_seconds=timeout_seconds)
-    metrics = summarize_episodes(episodes, episodes, num_dropped)
-    return metrics
+    return summary.to_result(summary.num_episodes, num_dropped)
 
 
 def collect_episodes(local_evaluator,
@@ -43,6 +41,40 @@ def collect_episodes(local_evaluator,
     return episodes, num_metric_batches_dropped
 
 
+def collect_episode_summaries(local_evaluator,
+                              remote_evaluators=[],
+                              timeout_seconds=180,
+                              keep_episodes=0):
+    """Gathers a summary of the new episodes of the given evaluators.
+
+    Each evaluator summarizes its own new episodes, so only one
+    EpisodeSummary per evaluator is sent back and merged here.
+
+    Arguments:
+        keep_episodes (int): Number of new episodes whose metrics tuples
+            are kept in the summary (see EpisodeSummary).
+
+    Returns:
+        summary (EpisodeSummary): Merged summary of all new episodes.
+        num_dropped (int): Number of evaluators that timed out.
+    """
+
+    pending = [
+        a.apply.remote(
+            lambda ev: EpisodeSummary(ev.sampler.get_metrics(), keep_episodes))
+        for a in remote_evaluators
+    ]
+    collected, _ = ray.wait(
+        pending, num_returns=len(pending), timeout=timeout_seconds * 1000)
+    num_metric_batches_dropped = len(pending) - len(collected)
+
+    summary = EpisodeSummary(local_evaluator.sampler.get_metrics(),
+                             keep_episodes)
+    for remote_summary in ray.get(collected):
+        summary.merge(remote_summary)
+    return summary, num_metric_batches_dropped
+
+
 def summarize_episodes(episodes, new_episodes, num_dropped):
     """Summarizes a set of episode metrics tuples.
 
@@ -52,51 +84,140 @@ def summarize_episodes(episodes, new_episodes, num_dropped):
         num_dropped: number of workers haven't returned their metrics
     """
 
-    if num_dropped > 0:
-        logger.warn("WARNING: {} workers have NOT returned metrics".format(
-            num_dropped))
-
-    episode_rewards = []
-    episode_lengths = []
-    policy_rewards = collections.defaultdict(list)
-    custom_metrics = collections.defaultdict(list)
-    for episode in episodes:
-        episode_lengths.append(episode.episode_length)
-        episode_rewards.append(episode.episode_reward)
+    return EpisodeSummary(episodes).to_result(len(new_episodes), num_dropped)
+
+
+class EpisodeSummary(object):
+    """Mergeable summary of the metrics of a set of episodes.
+
+    This keeps the count, sum, min and max of the episode rewards and
+    lengths, the per-policy rewards and the custom metrics, which is all
+    that is needed to compute training results. Summaries of disjoint sets
+    of episodes can be merged, which allows evaluators to send a summary of
+    their episodes instead of all the episode metrics tuples.
+
+    The metrics tuples of up to `keep_episodes` of the summarized episodes
+    are kept in `episodes`, so that callers can smooth results over an
+    exact number of past episodes.
+
+    Arguments:
+        episodes (list): RolloutMetrics tuples to summarize.
+        keep_episodes (int): Max number of metrics tuples to keep.
+    """
+
+    def __init__(self, episodes=None, keep_episodes=0):
+        self.num_episodes = 0
+        self.episode_reward = _RunningSummary()
+        self.episode_length = _RunningSummary()
+        self.policy_rewards = {}
+        self.custom_metrics = {}
+        self.keep_episodes = keep_episodes
+        self.episodes = []
+        for episode in episodes or []:
+            self.add(episode)
+
+    def add(self, episode):
+        """Adds a RolloutMetrics tuple to the summary."""
+
+        self._keep([episode])
+        self.num_episodes += 1
+        self.episode_length.push(episode.episode_length)
+        self.episode_reward.push(episode.episode_reward)
         for k, v in episode.custom_metrics.items():
-            custom_metrics[k].append(v)
+            _get_summary(self.custom_metrics, k).push(v)
         for (_, policy_id), reward in episode.agent_rewards.items():
             if policy_id != DEFAULT_POLICY_ID:
-                policy_rewards[policy_id].append(reward)
-    if episode_rewards:
-        min_reward = min(episode_rewards)
-        max_reward = max(episode_rewards)
-    else:
-        min_reward = float('nan')
-        max_reward = float('nan')
-    avg_reward = np.mean(episode_rewards)
-    avg_length = np.mean(episode_lengths)
-
-    for policy_id, rewards in policy_rewards.copy().items():
-        policy_rewards[policy_id] = np.mean(rewards)
-
-    for k, v_list in custom_metrics.copy().items():
-        custom_metrics[k + "_mean"] = np.mean(v_list)
-        filt = [v for v in v_list if not np.isnan(v)]
-        if filt:
-            custom_metrics[k + "_min"] = np.min(filt)
-            custom_metrics[k + "_max"] = np.max(filt)
-        else:
-            custom_metrics[k + "_min"] = float("nan")
-            custom_metrics[k + "_max"] = float("nan")
-        del custom_metrics[k]
-
-    return dict(
-        episode_reward_max=max_reward,
-        episode_reward_min=min_reward,
-        episode_reward_mean=avg_reward,
-        episode_len_mean=avg_length,
-        episodes_this_iter=len(new_episodes),
-        policy_reward_mean=dict(policy_rewards),
-        custom_metrics=dict(custom_metrics),
-        num_metric_batches_dropped=num_dropped)
+                _get_summary(self.policy_rewards, policy_id).push(reward)
+
+    def merge(self, other):
+        """Adds the episodes summarized by other to this summary."""
+
+        self._keep(other.episodes)
+        self.num_episodes += other.num_episodes
+        self.episode_length.merge(other.episode_length)
+        self.episode_reward.merge(other.episode_reward)
+        for k, v in other.custom_metrics.items():
+            _get_summary(self.custom_metrics, k).merge(v)
+        for policy_id, v in other.policy_rewards.items():
+            _get_summary(self.policy_rewards, policy_id).merge(v)
+
+    def _keep(self, episodes):
+        if self.keep_episodes > 0:
+            self.episodes.extend(episodes)
+            del self.episodes[:-self.keep_episodes]
+
+    def to_result(self, episodes_this_iter, num_dropped):
+        """Returns the training result fields for the summary.
+
+        Arguments:
+            episodes_this_iter: number of new episodes in this iteration
+            num_dropped: number of workers haven't returned their metrics
+        """
+
+        if num_dropped > 0:
+            logger.warn("WARNING: {} workers have NOT returned metrics".format(
+                num_dropped))
+
+        custom_metrics = {}
+        for k, v in self.custom_metrics.items():
+            custom_metrics[k + "_mean"] = v.mean
+            custom_metrics[k + "_min"] = v.min
+            custom_metrics[k + "_max"] = v.max
+
+        return dict(
+            episode_reward_max=self.episode_reward.max,
+            episode_reward_min=self.episode_reward.min,
+            episode_reward_mean=self.episode_reward.mean,
+            episode_len_mean=self.episode_length.mean,
+            episodes_this_iter=episodes_this_iter,
+            policy_reward_mean={
+                policy_id: v.mean
+                for policy_id, v in self.policy_rewards.items()
+            },
+            custom_metrics=custom_metrics,
+            num_metric_batches_dropped=num_dropped)
+
+
+class _RunningSummary(object):
+    """Count, sum, min and max of a stream of values.
+
+    NaN values count towards the mean (making it NaN), but are ignored by
+    the min and max.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self._min = float("inf")
+        self._max = float("-inf")
+
+    def push(self, x):
+        self.count += 1
+        self.total += x
+        if not np.isnan(x):
+            self._min = min(self._min, x)
+            self._max = max(self._max, x)
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self._min = min(self._min, other._min)
+        self._max = max(self._max, other._max)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else float("nan")
+
+    @property
+    def min(self):
+        return self._min if self._min <= self._max else float("nan")
+
+    @property
+    def max(self):
+        return self._max if self._min <= self._max else float("nan")
+
+
+def _get_summary(summaries, key):
+    if key not in summaries:
+        summaries[key] = _RunningSummary()
+    return summaries[key]
@@ -109,7 +109,10 @@ class PolicyEvaluator(EvaluatorInterface):
                  worker_index=0,
                  monitor_path=None,
                  log_level=None,
-                 callbacks=None):
+                 callbacks=None,
+                 input_creator=None,
+                 output_creator=None,
+                 inference_server=None):
         """Initialize a policy evaluator.
 
         Arguments:
@@ -172,6 +175,15 @@ class PolicyEvaluator(EvaluatorInterface):
                 directory if specified.
             log_level (str): Set the root log level on creation.
             callbacks (dict): Dict of custom debug callbacks.
+            input_creator (func): Optional function that returns an
+                InputReader. If set, experiences are read from it instead of
+                being sampled from the env.
+            output_creator (func): Optional function that returns an
+                OutputWriter, to which all sampled experiences are saved.
+            inference_server (ActorHandle): Optional InferenceServer actor.
+                If set, this evaluator only steps its envs and sends
+                observations to the server for policy evaluation, and does
+                not create policy graphs of its own.
         """
 
         if log_level:
@@ -194,6 +206,8 @@ class PolicyEvaluator(EvaluatorInterface):
         self.batch_mode = batch_mode
         self.compress_observations = compress_observations
         self.preprocessing_enabled = True
+        self.input_reader = input_creator() if input_creator else None
+        self.output_writer = output_creator() if output_creator else None
 
         self.env = env_creator(env_context)
         if isinstance(self.env, MultiAgentEnv) or \
@@ -233,9 +247,22 @@ class PolicyEvaluator(EvaluatorInterface):
                 env_creator(env_context.with_vector_index(vector_index)))
 
         self.tf_sess = None
+        self.inference_client = None
         policy_dict = _validate_and_canonicalize(policy_graph, self.env)
+        # The policy specs the inference server is built from
+        self.policy_dict = policy_dict
         self.policies_to_train = policies_to_train or list(policy_dict.keys())
-        if _has_tensorflow_graph(policy_dict):
+        if inference_server:
+            from ray.rllib.evaluation.inference_server import \
+                InferenceClient, make_remote_policy_map
+            # Only one client needs to forward weight updates to the server
+            self.policy_map, self.preprocessors = make_remote_policy_map(
+                inference_server, forward_weights=(worker_index == 1))
+            self.inference_client = InferenceClient(
+                inference_server,
+                policy_config.get("inference_server_max_latency_ms", 5) /
+                1000.0)
+        elif _has_tensorflow_graph(policy_dict):
             with tf.Graph().as_default():
                 if tf_session_creator:
                     self.tf_sess = tf_session_creator()
@@ -279,7 +306,7 @@ class PolicyEvaluator(EvaluatorInterface):
         else:
             raise ValueError("Unsupported batch mode: {}".format(
                 self.batch_mode))
-        if sample_async:
+        if sample_async and not self.input_reader:
             self.sampler = AsyncSampler(
                 self.async_env,
                 self.policy_map,
@@ -292,7 +319,8 @@ class PolicyEvaluator(EvaluatorInterface):
                 horizon=episode_horizon,
                 pack=pack_episodes,
                 tf_sess=self.tf_sess,
-                clip_actions=clip_actions)
+                clip_actions=clip_actions,
+                inference_client=self.inference_client)
             self.sampler.start()
         else:
             self.sampler = SyncSampler(
@@ -307,7 +335,8 @@ class PolicyEvaluator(EvaluatorInterface):
                 horizon=episode_horizon,
                 pack=pack_episodes,
                 tf_sess=self.tf_sess,
-                clip_actions=clip_actions)
+                clip_actions=clip_actions,
+                inference_client=self.inference_client)
 
         logger.debug("Created evaluator with env {} ({}), policies {}".format(
             self.async_env, self.env, self.policy_map))
@@ -320,23 +349,10 @@ class PolicyEvaluator(EvaluatorInterface):
             SampleBatch|MultiAgentBatch from evaluating the current policies.
         """
 
-        batches = [self.sampler.get_data()]
-        steps_so_far = batches[0].count
-
-        # In truncate_episodes mode, never pull more than 1 batch per env.
-        # This avoids over-running the target batch size.
-        if self.batch_mode == "truncate_episodes":
-            max_batches = self.num_envs
+        if self.input_reader:
+            batch = self.input_reader.next()
         else:
-            max_batches = float("inf")
-
-        while steps_so_far < self.sample_batch_size and len(
-                batches) < max_batches:
-            batch = self.sampler.get_data()
-            steps_so_far += batch.count
-            batches.append(batch)
-        batches.extend(self.sampler.get_extra_batches())
-        batch = batches[0].concat_samples(batches)
+            batch = self._sample_from_env()
 
         if self.callbacks.get("on_sample_end"):
             self.callbacks["on_sample_end"]({
@@ -344,6 +360,9 @@ class PolicyEvaluator(EvaluatorInterface):
                 "samples": batch
             })
 
+        if self.output_writer:
+            self.output_writer.write(batch)
+
         if self.compress_observations:
             if isinstance(batch, MultiAgentBatch):
                 for data in batch.policy_batches.values():
@@ -355,6 +374,31 @@ class PolicyEvaluator(EvaluatorInterface):
 
         return batch
 
+    def _sample_from_env(self):
+        batches = [self.sampler.get_data()]
+        steps_so_far = batches[0].count
+
+        # In truncate_episodes mode, never pull more than 1 batch per env.
+        # This avoids over-running the target batch size.
+        if self.batch_mode == "truncate_episodes":
+            max_batches = self.num_envs
+        else:
+            max_batches = float("inf")
+
+        while steps_so_far < self.sample_batch_size and len(
+                batches) < max_batches:
+            batch = self.sampler.get_data()
+            steps_so_far += batch.count
+            batches.append(batch)
+        batches.extend(self.sampler.get_extra_batches())
+        return batches[0].concat_samples(batches)
+
+    def close_output(self):
+        """Flushes any experiences buffered by the output writer."""
+
+        if self.output_writer:
+            self.output_writer.close()
+
     @ray.method(num_return_vals=2)
     def sample_with_count(self):
         """Same as sample() but returns the count as a separate future."""
@@ -473,7 +517,9 @@ class PolicyEvaluator(EvaluatorInterface):
         """
         assert all(k in new_filters for k in self.filters)
         for k in self.filters:
+            delta = self.filters[k].copy()
             self.filters[k].sync(new_filters[k])
+            self.filters[k].apply_changes(delta, with_buffer=True)
 
     def get_filters(self, flush_after=False):
         """Returns a snapshot of filters.
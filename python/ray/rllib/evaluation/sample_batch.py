@@ -5,6 +5,8 @@ from __future__ import print_function
 import collections
 import numpy as np
 
+import ray
+
 # Defaults policy id for single agent environments
 DEFAULT_POLICY_ID = "default"
 
@@ -77,12 +79,16 @@ class MultiAgentSampleBatchBuilder(object):
         }
         self.agent_builders = {}
         self.agent_to_policy = {}
+        # Object ids of batches postprocessed remotely, by policy id
+        self.pending_batches = collections.defaultdict(list)
+        self.pending_count = 0
         self.count = 0  # increment this manually
 
     def total(self):
         """Returns summed number of steps across all agent buffers."""
 
-        return sum(p.count for p in self.policy_builders.values())
+        return self.pending_count + sum(p.count
+                                        for p in self.policy_builders.values())
 
     def has_pending_data(self):
         """Returns whether there is pending unprocessed data."""
@@ -108,7 +114,9 @@ class MultiAgentSampleBatchBuilder(object):
         """Apply policy postprocessors to any unprocessed rows.
 
         This pushes the postprocessed per-agent batches onto the per-policy
-        builders, clearing per-agent state.
+        builders, clearing per-agent state. Postprocessors may also return
+        the object id of a batch that is computed remotely, which is only
+        fetched when the batch is built.
 
         Arguments:
             episode: current MultiAgentEpisode object or None
@@ -140,8 +148,12 @@ class MultiAgentSampleBatchBuilder(object):
 
         # Append into policy batches and reset
         for agent_id, post_batch in sorted(post_batches.items()):
-            self.policy_builders[self.agent_to_policy[agent_id]].add_batch(
-                post_batch)
+            policy_id = self.agent_to_policy[agent_id]
+            if isinstance(post_batch, ray.ObjectID):
+                self.pending_batches[policy_id].append(post_batch)
+                self.pending_count += pre_batches[agent_id][1].count
+            else:
+                self.policy_builders[policy_id].add_batch(post_batch)
         self.agent_builders.clear()
         self.agent_to_policy.clear()
 
@@ -155,14 +167,43 @@ class MultiAgentSampleBatchBuilder(object):
             episode: current MultiAgentEpisode object or None
         """
 
+        return self.build_and_reset_async(episode)()
+
+    def build_and_reset_async(self, episode):
+        """Like build_and_reset(), but doesn't wait for remote postprocessing.
+
+        Returns:
+            A function that returns the accumulated sample batches, fetching
+            all batches that are postprocessed remotely with one ray.get().
+        """
+
         self.postprocess_batch_so_far(episode)
         policy_batches = {}
         for policy_id, builder in self.policy_builders.items():
             if builder.count > 0:
                 policy_batches[policy_id] = builder.build_and_reset()
+        pending = [(policy_id, object_id)
+                   for policy_id, object_ids in self.pending_batches.items()
+                   for object_id in object_ids]
+        self.pending_batches.clear()
+        self.pending_count = 0
         old_count = self.count
         self.count = 0
-        return MultiAgentBatch.wrap_as_needed(policy_batches, old_count)
+
+        def fetch():
+            if pending:
+                fetched = collections.defaultdict(list)
+                batches = ray.get([object_id for _, object_id in pending])
+                for (policy_id, _), batch in zip(pending, batches):
+                    fetched[policy_id].append(batch)
+                for policy_id, batches in fetched.items():
+                    if policy_id in policy_batches:
+                        batches.insert(0, policy_batches[policy_id])
+                    policy_batches[policy_id] = SampleBatch.concat_samples(
+                        batches)
+            return MultiAgentBatch.wrap_as_needed(policy_batches, old_count)
+
+        return fetch
 
 
 class MultiAgentBatch(object):
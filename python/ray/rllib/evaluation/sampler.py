@@ -6,6 +6,7 @@ import gym
 from collections import defaultdict, namedtuple
 import logging
 import numpy as np
+import os
 import six.moves.queue as queue
 import threading
 
@@ -16,7 +17,7 @@ from ray.rllib.evaluation.tf_policy_graph import TFPolicyGraph
 from ray.rllib.env.async_vector_env import AsyncVectorEnv
 from ray.rllib.env.atari_wrappers import get_wrapper_by_cls, MonitorEnv
 from ray.rllib.models.action_dist import TupleActions
-from ray.rllib.utils.tf_run_builder import TFRunBuilder
+from ray.rllib.utils.tf_run_builder import TFRunBuilder, get_callable_cache
 
 logger = logging.getLogger(__name__)
 _large_batch_warned = False
@@ -29,6 +30,11 @@ PolicyEvalData = namedtuple(
     "PolicyEvalData",
     ["env_id", "agent_id", "obs", "rnn_state", "prev_action", "prev_reward"])
 
+# Column format of the PolicyEvalData rows to be evaluated by a single policy
+PolicyEvalColumns = namedtuple(
+    "PolicyEvalColumns",
+    ["obs", "rnn_state", "prev_action", "prev_reward", "episodes"])
+
 
 class SyncSampler(object):
     """This class interacts with the environment and tells it what to do.
@@ -51,7 +57,8 @@ class SyncSampler(object):
                  horizon=None,
                  pack=False,
                  tf_sess=None,
-                 clip_actions=True):
+                 clip_actions=True,
+                 inference_client=None):
         self.async_vector_env = AsyncVectorEnv.wrap_async(env)
         self.unroll_length = unroll_length
         self.horizon = horizon
@@ -64,7 +71,7 @@ class SyncSampler(object):
             self.async_vector_env, self.extra_batches.put, self.policies,
             self.policy_mapping_fn, self.unroll_length, self.horizon,
             self.preprocessors, self.obs_filters, clip_rewards, clip_actions,
-            pack, callbacks, tf_sess)
+            pack, callbacks, tf_sess, inference_client)
         self.metrics_queue = queue.Queue()
 
     def get_data(self):
@@ -112,7 +119,8 @@ class AsyncSampler(threading.Thread):
                  horizon=None,
                  pack=False,
                  tf_sess=None,
-                 clip_actions=True):
+                 clip_actions=True,
+                 inference_client=None):
         for _, f in obs_filters.items():
             assert getattr(f, "is_concurrent", False), \
                 "Observation Filter must support concurrent updates."
@@ -133,6 +141,7 @@ class AsyncSampler(threading.Thread):
         self.tf_sess = tf_sess
         self.callbacks = callbacks
         self.clip_actions = clip_actions
+        self.inference_client = inference_client
 
     def run(self):
         try:
@@ -146,7 +155,8 @@ class AsyncSampler(threading.Thread):
             self.async_vector_env, self.extra_batches.put, self.policies,
             self.policy_mapping_fn, self.unroll_length, self.horizon,
             self.preprocessors, self.obs_filters, self.clip_rewards,
-            self.clip_actions, self.pack, self.callbacks, self.tf_sess)
+            self.clip_actions, self.pack, self.callbacks, self.tf_sess,
+            self.inference_client)
         while True:
             # The timeout variable exists because apparently, if one worker
             # dies, the other workers won't die with it, unless the timeout is
@@ -211,7 +221,8 @@ def _env_runner(async_vector_env,
                 clip_actions,
                 pack,
                 callbacks,
-                tf_sess=None):
+                tf_sess=None,
+                inference_client=None):
     """This implements the common experience collection logic.
 
     Args:
@@ -235,6 +246,8 @@ def _env_runner(async_vector_env,
         callbacks (dict): User callbacks to run on episode events.
         tf_sess (Session|None): Optional tensorflow session to use for batching
             TF policy evaluations.
+        inference_client (InferenceClient|None): If set, policy evaluation is
+            delegated to a remote InferenceServer through this client.
 
     Yields:
         rollout (SampleBatch): Object containing state, action, reward,
@@ -282,12 +295,20 @@ def _env_runner(async_vector_env,
             async_vector_env, policies, batch_builder_pool, active_episodes,
             unfiltered_obs, rewards, dones, infos, off_policy_actions, horizon,
             preprocessors, obs_filters, unroll_length, pack, callbacks)
-        for o in outputs:
-            yield o
+        if not inference_client:
+            for o in _fetch_outputs(outputs):
+                yield o
 
         # Do batched policy eval
         eval_results = _do_policy_eval(tf_sess, to_eval, policies,
-                                       active_episodes)
+                                       active_episodes, inference_client)
+
+        # The inference server postprocesses the trajectories of the built
+        # batches before it gets the evaluation request, so fetching them
+        # after the evaluation doesn't wait for another round trip
+        if inference_client:
+            for o in _fetch_outputs(outputs):
+                yield o
 
         # Process results and update episode state
         actions_to_send = _process_policy_eval_results(
@@ -308,7 +329,8 @@ def _process_observations(async_vector_env, policies, batch_builder_pool,
     Returns:
         active_envs: set of non-terminated env ids
         to_eval: map of policy_id to list of agent PolicyEvalData
-        outputs: list of metrics and samples to return from the sampler
+        outputs: list of metrics, and of functions that return the samples
+            to return from the sampler (see _fetch_outputs)
     """
 
     active_envs = set()
@@ -405,7 +427,8 @@ def _process_observations(async_vector_env, policies, batch_builder_pool,
         if episode.batch_builder.has_pending_data():
             if (all_done and not pack) or \
                     episode.batch_builder.count >= unroll_length:
-                outputs.append(episode.batch_builder.build_and_reset(episode))
+                outputs.append(
+                    episode.batch_builder.build_and_reset_async(episode))
             elif all_done:
                 # Make sure postprocessor stays within one episode
                 episode.batch_builder.postprocess_batch_so_far(episode)
@@ -448,41 +471,99 @@ def _process_observations(async_vector_env, policies, batch_builder_pool,
     return active_envs, to_eval, outputs
 
 
-def _do_policy_eval(tf_sess, to_eval, policies, active_episodes):
+def _fetch_outputs(outputs):
+    """Yields the metrics and fetched batches of _process_observations()."""
+
+    for o in outputs:
+        if isinstance(o, RolloutMetrics):
+            yield o
+        else:
+            yield o()
+
+
+def _do_policy_eval(tf_sess,
+                    to_eval,
+                    policies,
+                    active_episodes,
+                    inference_client=None):
     """Call compute actions on observation batches to get next actions.
 
     Returns:
         eval_results: dict of policy to compute_action() outputs.
     """
 
-    eval_results = {}
-
-    if tf_sess:
-        builder = TFRunBuilder(tf_sess, "policy_eval")
-        pending_fetches = {}
-    else:
-        builder = None
+    eval_cols = {}
     for policy_id, eval_data in to_eval.items():
-        rnn_in_cols = _to_column_format([t.rnn_state for t in eval_data])
+        eval_cols[policy_id] = PolicyEvalColumns(
+            [t.obs for t in eval_data],
+            _to_column_format([t.rnn_state for t in eval_data]),
+            [t.prev_action for t in eval_data],
+            [t.prev_reward for t in eval_data],
+            # Episodes can't be sent to a remote inference server
+            None if inference_client else
+            [active_episodes[t.env_id] for t in eval_data])
+
+    if inference_client:
+        return inference_client.compute_actions(eval_cols)
+    return compute_actions_for_columns(tf_sess, eval_cols, policies)
+
+
+def compute_actions_for_columns(tf_sess, eval_cols, policies):
+    """Evaluates each policy on the given columns, batching TF policies.
+
+    Arguments:
+        tf_sess (Session|None): Session to batch TF policy evaluations in.
+        eval_cols (dict): Map of policy id to PolicyEvalColumns.
+        policies (dict): Map of policy ids to PolicyGraph instances.
+
+    Returns:
+        eval_results: dict of policy to compute_action() outputs.
+    """
+
+    eval_results = {}
+    tf_policy_ids, tf_feeds, tf_fetches, tf_key = [], [], [], []
+    for policy_id, cols in eval_cols.items():
         policy = _get_or_raise(policies, policy_id)
-        if builder and (policy.compute_actions.__code__ is
+        if tf_sess and (policy.compute_actions.__code__ is
                         TFPolicyGraph.compute_actions.__code__):
-            pending_fetches[policy_id] = policy._build_compute_actions(
-                builder, [t.obs for t in eval_data],
-                rnn_in_cols,
-                prev_action_batch=[t.prev_action for t in eval_data],
-                prev_reward_batch=[t.prev_reward for t in eval_data])
+            feeds, fetches = policy._compute_actions_feeds(
+                cols.obs,
+                cols.rnn_state,
+                prev_action_batch=cols.prev_action,
+                prev_reward_batch=cols.prev_reward)
+            tf_policy_ids.append(policy_id)
+            tf_feeds.extend(feeds)
+            tf_fetches.append(fetches)
+            tf_key.append((policy_id, tuple(ph for ph, _ in feeds),
+                           tuple(sorted(fetches[2]))))
         else:
             eval_results[policy_id] = policy.compute_actions(
-                [t.obs for t in eval_data],
-                rnn_in_cols,
-                prev_action_batch=[t.prev_action for t in eval_data],
-                prev_reward_batch=[t.prev_reward for t in eval_data],
-                episodes=[active_episodes[t.env_id] for t in eval_data])
-    if builder:
-        for k, v in pending_fetches.items():
-            eval_results[k] = builder.get(v)
+                cols.obs,
+                cols.rnn_state,
+                prev_action_batch=cols.prev_action,
+                prev_reward_batch=cols.prev_reward,
+                episodes=cols.episodes)
 
+    if not tf_policy_ids:
+        return eval_results
+
+    if os.environ.get("TF_TIMELINE_DIR"):
+        builder = TFRunBuilder(tf_sess, "policy_eval")
+        builder.add_feed_dict(dict(tf_feeds))
+        pending = [
+            builder.add_fetches([sampler] + state_outputs + [extra_fetches])
+            for sampler, state_outputs, extra_fetches in tf_fetches
+        ]
+        results = [(builder.get(f[0]), builder.get(f[1:-1]),
+                    builder.get(f[-1])) for f in pending]
+    else:
+        # Run all TF policies in one call of a cached callable, with the
+        # observations copied into reused arrays
+        results = get_callable_cache(tf_sess).run(
+            tuple(tf_key), tf_feeds, tf_fetches,
+            {policies[pid]._obs_input
+             for pid in tf_policy_ids})
+    eval_results.update(zip(tf_policy_ids, results))
     return eval_results
 
 
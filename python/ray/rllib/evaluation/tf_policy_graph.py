@@ -231,22 +231,42 @@ class TFPolicyGraph(PolicyGraph):
                                prev_action_batch=None,
                                prev_reward_batch=None,
                                episodes=None):
+        feeds, fetches = self._compute_actions_feeds(
+            obs_batch, state_batches, prev_action_batch, prev_reward_batch)
+        builder.add_feed_dict(dict(feeds))
+        sampler, state_outputs, extra_fetches = fetches
+        fetches = builder.add_fetches([sampler] + state_outputs +
+                                      [extra_fetches])
+        return fetches[0], fetches[1:-1], fetches[-1]
+
+    def _compute_actions_feeds(self,
+                               obs_batch,
+                               state_batches=None,
+                               prev_action_batch=None,
+                               prev_reward_batch=None):
+        """Returns the feeds and fetches of a compute_actions() run.
+
+        Returns:
+            feeds (list): List of (placeholder, value) pairs.
+            fetches (tuple): Tuple of the action sampler, the list of state
+                outputs, and the dict of extra action fetches.
+        """
         state_batches = state_batches or []
         assert len(self._state_inputs) == len(state_batches), \
             (self._state_inputs, state_batches)
-        builder.add_feed_dict(self.extra_compute_action_feed_dict())
-        builder.add_feed_dict({self._obs_input: obs_batch})
+        feeds = list(self.extra_compute_action_feed_dict().items())
+        feeds.append((self._obs_input, obs_batch))
         if state_batches:
-            builder.add_feed_dict({self._seq_lens: np.ones(len(obs_batch))})
+            feeds.append((self._seq_lens, np.ones(len(obs_batch))))
         if self._prev_action_input is not None and prev_action_batch:
-            builder.add_feed_dict({self._prev_action_input: prev_action_batch})
+            feeds.append((self._prev_action_input, prev_action_batch))
         if self._prev_reward_input is not None and prev_reward_batch:
-            builder.add_feed_dict({self._prev_reward_input: prev_reward_batch})
-        builder.add_feed_dict({self._is_training: False})
-        builder.add_feed_dict(dict(zip(self._state_inputs, state_batches)))
-        fetches = builder.add_fetches([self._sampler] + self._state_outputs +
-                                      [self.extra_compute_action_fetches()])
-        return fetches[0], fetches[1:-1], fetches[-1]
+            feeds.append((self._prev_reward_input, prev_reward_batch))
+        feeds.append((self._is_training, False))
+        feeds.extend(zip(self._state_inputs, state_batches))
+        fetches = (self._sampler, self._state_outputs,
+                   self.extra_compute_action_fetches())
+        return feeds, fetches
 
     def _build_compute_gradients(self, builder, postprocessed_batch):
         builder.add_feed_dict(self.extra_compute_grad_feed_dict())
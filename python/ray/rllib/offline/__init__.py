@@ -0,0 +1,9 @@
+from ray.rllib.offline.input_reader import InputReader
+from ray.rllib.offline.output_writer import OutputWriter, NoopOutput
+from ray.rllib.offline.columnar_reader import ColumnarReader
+from ray.rllib.offline.columnar_writer import ColumnarWriter
+
+__all__ = [
+    "InputReader", "OutputWriter", "NoopOutput", "ColumnarReader",
+    "ColumnarWriter"
+]
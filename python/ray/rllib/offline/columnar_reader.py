@@ -0,0 +1,137 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import glob
+import json
+import logging
+import os
+import pickle
+import random
+
+import numpy as np
+import six
+
+from ray.rllib.evaluation.sample_batch import SampleBatch
+from ray.rllib.offline.columnar_writer import META_FILE
+from ray.rllib.offline.input_reader import InputReader
+from ray.rllib.utils.annotations import override
+
+logger = logging.getLogger(__name__)
+
+try:
+    import lz4.frame
+    LZ4_ENABLED = True
+except ImportError:
+    LZ4_ENABLED = False
+
+
+class ColumnarReader(InputReader):
+    """Reads batches of experiences from shards written by ColumnarWriter.
+
+    Uncompressed columns are memory-mapped, so only the pages backing the
+    rows actually returned are read from disk. Shards are visited in random
+    order, and rows are shuffled within each shard if `shuffle` is set.
+
+    Examples:
+        >>> reader = ColumnarReader("/tmp/cartpole-out", batch_size=200)
+        >>> print(reader.next())
+        SampleBatch({"obs": [...], "actions": [...], ...})
+    """
+
+    def __init__(self, inputs, batch_size, shuffle=True):
+        """Initialize a ColumnarReader.
+
+        Arguments:
+            inputs (str|list): Either a directory or glob matching shard
+                directories, or a list of shard directories.
+            batch_size (int): Number of rows to return from each next() call.
+            shuffle (bool): Whether to shuffle rows within each shard. If
+                False, batches are contiguous (zero-copy) slices of shards.
+        """
+
+        if isinstance(inputs, six.string_types):
+            if os.path.isdir(inputs) and not os.path.exists(
+                    os.path.join(inputs, META_FILE)):
+                inputs = os.path.join(inputs, "*")
+            inputs = glob.glob(inputs)
+        self.shards = sorted(
+            d for d in inputs if os.path.exists(os.path.join(d, META_FILE)))
+        if not self.shards:
+            raise ValueError("No input shards found in {}".format(inputs))
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.shard_order = []
+        self.cur_shard = None
+        self.cur_count = 0
+        self.cur_order = None
+        self.cur_pos = 0
+
+    @override(InputReader)
+    def next(self):
+        pieces = []
+        needed = self.batch_size
+        while needed > 0:
+            if self.cur_shard is None or self.cur_pos >= self.cur_count:
+                self._next_shard()
+            end = min(self.cur_pos + needed, self.cur_count)
+            if self.shuffle:
+                # Sorted indices give sequential access within the mmap
+                idx = np.sort(self.cur_order[self.cur_pos:end])
+                pieces.append(
+                    SampleBatch({k: v[idx]
+                                 for k, v in self.cur_shard.items()}))
+            else:
+                pieces.append(
+                    SampleBatch({
+                        k: v[self.cur_pos:end]
+                        for k, v in self.cur_shard.items()
+                    }))
+            needed -= end - self.cur_pos
+            self.cur_pos = end
+        if len(pieces) == 1:
+            return pieces[0]
+        return SampleBatch.concat_samples(pieces)
+
+    def _next_shard(self):
+        if not self.shard_order:
+            self.shard_order = list(self.shards)
+            random.shuffle(self.shard_order)
+        shard_dir = self.shard_order.pop()
+        self.cur_shard, self.cur_count = read_shard(shard_dir)
+        if self.cur_count == 0:
+            raise ValueError("Empty input shard {}".format(shard_dir))
+        if self.shuffle:
+            self.cur_order = np.random.permutation(self.cur_count)
+        self.cur_pos = 0
+
+
+def read_shard(shard_dir):
+    """Loads the columns of a shard written by ColumnarWriter.
+
+    Returns:
+        Tuple of (dict of column name to array, row count).
+    """
+
+    with open(os.path.join(shard_dir, META_FILE)) as f:
+        meta = json.load(f)
+    columns = {}
+    for name, col in meta["columns"].items():
+        path = os.path.join(shard_dir, name)
+        if col["format"] == "npy":
+            columns[name] = np.load(path + ".npy", mmap_mode="r")
+        elif col["format"] == "pickle":
+            with open(path + ".pkl", "rb") as f:
+                columns[name] = pickle.load(f)
+        elif col["format"] == "lz4":
+            if not LZ4_ENABLED:
+                raise ImportError(
+                    "Shard {} has compressed columns, but lz4 is not "
+                    "installed. Run `pip install lz4`.".format(shard_dir))
+            with open(path + ".lz4", "rb") as f:
+                data = lz4.frame.decompress(f.read())
+            columns[name] = np.frombuffer(
+                data, dtype=np.dtype(col["dtype"])).reshape(col["shape"])
+        else:
+            raise ValueError("Unknown column format {}".format(col["format"]))
+    return columns, meta["count"]
@@ -0,0 +1,126 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from datetime import datetime
+import json
+import logging
+import os
+import pickle
+
+import numpy as np
+
+from ray.rllib.evaluation.sample_batch import MultiAgentBatch, SampleBatch
+from ray.rllib.offline.output_writer import OutputWriter
+from ray.rllib.utils.annotations import override
+
+logger = logging.getLogger(__name__)
+
+try:
+    import lz4.frame
+    LZ4_ENABLED = True
+except ImportError:
+    LZ4_ENABLED = False
+
+META_FILE = "meta.json"
+
+
+class ColumnarWriter(OutputWriter):
+    """Writes SampleBatches to columnar shards on local disk.
+
+    Batches are buffered and written out as one shard directory every
+    `max_shard_rows` rows. Each column of a shard is a separate file, so that
+    columns can be read independently:
+
+        <path>/output-<date>_worker-<index>_<n>/
+            meta.json     # row count, and dtype/shape/format of each column
+            obs.lz4       # LZ4 compressed raw array (compress_columns only)
+            actions.npy   # plain .npy array, memory-mappable on read
+            infos.pkl     # pickled object array (non-numeric columns)
+
+    Shards are written to a temporary directory and renamed into place once
+    complete, so readers never observe partially written shards.
+    """
+
+    def __init__(self,
+                 path,
+                 worker_index=0,
+                 max_shard_rows=10000,
+                 compress_columns=("obs", "new_obs")):
+        """Initialize a ColumnarWriter.
+
+        Arguments:
+            path (str): Directory to write shards to.
+            worker_index (int): Index of the evaluator writing the output,
+                which is used to make shard names unique.
+            max_shard_rows (int): Number of rows to buffer before writing a
+                shard.
+            compress_columns (list): Names of columns to LZ4 compress. These
+                columns can't be memory-mapped on read. Ignored if lz4 is not
+                installed.
+        """
+
+        if compress_columns and not LZ4_ENABLED:
+            logger.warning("lz4 not available, writing uncompressed columns. "
+                           "To install lz4, run `pip install lz4`.")
+            compress_columns = ()
+        self.path = os.path.abspath(os.path.expanduser(path))
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        self.worker_index = worker_index
+        self.max_shard_rows = max_shard_rows
+        self.compress_columns = set(compress_columns or ())
+        self.prefix = "output-{}_worker-{}".format(
+            datetime.today().strftime("%Y-%m-%d_%H-%M-%S"), worker_index)
+        self.buffer = []
+        self.buffered_rows = 0
+        self.num_shards = 0
+
+    @override(OutputWriter)
+    def write(self, sample_batch):
+        if isinstance(sample_batch, MultiAgentBatch):
+            raise ValueError(
+                "ColumnarWriter does not support multi-agent batches yet.")
+        self.buffer.append(sample_batch)
+        self.buffered_rows += sample_batch.count
+        if self.buffered_rows >= self.max_shard_rows:
+            self._write_shard()
+
+    @override(OutputWriter)
+    def close(self):
+        if self.buffer:
+            self._write_shard()
+
+    def _write_shard(self):
+        batch = SampleBatch.concat_samples(self.buffer)
+        self.buffer = []
+        self.buffered_rows = 0
+
+        name = "{}_{}".format(self.prefix, self.num_shards)
+        tmp_dir = os.path.join(self.path, "." + name)
+        os.makedirs(tmp_dir)
+        columns = {}
+        for k, v in batch.items():
+            columns[k] = _write_column(tmp_dir, k, np.asarray(v),
+                                       k in self.compress_columns)
+        with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+            json.dump({"count": batch.count, "columns": columns}, f)
+        os.rename(tmp_dir, os.path.join(self.path, name))
+        self.num_shards += 1
+        logger.debug("Wrote shard {} with {} rows".format(name, batch.count))
+
+
+def _write_column(shard_dir, name, arr, compress):
+    meta = {"dtype": arr.dtype.str, "shape": list(arr.shape)}
+    if arr.dtype == object:
+        meta["format"] = "pickle"
+        with open(os.path.join(shard_dir, name + ".pkl"), "wb") as f:
+            pickle.dump(arr, f, pickle.HIGHEST_PROTOCOL)
+    elif compress:
+        meta["format"] = "lz4"
+        with open(os.path.join(shard_dir, name + ".lz4"), "wb") as f:
+            f.write(lz4.frame.compress(np.ascontiguousarray(arr).tobytes()))
+    else:
+        meta["format"] = "npy"
+        np.save(os.path.join(shard_dir, name + ".npy"), arr)
+    return meta
@@ -7,8 +7,8 @@ from __future__ import division
 from __future__ import print_function
 
 import collections
+import math
 import os
-import random
 import time
 import threading
 
@@ -26,7 +26,8 @@ from ray.rllib.utils.timer import TimerStat
 from ray.rllib.utils.window_stat import WindowStat
 
 SAMPLE_QUEUE_DEPTH = 2
-REPLAY_QUEUE_DEPTH = 4
+MIN_REPLAY_QUEUE_DEPTH = 1
+MAX_REPLAY_QUEUE_DEPTH = 8
 LEARNER_QUEUE_MAX_SIZE = 16
 
 
@@ -38,7 +39,13 @@ class AsyncReplayOptimizer(PolicyOptimizer):
 
     This optimizer requires that policy evaluators return an additional
     "td_error" array in the info return of compute_gradients(). This error
-    term will be used for sample prioritization."""
+    term will be used for sample prioritization.
+
+    Sample batches are routed to a replay shard on the same node as the
+    producing evaluator when one exists (round-robin otherwise), and are
+    sent to each shard in one add_batch call per step. The number of
+    in-flight replay requests is adjusted to the measured replay latency
+    and learner throughput, rather than being a fixed depth per shard."""
 
     @override(PolicyOptimizer)
     def _init(self,
@@ -52,6 +59,7 @@ class AsyncReplayOptimizer(PolicyOptimizer):
               sample_batch_size=50,
               num_replay_buffer_shards=1,
               max_weight_sync_delay=400,
+              colocate_replay_shards=True,
               debug=False):
 
         self.debug = debug
@@ -63,7 +71,7 @@ class AsyncReplayOptimizer(PolicyOptimizer):
         self.learner = LearnerThread(self.local_evaluator)
         self.learner.start()
 
-        self.replay_actors = create_colocated(ReplayActor, [
+        replay_args = [
             num_replay_buffer_shards,
             learning_starts,
             buffer_size,
@@ -71,28 +79,48 @@ class AsyncReplayOptimizer(PolicyOptimizer):
             prioritized_replay_alpha,
             prioritized_replay_beta,
             prioritized_replay_eps,
-        ], num_replay_buffer_shards)
+        ]
+        if colocate_replay_shards:
+            self.replay_actors = create_colocated(ReplayActor, replay_args,
+                                                  num_replay_buffer_shards)
+        else:
+            self.replay_actors = [
+                ReplayActor.remote(*replay_args)
+                for _ in range(num_replay_buffer_shards)
+            ]
+        self.replay_hosts = ray.get(
+            [ra.get_host.remote() for ra in self.replay_actors])
 
         # Stats
         self.timers = {
             k: TimerStat()
             for k in [
                 "put_weights", "get_samples", "sample_processing",
-                "replay_processing", "update_priorities", "train", "sample"
+                "replay_processing", "update_priorities", "train", "sample",
+                "replay_latency"
             ]
         }
         self.num_weight_syncs = 0
         self.num_samples_dropped = 0
+        self.num_local_routes = 0
+        self.num_remote_routes = 0
         self.learning_started = False
 
         # Number of worker steps since the last weight update
         self.steps_since_update = {}
 
+        # Candidate replay shards for each evaluator and the number of sample
+        # batches routed from it so far (used to round-robin among them)
+        self.replay_routes = {}
+        self.num_routed = {}
+
         # Otherwise kick of replay tasks for local gradient updates
         self.replay_tasks = TaskPool()
-        for ra in self.replay_actors:
-            for _ in range(REPLAY_QUEUE_DEPTH):
-                self.replay_tasks.add(ra, ra.replay.remote())
+        self.replay_start_times = {}
+        self.replay_in_flight = collections.Counter()
+        self.replay_queue_depth = MIN_REPLAY_QUEUE_DEPTH * len(
+            self.replay_actors)
+        self._fill_replay_queue()
 
         # Kick off async background sampling
         self.sample_tasks = TaskPool()
@@ -138,6 +166,9 @@ class AsyncReplayOptimizer(PolicyOptimizer):
             "train_throughput": round(self.timers["train"].mean_throughput, 3),
             "num_weight_syncs": self.num_weight_syncs,
             "num_samples_dropped": self.num_samples_dropped,
+            "num_samples_routed_local": self.num_local_routes,
+            "num_samples_routed_remote": self.num_remote_routes,
+            "replay_queue_depth": self.replay_queue_depth,
             "learner_queue": self.learner.learner_queue_size.stats(),
             "replay_shard_0": replay_stats,
         }
@@ -156,7 +187,17 @@ class AsyncReplayOptimizer(PolicyOptimizer):
     def _set_evaluators(self, remote_evaluators):
         self.remote_evaluators = remote_evaluators
         weights = self.local_evaluator.get_weights()
-        for ev in self.remote_evaluators:
+        hosts = ray.get([ev.get_host.remote() for ev in remote_evaluators])
+        for i, (ev, host) in enumerate(zip(self.remote_evaluators, hosts)):
+            local = [
+                ra
+                for ra, ra_host in zip(self.replay_actors, self.replay_hosts)
+                if ra_host == host
+            ]
+            self.replay_routes[ev] = (local or self.replay_actors, bool(local))
+            # Stagger the round-robin start so that evaluators without a
+            # local shard spread evenly over all shards
+            self.num_routed[ev] = i
             ev.set_weights.remote(weights)
             self.steps_since_update[ev] = 0
             for _ in range(SAMPLE_QUEUE_DEPTH):
@@ -169,12 +210,12 @@ class AsyncReplayOptimizer(PolicyOptimizer):
         with self.timers["sample_processing"]:
             completed = list(self.sample_tasks.completed())
             counts = ray.get([c[1][1] for c in completed])
+            to_add = collections.defaultdict(list)
             for i, (ev, (sample_batch, count)) in enumerate(completed):
                 sample_timesteps += counts[i]
 
-                # Send the data to the replay buffer
-                random.choice(
-                    self.replay_actors).add_batch.remote(sample_batch)
+                # Route the data to a (preferably colocated) replay shard
+                to_add[self._route(ev)].append(sample_batch)
 
                 # Update weights if needed
                 self.steps_since_update[ev] += counts[i]
@@ -193,9 +234,15 @@ class AsyncReplayOptimizer(PolicyOptimizer):
                 # Kick off another sample request
                 self.sample_tasks.add(ev, ev.sample_with_count.remote())
 
+            # Send the data to the replay buffers, one call per shard
+            for ra, batches in to_add.items():
+                ra.add_batch.remote(*batches)
+
         with self.timers["replay_processing"]:
             for ra, replay in self.replay_tasks.completed():
-                self.replay_tasks.add(ra, ra.replay.remote())
+                self.replay_in_flight[ra] -= 1
+                self.timers["replay_latency"].push(
+                    time.time() - self.replay_start_times.pop(replay))
                 if self.learner.inqueue.full():
                     self.num_samples_dropped += 1
                 else:
@@ -203,6 +250,8 @@ class AsyncReplayOptimizer(PolicyOptimizer):
                         samples = ray.get(replay)
                     # Defensive copy against plasma crashes, see #2610 #3452
                     self.learner.inqueue.put((ra, samples and samples.copy()))
+            self._update_replay_queue_depth()
+            self._fill_replay_queue()
 
         with self.timers["update_priorities"]:
             while not self.learner.outqueue.empty():
@@ -212,6 +261,41 @@ class AsyncReplayOptimizer(PolicyOptimizer):
 
         return sample_timesteps, train_timesteps
 
+    def _route(self, ev):
+        candidates, is_local = self.replay_routes[ev]
+        ra = candidates[self.num_routed[ev] % len(candidates)]
+        self.num_routed[ev] += 1
+        if is_local:
+            self.num_local_routes += 1
+        else:
+            self.num_remote_routes += 1
+        return ra
+
+    def _update_replay_queue_depth(self):
+        """Sizes the replay prefetch queue from measured throughput.
+
+        Enough replay requests should be in flight to cover the replay
+        round-trip latency at the rate the learner consumes batches."""
+
+        grad_timer = self.learner.grad_timer
+        if not self.timers["replay_latency"].count or not grad_timer.count:
+            return
+        grad_time = max(grad_timer.mean, 1e-3)
+        depth = int(math.ceil(
+            self.timers["replay_latency"].mean / grad_time)) + 1
+        self.replay_queue_depth = min(
+            max(depth, MIN_REPLAY_QUEUE_DEPTH * len(self.replay_actors)),
+            MAX_REPLAY_QUEUE_DEPTH * len(self.replay_actors))
+
+    def _fill_replay_queue(self):
+        while self.replay_tasks.count < self.replay_queue_depth:
+            ra = min(
+                self.replay_actors, key=lambda a: self.replay_in_flight[a])
+            replay = ra.replay.remote()
+            self.replay_start_times[replay] = time.time()
+            self.replay_in_flight[ra] += 1
+            self.replay_tasks.add(ra, replay)
+
 
 @ray.remote(num_cpus=0)
 class ReplayActor(object):
@@ -244,17 +328,20 @@ class ReplayActor(object):
     def get_host(self):
         return os.uname()[1]
 
-    def add_batch(self, batch):
-        # Handle everything as if multiagent
-        if isinstance(batch, SampleBatch):
-            batch = MultiAgentBatch({DEFAULT_POLICY_ID: batch}, batch.count)
+    def add_batch(self, *batches):
         with self.add_batch_timer:
-            for policy_id, s in batch.policy_batches.items():
-                for row in s.rows():
-                    self.replay_buffers[policy_id].add(
-                        row["obs"], row["actions"], row["rewards"],
-                        row["new_obs"], row["dones"], row["weights"])
-        self.num_added += batch.count
+            for batch in batches:
+                # Handle everything as if multiagent
+                if isinstance(batch, SampleBatch):
+                    batch = MultiAgentBatch({
+                        DEFAULT_POLICY_ID: batch
+                    }, batch.count)
+                for policy_id, s in batch.policy_batches.items():
+                    for row in s.rows():
+                        self.replay_buffers[policy_id].add(
+                            row["obs"], row["actions"], row["rewards"],
+                            row["new_obs"], row["dones"], row["weights"])
+                self.num_added += batch.count
 
     def replay(self):
         if self.num_added < self.replay_starts:
@@ -15,6 +15,8 @@ import threading
 from six.moves import queue
 
 import ray
+from ray.rllib.evaluation.sample_batch import SampleBatch
+from ray.rllib.optimizers.batch_staging import SampleBatchStager
 from ray.rllib.optimizers.multi_gpu_impl import LocalSyncParallelOptimizer
 from ray.rllib.optimizers.policy_optimizer import PolicyOptimizer
 from ray.rllib.utils.actors import TaskPool
@@ -70,6 +72,13 @@ class AsyncSamplesOptimizer(PolicyOptimizer):
                 num_parallel_data_loaders=num_parallel_data_loaders)
         else:
             self.learner = LearnerThread(self.local_evaluator)
+
+        # Train batches are assembled in recycled arenas rather than by
+        # concatenating sample batches. The learner releases each arena once
+        # the batch has been consumed.
+        self.stager = SampleBatchStager(
+            train_batch_size, capacity=train_batch_size + sample_batch_size)
+        self.learner.stager = self.stager
         self.learner.start()
 
         assert len(self.remote_evaluators) > 0
@@ -88,7 +97,9 @@ class AsyncSamplesOptimizer(PolicyOptimizer):
             for _ in range(max_sample_requests_in_flight_per_worker):
                 self.sample_tasks.add(ev, ev.sample.remote())
 
+        # Used only for batch types that can't be staged (multi-agent)
         self.batch_buffer = []
+        self.batch_buffer_count = 0
 
         if replay_proportion:
             assert replay_buffer_num_slots > 0
@@ -96,7 +107,12 @@ class AsyncSamplesOptimizer(PolicyOptimizer):
                     train_batch_size)
         self.replay_proportion = replay_proportion
         self.replay_buffer_num_slots = replay_buffer_num_slots
-        self.replay_batches = []
+        self.replay_min_batches = int(
+            np.ceil(train_batch_size / sample_batch_size))
+        # Circular buffer of replay slots
+        self.replay_batches = [None] * replay_buffer_num_slots
+        self.replay_index = 0
+        self.num_replay_batches = 0
 
     @override(PolicyOptimizer)
     def step(self):
@@ -138,6 +154,7 @@ class AsyncSamplesOptimizer(PolicyOptimizer):
             "train_throughput": round(self.timers["train"].mean_throughput, 3),
             "num_weight_syncs": self.num_weight_syncs,
             "num_steps_replayed": self.num_replayed,
+            "num_staging_arenas": self.stager.num_arenas_allocated,
             "timing_breakdown": timing,
             "learner_queue": self.learner.learner_queue_size.stats(),
         }
@@ -152,13 +169,9 @@ class AsyncSamplesOptimizer(PolicyOptimizer):
 
         for ev, sample_batch in self._augment_with_replay(
                 self.sample_tasks.completed_prefetch()):
-            self.batch_buffer.append(sample_batch)
-            if sum(b.count
-                   for b in self.batch_buffer) >= self.train_batch_size:
-                train_batch = self.batch_buffer[0].concat_samples(
-                    self.batch_buffer)
+            train_batch = self._stage(sample_batch)
+            if train_batch is not None:
                 self.learner.inqueue.put(train_batch)
-                self.batch_buffer = []
 
             # If the batch was replayed, skip the update below.
             if ev is None:
@@ -168,9 +181,11 @@ class AsyncSamplesOptimizer(PolicyOptimizer):
 
             # Put in replay buffer if enabled
             if self.replay_buffer_num_slots > 0:
-                self.replay_batches.append(sample_batch)
-                if len(self.replay_batches) > self.replay_buffer_num_slots:
-                    self.replay_batches.pop(0)
+                self.replay_batches[self.replay_index] = sample_batch
+                self.replay_index = (
+                    (self.replay_index + 1) % self.replay_buffer_num_slots)
+                self.num_replay_batches = min(self.num_replay_batches + 1,
+                                              self.replay_buffer_num_slots)
 
             # Note that it's important to pull new weights once
             # updated to avoid excessive correlation between actors
@@ -192,21 +207,30 @@ class AsyncSamplesOptimizer(PolicyOptimizer):
 
         return sample_timesteps, train_timesteps
 
-    def _augment_with_replay(self, sample_futures):
-        def can_replay():
-            num_needed = int(
-                np.ceil(self.train_batch_size / self.sample_batch_size))
-            return len(self.replay_batches) > num_needed
+    def _stage(self, sample_batch):
+        if isinstance(sample_batch, SampleBatch):
+            return self.stager.add(sample_batch)
 
+        self.batch_buffer.append(sample_batch)
+        self.batch_buffer_count += sample_batch.count
+        if self.batch_buffer_count < self.train_batch_size:
+            return None
+        train_batch = self.batch_buffer[0].concat_samples(self.batch_buffer)
+        self.batch_buffer = []
+        self.batch_buffer_count = 0
+        return train_batch
+
+    def _augment_with_replay(self, sample_futures):
         for ev, sample_batch in sample_futures:
             sample_batch = ray.get(sample_batch)
             yield ev, sample_batch
 
-            if can_replay():
+            if self.num_replay_batches > self.replay_min_batches:
                 f = self.replay_proportion
                 while random.random() < f:
                     f -= 1
-                    replay_batch = random.choice(self.replay_batches)
+                    replay_batch = self.replay_batches[random.randint(
+                        0, self.num_replay_batches - 1)]
                     self.num_replayed += replay_batch.count
                     yield None, replay_batch
 
@@ -234,6 +258,7 @@ class LearnerThread(threading.Thread):
         self.weights_updated = False
         self.stats = {}
         self.stopped = False
+        self.stager = None
 
     def run(self):
         while not self.stopped:
@@ -248,6 +273,8 @@ class LearnerThread(threading.Thread):
             self.weights_updated = True
             self.stats = fetches.get("stats", {})
 
+        if self.stager:
+            self.stager.release(batch)
         self.outqueue.put(batch.count)
         self.learner_queue_size.push(self.inqueue.qsize())
 
@@ -362,4 +389,6 @@ class _LoaderThread(threading.Thread):
             opt.load_data(s.sess, [tuples[k] for k in data_keys],
                           [tuples[k] for k in state_keys])
 
+        if s.stager:
+            s.stager.release(batch)
         s.ready_optimizers.put(opt)
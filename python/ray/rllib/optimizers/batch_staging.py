@@ -0,0 +1,144 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import threading
+
+import numpy as np
+
+from ray.rllib.evaluation.sample_batch import SampleBatch
+
+
+class SampleBatchStager(object):
+    """Assembles train batches by copying samples into preallocated arenas.
+
+    This replaces accumulating sample batches in a list and calling
+    SampleBatch.concat_samples() on them, which allocates fresh arrays for
+    every column of every train batch. Instead, the columns of each added
+    batch are copied directly into a fixed-size arena. Once an arena holds at
+    least train_batch_size rows, a SampleBatch of views into it is returned.
+
+    Arenas are recycled once the consumer calls release() on the returned
+    batch, so in steady state no column memory is allocated at all. Sample
+    batches are never split across train batches, since some policies (e.g.,
+    V-trace) rely on rollout fragments being contiguous.
+
+    Examples:
+        >>> stager = SampleBatchStager(train_batch_size=4, capacity=6)
+        >>> stager.add(SampleBatch({"a": [1, 2]}))
+        None
+        >>> batch = stager.add(SampleBatch({"a": [3, 4]}))
+        >>> print(batch)
+        SampleBatch({"a": [1, 2, 3, 4]})
+        >>> stager.release(batch)  # the arena can now be reused
+    """
+
+    def __init__(self, train_batch_size, capacity):
+        """Initialize a stager.
+
+        Arguments:
+            train_batch_size (int): Min number of rows in each train batch.
+            capacity (int): Number of rows to allocate per arena. This should
+                be at least train_batch_size plus the size of one sample
+                batch, otherwise arenas will be grown on demand.
+        """
+
+        self.train_batch_size = train_batch_size
+        self.capacity = max(capacity, train_batch_size)
+        self.num_arenas_allocated = 0
+        self._lock = threading.Lock()
+        self._free_arenas = []
+        self._in_use = {}
+        self._spec = None
+        self._arena = None
+        self._filled = 0
+
+    def add(self, batch):
+        """Copies the batch into the current arena.
+
+        Returns:
+            SampleBatch of views into the arena if it now holds at least
+            train_batch_size rows, otherwise None.
+        """
+
+        if batch.count == 0:
+            return None
+
+        if self._arena is None:
+            self._set_spec(batch)
+            self._arena = self._get_arena()
+        elif not self._matches_spec(batch):
+            raise ValueError(
+                "Sample batch columns changed while staging a train batch",
+                batch)
+
+        if self._filled + batch.count > self.capacity:
+            self._grow(self._filled + batch.count)
+
+        start, end = self._filled, self._filled + batch.count
+        for k, column in self._arena.items():
+            column[start:end] = batch[k]
+        self._filled = end
+
+        if self._filled < self.train_batch_size:
+            return None
+
+        arena, filled = self._arena, self._filled
+        self._arena, self._filled = None, 0
+        train_batch = SampleBatch({k: v[:filled] for k, v in arena.items()})
+        with self._lock:
+            self._in_use[id(train_batch)] = arena
+        return train_batch
+
+    def release(self, train_batch):
+        """Returns the arena backing a train batch to the free list.
+
+        This is thread-safe, so that it can be called from the learner thread.
+        The batch must not be accessed after it has been released.
+        """
+
+        with self._lock:
+            arena = self._in_use.pop(id(train_batch), None)
+            if arena is not None and self._arena_fits_spec(arena):
+                self._free_arenas.append(arena)
+
+    def _set_spec(self, batch):
+        spec = {}
+        for k, v in batch.items():
+            v = np.asarray(v)
+            spec[k] = (v.shape[1:], v.dtype)
+        if spec != self._spec:
+            with self._lock:
+                self._spec = spec
+                self._free_arenas = []
+
+    def _matches_spec(self, batch):
+        if set(batch.keys()) != set(self._spec.keys()):
+            return False
+        for k, v in batch.items():
+            if np.shape(v)[1:] != self._spec[k][0]:
+                return False
+        return True
+
+    def _arena_fits_spec(self, arena):
+        return (len(next(iter(arena.values()))) == self.capacity
+                and set(arena.keys()) == set(self._spec.keys()))
+
+    def _get_arena(self):
+        with self._lock:
+            if self._free_arenas:
+                return self._free_arenas.pop()
+        self.num_arenas_allocated += 1
+        return {
+            k: np.empty((self.capacity, ) + shape, dtype=dtype)
+            for k, (shape, dtype) in self._spec.items()
+        }
+
+    def _grow(self, min_capacity):
+        with self._lock:
+            self.capacity = max(min_capacity, 2 * self.capacity)
+            self._free_arenas = []
+        old_arena = self._arena
+        self._arena = self._get_arena()
+        for k, column in self._arena.items():
+            column[:self._filled] = old_arena[k][:self._filled]
@@ -5,7 +5,9 @@ from __future__ import print_function
 import logging
 import math
 import numpy as np
+import threading
 from collections import defaultdict
+from six.moves import queue
 import tensorflow as tf
 
 import ray
@@ -34,6 +36,12 @@ class LocalMultiGPUOptimizer(PolicyOptimizer):
     Note that all replicas of the TFPolicyGraph will merge their
     extra_compute_grad and apply_grad feed_dicts and fetches. This
     may result in unexpected behavior.
+
+    If pipeline_sampling is set, the next train batch is sampled and loaded
+    into device memory by a background thread while SGD runs on the current
+    one, using two sets of device buffers. Each step then takes about the
+    max of the sampling and SGD times instead of their sum, but batches are
+    sampled with weights that are one step behind.
     """
 
     @override(PolicyOptimizer)
@@ -42,7 +50,8 @@ class LocalMultiGPUOptimizer(PolicyOptimizer):
               num_sgd_iter=10,
               train_batch_size=1024,
               num_gpus=0,
-              standardize_fields=[]):
+              standardize_fields=[],
+              pipeline_sampling=False):
         self.batch_size = sgd_batch_size
         self.num_sgd_iter = num_sgd_iter
         self.train_batch_size = train_batch_size
@@ -59,9 +68,11 @@ class LocalMultiGPUOptimizer(PolicyOptimizer):
         self.per_device_batch_size = int(self.batch_size / len(self.devices))
         self.sample_timer = TimerStat()
         self.load_timer = TimerStat()
+        self.load_wait_timer = TimerStat()
         self.grad_timer = TimerStat()
         self.update_weights_timer = TimerStat()
         self.standardize_fields = standardize_fields
+        self.pipeline_sampling = pipeline_sampling
 
         logger.info("LocalMultiGPUOptimizer devices {}".format(self.devices))
 
@@ -77,48 +88,118 @@ class LocalMultiGPUOptimizer(PolicyOptimizer):
         # per-GPU graph copies created below must share vars with the policy
         # reuse is set to AUTO_REUSE because Adam nodes are created after
         # all of the device copies are created.
-        self.optimizers = {}
+        # When pipelining, a second set of device buffers is loaded with the
+        # next batch while the first is being optimized on.
+        self.optimizer_sets = []
         with self.local_evaluator.tf_sess.graph.as_default():
             with self.local_evaluator.tf_sess.as_default():
-                for policy_id, policy in self.policies.items():
-                    with tf.variable_scope(policy_id, reuse=tf.AUTO_REUSE):
-                        if policy._state_inputs:
-                            rnn_inputs = policy._state_inputs + [
-                                policy._seq_lens
-                            ]
-                        else:
-                            rnn_inputs = []
-                        self.optimizers[policy_id] = (
-                            LocalSyncParallelOptimizer(
-                                policy._optimizer, self.devices,
-                                [v
-                                 for _, v in policy._loss_inputs], rnn_inputs,
-                                self.per_device_batch_size, policy.copy))
+                for _ in range(2 if pipeline_sampling else 1):
+                    optimizers = {}
+                    for policy_id, policy in self.policies.items():
+                        with tf.variable_scope(policy_id, reuse=tf.AUTO_REUSE):
+                            if policy._state_inputs:
+                                rnn_inputs = policy._state_inputs + [
+                                    policy._seq_lens
+                                ]
+                            else:
+                                rnn_inputs = []
+                            optimizers[policy_id] = (
+                                LocalSyncParallelOptimizer(
+                                    policy._optimizer, self.devices,
+                                    [v for _, v in policy._loss_inputs],
+                                    rnn_inputs, self.per_device_batch_size,
+                                    policy.copy))
+                    self.optimizer_sets.append(optimizers)
 
                 self.sess = self.local_evaluator.tf_sess
                 self.sess.run(tf.global_variables_initializer())
+        self.optimizers = self.optimizer_sets[0]
+
+        # Sets of optimizers ready to be loaded and loaded with samples
+        self.idle_optimizers = queue.Queue()
+        self.ready_optimizers = queue.Queue()
+        self.loader_thread = None
 
     @override(PolicyOptimizer)
     def step(self):
+        if self.pipeline_sampling:
+            return self._pipelined_step()
+
         with self.update_weights_timer:
-            if self.remote_evaluators:
-                weights = ray.put(self.local_evaluator.get_weights())
-                for e in self.remote_evaluators:
-                    e.set_weights.remote(weights)
+            self._broadcast_weights()
 
         with self.sample_timer:
-            if self.remote_evaluators:
-                # TODO(rliaw): remove when refactoring
-                from ray.rllib.agents.ppo.rollout import collect_samples
-                samples = collect_samples(self.remote_evaluators,
-                                          self.train_batch_size)
-            else:
-                samples = self.local_evaluator.sample()
-            # Handle everything as if multiagent
-            if isinstance(samples, SampleBatch):
-                samples = MultiAgentBatch({
-                    DEFAULT_POLICY_ID: samples
-                }, samples.count)
+            samples = self._sample()
+
+        with self.load_timer:
+            num_loaded_tuples = self._load_data(self.optimizers, samples)
+
+        fetches = self._optimize(self.optimizers, num_loaded_tuples)
+        self.num_steps_sampled += samples.count
+        self.num_steps_trained += samples.count
+        return fetches
+
+    @override(PolicyOptimizer)
+    def stats(self):
+        stats = dict(
+            PolicyOptimizer.stats(self), **{
+                "sample_time_ms": round(1000 * self.sample_timer.mean, 3),
+                "load_time_ms": round(1000 * self.load_timer.mean, 3),
+                "grad_time_ms": round(1000 * self.grad_timer.mean, 3),
+                "update_time_ms": round(1000 * self.update_weights_timer.mean,
+                                        3),
+            })
+        if self.pipeline_sampling and self.loader_thread:
+            stats["load_wait_time_ms"] = round(
+                1000 * self.load_wait_timer.mean, 3)
+        return stats
+
+    def _pipelined_step(self):
+        if self.loader_thread is None:
+            with self.update_weights_timer:
+                self._broadcast_weights()
+            for optimizers in self.optimizer_sets:
+                self.idle_optimizers.put(optimizers)
+            self.loader_thread = _SampleLoaderThread(self)
+            self.loader_thread.start()
+
+        with self.load_wait_timer:
+            loaded = self.ready_optimizers.get()
+        if isinstance(loaded, Exception):
+            raise loaded
+        samples, optimizers, num_loaded_tuples = loaded
+
+        fetches = self._optimize(optimizers, num_loaded_tuples)
+
+        # Broadcast the new weights before releasing the buffers, so that the
+        # loader samples the next batch with them.
+        with self.update_weights_timer:
+            self._broadcast_weights()
+        self.idle_optimizers.put(optimizers)
+
+        self.num_steps_sampled += samples.count
+        self.num_steps_trained += samples.count
+        return fetches
+
+    def _broadcast_weights(self):
+        if self.remote_evaluators:
+            weights = ray.put(self.local_evaluator.get_weights())
+            for e in self.remote_evaluators:
+                e.set_weights.remote(weights)
+
+    def _sample(self):
+        if self.remote_evaluators:
+            # TODO(rliaw): remove when refactoring
+            from ray.rllib.agents.ppo.rollout import collect_samples
+            samples = collect_samples(self.remote_evaluators,
+                                      self.train_batch_size)
+        else:
+            samples = self.local_evaluator.sample()
+        # Handle everything as if multiagent
+        if isinstance(samples, SampleBatch):
+            samples = MultiAgentBatch({
+                DEFAULT_POLICY_ID: samples
+            }, samples.count)
 
         for policy_id, policy in self.policies.items():
             if policy_id not in samples.policy_batches:
@@ -133,29 +214,31 @@ class LocalMultiGPUOptimizer(PolicyOptimizer):
             # Important: don't shuffle RNN sequence elements
             if not policy._state_inputs:
                 batch.shuffle()
+        return samples
 
+    def _load_data(self, optimizers, samples):
         num_loaded_tuples = {}
-        with self.load_timer:
-            for policy_id, batch in samples.policy_batches.items():
-                if policy_id not in self.policies:
-                    continue
-
-                policy = self.policies[policy_id]
-                tuples = policy._get_loss_inputs_dict(batch)
-                data_keys = [ph for _, ph in policy._loss_inputs]
-                if policy._state_inputs:
-                    state_keys = policy._state_inputs + [policy._seq_lens]
-                else:
-                    state_keys = []
-                num_loaded_tuples[policy_id] = (
-                    self.optimizers[policy_id].load_data(
-                        self.sess, [tuples[k] for k in data_keys],
-                        [tuples[k] for k in state_keys]))
+        for policy_id, batch in samples.policy_batches.items():
+            if policy_id not in self.policies:
+                continue
+
+            policy = self.policies[policy_id]
+            tuples = policy._get_loss_inputs_dict(batch)
+            data_keys = [ph for _, ph in policy._loss_inputs]
+            if policy._state_inputs:
+                state_keys = policy._state_inputs + [policy._seq_lens]
+            else:
+                state_keys = []
+            num_loaded_tuples[policy_id] = (optimizers[policy_id].load_data(
+                self.sess, [tuples[k] for k in data_keys],
+                [tuples[k] for k in state_keys]))
+        return num_loaded_tuples
 
+    def _optimize(self, optimizers, num_loaded_tuples):
         fetches = {}
         with self.grad_timer:
             for policy_id, tuples_per_device in num_loaded_tuples.items():
-                optimizer = self.optimizers[policy_id]
+                optimizer = optimizers[policy_id]
                 num_batches = (
                     int(tuples_per_device) // int(self.per_device_batch_size))
                 logger.debug("== sgd epochs for {} ==".format(policy_id))
@@ -171,21 +254,33 @@ class LocalMultiGPUOptimizer(PolicyOptimizer):
                     logger.debug("{} {}".format(i,
                                                 _averaged(iter_extra_fetches)))
                 fetches[policy_id] = _averaged(iter_extra_fetches)
-
-        self.num_steps_sampled += samples.count
-        self.num_steps_trained += samples.count
         return fetches
 
-    @override(PolicyOptimizer)
-    def stats(self):
-        return dict(
-            PolicyOptimizer.stats(self), **{
-                "sample_time_ms": round(1000 * self.sample_timer.mean, 3),
-                "load_time_ms": round(1000 * self.load_timer.mean, 3),
-                "grad_time_ms": round(1000 * self.grad_timer.mean, 3),
-                "update_time_ms": round(1000 * self.update_weights_timer.mean,
-                                        3),
-            })
+
+class _SampleLoaderThread(threading.Thread):
+    """Samples and loads train batches into idle device buffers."""
+
+    def __init__(self, optimizer):
+        threading.Thread.__init__(self)
+        self.optimizer = optimizer
+        self.daemon = True
+
+    def run(self):
+        try:
+            while True:
+                self._step()
+        except Exception as e:
+            logger.exception("Error sampling or loading train batch")
+            self.optimizer.ready_optimizers.put(e)
+
+    def _step(self):
+        o = self.optimizer
+        optimizers = o.idle_optimizers.get()
+        with o.sample_timer:
+            samples = o._sample()
+        with o.load_timer:
+            num_loaded_tuples = o._load_data(optimizers, samples)
+        o.ready_optimizers.put((samples, optimizers, num_loaded_tuples))
 
 
 def _averaged(kv):
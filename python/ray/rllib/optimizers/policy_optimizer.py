@@ -6,7 +6,8 @@ import logging
 
 import ray
 from ray.rllib.evaluation.policy_evaluator import PolicyEvaluator
-from ray.rllib.evaluation.metrics import collect_episodes, summarize_episodes
+from ray.rllib.evaluation.metrics import collect_episode_summaries, \
+    EpisodeSummary
 
 logger = logging.getLogger(__name__)
 
@@ -110,6 +111,8 @@ class PolicyOptimizer(object):
             timeout_seconds (int): Max wait time for a evaluator before
                 dropping its results. This usually indicates a hung evaluator.
             min_history (int): Min history length to smooth results over.
+                If there are fewer new episodes, the results are smoothed
+                over the latest past episodes, up to this many in total.
             selected_evaluators (list): Override the list of remote evaluators
                 to collect metrics from.
 
@@ -117,18 +120,20 @@ class PolicyOptimizer(object):
             res (dict): A training result dict from evaluator metrics with
                 `info` replaced with stats from self.
         """
-        episodes, num_dropped = collect_episodes(
+        summary, num_dropped = collect_episode_summaries(
             self.local_evaluator,
             selected_evaluators or self.remote_evaluators,
-            timeout_seconds=timeout_seconds)
-        orig_episodes = list(episodes)
-        missing = min_history - len(episodes)
+            timeout_seconds=timeout_seconds,
+            keep_episodes=min_history)
+        smoothed = EpisodeSummary()
+        smoothed.merge(summary)
+        missing = min_history - summary.num_episodes
         if missing > 0:
-            episodes.extend(self.episode_history[-missing:])
-            assert len(episodes) <= min_history
-        self.episode_history.extend(orig_episodes)
+            for episode in self.episode_history[-missing:]:
+                smoothed.add(episode)
+        self.episode_history.extend(summary.episodes)
         self.episode_history = self.episode_history[-min_history:]
-        res = summarize_episodes(episodes, orig_episodes, num_dropped)
+        res = smoothed.to_result(summary.num_episodes, num_dropped)
         res.update(info=self.stats())
         return res
 
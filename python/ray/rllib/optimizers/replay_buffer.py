@@ -7,12 +7,12 @@ import random
 import sys
 
 from ray.rllib.optimizers.segment_tree import SumSegmentTree, MinSegmentTree
-from ray.rllib.utils.compression import unpack_if_needed
+from ray.rllib.utils.compression import pack_if_needed, unpack_if_needed
 from ray.rllib.utils.window_stat import WindowStat
 
 
 class ReplayBuffer(object):
-    def __init__(self, size):
+    def __init__(self, size, frame_stack=0):
         """Create Prioritized Replay buffer.
 
         Parameters
@@ -20,8 +20,16 @@ class ReplayBuffer(object):
         size: int
           Max number of transitions to store in the buffer. When the buffer
           overflows the old memories are dropped.
+        frame_stack: int
+          If > 0, observations are assumed to be this many frames stacked
+          along the last axis (as done by FrameStack), and each distinct
+          frame is only stored once (see FrameStackStorage).
         """
         self._storage = []
+        if frame_stack:
+            self._frame_storage = FrameStackStorage(size, frame_stack)
+        else:
+            self._frame_storage = None
         self._maxsize = size
         self._next_idx = 0
         self._hit_count = np.zeros(size)
@@ -32,25 +40,65 @@ class ReplayBuffer(object):
         self._est_size_bytes = 0
 
     def __len__(self):
+        if self._frame_storage is not None:
+            return len(self._frame_storage)
         return len(self._storage)
 
     def add(self, obs_t, action, reward, obs_tp1, done, weight):
-        data = (obs_t, action, reward, obs_tp1, done)
-        self._num_added += 1
+        if self._frame_storage is not None:
+            self._frame_storage.add([self._next_idx], [obs_t], [action],
+                                    [reward], [obs_tp1], [done])
+            self._advance(1)
+            return
 
+        data = (obs_t, action, reward, obs_tp1, done)
         if self._next_idx >= len(self._storage):
             self._storage.append(data)
             self._est_size_bytes += sum(sys.getsizeof(d) for d in data)
         else:
             self._storage[self._next_idx] = data
-        if self._next_idx + 1 >= self._maxsize:
-            self._eviction_started = True
-        self._next_idx = (self._next_idx + 1) % self._maxsize
-        if self._eviction_started:
-            self._evicted_hit_stats.push(self._hit_count[self._next_idx])
-            self._hit_count[self._next_idx] = 0
+        self._advance(1)
+
+    def add_batch(self, batch):
+        """Adds all rows of a SampleBatch to the buffer.
+
+        In frame stack mode the columns are written to storage in bulk,
+        otherwise the observations of each row are compressed if possible.
+
+        Returns
+        -------
+        idxes: np.array
+          Indexes in the buffer the rows were stored at.
+        """
+        idxes = (self._next_idx + np.arange(batch.count)) % self._maxsize
+        if self._frame_storage is not None:
+            self._frame_storage.add(idxes, batch["obs"], batch["actions"],
+                                    batch["rewards"], batch["new_obs"],
+                                    batch["dones"])
+            self._advance(batch.count)
+        else:
+            for obs, action, reward, new_obs, done in zip(
+                    batch["obs"], batch["actions"], batch["rewards"],
+                    batch["new_obs"], batch["dones"]):
+                ReplayBuffer.add(self, pack_if_needed(obs), action, reward,
+                                 pack_if_needed(new_obs), done, None)
+        return idxes
+
+    def _advance(self, count):
+        for _ in range(count):
+            self._num_added += 1
+            if self._next_idx + 1 >= self._maxsize:
+                self._eviction_started = True
+            self._next_idx = (self._next_idx + 1) % self._maxsize
+            if self._eviction_started:
+                self._evicted_hit_stats.push(self._hit_count[self._next_idx])
+                self._hit_count[self._next_idx] = 0
 
     def _encode_sample(self, idxes):
+        if self._frame_storage is not None:
+            np.add.at(self._hit_count, idxes, 1)
+            return self._frame_storage.get(idxes)
+
         obses_t, actions, rewards, obses_tp1, dones = [], [], [], [], []
         for i in idxes:
             data = self._storage[i]
@@ -86,10 +134,7 @@ class ReplayBuffer(object):
           done_mask[i] = 1 if executing act_batch[i] resulted in
           the end of an episode and 0 otherwise.
         """
-        idxes = [
-            random.randint(0,
-                           len(self._storage) - 1) for _ in range(batch_size)
-        ]
+        idxes = [random.randint(0, len(self) - 1) for _ in range(batch_size)]
         self._num_sampled += batch_size
         return self._encode_sample(idxes)
 
@@ -97,8 +142,10 @@ class ReplayBuffer(object):
         data = {
             "added_count": self._num_added,
             "sampled_count": self._num_sampled,
-            "est_size_bytes": self._est_size_bytes,
-            "num_entries": len(self._storage),
+            "est_size_bytes": (self._frame_storage.size_bytes()
+                               if self._frame_storage is not None else
+                               self._est_size_bytes),
+            "num_entries": len(self),
         }
         if debug:
             data.update(self._evicted_hit_stats.stats())
@@ -106,7 +153,7 @@ class ReplayBuffer(object):
 
 
 class PrioritizedReplayBuffer(ReplayBuffer):
-    def __init__(self, size, alpha):
+    def __init__(self, size, alpha, frame_stack=0):
         """Create Prioritized Replay buffer.
 
         Parameters
@@ -117,12 +164,14 @@ class PrioritizedReplayBuffer(ReplayBuffer):
         alpha: float
           how much prioritization is used
           (0 - no prioritization, 1 - full prioritization)
+        frame_stack: int
+          Number of stacked frames in observations to store separately.
 
         See Also
         --------
         ReplayBuffer.__init__
         """
-        super(PrioritizedReplayBuffer, self).__init__(size)
+        super(PrioritizedReplayBuffer, self).__init__(size, frame_stack)
         assert alpha > 0
         self._alpha = alpha
 
@@ -146,11 +195,20 @@ class PrioritizedReplayBuffer(ReplayBuffer):
         self._it_sum[idx] = weight**self._alpha
         self._it_min[idx] = weight**self._alpha
 
+    def add_batch(self, batch):
+        """See ReplayBuffer.add_batch"""
+
+        idxes = super(PrioritizedReplayBuffer, self).add_batch(batch)
+        for idx in idxes:
+            self._it_sum[idx] = self._max_priority**self._alpha
+            self._it_min[idx] = self._max_priority**self._alpha
+        return idxes
+
     def _sample_proportional(self, batch_size):
         res = []
         for _ in range(batch_size):
             # TODO(szymon): should we ensure no repeats?
-            mass = random.random() * self._it_sum.sum(0, len(self._storage))
+            mass = random.random() * self._it_sum.sum(0, len(self))
             idx = self._it_sum.find_prefixsum_idx(mass)
             res.append(idx)
         return res
@@ -198,11 +256,11 @@ class PrioritizedReplayBuffer(ReplayBuffer):
 
         weights = []
         p_min = self._it_min.min() / self._it_sum.sum()
-        max_weight = (p_min * len(self._storage))**(-beta)
+        max_weight = (p_min * len(self))**(-beta)
 
         for idx in idxes:
             p_sample = self._it_sum[idx] / self._it_sum.sum()
-            weight = (p_sample * len(self._storage))**(-beta)
+            weight = (p_sample * len(self))**(-beta)
             weights.append(weight / max_weight)
         weights = np.array(weights)
         encoded_sample = self._encode_sample(idxes)
@@ -226,7 +284,7 @@ class PrioritizedReplayBuffer(ReplayBuffer):
         assert len(idxes) == len(priorities)
         for idx, priority in zip(idxes, priorities):
             assert priority > 0
-            assert 0 <= idx < len(self._storage)
+            assert 0 <= idx < len(self)
             delta = priority**self._alpha - self._it_sum[idx]
             self._prio_change_stats.push(delta)
             self._it_sum[idx] = priority**self._alpha
@@ -239,3 +297,179 @@ class PrioritizedReplayBuffer(ReplayBuffer):
         if debug:
             parent.update(self._prio_change_stats.stats())
         return parent
+
+
+class FrameStackStorage(object):
+    """Transition storage that keeps each distinct stacked frame once.
+
+    Observations made of k frames stacked along the last axis share k - 1
+    frames with the observation of the previous step, and the next
+    observation of a transition is usually the observation of the following
+    one. Instead of storing both stacked observations of every transition,
+    this keeps a single array of frames plus the indexes of the k frames
+    making up the obs and new_obs of each transition, and reassembles the
+    stacked observations when transitions are sampled.
+
+    Frames are only shared after checking that they are equal, so this is
+    correct for any observations, but only saves memory for stacked frames.
+    Frames no longer used by any transition are reclaimed by compacting the
+    frame array in place once it fills up.
+    """
+
+    def __init__(self, size, frame_stack):
+        self.size = size
+        self.k = frame_stack
+        self.num_entries = 0
+        self.num_frames = 0
+        self.frames = None
+        self.obs_idx = np.zeros((size, frame_stack), dtype=np.int64)
+        self.new_obs_idx = np.zeros((size, frame_stack), dtype=np.int64)
+        self.actions = None
+        self.rewards = None
+        self.dones = None
+        # The last new_obs added and its frame indexes, which the obs of the
+        # next transition added is likely to be equal to
+        self._last_new_obs = None
+        self._last_new_obs_idx = None
+
+    def __len__(self):
+        return self.num_entries
+
+    def add(self, idxes, obs, actions, rewards, new_obs, dones):
+        """Stores transitions at the given indexes."""
+
+        idxes = np.asarray(idxes)
+        obs = _unpack_column(obs)
+        new_obs = _unpack_column(new_obs)
+        if self.frames is None:
+            self._init_columns(obs, actions, rewards, dones)
+        c = self.frames.shape[-1]
+
+        # Whether the obs of each row is the new_obs of the row before it
+        continued = np.zeros(len(idxes), dtype=bool)
+        continued[1:] = _rows_equal(obs[1:], new_obs[:-1])
+        if self._last_new_obs is not None:
+            continued[0] = np.array_equal(obs[0], self._last_new_obs)
+        # Whether the new_obs of each row is its obs shifted by one frame
+        shifted = _rows_equal(new_obs[..., :-c], obs[..., c:])
+        num_new_frames = (self.k * np.sum(~continued) + np.sum(shifted) +
+                          self.k * np.sum(~shifted))
+        self._reserve(num_new_frames, idxes)
+
+        prev_idx = self._last_new_obs_idx
+        for i, idx in enumerate(idxes):
+            if continued[i]:
+                obs_idx = prev_idx
+            else:
+                obs_idx = self._append_frames(obs[i])
+            if shifted[i]:
+                new_obs_idx = np.append(
+                    obs_idx[1:], self._append_frames(new_obs[i][..., -c:]))
+            else:
+                new_obs_idx = self._append_frames(new_obs[i])
+            self.obs_idx[idx] = obs_idx
+            self.new_obs_idx[idx] = new_obs_idx
+            prev_idx = new_obs_idx
+
+        self.actions[idxes] = actions
+        self.rewards[idxes] = rewards
+        self.dones[idxes] = dones
+        self.num_entries = max(self.num_entries, np.max(idxes) + 1)
+        self._last_new_obs = new_obs[-1]
+        self._last_new_obs_idx = prev_idx
+
+    def get(self, idxes):
+        """Returns (obs, actions, rewards, new_obs, dones) arrays."""
+
+        idxes = np.asarray(idxes)
+        return (self._stack(self.obs_idx[idxes]),
+                self.actions[idxes], self.rewards[idxes],
+                self._stack(self.new_obs_idx[idxes]), self.dones[idxes])
+
+    def size_bytes(self):
+        if self.frames is None:
+            return 0
+        return (self.frames[0].nbytes * self.num_frames + self.obs_idx.nbytes +
+                self.new_obs_idx.nbytes + self.actions.nbytes +
+                self.rewards.nbytes + self.dones.nbytes)
+
+    def _init_columns(self, obs, actions, rewards, dones):
+        if obs.shape[-1] % self.k:
+            raise ValueError(
+                "Last observation axis must be {} stacked frames".format(
+                    self.k), obs.shape)
+        frame_shape = obs.shape[1:-1] + (obs.shape[-1] // self.k, )
+        self.frames = np.empty(
+            (self.size + 2 * self.k, ) + frame_shape, dtype=obs.dtype)
+        for name, column in [("actions", actions), ("rewards", rewards),
+                             ("dones", dones)]:
+            column = np.asarray(column)
+            setattr(
+                self, name,
+                np.zeros((self.size, ) + column.shape[1:], dtype=column.dtype))
+
+    def _append_frames(self, stacked):
+        frames = stacked.reshape(stacked.shape[:-1] + (-1,
+                                                       self.frames.shape[-1]))
+        frames = np.moveaxis(frames, -2, 0)
+        start = self.num_frames
+        self.frames[start:start + len(frames)] = frames
+        self.num_frames += len(frames)
+        return np.arange(start, start + len(frames))
+
+    def _reserve(self, num_frames, overwritten_idxes):
+        """Makes room for appending the given number of frames."""
+
+        if self.num_frames + num_frames <= len(self.frames):
+            return
+
+        # Find the frames still used by transitions that are not about to be
+        # overwritten, and move them to the front of the frame array
+        keep = np.ones(self.num_entries, dtype=bool)
+        keep[overwritten_idxes[overwritten_idxes < self.num_entries]] = False
+        used = [
+            self.obs_idx[:self.num_entries][keep].ravel(),
+            self.new_obs_idx[:self.num_entries][keep].ravel()
+        ]
+        if self._last_new_obs_idx is not None:
+            used.append(self._last_new_obs_idx)
+        live = np.unique(np.concatenate(used))
+        chunk_size = 10000
+        for start in range(0, len(live), chunk_size):
+            # Safe in place since live[i] >= i for all i
+            chunk = live[start:start + chunk_size]
+            self.frames[start:start + len(chunk)] = self.frames[chunk]
+        remap = np.zeros(len(self.frames), dtype=np.int64)
+        remap[live] = np.arange(len(live))
+        self.obs_idx[:self.num_entries] = remap[self.obs_idx[:
+                                                             self.num_entries]]
+        self.new_obs_idx[:self.num_entries] = remap[
+            self.new_obs_idx[:self.num_entries]]
+        if self._last_new_obs_idx is not None:
+            self._last_new_obs_idx = remap[self._last_new_obs_idx]
+        self.num_frames = len(live)
+
+        if self.num_frames + num_frames > len(self.frames):
+            capacity = int(1.5 * (self.num_frames + num_frames))
+            frames = np.empty(
+                (capacity, ) + self.frames.shape[1:], dtype=self.frames.dtype)
+            frames[:self.num_frames] = self.frames[:self.num_frames]
+            self.frames = frames
+
+    def _stack(self, frame_idx):
+        frames = np.moveaxis(self.frames[frame_idx], 1, -2)
+        return frames.reshape(frames.shape[:-2] + (-1, ))
+
+
+def _unpack_column(column):
+    # Compressed observations are bytes, which end up in a string array when
+    # the batches of several evaluators are concatenated
+    if isinstance(column, np.ndarray) and column.dtype.kind not in "SUO":
+        return column
+    return np.array([unpack_if_needed(o) for o in column])
+
+
+def _rows_equal(a, b):
+    if not len(a):
+        return np.zeros(0, dtype=bool)
+    return np.all((a == b).reshape(len(a), -1), axis=1)
@@ -0,0 +1,138 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import logging
+import math
+
+import ray
+from ray.rllib.utils.window_stat import WindowStat
+
+logger = logging.getLogger(__name__)
+
+
+class SampleCollector(object):
+    """Collects samples from remote evaluators without waiting on stragglers.
+
+    Each call to collect() returns once `min_evaluator_fraction` of the
+    evaluators have reported a sample batch, instead of blocking on the
+    slowest one. Evaluators that report early are asked for more samples
+    while the collected batches hold fewer than the requested number of
+    timesteps, so that fast evaluators make up for slow ones.
+
+    Sample requests still pending when collect() returns are kept. Those of
+    evaluators that reported during the call are carried over to the next
+    call as regular requests. Those of the evaluators that did not are late:
+    if they complete during the next call, their batches are either folded
+    into that call's result (`late_samples="fold"`) or dropped
+    (`late_samples="drop"`).
+    Folded batches were computed with older weights than the current ones,
+    so the number of weight updates they lag behind (their staleness) is
+    tracked, and batches more than `max_sample_staleness` updates behind are
+    dropped regardless.
+
+    Examples:
+        >>> collector = SampleCollector(remote_evaluators, 0.75)
+        >>> collector.set_weights(ray.put(local_evaluator.get_weights()))
+        >>> batches = collector.collect(min_timesteps=4000)
+    """
+
+    def __init__(self,
+                 evaluators,
+                 min_evaluator_fraction=1.0,
+                 late_samples="fold",
+                 max_sample_staleness=1):
+        """Initialize a sample collector.
+
+        Arguments:
+            evaluators (list): Remote evaluator actor handles.
+            min_evaluator_fraction (float): Fraction of evaluators that must
+                report a sample batch before collect() returns.
+            late_samples (str): Either "fold" or "drop".
+            max_sample_staleness (int): Max number of weight updates a late
+                sample batch can lag behind to still be folded in.
+        """
+
+        if late_samples not in ["fold", "drop"]:
+            raise ValueError("late_samples must be one of 'fold' or 'drop'",
+                             late_samples)
+        self.evaluators = evaluators
+        self.num_required = max(
+            1, int(math.ceil(min_evaluator_fraction * len(evaluators))))
+        self.late_samples = late_samples
+        self.max_sample_staleness = max_sample_staleness
+        self.weights_version = 0
+        # Map from pending sample object id -> (evaluator index, version of
+        # the weights it was requested with)
+        self.pending = {}
+        # The pending sample object ids of evaluators that did not report
+        # during the last call to collect()
+        self.late = set()
+        self.staleness = WindowStat("staleness", 100)
+        self.num_late_folded = 0
+        self.num_late_dropped = 0
+
+    def set_weights(self, weights):
+        """Broadcasts new weights to all evaluators.
+
+        Evaluators that are still computing a sample batch apply the weights
+        once they are done with it.
+        """
+
+        self.weights_version += 1
+        for e in self.evaluators:
+            e.set_weights.remote(weights)
+
+    def collect(self, min_timesteps=0):
+        """Returns sample batches from at least the required evaluators.
+
+        Arguments:
+            min_timesteps (int): Min total count of the returned batches.
+
+        Returns:
+            List of sample batches.
+        """
+
+        late = self.late
+        busy = {i for i, _ in self.pending.values()}
+        for i in range(len(self.evaluators)):
+            if i not in busy:
+                self._request_sample(i)
+
+        samples = []
+        reported = set()
+        count = 0
+        while len(reported) < self.num_required or count < min_timesteps:
+            [obj_id], _ = ray.wait(list(self.pending))
+            i, version = self.pending.pop(obj_id)
+            staleness = self.weights_version - version
+            if obj_id in late and (self.late_samples == "drop"
+                                   or staleness > self.max_sample_staleness):
+                self.num_late_dropped += 1
+            else:
+                if obj_id in late:
+                    self.num_late_folded += 1
+                batch = ray.get(obj_id)
+                samples.append(batch)
+                count += batch.count
+                reported.add(i)
+                self.staleness.push(staleness)
+            if i not in reported or count < min_timesteps:
+                self._request_sample(i)
+
+        self.late = {
+            obj_id
+            for obj_id, (i, _) in self.pending.items() if i not in reported
+        }
+        return samples
+
+    def stats(self):
+        return {
+            "num_late_samples_folded": self.num_late_folded,
+            "num_late_samples_dropped": self.num_late_dropped,
+            "sample_staleness": self.staleness.stats(),
+        }
+
+    def _request_sample(self, i):
+        obj_id = self.evaluators[i].sample.remote()
+        self.pending[obj_id] = (i, self.weights_version)
@@ -9,10 +9,10 @@ import ray
 from ray.rllib.optimizers.replay_buffer import ReplayBuffer, \
     PrioritizedReplayBuffer
 from ray.rllib.optimizers.policy_optimizer import PolicyOptimizer
+from ray.rllib.optimizers.sample_collector import SampleCollector
 from ray.rllib.evaluation.sample_batch import SampleBatch, DEFAULT_POLICY_ID, \
     MultiAgentBatch
 from ray.rllib.utils.annotations import override
-from ray.rllib.utils.compression import pack_if_needed
 from ray.rllib.utils.filter import RunningStat
 from ray.rllib.utils.timer import TimerStat
 from ray.rllib.utils.schedules import LinearSchedule
@@ -23,7 +23,14 @@ class SyncReplayOptimizer(PolicyOptimizer):
 
     This optimizer requires that policy evaluators return an additional
     "td_error" array in the info return of compute_gradients(). This error
-    term will be used for sample prioritization."""
+    term will be used for sample prioritization.
+
+    If min_evaluator_fraction < 1, each step only waits for that fraction of
+    the remote evaluators to report samples (see SampleCollector).
+
+    If replay_frame_stack is set to the number of frames stacked in the
+    observations (e.g., 4 for Atari), the replay buffers store each frame
+    only once instead of in up to 2 * replay_frame_stack observations."""
 
     @override(PolicyOptimizer)
     def _init(self,
@@ -37,7 +44,11 @@ class SyncReplayOptimizer(PolicyOptimizer):
               final_prioritized_replay_beta=0.4,
               prioritized_replay_eps=1e-6,
               train_batch_size=32,
-              sample_batch_size=4):
+              sample_batch_size=4,
+              min_evaluator_fraction=1.0,
+              late_samples="fold",
+              max_sample_staleness=1,
+              replay_frame_stack=0):
 
         self.replay_starts = learning_starts
         # linearly annealing beta used in Rainbow paper
@@ -48,6 +59,12 @@ class SyncReplayOptimizer(PolicyOptimizer):
             final_p=final_prioritized_replay_beta)
         self.prioritized_replay_eps = prioritized_replay_eps
         self.train_batch_size = train_batch_size
+        if self.remote_evaluators and min_evaluator_fraction < 1:
+            self.sample_collector = SampleCollector(
+                self.remote_evaluators, min_evaluator_fraction, late_samples,
+                max_sample_staleness)
+        else:
+            self.sample_collector = None
 
         # Stats
         self.update_weights_timer = TimerStat()
@@ -62,11 +79,14 @@ class SyncReplayOptimizer(PolicyOptimizer):
 
             def new_buffer():
                 return PrioritizedReplayBuffer(
-                    buffer_size, alpha=prioritized_replay_alpha)
+                    buffer_size,
+                    alpha=prioritized_replay_alpha,
+                    frame_stack=replay_frame_stack)
         else:
 
             def new_buffer():
-                return ReplayBuffer(buffer_size)
+                return ReplayBuffer(
+                    buffer_size, frame_stack=replay_frame_stack)
 
         self.replay_buffers = collections.defaultdict(new_buffer)
 
@@ -75,13 +95,19 @@ class SyncReplayOptimizer(PolicyOptimizer):
     @override(PolicyOptimizer)
     def step(self):
         with self.update_weights_timer:
-            if self.remote_evaluators:
+            if self.sample_collector:
+                self.sample_collector.set_weights(
+                    ray.put(self.local_evaluator.get_weights()))
+            elif self.remote_evaluators:
                 weights = ray.put(self.local_evaluator.get_weights())
                 for e in self.remote_evaluators:
                     e.set_weights.remote(weights)
 
         with self.sample_timer:
-            if self.remote_evaluators:
+            if self.sample_collector:
+                batch = SampleBatch.concat_samples(
+                    self.sample_collector.collect())
+            elif self.remote_evaluators:
                 batch = SampleBatch.concat_samples(
                     ray.get(
                         [e.sample.remote() for e in self.remote_evaluators]))
@@ -95,14 +121,7 @@ class SyncReplayOptimizer(PolicyOptimizer):
                 }, batch.count)
 
             for policy_id, s in batch.policy_batches.items():
-                for row in s.rows():
-                    self.replay_buffers[policy_id].add(
-                        pack_if_needed(row["obs"]),
-                        row["actions"],
-                        row["rewards"],
-                        pack_if_needed(row["new_obs"]),
-                        row["dones"],
-                        weight=None)
+                self.replay_buffers[policy_id].add_batch(s)
 
         if self.num_steps_sampled >= self.replay_starts:
             self._optimize()
@@ -111,8 +130,11 @@ class SyncReplayOptimizer(PolicyOptimizer):
 
     @override(PolicyOptimizer)
     def stats(self):
+        stats = PolicyOptimizer.stats(self)
+        if self.sample_collector:
+            stats.update(self.sample_collector.stats())
         return dict(
-            PolicyOptimizer.stats(self), **{
+            stats, **{
                 "sample_time_ms": round(1000 * self.sample_timer.mean, 3),
                 "replay_time_ms": round(1000 * self.replay_timer.mean, 3),
                 "grad_time_ms": round(1000 * self.grad_timer.mean, 3),
@@ -5,6 +5,7 @@ from __future__ import print_function
 import ray
 import logging
 from ray.rllib.optimizers.policy_optimizer import PolicyOptimizer
+from ray.rllib.optimizers.sample_collector import SampleCollector
 from ray.rllib.evaluation.sample_batch import SampleBatch
 from ray.rllib.utils.annotations import override
 from ray.rllib.utils.filter import RunningStat
@@ -19,10 +20,24 @@ class SyncSamplesOptimizer(PolicyOptimizer):
     In each step, this optimizer pulls samples from a number of remote
     evaluators, concatenates them, and then updates a local model. The updated
     model weights are then broadcast to all remote evaluators.
+
+    If min_evaluator_fraction < 1, each step only waits for that fraction of
+    the remote evaluators to report samples (see SampleCollector).
     """
 
     @override(PolicyOptimizer)
-    def _init(self, num_sgd_iter=1, train_batch_size=1):
+    def _init(self,
+              num_sgd_iter=1,
+              train_batch_size=1,
+              min_evaluator_fraction=1.0,
+              late_samples="fold",
+              max_sample_staleness=1):
+        if self.remote_evaluators and min_evaluator_fraction < 1:
+            self.sample_collector = SampleCollector(
+                self.remote_evaluators, min_evaluator_fraction, late_samples,
+                max_sample_staleness)
+        else:
+            self.sample_collector = None
         self.update_weights_timer = TimerStat()
         self.sample_timer = TimerStat()
         self.grad_timer = TimerStat()
@@ -34,7 +49,10 @@ class SyncSamplesOptimizer(PolicyOptimizer):
     @override(PolicyOptimizer)
     def step(self):
         with self.update_weights_timer:
-            if self.remote_evaluators:
+            if self.sample_collector:
+                self.sample_collector.set_weights(
+                    ray.put(self.local_evaluator.get_weights()))
+            elif self.remote_evaluators:
                 weights = ray.put(self.local_evaluator.get_weights())
                 for e in self.remote_evaluators:
                     e.set_weights.remote(weights)
@@ -42,7 +60,10 @@ class SyncSamplesOptimizer(PolicyOptimizer):
         with self.sample_timer:
             samples = []
             while sum(s.count for s in samples) < self.train_batch_size:
-                if self.remote_evaluators:
+                if self.sample_collector:
+                    samples.extend(
+                        self.sample_collector.collect(self.train_batch_size))
+                elif self.remote_evaluators:
                     samples.extend(
                         ray.get([
                             e.sample.remote() for e in self.remote_evaluators
@@ -67,8 +88,11 @@ class SyncSamplesOptimizer(PolicyOptimizer):
 
     @override(PolicyOptimizer)
     def stats(self):
+        stats = PolicyOptimizer.stats(self)
+        if self.sample_collector:
+            stats.update(self.sample_collector.stats())
         return dict(
-            PolicyOptimizer.stats(self), **{
+            stats, **{
                 "sample_time_ms": round(1000 * self.sample_timer.mean, 3),
                 "grad_time_ms": round(1000 * self.grad_timer.mean, 3),
                 "update_time_ms": round(1000 * self.update_weights_timer.mean,
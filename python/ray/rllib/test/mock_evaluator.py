@@ -51,4 +51,6 @@ class _MockEvaluator(object):
     def sync_filters(self, new_filters):
         assert all(k in new_filters for k in self.filters)
         for k in self.filters:
+            delta = self.filters[k].copy()
             self.filters[k].sync(new_filters[k])
+            self.filters[k].apply_changes(delta, with_buffer=True)
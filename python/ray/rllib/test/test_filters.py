@@ -72,6 +72,18 @@ class MSFTest(unittest.TestCase):
             self.assertEqual(filt.buffer.n, 5)
             self.assertEqual(filt.rs.n, 15)
 
+    def testMergeBuffer(self):
+        filt = MeanStdFilter(())
+        filt2 = MeanStdFilter(())
+        for i in range(5):
+            filt(i)
+            filt2(i + 5)
+        filt.merge_buffer(filt2)
+        self.assertEqual(filt.rs.n, 5)
+        self.assertEqual(filt.buffer.n, 10)
+        self.assertAlmostEqual(filt.buffer.mean, 4.5)
+        self.assertAlmostEqual(filt.buffer.var, np.var(range(10), ddof=1))
+
 
 class FilterManagerTest(unittest.TestCase):
     def setUp(self):
@@ -105,6 +117,42 @@ class FilterManagerTest(unittest.TestCase):
         self.assertEqual(obs_f.rs.n, filt1.rs.n)
         self.assertEqual(obs_f.buffer.n, filt1.buffer.n)
 
+    def testSynchronizeTree(self):
+        """Tree synchronization applies the buffers of all remotes"""
+        filt1 = MeanStdFilter(())
+        RemoteEvaluator = ray.remote(_MockEvaluator)
+        remotes = [RemoteEvaluator.remote(sample_count=10) for _ in range(5)]
+        ray.get([e.sample.remote() for e in remotes])
+
+        filters = {"obs_filter": filt1, "rew_filter": filt1.copy()}
+        FilterManager.synchronize(filters, remotes, tree_fanout=2)
+
+        self.assertEqual(filt1.rs.n, 50)
+        for e in remotes:
+            obs_f = ray.get(e.get_filters.remote())["obs_filter"]
+            self.assertEqual(obs_f.rs.n, 50)
+            self.assertEqual(obs_f.buffer.n, 0)
+
+    def testSynchronizeAsync(self):
+        """Samples taken while merging are rebased onto the new filters"""
+        filters = {
+            "obs_filter": MeanStdFilter(()),
+            "rew_filter": MeanStdFilter(())
+        }
+        RemoteEvaluator = ray.remote(_MockEvaluator)
+        remotes = [RemoteEvaluator.remote(sample_count=10) for _ in range(3)]
+        [e.sample.remote() for e in remotes]
+
+        pending = FilterManager.start_synchronize(remotes, tree_fanout=2)
+        ray.get([e.sample.remote() for e in remotes])
+        FilterManager.finish_synchronize(filters, remotes, pending)
+
+        self.assertEqual(filters["obs_filter"].rs.n, 30)
+        for e in remotes:
+            obs_f = ray.get(e.get_filters.remote())["obs_filter"]
+            self.assertEqual(obs_f.rs.n, 40)
+            self.assertEqual(obs_f.buffer.n, 10)
+
 
 if __name__ == "__main__":
     unittest.main(verbosity=2)
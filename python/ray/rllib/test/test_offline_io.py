@@ -0,0 +1,67 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from ray.rllib.evaluation import SampleBatch
+from ray.rllib.offline import ColumnarReader, ColumnarWriter
+
+
+def make_batch(start, count):
+    return SampleBatch({
+        "obs": np.arange(start, start + count).reshape((count,
+                                                        1)).astype(np.float32),
+        "actions": np.arange(start, start + count),
+        "infos": np.array([{
+            "i": i
+        } for i in range(count)]),
+    })
+
+
+class ColumnarIOTest(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def testWriteAndReadBack(self):
+        writer = ColumnarWriter(
+            self.test_dir, max_shard_rows=10, compress_columns=["obs"])
+        for i in range(5):
+            writer.write(make_batch(i * 4, 4))
+        writer.close()
+        self.assertEqual(writer.num_shards, 2)
+
+        reader = ColumnarReader(self.test_dir, batch_size=5, shuffle=False)
+        seen = []
+        for _ in range(4):
+            batch = reader.next()
+            self.assertEqual(batch.count, 5)
+            self.assertEqual(batch["obs"][:, 0].tolist(),
+                             batch["actions"].tolist())
+            seen.extend(batch["actions"].tolist())
+        self.assertEqual(sorted(seen), list(range(20)))
+
+    def testShuffle(self):
+        writer = ColumnarWriter(self.test_dir, max_shard_rows=20)
+        writer.write(make_batch(0, 20))
+        writer.close()
+        reader = ColumnarReader(self.test_dir, batch_size=20, shuffle=True)
+        batch = reader.next()
+        self.assertEqual(sorted(batch["actions"].tolist()), list(range(20)))
+        self.assertEqual(batch["obs"][:, 0].tolist(),
+                         batch["actions"].tolist())
+
+    def testNoShards(self):
+        self.assertRaises(ValueError,
+                          lambda: ColumnarReader(self.test_dir, 10))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -2,14 +2,21 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import time
 import unittest
 
 import numpy as np
 
 import ray
+from ray.rllib.agents.ppo import PPOAgent
 from ray.rllib.test.mock_evaluator import _MockEvaluator
-from ray.rllib.optimizers import AsyncGradientsOptimizer
+from ray.rllib.optimizers import AsyncGradientsOptimizer, AsyncReplayOptimizer
 from ray.rllib.evaluation import SampleBatch
+from ray.rllib.optimizers.batch_staging import SampleBatchStager
+from ray.rllib.optimizers.replay_buffer import ReplayBuffer, \
+    PrioritizedReplayBuffer
+from ray.rllib.optimizers.sample_collector import SampleCollector
+from ray.rllib.utils.compression import pack
 
 
 class AsyncOptimizerTest(unittest.TestCase):
@@ -27,6 +34,132 @@ class AsyncOptimizerTest(unittest.TestCase):
         self.assertTrue(all(local.get_weights() == 0))
 
 
+class PipelinedMultiGPUOptimizerTest(unittest.TestCase):
+    def tearDown(self):
+        ray.shutdown()
+
+    def testPipelineSampling(self):
+        ray.init(num_cpus=2)
+        agent = PPOAgent(
+            env="CartPole-v0",
+            config={
+                "num_workers": 1,
+                "sample_batch_size": 50,
+                "train_batch_size": 200,
+                "sgd_minibatch_size": 50,
+                "num_sgd_iter": 2,
+                "pipeline_sampling": True,
+            })
+        for _ in range(3):
+            result = agent.train()
+        self.assertGreaterEqual(result["timesteps_total"], 600)
+        self.assertIn("load_wait_time_ms", result["info"])
+
+
+class _HostMockEvaluator(_MockEvaluator):
+    def __init__(self, host):
+        _MockEvaluator.__init__(self)
+        self.host = host
+
+    def get_host(self):
+        return self.host
+
+    def sample_with_count(self):
+        batch = self.sample()
+        return batch, batch.count
+
+
+class AsyncReplayOptimizerTest(unittest.TestCase):
+    def tearDown(self):
+        ray.shutdown()
+
+    def testReplayShardRouting(self):
+        ray.init(num_cpus=4)
+        optimizer = AsyncReplayOptimizer(_MockEvaluator(), [], {
+            "num_replay_buffer_shards": 3,
+            "colocate_replay_shards": False,
+        })
+        # Pretend the shards were placed on different nodes
+        optimizer.replay_hosts = ["node1", "node2", "node2"]
+        remote_host = ray.remote(_HostMockEvaluator)
+        evaluators = [
+            remote_host.remote("node1"),
+            remote_host.remote("node2"),
+            remote_host.remote("node3"),
+        ]
+        optimizer._set_evaluators(evaluators)
+        shards = optimizer.replay_actors
+
+        # Evaluators with shards on their node only route to those
+        self.assertEqual([optimizer._route(evaluators[0]) for _ in range(4)],
+                         [shards[0]] * 4)
+        self.assertEqual(
+            set(optimizer._route(evaluators[1]) for _ in range(4)),
+            {shards[1], shards[2]})
+        self.assertEqual(optimizer.num_local_routes, 8)
+        self.assertEqual(optimizer.num_remote_routes, 0)
+
+        # Evaluators without one spread over all shards
+        self.assertEqual(
+            set(optimizer._route(evaluators[2]) for _ in range(3)),
+            set(shards))
+        self.assertEqual(optimizer.num_remote_routes, 3)
+        optimizer.stop()
+
+
+class _SlowMockEvaluator(_MockEvaluator):
+    def sample(self):
+        time.sleep(2)
+        return _MockEvaluator.sample(self)
+
+
+class SampleCollectorTest(unittest.TestCase):
+    def setUp(self):
+        ray.init(num_cpus=4)
+        remote_fast = ray.remote(_MockEvaluator)
+        remote_slow = ray.remote(_SlowMockEvaluator)
+        self.evaluators = [remote_fast.remote() for _ in range(3)]
+        self.evaluators.append(remote_slow.remote())
+
+    def tearDown(self):
+        ray.shutdown()
+
+    def testFoldLateSamples(self):
+        collector = SampleCollector(self.evaluators, 0.75)
+        collector.set_weights(ray.put(np.zeros(4)))
+        self.assertEqual(len(collector.collect()), 3)
+        self.assertEqual(len(collector.pending), 1)
+        collector.set_weights(ray.put(np.zeros(4)))
+        time.sleep(3)
+        self.assertEqual(len(collector.collect()), 3)
+        self.assertEqual(collector.num_late_folded, 1)
+        self.assertEqual(
+            collector.stats()["sample_staleness"]["staleness_quantiles"][-1],
+            1)
+
+    def testDropLateSamples(self):
+        collector = SampleCollector(self.evaluators, 0.75, "drop")
+        collector.collect()
+        time.sleep(3)
+        self.assertEqual(len(collector.collect()), 3)
+        self.assertEqual(collector.num_late_dropped, 1)
+
+    def testCarryOverPendingSamples(self):
+        collector = SampleCollector(self.evaluators, 0.75, "drop")
+        collector.collect(min_timesteps=100)
+        # The requests of the fast evaluators that were asked for more
+        # samples are not late, unlike the one of the slow evaluator
+        self.assertEqual(len(collector.pending), 3)
+        self.assertEqual(len(collector.late), 1)
+        self.assertEqual(len(collector.collect()), 3)
+        self.assertEqual(collector.num_late_dropped, 0)
+
+    def testMinTimesteps(self):
+        collector = SampleCollector(self.evaluators, 0.5)
+        samples = collector.collect(min_timesteps=100)
+        self.assertGreaterEqual(sum(s.count for s in samples), 100)
+
+
 class SampleBatchTest(unittest.TestCase):
     def testConcat(self):
         b1 = SampleBatch({"a": np.array([1, 2, 3]), "b": np.array([4, 5, 6])})
@@ -40,5 +173,132 @@ class SampleBatchTest(unittest.TestCase):
         self.assertEqual(b["b"].tolist(), [4, 5, 6, 4, 5])
 
 
+class SampleBatchStagerTest(unittest.TestCase):
+    def testStageAndRecycle(self):
+        stager = SampleBatchStager(train_batch_size=4, capacity=6)
+        b1 = SampleBatch({"a": np.array([1, 2, 3]), "b": np.ones((3, 2))})
+        b2 = SampleBatch({"a": np.array([4, 5]), "b": np.zeros((2, 2))})
+        self.assertIsNone(stager.add(b1))
+        out = stager.add(b2)
+        self.assertEqual(out.count, 5)
+        self.assertEqual(out["a"].tolist(), [1, 2, 3, 4, 5])
+        self.assertEqual(out["b"].shape, (5, 2))
+        stager.release(out)
+        self.assertIsNone(stager.add(b2))
+        out = stager.add(b1)
+        self.assertEqual(out["a"].tolist(), [4, 5, 1, 2, 3])
+        self.assertEqual(stager.num_arenas_allocated, 1)
+
+    def testGrow(self):
+        stager = SampleBatchStager(train_batch_size=2, capacity=2)
+        b1 = SampleBatch({"a": np.array([1])})
+        b2 = SampleBatch({"a": np.array([2, 3, 4])})
+        self.assertIsNone(stager.add(b1))
+        out = stager.add(b2)
+        self.assertEqual(out["a"].tolist(), [1, 2, 3, 4])
+
+    def testColumnsChanged(self):
+        stager = SampleBatchStager(train_batch_size=4, capacity=4)
+        stager.add(SampleBatch({"a": np.array([1])}))
+        self.assertRaises(ValueError,
+                          lambda: stager.add(SampleBatch({"b": [1]})))
+
+
+def _stacked_batch(start, count, k):
+    """Returns a batch of transitions over frames filled with their index."""
+    frames = [np.full((2, 2, 1), i) for i in range(start, start + count + k)]
+    obs = [np.concatenate(frames[i:i + k], axis=-1) for i in range(count)]
+    return SampleBatch({
+        "obs": np.array(obs),
+        "actions": np.arange(start, start + count),
+        "rewards": np.ones(count),
+        "new_obs": np.array(
+            obs[1:] + [np.concatenate(frames[count:count + k], axis=-1)]),
+        "dones": np.zeros(count),
+    })
+
+
+class ReplayBufferTest(unittest.TestCase):
+    def testFrameStackRoundTrip(self):
+        buf = ReplayBuffer(100, frame_stack=4)
+        batch = _stacked_batch(0, 10, 4)
+        idxes = buf.add_batch(batch)
+        self.assertEqual(idxes.tolist(), list(range(10)))
+        self.assertEqual(len(buf), 10)
+        obs, actions, _, new_obs, _ = buf._encode_sample([3, 0, 9])
+        self.assertTrue(np.array_equal(obs, batch["obs"][[3, 0, 9]]))
+        self.assertTrue(np.array_equal(new_obs, batch["new_obs"][[3, 0, 9]]))
+        self.assertEqual(actions.tolist(), [3, 0, 9])
+        # 4 frames for the first obs plus one per step
+        self.assertEqual(buf._frame_storage.num_frames, 14)
+
+    def testFrameStackAcrossBatches(self):
+        buf = ReplayBuffer(100, frame_stack=4)
+        buf.add_batch(_stacked_batch(0, 5, 4))
+        buf.add_batch(_stacked_batch(5, 5, 4))
+        # A new episode shares no frames with the last one
+        buf.add_batch(_stacked_batch(100, 5, 4))
+        self.assertEqual(buf._frame_storage.num_frames, 9 + 5 + 9)
+        obs, _, _, _, _ = buf._encode_sample([5, 10])
+        self.assertEqual(obs[0, 0, 0].tolist(), [5, 6, 7, 8])
+        self.assertEqual(obs[1, 0, 0].tolist(), [100, 101, 102, 103])
+
+    def testFrameStackEviction(self):
+        buf = ReplayBuffer(8, frame_stack=4)
+        for start in range(0, 100, 3):
+            buf.add_batch(_stacked_batch(start, 3, 4))
+        self.assertEqual(len(buf), 8)
+        self.assertLessEqual(len(buf._frame_storage.frames), 8 + 2 * 4)
+        obs, actions, _, new_obs, _ = buf._encode_sample(list(range(8)))
+        for o, a, n in zip(obs, actions, new_obs):
+            self.assertEqual(o[0, 0].tolist(), list(range(a, a + 4)))
+            self.assertEqual(n[0, 0].tolist(), list(range(a + 1, a + 5)))
+
+    def testPrioritizedAddBatch(self):
+        buf = PrioritizedReplayBuffer(16, alpha=0.6, frame_stack=4)
+        buf.add_batch(_stacked_batch(0, 10, 4))
+        obs, actions, _, new_obs, _, weights, idxes = buf.sample(5, beta=0.4)
+        self.assertEqual(obs.shape, (5, 2, 2, 4))
+        self.assertEqual(actions.tolist(), list(idxes))
+        buf.update_priorities(idxes, np.ones(5) * 2)
+
+    def testFrameStackCompressedObservations(self):
+        # Evaluators with compress_observations pack each observation, and
+        # the batches of several evaluators are concatenated
+        batches = [_stacked_batch(start, 5, 4) for start in [0, 100, 200]]
+        packed = []
+        for batch in batches:
+            batch = batch.copy()
+            batch["obs"] = [pack(o) for o in batch["obs"]]
+            batch["new_obs"] = [pack(o) for o in batch["new_obs"]]
+            packed.append(batch)
+        buf = ReplayBuffer(100, frame_stack=4)
+        buf.add_batch(SampleBatch.concat_samples(packed))
+        self.assertEqual(buf._frame_storage.num_frames, 3 * 9)
+        obs, _, _, new_obs, _ = buf._encode_sample(list(range(15)))
+        expected = SampleBatch.concat_samples(batches)
+        self.assertTrue(np.array_equal(obs, expected["obs"]))
+        self.assertTrue(np.array_equal(new_obs, expected["new_obs"]))
+
+    def testSingleFrame(self):
+        buf = ReplayBuffer(100, frame_stack=1)
+        batch = _stacked_batch(0, 10, 1)
+        buf.add_batch(batch)
+        buf.add(batch["obs"][0], 0, 1, batch["new_obs"][0], 0, None)
+        self.assertEqual(buf._frame_storage.num_frames, 11 + 2)
+        obs, _, _, new_obs, _ = buf._encode_sample(list(range(11)))
+        self.assertTrue(np.array_equal(obs[:10], batch["obs"]))
+        self.assertTrue(np.array_equal(new_obs[:10], batch["new_obs"]))
+        self.assertTrue(np.array_equal(obs[10], batch["obs"][0]))
+
+    def testAddBatchWithoutFrameStack(self):
+        buf = ReplayBuffer(4)
+        buf.add_batch(_stacked_batch(0, 6, 4))
+        self.assertEqual(len(buf), 4)
+        obs, actions, _, _, _ = buf._encode_sample([0, 1])
+        self.assertEqual(actions.tolist(), [4, 5])
+        self.assertEqual(obs[0, 0, 0].tolist(), [4, 5, 6, 7])
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
@@ -11,11 +11,15 @@ from collections import Counter
 import ray
 from ray.rllib.agents.pg import PGAgent
 from ray.rllib.agents.a3c import A2CAgent
+from ray.rllib.evaluation.inference_server import InferenceServer
 from ray.rllib.evaluation.policy_evaluator import PolicyEvaluator
-from ray.rllib.evaluation.metrics import collect_metrics
+from ray.rllib.evaluation.metrics import collect_metrics, EpisodeSummary
 from ray.rllib.evaluation.policy_graph import PolicyGraph
 from ray.rllib.evaluation.postprocessing import compute_advantages
+from ray.rllib.evaluation.sampler import RolloutMetrics
+from ray.rllib.optimizers.policy_optimizer import PolicyOptimizer
 from ray.rllib.env.vector_env import VectorEnv
+from ray.rllib.utils.tf_run_builder import get_callable_cache
 from ray.tune.registry import register_env
 
 
@@ -36,6 +40,15 @@ class MockPolicyGraph(PolicyGraph):
         return compute_advantages(batch, 100.0, 0.9, use_gae=False)
 
 
+class MockServerPolicyGraph(MockPolicyGraph):
+    def postprocess_trajectory(self,
+                               batch,
+                               other_agent_batches=None,
+                               episode=None):
+        # Episodes aren't passed to policies on an inference server
+        return compute_advantages(batch, 100.0, 0.9, use_gae=False)
+
+
 class BadPolicyGraph(PolicyGraph):
     def compute_actions(self,
                         obs_batch,
@@ -125,6 +138,25 @@ class MockVectorEnv(VectorEnv):
         return self.envs
 
 
+class _MetricsSampler(object):
+    def __init__(self):
+        self.metrics = []
+
+    def get_metrics(self):
+        metrics, self.metrics = self.metrics, []
+        return metrics
+
+
+class _MetricsEvaluator(object):
+    def __init__(self):
+        self.sampler = _MetricsSampler()
+
+
+class _MetricsOptimizer(PolicyOptimizer):
+    def _init(self):
+        pass
+
+
 class TestPolicyEvaluator(unittest.TestCase):
     def testBasic(self):
         ev = PolicyEvaluator(
@@ -203,6 +235,20 @@ class TestPolicyEvaluator(unittest.TestCase):
         self.assertGreater(counts["step"], 200)
         self.assertLess(counts["step"], 400)
 
+    def testCachedPolicyEval(self):
+        pg = PGAgent(
+            env="CartPole-v0",
+            config={
+                "num_workers": 0,
+                "sample_batch_size": 10,
+            })
+        ev = pg.local_evaluator
+        ev.sample()
+        ev.sample()
+        cache = get_callable_cache(ev.tf_sess)
+        self.assertEqual(len(cache._callables), 1)
+        self.assertEqual(len(cache._buffers), 1)
+
     def testQueryEvaluators(self):
         register_env("test", lambda _: gym.make("CartPole-v0"))
         pg = PGAgent(
@@ -217,6 +263,44 @@ class TestPolicyEvaluator(unittest.TestCase):
         self.assertEqual(results, [5, 5, 5])
         self.assertEqual(results2, [(0, 5), (1, 5), (2, 5)])
 
+    def testInferenceServer(self):
+        local = PolicyEvaluator(
+            env_creator=lambda _: MockEnv(episode_length=10),
+            policy_graph=MockServerPolicyGraph)
+        server = InferenceServer.as_remote().remote(
+            local.policy_dict, local.preprocessors,
+            {"inference_server_max_latency_ms": 1})
+        evs = [
+            PolicyEvaluator.as_remote().remote(
+                env_creator=lambda _: MockEnv(episode_length=10),
+                policy_graph=MockServerPolicyGraph,
+                batch_steps=25,
+                worker_index=i + 1,
+                inference_server=server) for i in range(2)
+        ]
+        for _ in range(3):
+            for batch in ray.get([ev.sample.remote() for ev in evs]):
+                self.assertEqual(batch.count, 25)
+                self.assertEqual(batch["actions"].tolist(), [0] * 25)
+                self.assertGreater(batch["advantages"][0], 1)
+        stats = ray.get(server.inference_stats.remote())
+        self.assertGreaterEqual(stats["num_requests"], 150)
+        self.assertEqual(stats["num_dropped"], 0)
+
+    def testInferenceServerTraining(self):
+        register_env("test", lambda _: gym.make("CartPole-v0"))
+        pg = PGAgent(
+            env="test",
+            config={
+                "num_workers": 2,
+                "sample_batch_size": 50,
+                "inference_server": True,
+            })
+        result = pg.train()
+        self.assertGreaterEqual(result["timesteps_this_iter"], 200)
+        stats = ray.get(pg.inference_server.inference_stats.remote())
+        self.assertGreater(stats["num_requests"], 0)
+
     def testRewardClipping(self):
         # clipping on
         ev = PolicyEvaluator(
@@ -420,6 +504,67 @@ class TestPolicyEvaluator(unittest.TestCase):
         return obs_f
 
 
+class EpisodeSummaryTest(unittest.TestCase):
+    def testMerge(self):
+        episodes = [
+            RolloutMetrics(i, float(i), {
+                (0, "p1"): 2.0 * i,
+                (1, "default"): 1.0
+            }, {"m": float("nan") if i == 3 else i}) for i in range(10)
+        ]
+        summary = EpisodeSummary(episodes[:4])
+        summary.merge(EpisodeSummary(episodes[4:]))
+        summary.merge(EpisodeSummary())
+        result = summary.to_result(10, 0)
+        self.assertEqual(result["episode_reward_mean"], 4.5)
+        self.assertEqual(result["episode_reward_max"], 9)
+        self.assertEqual(result["policy_reward_mean"], {"p1": 9.0})
+        self.assertTrue(np.isnan(result["custom_metrics"]["m_mean"]))
+        self.assertEqual(result["custom_metrics"]["m_min"], 0)
+        self.assertEqual(result["custom_metrics"]["m_max"], 9)
+
+    def testKeepEpisodes(self):
+        episodes = [RolloutMetrics(i, float(i), {}, {}) for i in range(6)]
+        summary = EpisodeSummary(episodes[:4], keep_episodes=3)
+        self.assertEqual(summary.episodes, episodes[1:4])
+        summary.merge(EpisodeSummary(episodes[4:], keep_episodes=3))
+        self.assertEqual(summary.episodes, episodes[3:])
+        self.assertEqual(summary.num_episodes, 6)
+        self.assertEqual(EpisodeSummary(episodes).episodes, [])
+
+    def testSmoothingWindow(self):
+        local = _MetricsEvaluator()
+        optimizer = _MetricsOptimizer(local)
+
+        def collect(num_episodes, reward):
+            local.sampler.metrics = [
+                RolloutMetrics(1, float(reward), {}, {})
+                for _ in range(num_episodes)
+            ]
+            return optimizer.collect_metrics(0, min_history=100)
+
+        collect(60, 0)
+        # The 60 new episodes and the latest 40 past ones
+        result = collect(60, 1)
+        self.assertEqual(result["episodes_this_iter"], 60)
+        self.assertAlmostEqual(result["episode_reward_mean"], 0.6)
+        # The 30 new episodes, 60 episodes of the last iteration and 10 of
+        # the one before
+        result = collect(30, 2)
+        self.assertAlmostEqual(result["episode_reward_mean"], 1.2)
+        # Only new episodes if there are enough of them
+        result = collect(150, 3)
+        self.assertEqual(result["episodes_this_iter"], 150)
+        self.assertEqual(result["episode_reward_mean"], 3)
+        self.assertEqual(len(optimizer.episode_history), 100)
+
+    def testEmpty(self):
+        result = EpisodeSummary().to_result(0, 0)
+        self.assertEqual(result["episodes_this_iter"], 0)
+        self.assertTrue(np.isnan(result["episode_reward_mean"]))
+        self.assertTrue(np.isnan(result["episode_reward_min"]))
+
+
 if __name__ == '__main__':
     ray.init(num_cpus=5)
     unittest.main(verbosity=2)
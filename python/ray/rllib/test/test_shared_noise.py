@@ -0,0 +1,65 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from ray.rllib.utils import shared_noise
+from ray.rllib.utils.shared_noise import SharedNoiseTable
+
+
+def _load_noise(directory, count, queue):
+    noise = SharedNoiseTable(count, directory=directory)
+    queue.put((noise.noise.filename, np.array(noise.get(count - 100, 100))))
+
+
+class SharedNoiseTableTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.chunk_size = shared_noise.GENERATE_CHUNK_SIZE
+        # Generate the table in several chunks
+        shared_noise.GENERATE_CHUNK_SIZE = 300000
+
+    def tearDown(self):
+        shared_noise.GENERATE_CHUNK_SIZE = self.chunk_size
+        shutil.rmtree(self.directory)
+
+    def testSharedBetweenProcesses(self):
+        count = 1000000
+        queue = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=_load_noise, args=(self.directory, count, queue))
+            for _ in range(2)
+        ]
+        for p in processes:
+            p.start()
+        results = [queue.get(timeout=60) for _ in processes]
+        for p in processes:
+            p.join()
+            self.assertEqual(p.exitcode, 0)
+
+        (path1, noise1), (path2, noise2) = results
+        self.assertEqual(path1, path2)
+        self.assertEqual(
+            [f for f in os.listdir(self.directory) if f.endswith(".npy")],
+            [os.path.basename(path1)])
+        self.assertTrue(np.array_equal(noise1, noise2))
+        expected = np.random.RandomState(
+            shared_noise.DEFAULT_NOISE_SEED).randn(count)[-100:]
+        self.assertTrue(np.allclose(noise1, expected))
+
+        # A table created in this process maps the same file
+        noise = SharedNoiseTable(count, directory=self.directory)
+        self.assertEqual(noise.noise.filename, path1)
+        self.assertTrue(np.array_equal(noise.get(count - 100, 100), noise1))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -31,6 +31,10 @@ class Filter(object):
         """Creates copy of current state and clears accumulated state"""
         raise NotImplementedError
 
+    def merge_buffer(self, other):
+        """Adds the state accumulated by other filter to that of self."""
+        raise NotImplementedError
+
     def as_serializable(self):
         raise NotImplementedError
 
@@ -56,6 +60,9 @@ class NoFilter(Filter):
     def sync(self, other):
         pass
 
+    def merge_buffer(self, other):
+        pass
+
     def clear_buffer(self):
         pass
 
@@ -179,6 +186,20 @@ class MeanStdFilter(Filter):
         if with_buffer:
             self.buffer = other.buffer.copy()
 
+    def merge_buffer(self, other):
+        """Adds the buffer of another filter to the buffer of self.
+
+        Examples:
+            >>> a = MeanStdFilter(())
+            >>> a(1)
+            >>> b = MeanStdFilter(())
+            >>> b(3)
+            >>> a.merge_buffer(b)
+            >>> print([a.rs.n, a.buffer.n, a.buffer.mean])
+            [1, 2, 2.0]
+        """
+        self.buffer.update(other.buffer)
+
     def copy(self):
         """Returns a copy of Filter."""
         other = MeanStdFilter(self.shape)
@@ -8,10 +8,19 @@ import ray
 class FilterManager(object):
     """Manages filters and coordination across remote evaluators that expose
         `get_filters` and `sync_filters`.
+
+    With many evaluators, merging all of their filters on the driver becomes
+    a bottleneck. If `tree_fanout` is set, the filter deltas of the
+    evaluators are instead merged by a tree of remote tasks that each merge
+    up to `tree_fanout` inputs, so that the driver only receives and applies
+    a single merged delta.
     """
 
     @staticmethod
-    def synchronize(local_filters, remotes, update_remote=True):
+    def synchronize(local_filters,
+                    remotes,
+                    update_remote=True,
+                    tree_fanout=None):
         """Aggregates all filters from remote evaluators.
 
         Local copy is updated and then broadcasted to all remote evaluators.
@@ -20,13 +29,81 @@ class FilterManager(object):
             local_filters (dict): Filters to be synchronized.
             remotes (list): Remote evaluators with filters.
             update_remote (bool): Whether to push updates to remote filters.
+            tree_fanout (int): If set, merge the remote filters in a tree of
+                tasks with this fanout instead of on the driver.
         """
+        if tree_fanout:
+            pending = FilterManager.start_synchronize(remotes, tree_fanout)
+            FilterManager.finish_synchronize(local_filters, remotes, pending,
+                                             update_remote)
+            return
+
         remote_filters = ray.get(
             [r.get_filters.remote(flush_after=True) for r in remotes])
         for rf in remote_filters:
             for k in local_filters:
                 local_filters[k].apply_changes(rf[k], with_buffer=False)
         if update_remote:
-            copies = {k: v.as_serializable() for k, v in local_filters.items()}
-            remote_copy = ray.put(copies)
-            [r.sync_filters.remote(remote_copy) for r in remotes]
+            FilterManager._broadcast(local_filters, remotes)
+
+    @staticmethod
+    def start_synchronize(remotes, tree_fanout=16):
+        """Starts merging the filter deltas of remote evaluators.
+
+        This returns without waiting for the evaluators, so the merge can
+        run while they are sampling. Evaluators keep accumulating new deltas
+        meanwhile, which are rebased onto the merged filters once these are
+        pushed by finish_synchronize().
+
+        Args:
+            remotes (list): Remote evaluators with filters.
+            tree_fanout (int): Max number of filters merged by each task.
+
+        Returns:
+            Object id of the merged filters, or None if there are no remotes.
+        """
+        assert tree_fanout > 1, tree_fanout
+        pending = [r.get_filters.remote(flush_after=True) for r in remotes]
+        while len(pending) > 1:
+            pending = [
+                _merge_filters.remote(*pending[i:i + tree_fanout])
+                for i in range(0, len(pending), tree_fanout)
+            ]
+        return pending[0] if pending else None
+
+    @staticmethod
+    def finish_synchronize(local_filters,
+                           remotes,
+                           merged_filters,
+                           update_remote=True):
+        """Applies the result of start_synchronize() to the local filters.
+
+        Args:
+            local_filters (dict): Filters to be synchronized.
+            remotes (list): Remote evaluators with filters.
+            merged_filters (ObjectID): Result of start_synchronize().
+            update_remote (bool): Whether to push updates to remote filters.
+        """
+        if merged_filters is not None:
+            merged = ray.get(merged_filters)
+            for k in local_filters:
+                local_filters[k].apply_changes(merged[k], with_buffer=False)
+        if update_remote:
+            FilterManager._broadcast(local_filters, remotes)
+
+    @staticmethod
+    def _broadcast(local_filters, remotes):
+        copies = {k: v.as_serializable() for k, v in local_filters.items()}
+        remote_copy = ray.put(copies)
+        [r.sync_filters.remote(remote_copy) for r in remotes]
+
+
+@ray.remote(num_cpus=0)
+def _merge_filters(*filter_dicts):
+    """Returns filters whose buffers hold the sum of all the given buffers."""
+
+    merged = filter_dicts[0]
+    for filters in filter_dicts[1:]:
+        for k in merged:
+            merged[k].merge_buffer(filters[k])
+    return merged
@@ -0,0 +1,93 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import fcntl
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NOISE_SEED = 123
+
+# Directory of the noise files, which is the same for every process on a node
+# regardless of the Ray session it belongs to, so that drivers connecting to
+# an existing cluster share the files of its workers
+DEFAULT_NOISE_DIR = "/tmp/ray/noise"
+
+# Number of floats to generate at a time when creating the noise file
+GENERATE_CHUNK_SIZE = 10000000
+
+
+class SharedNoiseTable(object):
+    """A large, read-only table of Gaussian noise shared by processes.
+
+    The table is generated once per node into a file named after (count,
+    seed) in DEFAULT_NOISE_DIR, and then memory-mapped read-only by every
+    process on the node that uses it, so that the physical pages are shared
+    through the OS page cache. The contents are fully determined by (count,
+    seed), so every node generates an identical table.
+
+    Processes should construct their own table from the same arguments
+    rather than pass the table (or its contents) through the object store.
+
+    Examples:
+        >>> noise = SharedNoiseTable(250000000)
+        >>> i = noise.sample_index(dim=1000)
+        >>> noise.get(i, 1000).shape
+        (1000,)
+    """
+
+    def __init__(self, count, seed=DEFAULT_NOISE_SEED, directory=None):
+        self.count = count
+        self.seed = seed
+        self.directory = directory
+        self.noise = np.load(
+            _get_or_create_noise_file(count, seed, directory), mmap_mode="r")
+        assert self.noise.dtype == np.float32
+
+    def get(self, i, dim):
+        return self.noise[i:i + dim]
+
+    def sample_index(self, dim):
+        return np.random.randint(0, len(self.noise) - dim + 1)
+
+
+def _get_or_create_noise_file(count, seed, directory):
+    directory = directory or DEFAULT_NOISE_DIR
+    if not os.path.exists(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            pass  # created concurrently by another process
+    path = os.path.join(directory, "noise_{}_{}.npy".format(seed, count))
+    if os.path.exists(path):
+        return path
+
+    # Serialize generation across all processes on this node
+    with open(path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if not os.path.exists(path):
+                _generate_noise_file(path, count, seed)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    return path
+
+
+def _generate_noise_file(path, count, seed):
+    logger.info("Generating shared noise table {}".format(path))
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    noise = np.lib.format.open_memmap(
+        tmp_path, mode="w+", dtype=np.float32, shape=(count, ))
+    # Successive draws from one RandomState yield the same stream as a single
+    # randn(count) call, without materializing it in float64.
+    rs = np.random.RandomState(seed)
+    for start in range(0, count, GENERATE_CHUNK_SIZE):
+        end = min(start + GENERATE_CHUNK_SIZE, count)
+        noise[start:end] = rs.randn(end - start)
+    noise.flush()
+    del noise
+    os.rename(tmp_path, path)
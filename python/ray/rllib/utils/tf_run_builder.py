@@ -5,7 +5,9 @@ from __future__ import print_function
 import logging
 import os
 import time
+import weakref
 
+import numpy as np
 import tensorflow as tf
 from tensorflow.python.client import timeline
 
@@ -58,6 +60,82 @@ class TFRunBuilder(object):
             raise ValueError("Unsupported fetch type: {}".format(to_fetch))
 
 
+class TFCallableCache(object):
+    """Runs repeated session calls through cached Session callables.
+
+    Each session.run() call re-validates its fetches and feed dict before
+    running the graph, which is a large part of the cost of running small
+    graphs (e.g., MLP policies) once per sampling step. This instead keeps a
+    callable made with Session.make_callable() for each distinct set of fed
+    placeholders and fetches.
+
+    Feeds of selected placeholders that are given as lists of rows (e.g.,
+    observations) are also copied into a reused array of the placeholder
+    dtype, instead of being converted into a new array on every call.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self._callables = {}
+        self._buffers = {}
+
+    def run(self, key, feeds, fetches, buffered=()):
+        """Runs the callable cached under the given key.
+
+        Arguments:
+            key: Hashable key identifying the placeholders and fetches. The
+                callable is created on the first call with the key, so the
+                key must change whenever the placeholders or fetches do.
+            feeds (list): List of (placeholder, value) pairs.
+            fetches: Fetches as accepted by session.run().
+            buffered (set): Placeholders whose values to copy into a reused
+                array when given as a list of rows.
+
+        Returns:
+            Fetched values, in the same structure as fetches.
+        """
+
+        fn = self._callables.get(key)
+        if fn is None:
+            placeholders = [ph for ph, _ in feeds]
+            if len(set(placeholders)) != len(placeholders):
+                raise ValueError("Key added twice: {}".format(placeholders))
+            fn = self.session.make_callable(fetches, placeholders)
+            self._callables[key] = fn
+        return fn(*[
+            self._to_buffer(ph, value) if ph in buffered else value
+            for ph, value in feeds
+        ])
+
+    def _to_buffer(self, placeholder, rows):
+        if isinstance(rows, np.ndarray) or len(rows) == 0:
+            return rows
+        row_shape = np.shape(rows[0])
+        buf = self._buffers.get(placeholder)
+        if (buf is None or len(buf) < len(rows) or buf.shape[1:] != row_shape):
+            capacity = len(rows) if buf is None else max(
+                len(rows), 2 * len(buf))
+            buf = np.empty(
+                (capacity, ) + row_shape,
+                dtype=placeholder.dtype.as_numpy_dtype)
+            self._buffers[placeholder] = buf
+        out = buf[:len(rows)]
+        for i, row in enumerate(rows):
+            out[i] = row
+        return out
+
+
+_callable_caches = weakref.WeakKeyDictionary()
+
+
+def get_callable_cache(session):
+    """Returns the TFCallableCache of the given session."""
+
+    if session not in _callable_caches:
+        _callable_caches[session] = TFCallableCache(session)
+    return _callable_caches[session]
+
+
 _count = 0
 
 
@@ -210,6 +210,17 @@ def cli(logging_level, logging_format):
     "--temp-dir",
     default=None,
     help="manually specify the root temporary dir of the Ray process")
+@click.option(
+    "--object-spill-directory",
+    required=False,
+    type=str,
+    help=("spill objects to files in this directory when the object store is "
+          "nearly full, which must also be enabled on the head node"))
+@click.option(
+    "--object-spill-bandwidth",
+    required=False,
+    type=int,
+    help="the max number of bytes spilled per second by the object store")
 @click.option(
     "--internal-config",
     default=None,
@@ -222,7 +233,8 @@ def start(node_ip_address, redis_address, redis_port, num_redis_shards,
           num_gpus, resources, head, no_ui, block, plasma_directory,
           huge_pages, autoscaling_config, no_redirect_worker_output,
           no_redirect_output, plasma_store_socket_name, raylet_socket_name,
-          temp_dir, internal_config):
+          temp_dir, object_spill_directory, object_spill_bandwidth,
+          internal_config):
     # Convert hostnames to numerical IP address.
     if node_ip_address is not None:
         node_ip_address = services.address_to_ip(node_ip_address)
@@ -295,6 +307,8 @@ def start(node_ip_address, redis_address, redis_port, num_redis_shards,
             plasma_store_socket_name=plasma_store_socket_name,
             raylet_socket_name=raylet_socket_name,
             temp_dir=temp_dir,
+            object_spill_directory=object_spill_directory,
+            object_spill_bandwidth=object_spill_bandwidth,
             _internal_config=internal_config)
         logger.info(address_info)
         logger.info(
@@ -375,6 +389,8 @@ def start(node_ip_address, redis_address, redis_port, num_redis_shards,
             plasma_store_socket_name=plasma_store_socket_name,
             raylet_socket_name=raylet_socket_name,
             temp_dir=temp_dir,
+            object_spill_directory=object_spill_directory,
+            object_spill_bandwidth=object_spill_bandwidth,
             _internal_config=internal_config)
         logger.info(address_info)
         logger.info("\nStarted Ray on this node. If you wish to terminate the "
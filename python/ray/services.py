@@ -21,15 +21,17 @@ import pyarrow
 # Ray modules
 import ray.ray_constants
 import ray.plasma
+import ray.spill_manager
 
 from ray.tempfile_services import (
     get_ipython_notebook_path, get_logs_dir_path, get_raylet_socket_name,
     get_temp_root, new_log_monitor_log_file, new_monitor_log_file,
     new_plasma_store_log_file, new_raylet_log_file, new_redis_log_file,
-    new_webui_log_file, set_temp_root)
+    new_spill_manager_log_file, new_webui_log_file, set_temp_root)
 
 PROCESS_TYPE_MONITOR = "monitor"
 PROCESS_TYPE_LOG_MONITOR = "log_monitor"
+PROCESS_TYPE_SPILL_MANAGER = "spill_manager"
 PROCESS_TYPE_WORKER = "worker"
 PROCESS_TYPE_RAYLET = "raylet"
 PROCESS_TYPE_PLASMA_STORE = "plasma_store"
@@ -46,9 +48,9 @@ MAX_DEFAULT_MEM = 20 * 1000 * 1000 * 1000
 # to the screen.
 all_processes = OrderedDict(
     [(PROCESS_TYPE_MONITOR, []), (PROCESS_TYPE_LOG_MONITOR, []),
-     (PROCESS_TYPE_WORKER, []), (PROCESS_TYPE_RAYLET, []),
-     (PROCESS_TYPE_PLASMA_STORE, []), (PROCESS_TYPE_REDIS_SERVER, []),
-     (PROCESS_TYPE_WEB_UI, [])], )
+     (PROCESS_TYPE_SPILL_MANAGER, []), (PROCESS_TYPE_WORKER, []),
+     (PROCESS_TYPE_RAYLET, []), (PROCESS_TYPE_PLASMA_STORE, []),
+     (PROCESS_TYPE_REDIS_SERVER, []), (PROCESS_TYPE_WEB_UI, [])], )
 
 # True if processes are run in the valgrind profiler.
 RUN_RAYLET_PROFILER = False
@@ -664,7 +666,7 @@ def _start_redis_instance(node_ip_address="127.0.0.1",
     wait_for_redis_to_start("127.0.0.1", port, password=password)
     # Configure Redis to generate keyspace notifications. TODO(rkn): Change
     # this to only generate notifications for the export keys.
-    redis_client.config_set("notify-keyspace-events", "Kl")
+    redis_client.config_set("notify-keyspace-events", "Klh")
 
     # Configure Redis to not run in protected mode so that processes on other
     # hosts can connect to it. TODO(rkn): Do this in a more secure way.
@@ -757,6 +759,73 @@ def start_log_monitor(redis_address,
         password=redis_password)
 
 
+def _spilling_enabled(redis_address, redis_password=None):
+    """Whether a spill manager was started in the cluster."""
+    redis_ip_address, redis_port = redis_address.split(":")
+    redis_client = redis.StrictRedis(
+        host=redis_ip_address, port=redis_port, password=redis_password)
+    return redis_client.exists(ray.spill_manager.SPILL_MANAGERS_KEY)
+
+
+def start_spill_manager(redis_address,
+                        node_ip_address,
+                        plasma_store_socket_name,
+                        spill_directory,
+                        bandwidth=None,
+                        stdout_file=None,
+                        stderr_file=None,
+                        cleanup=cleanup,
+                        redis_password=None):
+    """Start a process that spills objects from an object store to disk.
+
+    Args:
+        redis_address (str): The address of the Redis instance.
+        node_ip_address (str): The IP address of the node that this spill
+            manager is running on.
+        plasma_store_socket_name (str): The socket of the object store.
+        spill_directory (str): The directory to spill objects to.
+        bandwidth (int): The max number of bytes spilled per second. If None,
+            this is not limited.
+        stdout_file: A file handle opened for writing to redirect stdout to. If
+            no redirection should happen, then this should be None.
+        stderr_file: A file handle opened for writing to redirect stderr to. If
+            no redirection should happen, then this should be None.
+        cleanup (bool): True if using Ray in local mode. If cleanup is true,
+            then this process will be killed by services.cleanup() when the
+            Python process that imported services exits.
+        redis_password (str): The password of the redis server.
+    """
+    # Register the spill manager before any worker of the node connects, so
+    # that the workers find the spill directory.
+    redis_ip_address, redis_port = redis_address.split(":")
+    redis_client = redis.StrictRedis(
+        host=redis_ip_address, port=redis_port, password=redis_password)
+    redis_client.hset(
+        ray.spill_manager.SPILL_MANAGERS_KEY,
+        ray.spill_manager.location(node_ip_address, plasma_store_socket_name),
+        spill_directory)
+
+    spill_manager_filepath = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "spill_manager.py")
+    command = [
+        sys.executable, "-u", spill_manager_filepath, "--redis-address",
+        redis_address, "--node-ip-address", node_ip_address,
+        "--plasma-store-socket-name", plasma_store_socket_name,
+        "--spill-directory", spill_directory
+    ]
+    if bandwidth:
+        command += ["--bandwidth", str(bandwidth)]
+    if redis_password:
+        command += ["--redis-password", redis_password]
+    p = subprocess.Popen(command, stdout=stdout_file, stderr=stderr_file)
+    if cleanup:
+        all_processes[PROCESS_TYPE_SPILL_MANAGER].append(p)
+    record_log_files_in_redis(
+        redis_address,
+        node_ip_address, [stdout_file, stderr_file],
+        password=redis_password)
+
+
 def start_ui(redis_address, stdout_file=None, stderr_file=None, cleanup=True):
     """Start a UI process.
 
@@ -1304,6 +1373,8 @@ def start_ray_processes(address_info=None,
                         plasma_store_socket_name=None,
                         raylet_socket_name=None,
                         temp_dir=None,
+                        object_spill_directory=None,
+                        object_spill_bandwidth=None,
                         _internal_config=None):
     """Helper method to start Ray processes.
 
@@ -1377,6 +1448,12 @@ def start_ray_processes(address_info=None,
             used by the raylet process.
         temp_dir (str): If provided, it will specify the root temporary
             directory for the Ray process.
+        object_spill_directory (str): If provided, objects are spilled from
+            the object stores to files in this directory when the stores are
+            nearly full. If this is not the head node, spilling must be
+            enabled on the head node as well.
+        object_spill_bandwidth (int): The max number of bytes spilled per
+            second by each object store. If None, this is not limited.
         _internal_config (str): JSON configuration for overriding
             RayConfig defaults. For testing purposes ONLY.
 
@@ -1422,6 +1499,15 @@ def start_ray_processes(address_info=None,
     # should address the warnings.
     redis_address = address_info.get("redis_address")
     redis_shards = address_info.get("redis_shards", [])
+    if object_spill_directory is not None:
+        object_spill_directory = os.path.abspath(object_spill_directory)
+        # Workers only pin the arguments of their tasks if objects are
+        # spilled when they connect, so spilling must be enabled when the
+        # cluster starts.
+        if redis_address is not None and not _spilling_enabled(
+                redis_address, redis_password):
+            raise Exception("Object spilling can only be enabled on this "
+                            "node if it is enabled on the head node.")
     if redis_address is None:
         redis_address, redis_shards = start_redis(
             node_ip_address,
@@ -1514,6 +1600,21 @@ def start_ray_processes(address_info=None,
         object_store_addresses.append(object_store_address)
         time.sleep(0.1)
 
+        # Start the spill manager of the object store, if necessary.
+        if object_spill_directory is not None:
+            spill_manager_stdout_file, spill_manager_stderr_file = (
+                new_spill_manager_log_file(i))
+            start_spill_manager(
+                redis_address,
+                node_ip_address,
+                object_store_address,
+                object_spill_directory,
+                bandwidth=object_spill_bandwidth,
+                stdout_file=spill_manager_stdout_file,
+                stderr_file=spill_manager_stderr_file,
+                cleanup=cleanup,
+                redis_password=redis_password)
+
     # Start any raylets that do not exist yet.
     for i in range(len(raylet_socket_names), num_local_schedulers):
         raylet_stdout_file, raylet_stderr_file = new_raylet_log_file(
@@ -1568,6 +1669,8 @@ def start_ray_node(node_ip_address,
                    plasma_store_socket_name=None,
                    raylet_socket_name=None,
                    temp_dir=None,
+                   object_spill_directory=None,
+                   object_spill_bandwidth=None,
                    _internal_config=None):
     """Start the Ray processes for a single node.
 
@@ -1612,6 +1715,12 @@ def start_ray_node(node_ip_address,
             used by the raylet process.
         temp_dir (str): If provided, it will specify the root temporary
             directory for the Ray process.
+        object_spill_directory (str): If provided, objects are spilled from
+            the object stores to files in this directory when the stores are
+            nearly full. Spilling must be enabled on the head node as
+            well.
+        object_spill_bandwidth (int): The max number of bytes spilled per
+            second by each object store. If None, this is not limited.
         _internal_config (str): JSON configuration for overriding
             RayConfig defaults. For testing purposes ONLY.
 
@@ -1642,6 +1751,8 @@ def start_ray_node(node_ip_address,
         plasma_store_socket_name=plasma_store_socket_name,
         raylet_socket_name=raylet_socket_name,
         temp_dir=temp_dir,
+        object_spill_directory=object_spill_directory,
+        object_spill_bandwidth=object_spill_bandwidth,
         _internal_config=_internal_config)
 
 
@@ -1672,6 +1783,8 @@ def start_ray_head(address_info=None,
                    plasma_store_socket_name=None,
                    raylet_socket_name=None,
                    temp_dir=None,
+                   object_spill_directory=None,
+                   object_spill_bandwidth=None,
                    _internal_config=None):
     """Start Ray in local mode.
 
@@ -1738,6 +1851,11 @@ def start_ray_head(address_info=None,
             used by the raylet process.
         temp_dir (str): If provided, it will specify the root temporary
             directory for the Ray process.
+        object_spill_directory (str): If provided, objects are spilled from
+            the object stores to files in this directory when the stores are
+            nearly full.
+        object_spill_bandwidth (int): The max number of bytes spilled per
+            second by each object store. If None, this is not limited.
         _internal_config (str): JSON configuration for overriding
             RayConfig defaults. For testing purposes ONLY.
 
@@ -1775,4 +1893,6 @@ def start_ray_head(address_info=None,
         plasma_store_socket_name=plasma_store_socket_name,
         raylet_socket_name=raylet_socket_name,
         temp_dir=temp_dir,
+        object_spill_directory=object_spill_directory,
+        object_spill_bandwidth=object_spill_bandwidth,
         _internal_config=_internal_config)
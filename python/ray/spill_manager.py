@@ -0,0 +1,659 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import binascii
+import errno
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+
+import pyarrow
+import pyarrow.plasma as plasma
+import redis
+
+import ray.ray_constants as ray_constants
+import ray.utils
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+# The number of bytes written or read at once when spilling or restoring.
+_CHUNK_SIZE = 8 * 1024 * 1024
+
+# The bounds of the interval at which restore_objects checks whether objects
+# restored by other processes are back in the object stores.
+_MIN_RESTORE_INTERVAL_S = 0.001
+_MAX_RESTORE_INTERVAL_S = 0.1
+
+# The Redis keys below are all in the primary shard.
+
+# A hash from the location of each spill manager, see location(), to its
+# spill directory. Workers find the spill directory of their node here, and
+# only pin the arguments of their tasks if it is not empty.
+SPILL_MANAGERS_KEY = b"SpillManagers"
+
+# A hash from the ID of each spilled object to the location of the spill
+# manager that spilled it. The object is restored by this spill manager,
+# unless the file is in the spill directory of the restoring node as well.
+SPILLED_OBJECTS_KEY = b"SpilledObjects"
+
+# A hash that counts, for each object, the submitted tasks that have the
+# object as an argument and have not fetched it yet. These objects are not
+# spilled, since the raylet would try to reconstruct them instead of
+# restoring them. The objects pinned by each task are kept in a set under
+# TASK_PINS_PREFIX + task ID, and the tasks of each driver that have pins in
+# a set under DRIVER_PINS_PREFIX + driver ID.
+PINNED_OBJECTS_KEY = b"SpillPinnedObjects"
+TASK_PINS_PREFIX = b"SpillTaskPins:"
+DRIVER_PINS_PREFIX = b"SpillDriverPins:"
+
+# KEYS: the pinned objects, the task pins and the driver pins.
+# ARGV: the task ID, followed by the object IDs.
+_PIN_SCRIPT = """
+for i = 2, #ARGV do
+    if redis.call("SADD", KEYS[2], ARGV[i]) == 1 then
+        redis.call("HINCRBY", KEYS[1], ARGV[i], 1)
+    end
+end
+redis.call("SADD", KEYS[3], ARGV[1])
+"""
+
+# Removes the pins of a task, if it still has them.
+# KEYS: the pinned objects, the task pins and the driver pins.
+# ARGV: the task ID.
+_UNPIN_SCRIPT = """
+for _, object_id in ipairs(redis.call("SMEMBERS", KEYS[2])) do
+    if redis.call("HINCRBY", KEYS[1], object_id, -1) <= 0 then
+        redis.call("HDEL", KEYS[1], object_id)
+    end
+end
+redis.call("DEL", KEYS[2])
+redis.call("SREM", KEYS[3], ARGV[1])
+"""
+
+# Records that an object is spilled, unless it is pinned. This is atomic
+# with pinning, so a task that pins the object afterwards finds it in the
+# spilled objects and restores it.
+# KEYS: the pinned objects and the spilled objects.
+# ARGV: the object ID and the location of the spill manager.
+_MARK_SPILLED_SCRIPT = """
+if redis.call("HEXISTS", KEYS[1], ARGV[1]) == 1 then
+    return 0
+end
+redis.call("HSET", KEYS[2], ARGV[1], ARGV[2])
+return 1
+"""
+
+# Removes a spilled object, if it was spilled by the given spill manager.
+# KEYS: the spilled objects.
+# ARGV: the object ID and the location of the spill manager.
+_UNMARK_SPILLED_SCRIPT = """
+if redis.call("HGET", KEYS[1], ARGV[1]) == ARGV[2] then
+    redis.call("HDEL", KEYS[1], ARGV[1])
+end
+"""
+
+
+def location(node_ip_address, plasma_store_socket_name):
+    """Returns the location of the spill manager of an object store.
+
+    This is also the channel that the spill manager receives restore
+    requests on.
+    """
+    return "SpillManager:{}:{}".format(
+        node_ip_address, plasma_store_socket_name).encode("ascii")
+
+
+def spill_path(spill_directory, object_id):
+    """Returns the path of the file that an object is spilled to.
+
+    Args:
+        spill_directory (str): The directory that objects are spilled to.
+        object_id (plasma.ObjectID): The ID of the object.
+    """
+    return os.path.join(spill_directory,
+                        binascii.hexlify(object_id.binary()).decode("ascii"))
+
+
+def pin_task_arguments(redis_client, task_id, driver_id, object_ids):
+    """Keeps the object arguments of a submitted task from being spilled.
+
+    Args:
+        redis_client: A client of the primary Redis shard.
+        task_id (bytes): The ID of the task.
+        driver_id (bytes): The ID of the driver of the task.
+        object_ids (List[bytes]): The IDs of the object arguments.
+    """
+    redis_client.eval(_PIN_SCRIPT, 3, PINNED_OBJECTS_KEY,
+                      TASK_PINS_PREFIX + task_id,
+                      DRIVER_PINS_PREFIX + driver_id, task_id, *object_ids)
+
+
+def unpin_task_arguments(redis_client, task_id, driver_id):
+    """Lets the object arguments of a task be spilled again.
+
+    This is a no-op if the pins of the task were already removed, so it is
+    safe for reconstructed tasks.
+
+    Args:
+        redis_client: A client of the primary Redis shard.
+        task_id (bytes): The ID of the task.
+        driver_id (bytes): The ID of the driver of the task.
+    """
+    redis_client.eval(_UNPIN_SCRIPT, 3, PINNED_OBJECTS_KEY,
+                      TASK_PINS_PREFIX + task_id,
+                      DRIVER_PINS_PREFIX + driver_id, task_id)
+
+
+def unpin_driver_tasks(redis_client, driver_id):
+    """Removes the pins of the tasks of a driver that never fetched them.
+
+    Args:
+        redis_client: A client of the primary Redis shard.
+        driver_id (bytes): The ID of the driver.
+    """
+    for task_id in redis_client.smembers(DRIVER_PINS_PREFIX + driver_id):
+        unpin_task_arguments(redis_client, task_id, driver_id)
+    redis_client.delete(DRIVER_PINS_PREFIX + driver_id)
+
+
+def restore_objects(redis_client,
+                    plasma_client,
+                    spill_directory,
+                    object_ids,
+                    timeout=ray_constants.OBJECT_SPILL_RESTORE_TIMEOUT_S):
+    """Restores spilled objects to the object stores.
+
+    The objects whose files are in the given spill directory are restored to
+    the local object store. The others are restored by the spill managers
+    that spilled them, to their own object stores, from which the object
+    manager fetches them. Objects that are being deleted from a store as
+    they are spilled are restored once they are gone.
+
+    Args:
+        redis_client: A client of the primary Redis shard.
+        plasma_client: A client of the local object store.
+        spill_directory (str): The spill directory of this node, or None if
+            objects are not spilled on this node.
+        object_ids (List[plasma.ObjectID]): The IDs of the objects to
+            restore. Objects that were not spilled are skipped.
+        timeout (float): The max number of seconds to wait for other
+            processes to restore objects.
+
+    Returns:
+        The list of IDs of the objects that were restored to the local store.
+    """
+    restored = []
+    deadline = time.time() + timeout
+    interval = _MIN_RESTORE_INTERVAL_S
+    spilled = _spilled_locations(redis_client, object_ids)
+    while spilled:
+        if spill_directory is not None:
+            done, missing = _restore_from_files(redis_client, plasma_client,
+                                                spill_directory, spilled)
+            restored.extend(done)
+        else:
+            missing = spilled
+        skipped = _request_restores(redis_client, missing)
+        skipped.update(object_id.binary() for object_id in restored)
+        object_ids = [
+            object_id for object_id, _ in spilled
+            if object_id.binary() not in skipped
+        ]
+        if not object_ids:
+            break
+        if time.time() + interval > deadline:
+            logger.warning("Timed out waiting for {} spilled objects to be "
+                           "restored.".format(len(object_ids)))
+            break
+        # Wait for the objects restored by other processes, or deleted from
+        # the stores by their spill managers.
+        time.sleep(interval)
+        interval = min(2 * interval, _MAX_RESTORE_INTERVAL_S)
+        spilled = _spilled_locations(redis_client, object_ids)
+    return restored
+
+
+def _spilled_locations(redis_client, object_ids):
+    """Returns the (ID, spill manager location) of the spilled objects."""
+    if not object_ids:
+        return []
+    locations = redis_client.hmget(
+        SPILLED_OBJECTS_KEY, [object_id.binary() for object_id in object_ids])
+    return [(object_id, spill_manager)
+            for object_id, spill_manager in zip(object_ids, locations)
+            if spill_manager is not None]
+
+
+def _request_restores(redis_client, spilled):
+    """Asks the spill managers of spilled objects to restore them.
+
+    Args:
+        redis_client: A client of the primary Redis shard.
+        spilled: The (ID, spill manager location) of the spilled objects.
+
+    Returns:
+        The set of IDs of the objects whose spill managers are gone.
+    """
+    requests = {}
+    for object_id, spill_manager in spilled:
+        requests.setdefault(spill_manager, []).append(object_id.binary())
+    lost = set()
+    for spill_manager, object_ids in requests.items():
+        if redis_client.publish(spill_manager, b"".join(object_ids)) == 0:
+            # The spill manager exited, and removed its files.
+            logger.warning("Can't restore {} objects spilled by {}, which "
+                           "is gone.".format(
+                               len(object_ids),
+                               ray.utils.decode(spill_manager)))
+            lost.update(object_ids)
+    return lost
+
+
+def _restore_from_files(redis_client, plasma_client, spill_directory, spilled):
+    """Restores spilled objects from the files in a directory.
+
+    Objects that are in the store are skipped, since they may still be
+    deleted by the spill manager or sealed by another restoring process, and
+    so are objects that don't fit in the store. The file of a restored
+    object is removed, since it is spilled again if needed.
+
+    Args:
+        redis_client: A client of the primary Redis shard.
+        plasma_client: A client of the object store to restore to.
+        spill_directory (str): The directory that objects are spilled to.
+        spilled: The (ID, spill manager location) of the spilled objects.
+
+    Returns:
+        The list of IDs of the restored objects, and the list of (ID,
+        location) of the objects that have no file in the directory.
+    """
+    restored = []
+    missing = []
+    for object_id, spill_manager in spilled:
+        path = spill_path(spill_directory, object_id)
+        try:
+            spill_file = open(path, "rb")
+        except IOError as e:
+            if e.errno == errno.ENOENT:
+                missing.append((object_id, spill_manager))
+                continue
+            raise
+        with spill_file:
+            size = os.fstat(spill_file.fileno()).st_size
+            try:
+                buf = plasma_client.create(object_id, size)
+            except pyarrow.PlasmaObjectExists:
+                continue
+            except pyarrow.PlasmaStoreFull:
+                # The spill manager of the store may make room for it.
+                logger.warning("The object store is too full to restore an "
+                               "object of {} bytes.".format(size))
+                continue
+            stream = pyarrow.FixedSizeBufferWriter(buf)
+            while True:
+                chunk = spill_file.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+                stream.write(chunk)
+            plasma_client.seal(object_id)
+            # The object can't be spilled again before it is released, so
+            # this does not remove a newer location.
+            redis_client.eval(_UNMARK_SPILLED_SCRIPT, 1, SPILLED_OBJECTS_KEY,
+                              object_id.binary(), spill_manager)
+            del stream, buf
+        _remove_file(path)
+        restored.append(object_id)
+    return restored, missing
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+
+class SpillManager(object):
+    """Spills objects from an object store to disk when it is nearly full.
+
+    When the objects in the store use more than a fraction of its capacity,
+    or when the memory of the node is nearly used up, the objects that are
+    not in use are written to files, oldest first, and deleted from the
+    store. The spilled objects are recorded in Redis, and ray.get restores
+    them (see restore_objects). Objects spilled on other nodes are restored
+    by their spill managers, which serve restore requests from a background
+    thread, unless the spill directory is shared by the nodes.
+
+    The raylet does not restore the arguments of tasks, so objects are not
+    spilled while submitted tasks depend on them (see pin_task_arguments),
+    and submitting a task restores its spilled arguments. Objects that are
+    only needed by ray.wait are not restored and may be reconstructed
+    instead.
+
+    Attributes:
+        redis_client: A client of the primary Redis shard.
+        plasma_client: A client of the object store.
+        location (bytes): The location of this spill manager, see
+            location().
+        spill_directory (str): The directory that objects are spilled to.
+        capacity (int): The capacity of the object store in bytes.
+        spilled: The IDs of the objects spilled by this spill manager, whose
+            files are removed when it exits.
+    """
+
+    def __init__(self,
+                 redis_ip_address,
+                 redis_port,
+                 node_ip_address,
+                 plasma_store_socket_name,
+                 spill_directory,
+                 high_watermark=ray_constants.OBJECT_SPILL_HIGH_WATERMARK,
+                 low_watermark=ray_constants.OBJECT_SPILL_LOW_WATERMARK,
+                 memory_threshold=ray_constants.OBJECT_SPILL_MEMORY_THRESHOLD,
+                 bandwidth=0,
+                 redis_password=None):
+        """Initialize the spill manager.
+
+        Args:
+            redis_ip_address (str): The IP address of the primary Redis
+                shard.
+            redis_port (int): The port of the primary Redis shard.
+            node_ip_address (str): The IP address of this node.
+            plasma_store_socket_name (str): The socket of the object store.
+            spill_directory (str): The directory to spill objects to.
+            high_watermark (float): Spill objects once they use more than
+                this fraction of the store capacity.
+            low_watermark (float): The fraction of the store capacity to
+                spill down to.
+            memory_threshold (float): Also spill objects once more than this
+                fraction of the node memory is used. This requires psutil.
+            bandwidth (int): The max number of bytes written per second, or
+                0 for no limit.
+            redis_password (str): The password of the Redis server.
+        """
+        assert 0 <= low_watermark <= high_watermark <= 1
+        self.redis_client = redis.StrictRedis(
+            host=redis_ip_address, port=redis_port, password=redis_password)
+        self.plasma_store_socket_name = plasma_store_socket_name
+        self.plasma_client = plasma.connect(plasma_store_socket_name, "", 0)
+        self.location = location(node_ip_address, plasma_store_socket_name)
+        self.spill_directory = spill_directory
+        self.capacity = self.plasma_client.store_capacity()
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        self.memory_threshold = memory_threshold
+        self.bandwidth = bandwidth
+        self.spilled = set()
+        # The time at which the bytes written so far may have been written
+        # under the bandwidth limit.
+        self._write_deadline = time.time()
+        if not os.path.isdir(spill_directory):
+            os.makedirs(spill_directory)
+
+        self.restore_requests = self.redis_client.pubsub()
+        self.restore_requests.subscribe(self.location)
+        # Wait for the subscription to be confirmed, so that no request for
+        # an object spilled from now on is missed.
+        next(self.restore_requests.listen())
+
+    def memory_pressure(self):
+        """Whether more than memory_threshold of the node memory is used."""
+        if psutil is None:
+            return False
+        memory = psutil.virtual_memory()
+        return memory.total - memory.available > (
+            memory.total * self.memory_threshold)
+
+    def pinned(self, object_ids):
+        """Returns the set of the given objects that tasks depend on."""
+        if not object_ids:
+            return set()
+        counts = self.redis_client.hmget(
+            PINNED_OBJECTS_KEY,
+            [object_id.binary() for object_id in object_ids])
+        return {
+            object_id
+            for object_id, count in zip(object_ids, counts) if count
+        }
+
+    def objects_to_spill(self, objects, under_pressure=False):
+        """Picks the objects to spill.
+
+        Args:
+            objects (dict): The objects in the store, as returned by
+                plasma_client.list().
+            under_pressure (bool): Whether the node is low on memory, in
+                which case objects are spilled down to the low watermark
+                even if the store is not above the high watermark.
+
+        Returns:
+            The IDs and sizes of the objects to spill, oldest first.
+        """
+        used = sum(info["data_size"] + info["metadata_size"]
+                   for info in objects.values())
+        if not under_pressure and used <= self.high_watermark * self.capacity:
+            return []
+
+        candidates = {
+            object_id: info
+            for object_id, info in objects.items()
+            if info["state"] == "sealed" and info["ref_count"] == 0
+        }
+        pinned = self.pinned(list(candidates))
+        candidates = sorted(
+            (info["create_time"], object_id.binary(), object_id,
+             info["data_size"] + info["metadata_size"])
+            for object_id, info in candidates.items()
+            if object_id not in pinned)
+        to_spill = []
+        for _, _, object_id, size in candidates:
+            if used <= self.low_watermark * self.capacity:
+                break
+            to_spill.append((object_id, size))
+            used -= size
+        return to_spill
+
+    def spill(self, object_id):
+        """Writes an object to a file and deletes it from the store.
+
+        Returns:
+            True if the object was spilled, and False if it was deleted from
+            the store since it was listed, or if it is now in use or a task
+            now depends on it.
+        """
+        path = spill_path(self.spill_directory, object_id)
+        # The object may have been restored from a file that still exists.
+        if not os.path.exists(path):
+            [buf] = self.plasma_client.get_buffers([object_id], timeout_ms=0)
+            if buf is None:
+                return False
+            data = memoryview(buf)
+            temp_path = "{}.{}.tmp".format(path, os.getpid())
+            with open(temp_path, "wb") as spill_file:
+                for i in range(0, len(data), _CHUNK_SIZE):
+                    chunk = data[i:i + _CHUNK_SIZE]
+                    spill_file.write(chunk)
+                    self._throttle(len(chunk))
+            # Release the object before deleting it.
+            del data, buf
+            # Rename the complete file, so that partial files are never
+            # restored.
+            os.rename(temp_path, path)
+        self.spilled.add(object_id.binary())
+        # A task that depends on the object may have been submitted while
+        # it was written. Tasks submitted from now on restore it.
+        if not self.redis_client.eval(_MARK_SPILLED_SCRIPT, 2,
+                                      PINNED_OBJECTS_KEY, SPILLED_OBJECTS_KEY,
+                                      object_id.binary(), self.location):
+            return False
+        self.plasma_client.delete([object_id])
+        # Objects that are in use are not deleted.
+        if self.plasma_client.contains(object_id):
+            self.redis_client.eval(
+                _UNMARK_SPILLED_SCRIPT, 1, SPILLED_OBJECTS_KEY,
+                object_id.binary(), self.location)
+            return False
+        return True
+
+    def _throttle(self, num_bytes):
+        """Sleeps as needed to write at most bandwidth bytes per second."""
+        if not self.bandwidth:
+            return
+        now = time.time()
+        self._write_deadline = (
+            max(self._write_deadline, now) + num_bytes / self.bandwidth)
+        if self._write_deadline > now:
+            time.sleep(self._write_deadline - now)
+
+    def check_and_spill(self):
+        """Spill objects if the store or the node are running out of memory.
+
+        Returns:
+            The number of bytes spilled.
+        """
+        under_pressure = self.memory_pressure()
+        num_bytes = 0
+        for object_id, size in self.objects_to_spill(self.plasma_client.list(),
+                                                     under_pressure):
+            if self.spill(object_id):
+                num_bytes += size
+        if num_bytes > 0:
+            logger.info("Spilled {} MB of objects to {}.".format(
+                round(num_bytes / 1e6, 2), self.spill_directory))
+        return num_bytes
+
+    def serve_restore_requests(self):
+        """Restores the objects that other nodes request, forever.
+
+        The requests are messages on the channel named after the location
+        of this spill manager, made of the IDs of the requested objects.
+        """
+        # The plasma client of the spill manager is used by the main thread.
+        plasma_client = plasma.connect(self.plasma_store_socket_name, "", 0)
+        id_size = ray_constants.ID_SIZE
+        for message in self.restore_requests.listen():
+            if message["type"] != "message":
+                continue
+            data = message["data"]
+            object_ids = [
+                plasma.ObjectID(data[i:i + id_size])
+                for i in range(0, len(data), id_size)
+            ]
+            try:
+                _restore_from_files(
+                    self.redis_client, plasma_client, self.spill_directory,
+                    _spilled_locations(self.redis_client, object_ids))
+            except Exception:
+                # The requesters time out instead.
+                logger.exception("Failed to restore objects.")
+
+    def cleanup(self):
+        """Removes the files written by this spill manager."""
+        for object_id in self.spilled:
+            _remove_file(
+                spill_path(self.spill_directory, plasma.ObjectID(object_id)))
+            self.redis_client.eval(_UNMARK_SPILLED_SCRIPT, 1,
+                                   SPILLED_OBJECTS_KEY, object_id,
+                                   self.location)
+        self.spilled = set()
+
+    def run(self):
+        """Run the spill manager.
+
+        This checks the memory usage of the store every
+        ray_constants.OBJECT_SPILL_CHECK_INTERVAL_S seconds, and serves
+        restore requests from a background thread.
+        """
+        t = threading.Thread(
+            target=self.serve_restore_requests,
+            name="ray_spill_manager_restore_requests")
+        # Making the thread a daemon causes it to exit when the main thread
+        # exits.
+        t.daemon = True
+        t.start()
+        while True:
+            self.check_and_spill()
+            time.sleep(ray_constants.OBJECT_SPILL_CHECK_INTERVAL_S)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=("Parse the object store socket and the spill directory "
+                     "for the spill manager."))
+    parser.add_argument(
+        "--redis-address",
+        required=True,
+        type=str,
+        help="The address to use for Redis.")
+    parser.add_argument(
+        "--redis-password",
+        required=False,
+        type=str,
+        default=None,
+        help="the password to use for Redis")
+    parser.add_argument(
+        "--node-ip-address",
+        required=True,
+        type=str,
+        help="The IP address of the node.")
+    parser.add_argument(
+        "--plasma-store-socket-name",
+        required=True,
+        type=str,
+        help="The socket name of the object store to spill objects from.")
+    parser.add_argument(
+        "--spill-directory",
+        required=True,
+        type=str,
+        help="The directory to spill objects to.")
+    parser.add_argument(
+        "--bandwidth",
+        required=False,
+        type=int,
+        default=0,
+        help="The max number of bytes written per second, or 0 for no limit.")
+    parser.add_argument(
+        "--logging-level",
+        required=False,
+        type=str,
+        default=ray_constants.LOGGER_LEVEL,
+        choices=ray_constants.LOGGER_LEVEL_CHOICES,
+        help=ray_constants.LOGGER_LEVEL_HELP)
+    parser.add_argument(
+        "--logging-format",
+        required=False,
+        type=str,
+        default=ray_constants.LOGGER_FORMAT,
+        help=ray_constants.LOGGER_FORMAT_HELP)
+    args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.getLevelName(args.logging_level.upper()),
+        format=args.logging_format)
+
+    redis_ip_address, redis_port = args.redis_address.split(":")
+    spill_manager = SpillManager(
+        redis_ip_address,
+        int(redis_port),
+        args.node_ip_address,
+        args.plasma_store_socket_name,
+        args.spill_directory,
+        bandwidth=args.bandwidth,
+        redis_password=args.redis_password)
+
+    def handle_sigterm(signum, frame):
+        spill_manager.cleanup()
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, handle_sigterm)
+    spill_manager.run()
@@ -219,6 +219,13 @@ def new_plasma_store_log_file(local_scheduler_index, redirect_output):
     return plasma_store_stdout_file, plasma_store_stderr_file
 
 
+def new_spill_manager_log_file(local_scheduler_index):
+    """Create new logging files for the spill manager."""
+    spill_manager_stdout_file, spill_manager_stderr_file = new_log_files(
+        "spill_manager_{}".format(local_scheduler_index), redirect_output=True)
+    return spill_manager_stdout_file, spill_manager_stderr_file
+
+
 def new_monitor_log_file(redirect_output):
     """Create new logging files for the monitor."""
     monitor_stdout_file, monitor_stderr_file = new_log_files(
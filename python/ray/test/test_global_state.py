@@ -106,3 +106,58 @@ def test_add_remove_cluster_resources(cluster_start):
         nodes += [cluster.add_node(resources=dict(CPU=1))]
     assert cluster.wait_for_nodes()
     assert ray.global_state.cluster_resources()["CPU"] == 6
+
+
+@pytest.mark.skipif(
+    pytest_timeout is None,
+    reason="Timeout package not installed; skipping test that may hang.")
+@pytest.mark.timeout(20)
+def test_available_resources_view(cluster_start):
+    cluster = cluster_start
+    assert ray.global_state.available_resources()["CPU"] == 1
+
+    # Repeated queries are served from the cached views.
+    start_time = time.time()
+    for _ in range(100):
+        assert ray.global_state.cluster_resources()["CPU"] == 1
+        assert ray.global_state.available_resources()["CPU"] == 1
+    assert time.time() - start_time < 5
+
+    node = cluster.add_node(resources=dict(CPU=1))
+    assert cluster.wait_for_nodes()
+    while ray.global_state.available_resources().get("CPU") != 2:
+        time.sleep(0.1)
+
+    cluster.remove_node(node)
+    assert cluster.wait_for_nodes()
+    while ray.global_state.available_resources().get("CPU") != 1:
+        time.sleep(0.1)
+
+
+def test_task_and_object_tables(ray_start):
+    @ray.remote
+    def f():
+        return 1
+
+    object_ids = [f.remote() for _ in range(10)]
+    ray.get(object_ids)
+    driver_id = ray.worker.global_worker.task_driver_id.hex()
+
+    task_table = ray.global_state.task_table()
+    driver_tasks = dict(ray.global_state.iter_task_table(driver_id=driver_id))
+    assert len(driver_tasks) >= 10
+    for task_id, task_info in driver_tasks.items():
+        assert task_table[task_id] == task_info
+        assert task_info["TaskSpec"]["DriverID"] == driver_id
+    assert list(ray.global_state.iter_task_table(driver_id="ff" * 20)) == []
+
+    object_table = ray.global_state.object_table()
+    assert all(object_id in object_table for object_id in object_ids)
+    task_ids = {
+        ray.raylet.compute_task_id(object_id).id()
+        for object_id in object_ids
+    }
+    objects = dict(ray.global_state.iter_object_table(task_ids=task_ids))
+    assert set(objects) == set(object_ids)
+    for object_id, object_info in objects.items():
+        assert object_table[object_id] == object_info
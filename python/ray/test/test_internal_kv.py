@@ -0,0 +1,82 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+
+import pytest
+
+import ray
+from ray.experimental import internal_kv
+
+
+@pytest.fixture
+def ray_start_sharded():
+    # Start the Ray processes.
+    ray.init(num_cpus=1, num_redis_shards=3)
+    yield None
+    # The code after the yield will run as teardown code.
+    ray.shutdown()
+
+
+def test_multi_put_get(ray_start_sharded):
+    keys = [("key{}".format(i)).encode("ascii") for i in range(20)]
+    values = [("value{}".format(i)).encode("ascii") for i in range(20)]
+
+    assert internal_kv._internal_kv_multi_put(list(zip(
+        keys, values))) == [False] * 20
+    assert internal_kv._internal_kv_multi_get(keys) == values
+    assert internal_kv._internal_kv_put(keys[0], b"new") is True
+    assert internal_kv._internal_kv_get(keys[0]) == values[0]
+    assert internal_kv._internal_kv_put(keys[0], b"new", overwrite=True)
+    assert internal_kv._internal_kv_get(keys[0]) == b"new"
+    assert internal_kv._internal_kv_get(b"missing") is None
+
+    # The keys are spread over the shards.
+    redis_clients = ray.worker.global_state.redis_clients
+    for key in keys:
+        index = internal_kv._shard_index(key, len(redis_clients))
+        assert redis_clients[index].hget(key, "value") is not None
+    assert len(
+        {internal_kv._shard_index(key, len(redis_clients))
+         for key in keys}) == len(redis_clients)
+
+
+def test_cache_invalidation(ray_start_sharded):
+    assert internal_kv._internal_kv_get(b"key", cached=True) is None
+    # Local writes are visible immediately.
+    internal_kv._internal_kv_put(b"key", b"1")
+    assert internal_kv._internal_kv_get(b"key", cached=True) == b"1"
+
+    @ray.remote
+    def put(value):
+        internal_kv._internal_kv_put(b"key", value, overwrite=True)
+
+    # Writes of other workers are visible once their notification arrives.
+    ray.get(put.remote(b"2"))
+    start_time = time.time()
+    while internal_kv._internal_kv_get(b"key", cached=True) != b"2":
+        assert time.time() - start_time < 10
+        time.sleep(0.1)
+
+
+def test_named_actor_lookups(ray_start_sharded):
+    @ray.remote
+    class Counter(object):
+        def __init__(self):
+            self.x = 0
+
+        def inc(self):
+            self.x += 1
+            return self.x
+
+    with pytest.raises(ValueError):
+        ray.experimental.get_actor("counter")
+    ray.experimental.register_actor("counter", Counter.remote())
+
+    @ray.remote
+    def inc():
+        return ray.get(ray.experimental.get_actor("counter").inc.remote())
+
+    assert sorted(ray.get([inc.remote() for _ in range(10)])) == list(
+        range(1, 11))
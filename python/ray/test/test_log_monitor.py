@@ -0,0 +1,237 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+import ray.ray_constants as ray_constants
+from ray.log_monitor import LogMonitor, _Inotify
+
+# These tests use temporary log files, and a fake Redis client that records
+# the commands of its pipelines.
+
+
+class _FakePipeline(object):
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.commands = []
+
+    def rpush(self, key, *values):
+        self.commands.append(("rpush", key, list(values)))
+
+    def ltrim(self, key, start, end):
+        self.commands.append(("ltrim", key, start, end))
+
+    def execute(self):
+        self.redis_client.executed.append(self.commands)
+
+
+class _FakeRedis(object):
+    def __init__(self):
+        self.log_filenames = []
+        self.executed = []
+
+    def lrange(self, key, start, end):
+        return self.log_filenames[start:]
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+
+class _FakeInotify(object):
+    def __init__(self, modified_files):
+        self.modified_files = modified_files
+        self.paths = set()
+
+    def add_watch(self, path):
+        self.paths.add(path)
+
+    def wait(self, timeout):
+        return self.modified_files
+
+
+@pytest.fixture
+def log_dir():
+    directory = tempfile.mkdtemp()
+    yield directory
+    shutil.rmtree(directory)
+
+
+@pytest.fixture
+def monitor():
+    monitor = LogMonitor("127.0.0.1", 6379, "1.2.3.4")
+    monitor.redis_client = _FakeRedis()
+    if monitor.inotify is not None:
+        os.close(monitor.inotify.fd)
+        monitor.inotify = None
+    yield monitor
+    for handle in monitor.log_file_handles.values():
+        handle.close()
+
+
+def _log_file(log_dir, name="worker.out"):
+    return os.path.join(log_dir, name).encode("ascii")
+
+
+def _append(path, data):
+    with open(path, "ab") as f:
+        f.write(data)
+
+
+def _track(monitor, path):
+    monitor.redis_client.log_filenames.append(path)
+    monitor.update_log_filenames()
+    assert monitor.open_log_file(path)
+
+
+def test_read_new_lines(monitor, log_dir):
+    path = _log_file(log_dir)
+    _append(path, b"")
+    _track(monitor, path)
+    assert monitor.read_new_lines(path) == []
+
+    _append(path, b"a\nb\n")
+    assert monitor.read_new_lines(path) == [b"a\n", b"b\n"]
+    assert monitor.log_files[path] == 4
+    assert monitor.read_new_lines(path) == []
+
+
+def test_read_new_lines_partial_line(monitor, log_dir):
+    path = _log_file(log_dir)
+    _append(path, b"a\npart")
+    _track(monitor, path)
+    assert monitor.read_new_lines(path) == [b"a\n"]
+    assert monitor.partial_lines[path] == b"part"
+
+    _append(path, b"ial")
+    assert monitor.read_new_lines(path) == []
+    _append(path, b"\nc")
+    assert monitor.read_new_lines(path) == [b"partial\n"]
+    assert monitor.partial_lines[path] == b"c"
+
+
+def test_read_new_lines_truncation(monitor, log_dir):
+    path = _log_file(log_dir)
+    _append(path, b"old line\nold partial")
+    _track(monitor, path)
+    assert monitor.read_new_lines(path) == [b"old line\n"]
+
+    with open(path, "wb") as f:
+        f.write(b"new\n")
+    assert monitor.read_new_lines(path) == [b"new\n"]
+    assert path not in monitor.partial_lines
+    assert monitor.log_files[path] == 4
+
+
+def test_read_new_lines_max_bytes(monitor, log_dir, monkeypatch):
+    monkeypatch.setattr(ray_constants, "LOG_MONITOR_MAX_READ_BYTES", 4)
+    path = _log_file(log_dir)
+    _append(path, b"ab\ncd\n")
+    _track(monitor, path)
+    monitor.files_to_check.clear()
+    assert monitor.read_new_lines(path) == [b"ab\n"]
+    # The rest of the file is read on the next check
+    assert path in monitor.files_to_check
+    assert monitor.read_new_lines(path) == [b"cd\n"]
+
+    # Lines longer than the max read size are pushed in pieces
+    _append(path, b"0123456789\n")
+    assert monitor.read_new_lines(path) == [b"0123"]
+    assert monitor.read_new_lines(path) == [b"4567"]
+    assert monitor.read_new_lines(path) == [b"89\n"]
+
+
+def test_push_updates(monitor, log_dir):
+    paths = [_log_file(log_dir, "a.out"), _log_file(log_dir, "b.out")]
+    _append(paths[0], b"a\n")
+    _append(paths[1], b"partial")
+    monitor.redis_client.log_filenames.extend(paths)
+    monitor.update_log_filenames()
+    monitor.check_log_files_and_push_updates()
+
+    key = "LOGFILE:1.2.3.4:{}".format(paths[0].decode("ascii"))
+    assert monitor.redis_client.executed == [[
+        ("rpush", key, [b"a\n"]),
+        ("ltrim", key, -ray_constants.LOG_MONITOR_MAX_LINES_PER_FILE, -1),
+    ]]
+
+    # Nothing is pushed if there are no new complete lines
+    monitor.check_log_files_and_push_updates()
+    assert len(monitor.redis_client.executed) == 1
+
+
+def test_inotify_overflow_checks_all_files(monitor, log_dir):
+    paths = [_log_file(log_dir, "a.out"), _log_file(log_dir, "b.out")]
+    for path in paths:
+        _append(path, b"")
+    monitor.inotify = _FakeInotify(set())
+    monitor.redis_client.log_filenames.extend(paths)
+    monitor.update_log_filenames()
+    monitor.check_log_files_and_push_updates()
+    assert monitor.inotify.paths == set(paths)
+
+    monitor.wait_for_changes(0)
+    assert monitor.files_to_check == set()
+    monitor.inotify.modified_files = None
+    monitor.wait_for_changes(0)
+    assert monitor.files_to_check == set(paths)
+
+
+def _pipe_inotify(paths, events):
+    """Returns an _Inotify that reads the given events from a pipe."""
+    inotify = _Inotify.__new__(_Inotify)
+    inotify.fd, write_fd = os.pipe()
+    inotify.paths = paths
+    data = b""
+    for watch_descriptor, mask, name in events:
+        data += _Inotify._EVENT.pack(watch_descriptor, mask, 0, len(name))
+        data += name
+    os.write(write_fd, data)
+    os.close(write_fd)
+    return inotify
+
+
+def test_inotify_parses_events():
+    paths = {1: b"a", 2: b"b", 3: b"c"}
+    inotify = _pipe_inotify(paths, [
+        (1, _Inotify.IN_MODIFY, b""),
+        (3, _Inotify.IN_MODIFY, b"name\0\0\0\0"),
+        (4, _Inotify.IN_MODIFY, b""),
+    ])
+    try:
+        assert inotify.wait(0) == {b"a", b"c"}
+    finally:
+        os.close(inotify.fd)
+
+
+def test_inotify_overflow():
+    paths = {1: b"a"}
+    inotify = _pipe_inotify(paths, [
+        (1, _Inotify.IN_MODIFY, b""),
+        (-1, _Inotify.IN_Q_OVERFLOW, b""),
+    ])
+    try:
+        assert inotify.wait(0) is None
+    finally:
+        os.close(inotify.fd)
+
+
+@pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="inotify is Linux only")
+def test_inotify(log_dir):
+    path = _log_file(log_dir)
+    _append(path, b"")
+    inotify = _Inotify()
+    try:
+        inotify.add_watch(path)
+        assert inotify.wait(0) == set()
+        _append(path, b"a\n")
+        assert inotify.wait(1) == {path}
+        assert inotify.wait(0) == set()
+    finally:
+        os.close(inotify.fd)
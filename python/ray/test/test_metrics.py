@@ -0,0 +1,105 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import math
+import time
+
+import pytest
+
+import ray
+import ray.metrics as metrics
+
+
+@pytest.fixture
+def ray_start():
+    # Start the Ray processes.
+    ray.init(num_cpus=1)
+    yield None
+    # The code after the yield will run as teardown code.
+    ray.shutdown()
+
+
+def test_registry():
+    registry = metrics.MetricsRegistry()
+    registry.counter("calls").inc()
+    registry.counter("calls").inc(2)
+    registry.gauge("pending").set(3)
+    registry.histogram("latency", buckets=[1, 2]).observe(1.5)
+
+    snapshot = registry.snapshot()
+    assert snapshot["calls"]["value"] == 3
+    assert snapshot["pending"]["value"] == 3
+    assert snapshot["latency"]["counts"] == [0, 1, 0]
+    assert snapshot["latency"]["sum"] == 1.5
+
+    with pytest.raises(ValueError):
+        registry.gauge("calls")
+
+
+def test_merge_and_quantile():
+    snapshots = []
+    for values in [[0.5, 1.5], [1.5, 2.5, 3.5, 3.5]]:
+        registry = metrics.MetricsRegistry()
+        registry.counter("calls").inc(len(values))
+        histogram = registry.histogram("latency", buckets=[1, 2, 3])
+        for value in values:
+            histogram.observe(value)
+        snapshots.append(registry.snapshot())
+
+    merged = metrics.merge_snapshots(snapshots)
+    assert merged["calls"]["value"] == 6
+    assert merged["latency"]["counts"] == [1, 2, 1, 2]
+    assert merged["latency"]["count"] == 6
+    # The inputs are not modified
+    assert snapshots[0]["latency"]["counts"] == [1, 1, 0, 0]
+
+    assert metrics.quantile(merged["latency"], 0.5) == 2
+    assert metrics.quantile(merged["latency"], 0.25) == 1.25
+    assert metrics.quantile(merged["latency"], 0.99) == 3
+    empty = metrics.MetricsRegistry().histogram("empty").snapshot()
+    assert math.isnan(metrics.quantile(empty, 0.5))
+
+
+def test_to_text():
+    registry = metrics.MetricsRegistry()
+    registry.counter("calls", "Number of calls.").inc(2)
+    registry.histogram("latency", buckets=[1]).observe(0.5)
+
+    text = metrics.to_text(registry.snapshot(), {"node": "1.2.3.4"})
+    assert text.splitlines() == [
+        "# HELP calls Number of calls.",
+        "# TYPE calls counter",
+        'calls{node="1.2.3.4"} 2',
+        "# TYPE latency histogram",
+        'latency_bucket{node="1.2.3.4",le="1.0"} 1',
+        'latency_bucket{node="1.2.3.4",le="+Inf"} 1',
+        'latency_sum{node="1.2.3.4"} 0.5',
+        'latency_count{node="1.2.3.4"} 1',
+    ]
+
+
+def test_global_state_metrics(ray_start):
+    @ray.remote
+    def f(x):
+        return x
+
+    ray.get([f.remote(ray.put(i)) for i in range(10)])
+
+    worker = ray.worker.global_worker
+    metrics.push_metrics(worker.redis_client, worker.node_ip_address,
+                         worker.worker_id, 60)
+    node_ip_address = worker.node_ip_address
+    # The workers push their metrics periodically
+    start_time = time.time()
+    while True:
+        node_metrics = ray.global_state.metrics()[node_ip_address]
+        if ("ray_task_execute_seconds" in node_metrics
+                and node_metrics["ray_task_execute_seconds"]["count"] >= 10):
+            break
+        assert time.time() - start_time < 30
+        time.sleep(1)
+
+    assert node_metrics["ray_tasks_submitted"]["value"] >= 10
+    assert node_metrics["ray_put_bytes"]["count"] >= 10
+    assert node_metrics["ray_get_seconds"]["count"] >= 11
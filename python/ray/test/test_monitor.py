@@ -0,0 +1,201 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import pytest
+
+import ray
+import ray.gcs_utils
+from ray.monitor import Monitor
+
+# These tests feed messages to the monitor without a Redis server. The
+# flatbuffer parsers of ray.gcs_utils are replaced with pass-through stubs,
+# so that the message data can be made of the stub classes below.
+
+
+class _GcsTableEntry(object):
+    def __init__(self, entries):
+        self.entries = entries
+
+    @staticmethod
+    def GetRootAsGcsTableEntry(data, offset):
+        return data
+
+    def EntriesLength(self):
+        return len(self.entries)
+
+    def Entries(self, i):
+        return self.entries[i]
+
+
+class _HeartbeatBatch(object):
+    def __init__(self, heartbeats):
+        self.heartbeats = heartbeats
+
+    @staticmethod
+    def GetRootAsHeartbeatBatchTableData(data, offset):
+        return data
+
+    def BatchLength(self):
+        return len(self.heartbeats)
+
+    def Batch(self, i):
+        return self.heartbeats[i]
+
+
+class _Heartbeat(object):
+    def __init__(self, client_id, available, total):
+        self.client_id = client_id
+        self.available = sorted(available.items())
+        self.total = sorted(total.items())
+
+    def ClientId(self):
+        return self.client_id
+
+    def ResourcesAvailableLabelLength(self):
+        return len(self.available)
+
+    def ResourcesAvailableLabel(self, i):
+        return self.available[i][0]
+
+    def ResourcesAvailableCapacity(self, i):
+        return self.available[i][1]
+
+    def ResourcesTotalLabelLength(self):
+        return len(self.total)
+
+    def ResourcesTotalLabel(self, i):
+        return self.total[i][0]
+
+    def ResourcesTotalCapacity(self, i):
+        return self.total[i][1]
+
+
+class _Client(object):
+    def __init__(self, client_id, is_insertion, address):
+        self.client_id = client_id
+        self.is_insertion = is_insertion
+        self.address = address
+
+    @staticmethod
+    def GetRootAsClientTableData(data, offset):
+        return data
+
+    def ClientId(self):
+        return self.client_id
+
+    def IsInsertion(self):
+        return self.is_insertion
+
+    def NodeManagerAddress(self):
+        return self.address
+
+
+class _LoadMetrics(object):
+    def __init__(self):
+        self.updates = []
+
+    def update(self, ip, static_resources, dynamic_resources):
+        self.updates.append((ip, static_resources, dynamic_resources))
+
+
+class _PubSub(object):
+    def __init__(self):
+        self.messages = []
+
+    def get_message(self):
+        if self.messages:
+            return self.messages.pop(0)
+        return None
+
+
+@pytest.fixture
+def monitor(monkeypatch):
+    monkeypatch.setattr(ray.gcs_utils, "GcsTableEntry", _GcsTableEntry)
+    monkeypatch.setattr(ray.gcs_utils, "HeartbeatBatchTableData",
+                        _HeartbeatBatch)
+    monkeypatch.setattr(ray.gcs_utils, "ClientTableData", _Client)
+    # Skip the constructor, which connects to Redis.
+    monitor = Monitor.__new__(Monitor)
+    monitor.primary_subscribe_client = _PubSub()
+    monitor.local_scheduler_id_to_ip_map = {}
+    monitor.heartbeat_resources = {}
+    monitor.resource_labels = {}
+    monitor.load_metrics = _LoadMetrics()
+    return monitor
+
+
+def _publish_clients(monitor, *clients):
+    monitor.primary_subscribe_client.messages.append({
+        "channel": ray.gcs_utils.XRAY_CLIENT_CHANNEL,
+        "data": _GcsTableEntry(list(clients))
+    })
+
+
+def _publish_heartbeats(monitor, *heartbeats):
+    monitor.primary_subscribe_client.messages.append({
+        "channel": ray.gcs_utils.XRAY_HEARTBEAT_BATCH_CHANNEL,
+        "data": _GcsTableEntry([_HeartbeatBatch(list(heartbeats))])
+    })
+
+
+def test_newest_heartbeat_per_client(monitor):
+    _publish_clients(monitor, _Client(b"a", True, b"1.1.1.1:1234"),
+                     _Client(b"b", True, b"2.2.2.2:1234"))
+    _publish_heartbeats(monitor, _Heartbeat(b"a", {b"CPU": 1}, {b"CPU": 2}),
+                        _Heartbeat(b"b", {b"CPU": 4}, {b"CPU": 4}))
+    _publish_heartbeats(monitor, _Heartbeat(b"a", {b"CPU": 0}, {b"CPU": 2}))
+    monitor.process_messages()
+
+    # The clients were added before their heartbeats were handled, and only
+    # the newest heartbeat of each client was used.
+    assert sorted(monitor.load_metrics.updates) == [
+        ("1.1.1.1", {
+            b"CPU": 2
+        }, {
+            b"CPU": 0
+        }),
+        ("2.2.2.2", {
+            b"CPU": 4
+        }, {
+            b"CPU": 4
+        }),
+    ]
+    assert monitor.primary_subscribe_client.messages == []
+
+
+def test_unchanged_heartbeat_reuses_resources(monitor):
+    _publish_clients(monitor, _Client(b"a", True, b"1.1.1.1:1234"))
+    _publish_heartbeats(monitor, _Heartbeat(b"a", {b"CPU": 1}, {b"CPU": 2}))
+    monitor.process_messages()
+    _publish_heartbeats(monitor, _Heartbeat(b"a", {b"CPU": 1}, {b"CPU": 2}))
+    monitor.process_messages()
+    _publish_heartbeats(monitor, _Heartbeat(b"a", {b"CPU": 0}, {b"CPU": 2}))
+    monitor.process_messages()
+
+    first, second, third = monitor.load_metrics.updates
+    assert second[1] is first[1] and second[2] is first[2]
+    assert third[1] == first[1] and third[2] == {b"CPU": 0}
+
+
+def test_removed_client(monitor):
+    _publish_clients(monitor, _Client(b"a", True, b"1.1.1.1:1234"),
+                     _Client(b"b", True, b"2.2.2.2:1234"))
+    _publish_heartbeats(monitor, _Heartbeat(b"a", {b"CPU": 1}, {b"CPU": 1}),
+                        _Heartbeat(b"b", {b"CPU": 1}, {b"CPU": 1}))
+    monitor.process_messages()
+    assert set(monitor.heartbeat_resources) == {b"a", b"b"}
+
+    _publish_clients(monitor, _Client(b"a", False, b"1.1.1.1:1234"))
+    _publish_heartbeats(monitor, _Heartbeat(b"a", {b"CPU": 1}, {b"CPU": 1}),
+                        _Heartbeat(b"b", {b"CPU": 0}, {b"CPU": 1}))
+    monitor.process_messages()
+
+    assert monitor.local_scheduler_id_to_ip_map == {b"b": "2.2.2.2"}
+    assert set(monitor.heartbeat_resources) == {b"b"}
+    # The heartbeat of the removed client was dropped.
+    assert monitor.load_metrics.updates[2:] == [("2.2.2.2", {
+        b"CPU": 1
+    }, {
+        b"CPU": 0
+    })]
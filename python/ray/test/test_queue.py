@@ -7,7 +7,8 @@ import pytest
 
 import ray
 
-from ray.experimental.queue import Queue, Empty, Full
+from ray.experimental.queue import (Queue, ShardedQueue, Empty, Full,
+                                    _QueueActor)
 
 
 def setup_module():
@@ -125,3 +126,94 @@ def test_qsize():
         assert q.get() == item
         size -= 1
         assert q.qsize() == size
+
+
+def test_batch():
+    q = Queue(4)
+
+    q.put_batch([0, 1, 2])
+    with pytest.raises(Full):
+        q.put_batch([3, 4], block=False)
+    with pytest.raises(ValueError):
+        q.put_batch(list(range(5)))
+
+    assert q.get_batch(2) == [0, 1]
+    with pytest.raises(Empty):
+        q.get_batch(2, timeout=0.2)
+
+    put_async.remote(q, 3, True, None, 0.2)
+    assert q.get_batch(2) == [2, 3]
+
+
+def test_waiters_fifo():
+    q = Queue()
+
+    consumers = []
+    for _ in range(5):
+        consumers.append(get_async.remote(q, True, None, 0))
+        # Make sure the consumers are parked in order
+        time.sleep(0.2)
+    q.put_batch(list(range(5)))
+
+    assert ray.get(consumers) == list(range(5))
+
+
+def test_cancelled_waiter():
+    q = Queue(1)
+
+    q.put(0)
+    with pytest.raises(Full):
+        q.put(1, timeout=0.2)
+    # The timed out put must not block the ones behind it
+    assert q.get() == 0
+    q.put(2, timeout=0.2)
+    assert q.get() == 2
+    assert q.qsize() == 0
+
+
+def test_expired_requests():
+    q = Queue()
+    q.actor = _QueueActor.remote(0, 0.5)
+
+    # A get request parked by a caller that never polls it, as if it died
+    ticket, done, _ = ray.get(q.actor.get_batch_wait.remote(1))
+    assert not done
+    time.sleep(1)
+    # The expired request must not take the item
+    q.put(0)
+    assert ray.get(q.actor.poll.remote(ticket)) == (None, None)
+    assert q.get(block=False) == 0
+
+    # A get request that is served but never polled
+    ticket, done, _ = ray.get(q.actor.get_batch_wait.remote(1))
+    q.put(1)
+    assert q.qsize() == 0
+    time.sleep(1)
+    # Its item is put back into the queue
+    assert q.qsize() == 1
+    assert ray.get(q.actor.poll.remote(ticket)) == (None, None)
+    assert q.get(block=False) == 1
+
+    # Callers that keep polling are not expired
+    consumer = get_async.remote(q, True, None, 0)
+    time.sleep(1)
+    q.put(2)
+    assert ray.get(consumer) == 2
+
+
+def test_sharded():
+    q = ShardedQueue(3)
+
+    items = list(range(10))
+    for item in items:
+        q.put(item)
+    assert q.qsize() == len(items)
+    assert sorted(q.get() for _ in items) == items
+
+    with pytest.raises(Empty):
+        q.get_nowait()
+    with pytest.raises(Empty):
+        q.get(timeout=0.2)
+
+    put_async.remote(q, 0, True, None, 0.2)
+    assert q.get() == 0
@@ -0,0 +1,139 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import time
+
+import numpy as np
+import pyarrow.plasma as plasma
+import pytest
+
+import ray
+import ray.ray_constants as ray_constants
+import ray.spill_manager as spill_manager
+
+
+@pytest.fixture
+def ray_start_spilling(tmpdir):
+    spill_directory = str(tmpdir.join("spill"))
+    # Start the Ray processes.
+    ray.init(
+        num_cpus=1,
+        object_store_memory=100 * 1024 * 1024,
+        object_spill_directory=spill_directory)
+    yield spill_directory
+    # The code after the yield will run as teardown code.
+    ray.shutdown()
+
+
+def test_spill_and_restore(ray_start_spilling):
+    spill_directory = ray_start_spilling
+    object_ids = []
+    for i in range(20):
+        object_ids.append(ray.put(np.full(10 * 1024 * 1024, i, np.uint8)))
+        # Give the spill manager time to make room for the next object.
+        time.sleep(1.5 * ray_constants.OBJECT_SPILL_CHECK_INTERVAL_S)
+    assert len(os.listdir(spill_directory)) > 0
+
+    for i, object_id in enumerate(object_ids):
+        array = ray.get(object_id)
+        assert array[0] == i and array[-1] == i
+        del array
+
+
+def test_spilled_task_returns(ray_start_spilling):
+    @ray.remote
+    def f(i):
+        time.sleep(1.5 * ray_constants.OBJECT_SPILL_CHECK_INTERVAL_S)
+        return np.full(10 * 1024 * 1024, i, np.uint8)
+
+    object_ids = []
+    for i in range(20):
+        object_ids.append(f.remote(i))
+        ray.wait([object_ids[-1]])
+
+    assert [ray.get(object_id)[0] for object_id in object_ids] == list(
+        range(20))
+
+
+def test_spilled_task_arguments(ray_start_spilling):
+    spill_directory = ray_start_spilling
+
+    @ray.remote
+    def first_and_last(array):
+        return array[0], array[-1]
+
+    object_ids = []
+    for i in range(20):
+        object_ids.append(ray.put(np.full(10 * 1024 * 1024, i, np.uint8)))
+        time.sleep(1.5 * ray_constants.OBJECT_SPILL_CHECK_INTERVAL_S)
+    assert len(os.listdir(spill_directory)) > 0
+
+    # The spilled objects are restored when the tasks are submitted, instead
+    # of being reconstructed by the raylet.
+    for i, object_id in enumerate(object_ids):
+        assert ray.get(first_and_last.remote(object_id)) == (i, i)
+
+
+def test_restore_by_spill_manager(ray_start_spilling):
+    worker = ray.worker.global_worker
+    object_ids = []
+    for i in range(20):
+        object_ids.append(ray.put(np.full(10 * 1024 * 1024, i, np.uint8)))
+        time.sleep(1.5 * ray_constants.OBJECT_SPILL_CHECK_INTERVAL_S)
+    object_id = plasma.ObjectID(object_ids[0].id())
+    assert worker.redis_client.hexists(spill_manager.SPILLED_OBJECTS_KEY,
+                                       object_id.binary())
+
+    # Without a local spill directory, as on a node that does not share the
+    # spill directory, the object is restored by the spill manager.
+    restored = spill_manager.restore_objects(
+        worker.redis_client, worker.plasma_client, None, [object_id])
+    assert restored == []
+    assert not worker.redis_client.hexists(spill_manager.SPILLED_OBJECTS_KEY,
+                                           object_id.binary())
+    assert worker.plasma_client.contains(object_id)
+    assert ray.get(object_ids[0])[0] == 0
+
+
+def test_task_pins(ray_start_spilling):
+    redis_client = ray.worker.global_worker.redis_client
+    driver_id = 20 * b"d"
+    first_task, second_task = 20 * b"a", 20 * b"b"
+    object_id = 20 * b"o"
+
+    def pins():
+        return int(
+            redis_client.hget(spill_manager.PINNED_OBJECTS_KEY, object_id)
+            or 0)
+
+    spill_manager.pin_task_arguments(redis_client, first_task, driver_id,
+                                     [object_id, object_id])
+    spill_manager.pin_task_arguments(redis_client, second_task, driver_id,
+                                     [object_id])
+    assert pins() == 2
+
+    # Unpinning is idempotent, so that a reconstructed task does not remove
+    # the pins of other tasks.
+    spill_manager.unpin_task_arguments(redis_client, first_task, driver_id)
+    spill_manager.unpin_task_arguments(redis_client, first_task, driver_id)
+    assert pins() == 1
+
+    # The pins of tasks that never ran are removed with their driver.
+    spill_manager.unpin_driver_tasks(redis_client, driver_id)
+    assert pins() == 0
+    assert not redis_client.exists(spill_manager.DRIVER_PINS_PREFIX +
+                                   driver_id)
+
+
+def test_finished_tasks_unpin_arguments(ray_start_spilling):
+    @ray.remote
+    def size(array):
+        return array.size
+
+    object_ids = [ray.put(np.zeros(1024, np.uint8)) for _ in range(5)]
+    assert ray.get(
+        [size.remote(object_id) for object_id in object_ids]) == 5 * [1024]
+    redis_client = ray.worker.global_worker.redis_client
+    assert not redis_client.exists(spill_manager.PINNED_OBJECTS_KEY)
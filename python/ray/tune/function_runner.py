@@ -2,13 +2,14 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import collections
 import logging
 import time
 import threading
 
 from ray.tune import TuneError
 from ray.tune.trainable import Trainable
-from ray.tune.result import TIMESTEPS_TOTAL
+from ray.tune.result import INTERMEDIATE_RESULTS, TIMESTEPS_TOTAL
 
 logger = logging.getLogger(__name__)
 
@@ -16,16 +17,21 @@ logger = logging.getLogger(__name__)
 class StatusReporter(object):
     """Object passed into your function that you can report status through.
 
+    Reported results are buffered in a bounded queue until the trainable
+    consumes them, so no result is lost. If the queue is full, reporting
+    blocks until there is room again.
+
     Example:
         >>> def trainable_function(config, reporter):
         >>>     assert isinstance(reporter, StatusReporter)
         >>>     reporter(timesteps_total=1)
     """
 
-    def __init__(self):
-        self._latest_result = None
+    def __init__(self, max_queue_size=1000):
+        self._max_queue_size = max_queue_size
+        self._queue = collections.deque()
         self._last_result = None
-        self._lock = threading.Lock()
+        self._cv = threading.Condition()
         self._error = None
         self._done = False
 
@@ -39,29 +45,66 @@ class StatusReporter(object):
             >>> reporter(mean_accuracy=1, training_iteration=4)
         """
 
-        with self._lock:
-            self._latest_result = self._last_result = kwargs.copy()
-
-    def _get_and_clear_status(self):
-        if self._error:
-            raise TuneError("Error running trial: " + str(self._error))
-        if self._done and not self._latest_result:
-            if not self._last_result:
-                raise TuneError("Trial finished without reporting result!")
-            self._last_result.update(done=True)
-            return self._last_result
-        with self._lock:
-            res = self._latest_result
-            self._latest_result = None
-            return res
+        with self._cv:
+            while (len(self._queue) >= self._max_queue_size
+                   and self._error is None):
+                self._cv.wait()
+            if self._error is not None:
+                return  # the trainable was stopped, drop the result
+            self._queue.append(kwargs.copy())
+            self._cv.notify_all()
+
+    def _get_results(self, max_results=1):
+        """Blocks until results are available and returns them.
+
+        Args:
+            max_results (int): Max number of queued results to return.
+
+        Returns:
+            List of results in the order they were reported. Once the
+            function has returned and all results have been consumed, the
+            last result is returned again with done=True.
+        """
+
+        with self._cv:
+            while (not self._queue and not self._done and self._error is None):
+                self._cv.wait()
+            if self._error:
+                raise TuneError("Error running trial: " + str(self._error))
+            if not self._queue:
+                if not self._last_result:
+                    raise TuneError("Trial finished without reporting result!")
+                self._last_result.update(done=True)
+                return [self._last_result]
+            results = []
+            while self._queue and len(results) < max_results:
+                results.append(self._queue.popleft())
+            self._last_result = results[-1]
+            self._cv.notify_all()
+            return results
+
+    def _set_done(self, error=None):
+        with self._cv:
+            if error is not None:
+                self._error = error
+            self._done = True
+            self._cv.notify_all()
 
     def _stop(self):
-        self._error = "Agent stopped"
+        with self._cv:
+            self._error = "Agent stopped"
+            self._cv.notify_all()
 
 
 DEFAULT_CONFIG = {
-    # batch results to at least this granularity
-    "script_min_iter_time_s": 1,
+    # min time in seconds between two results returned by train()
+    "script_min_iter_time_s": 0,
+    # if true, train() returns the latest result reported since the last
+    # call, with the earlier ones under intermediate_results, otherwise each
+    # reported result is returned by its own train() call
+    "script_batch_results": False,
+    # max number of results to buffer before reporting blocks
+    "script_max_queued_results": 1000,
 }
 
 
@@ -79,11 +122,11 @@ class _RunnerThread(threading.Thread):
         try:
             self._entrypoint(*self._entrypoint_args)
         except Exception as e:
-            self._status_reporter._error = e
+            self._status_reporter._set_done(error=e)
             logger.exception("Runner Thread raised error.")
             raise e
         finally:
-            self._status_reporter._done = True
+            self._status_reporter._set_done()
 
 
 class FunctionRunner(Trainable):
@@ -96,37 +139,47 @@ class FunctionRunner(Trainable):
 
     def _setup(self, config):
         entrypoint = self._trainable_func()
-        self._status_reporter = StatusReporter()
+        self._status_reporter = StatusReporter(
+            self._get_config(config, "script_max_queued_results"))
         scrubbed_config = config.copy()
         for k in self._default_config:
             if k in scrubbed_config:
                 del scrubbed_config[k]
         self._runner = _RunnerThread(entrypoint, scrubbed_config,
                                      self._status_reporter)
+        self._min_iter_time_s = self._get_config(config,
+                                                 "script_min_iter_time_s")
+        self._batch_results = self._get_config(config, "script_batch_results")
         self._start_time = time.time()
+        self._last_train_time = self._start_time
         self._last_reported_timestep = 0
         self._runner.start()
 
+    def _get_config(self, config, key):
+        return config.get(key, self._default_config[key])
+
     def _trainable_func(self):
         """Subclasses can override this to set the trainable func."""
 
         raise NotImplementedError
 
     def _train(self):
-        time.sleep(
-            self.config.get("script_min_iter_time_s",
-                            self._default_config["script_min_iter_time_s"]))
-        result = self._status_reporter._get_and_clear_status()
-        while result is None:
-            time.sleep(1)
-            result = self._status_reporter._get_and_clear_status()
-
+        delay = self._last_train_time + self._min_iter_time_s - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        results = self._status_reporter._get_results(
+            max_results=(float("inf") if self._batch_results else 1))
+        self._last_train_time = time.time()
+
+        result = results[-1]
         curr_ts_total = result.get(TIMESTEPS_TOTAL)
         if curr_ts_total is not None:
             result.update(
                 timesteps_this_iter=(
                     curr_ts_total - self._last_reported_timestep))
             self._last_reported_timestep = curr_ts_total
+        if len(results) > 1:
+            result = dict(result, **{INTERMEDIATE_RESULTS: results[:-1]})
 
         return result
 
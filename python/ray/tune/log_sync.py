@@ -2,7 +2,9 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+from collections import namedtuple
 import distutils.spawn
+import fnmatch
 import logging
 import os
 import subprocess
@@ -17,7 +19,8 @@ except ImportError:  # py2
 import ray
 from ray.tune.cluster_info import get_ssh_key, get_ssh_user
 from ray.tune.error import TuneError
-from ray.tune.result import DEFAULT_RESULTS_DIR
+from ray.tune.result import DEFAULT_RESULTS_DIR, EXPR_PROGRESS_FILE, \
+    EXPR_RESULT_FILE
 from ray.tune.suggest.variant_generator import function as tune_function
 
 logger = logging.getLogger(__name__)
@@ -25,6 +28,33 @@ logger = logging.getLogger(__name__)
 # Map from (logdir, remote_dir) -> syncer
 _syncers = {}
 
+# Local dirs that receive log updates pushed with trial results, and so
+# don't need to be rsync'ed from the worker
+_pushed_dirs = set()
+
+# Result field holding the log updates pushed by a remote trainable
+LOG_UPDATES = "__log_updates__"
+
+# Max number of bytes of log updates to attach to a single result
+MAX_LOG_PUSH_BYTES = 10 * 1024 * 1024
+
+# Patterns of the names of logdir files that are only ever appended to, and
+# so are pushed by sending the appended bytes. Other files are pushed in full
+# whenever they change.
+APPEND_ONLY_FILES = [
+    EXPR_RESULT_FILE, EXPR_PROGRESS_FILE, "events.out.tfevents.*"
+]
+
+# Number of bytes before the collected offset of an append-only file that are
+# compared on the next collection, to detect files that were rewritten
+_TAIL_CHECK_BYTES = 64
+
+# The state of a file collected by a LogTailer. The offset is the number of
+# bytes collected so far, and the other fields describe the file as it was
+# when they were read.
+_CollectedFile = namedtuple("_CollectedFile",
+                            ["offset", "inode", "size", "mtime", "tail"])
+
 S3_PREFIX = "s3://"
 GCS_PREFIX = "gs://"
 ALLOWED_REMOTE_PREFIXES = (S3_PREFIX, GCS_PREFIX)
@@ -65,6 +95,33 @@ def wait_for_log_sync():
         syncer.wait()
 
 
+def apply_log_updates(local_dir, updates):
+    """Writes log updates collected by a LogTailer into a local dir.
+
+    Once updates have been applied to a dir, it is no longer rsync'ed from
+    the worker by the log syncer.
+
+    Arguments:
+        local_dir (str): Local copy of the dir the updates were collected in.
+        updates (list): List of (relpath, offset, data) tuples.
+    """
+
+    _pushed_dirs.add(local_dir)
+    for relpath, offset, data in updates:
+        path = os.path.join(local_dir, relpath)
+        parent = os.path.dirname(path)
+        if not os.path.exists(parent):
+            os.makedirs(parent)
+        if offset == 0 or not os.path.exists(path):
+            mode = "wb"
+        else:
+            mode = "r+b"
+        with open(path, mode) as f:
+            f.seek(offset)
+            f.write(data)
+            f.truncate()
+
+
 def validate_sync_function(sync_function):
     if sync_function is None:
         return
@@ -79,6 +136,100 @@ def validate_sync_function(sync_function):
             sync_function))
 
 
+class LogTailer(object):
+    """Tracks the bytes of files in a dir that have not been collected yet.
+
+    This is used by remote trainables to push the files they write to their
+    logdir to the driver along with their results, instead of having the
+    driver rsync each trial's logdir from the worker.
+
+    Only the appended bytes of the files matching APPEND_ONLY_FILES are sent.
+    If such a file turns out to have been rewritten, i.e. it was replaced,
+    it shrank, or the bytes before the collected offset changed, it is sent
+    again from the start. Other files are sent in full whenever their size
+    or mtime changes.
+
+    Arguments:
+        logdir (str): Directory to collect updates from.
+    """
+
+    def __init__(self, logdir):
+        self.logdir = logdir
+        # Map from relpath -> _CollectedFile
+        self._collected = {}
+
+    def collect(self, max_bytes=MAX_LOG_PUSH_BYTES):
+        """Returns new file contents since the last call.
+
+        Arguments:
+            max_bytes (int): Max total size of the returned data. Any
+                remaining bytes are returned by the following calls.
+
+        Returns:
+            List of (relpath, offset, data) tuples.
+        """
+
+        updates = []
+        budget = max_bytes
+        for relpath, path in self._list_files():
+            if budget <= 0:
+                break
+            try:
+                st = os.stat(path)
+                with open(path, "rb") as f:
+                    offset = self._resume_offset(relpath, f, st)
+                    if offset is None:
+                        continue
+                    f.seek(offset)
+                    data = f.read(min(st.st_size - offset, budget))
+            except (IOError, OSError):
+                continue  # deleted since listing
+            offset_after = offset + len(data)
+            tail = data[-_TAIL_CHECK_BYTES:]
+            if offset > 0 and len(tail) < _TAIL_CHECK_BYTES:
+                tail = (
+                    self._collected[relpath].tail + tail)[-_TAIL_CHECK_BYTES:]
+            updates.append((relpath, offset, data))
+            self._collected[relpath] = _CollectedFile(
+                offset_after, st.st_ino, st.st_size, st.st_mtime, tail)
+            budget -= len(data)
+        return updates
+
+    def _resume_offset(self, relpath, f, st):
+        """Returns the offset to collect from, or None if there's nothing."""
+
+        prev = self._collected.get(relpath)
+        if prev is None or prev.inode != st.st_ino:
+            return 0
+
+        if not _is_append_only(relpath):
+            if prev.size != st.st_size or prev.mtime != st.st_mtime:
+                return 0  # changed since it was (partially) sent
+            return prev.offset if prev.offset < st.st_size else None
+
+        if st.st_size < prev.offset or (st.st_size == prev.offset
+                                        and st.st_mtime != prev.mtime):
+            return 0
+        if prev.tail:
+            f.seek(prev.offset - len(prev.tail))
+            if f.read(len(prev.tail)) != prev.tail:
+                return 0
+        if st.st_size == prev.offset:
+            return None
+        return prev.offset
+
+    def _list_files(self):
+        for root, _, files in os.walk(self.logdir):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                yield os.path.relpath(path, self.logdir), path
+
+
+def _is_append_only(relpath):
+    name = os.path.basename(relpath)
+    return any(fnmatch.fnmatch(name, pattern) for pattern in APPEND_ONLY_FILES)
+
+
 class _LogSyncer(object):
     """Log syncer for tune.
 
@@ -131,6 +282,9 @@ class _LogSyncer(object):
 
         if self.worker_ip == self.local_ip:
             worker_to_local_sync_cmd = None  # don't need to rsync
+        elif self.local_dir in _pushed_dirs:
+            # The worker pushes its logs, including rewritten files
+            worker_to_local_sync_cmd = None
         else:
             ssh_key = get_ssh_key()
             ssh_user = get_ssh_user()
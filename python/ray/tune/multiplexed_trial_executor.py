@@ -0,0 +1,209 @@
+# coding: utf-8
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import logging
+import math
+import os
+
+import ray
+from ray.tune.logger import NoopLogger
+from ray.tune.ray_trial_executor import RayTrialExecutor
+from ray.tune.registry import _global_registry, TRAINABLE_CLASS
+from ray.tune.trial import Resources
+
+logger = logging.getLogger(__name__)
+
+
+class MultiplexedTrialExecutor(RayTrialExecutor):
+    """Trial executor that runs several trials inside each actor.
+
+    Trials that request the same resources are packed into shared host
+    actors of up to `trials_per_actor` trials each, instead of getting an
+    actor process each. This is useful for sweeps over cheap models, where
+    the per-actor startup overhead dominates, and allows trials to request
+    fractional resources such as Resources(cpu=0.25, gpu=0).
+
+    A host actor reserves the resources of all of its trial slots when it is
+    created, and is terminated once all of its trials have stopped. Since
+    actors execute one call at a time, the train() calls of the trials in a
+    host are interleaved in round-robin order. Each trial keeps its own
+    trainable instance and logdir, so results and checkpoints stay separate.
+    The trainables of a host share its working directory, so they should
+    write any other files under their logdir.
+
+    Examples:
+        >>> run_experiments(
+        >>>     {"sweep": {"run": "my_model", "num_samples": 1000,
+        >>>                "trial_resources": {"cpu": 0.25, "gpu": 0}}},
+        >>>     trial_executor=MultiplexedTrialExecutor(trials_per_actor=4))
+    """
+
+    def __init__(self, queue_trials=False, trials_per_actor=4):
+        super(MultiplexedTrialExecutor, self).__init__(queue_trials)
+        self._trials_per_actor = trials_per_actor
+        # Map from trial resources -> list of _HostState
+        self._hosts = {}
+
+    def _setup_runner(self, trial):
+        trial.init_logger()
+        host = self._get_host(trial.resources)
+        host.trial_ids.add(trial.trial_id)
+        host.handle.add_trainable.remote(trial.trial_id, trial.trainable_name,
+                                         trial.config,
+                                         self._make_logger_creator(trial))
+        runner = _MultiplexedRunner(host, trial.trial_id)
+        runner.enable_log_push.remote(ray.services.get_node_ip_address())
+        return runner
+
+    def _make_logger_creator(self, trial):
+        remote_logdir = trial.logdir
+
+        def logger_creator(config):
+            # Unlike RayTrialExecutor, don't change the working dir, which
+            # is shared by the other trainables of the host.
+            if not os.path.exists(remote_logdir):
+                os.makedirs(remote_logdir)
+            return NoopLogger(config, remote_logdir)
+
+        return logger_creator
+
+    def _get_host(self, resources):
+        """Returns a host with a free slot, creating one if needed.
+
+        The resources of the trial have already been committed by the
+        caller, so the reservation of the chosen slot is handed over to it.
+        """
+
+        for host in self._hosts.get(resources, []):
+            if host.num_free_slots() > 0:
+                self._return_resources(resources)
+                return host
+
+        num_slots = self._num_slots_available(resources) + 1
+        handle = ray.remote(
+            num_cpus=num_slots * resources.cpu,
+            num_gpus=num_slots * resources.gpu)(_TrainableHost).remote()
+        host = _HostState(handle, num_slots)
+        self._hosts.setdefault(resources, []).append(host)
+        # Reserve the other slots of the host, so that the resources held
+        # by the host are always accounted for as committed.
+        self._commit_resources(_scale(resources, num_slots - 1))
+        logger.debug("Created host actor with {} slots of {}".format(
+            num_slots, resources.summary_string()))
+        return host
+
+    def _num_slots_available(self, resources):
+        """Returns how many more trial slots of this shape would fit."""
+
+        limits = [self._trials_per_actor - 1]
+        for needed, avail, committed in [
+            (resources.cpu_total(), self._avail_resources.cpu,
+             self._committed_resources.cpu),
+            (resources.gpu_total(), self._avail_resources.gpu,
+             self._committed_resources.gpu),
+        ]:
+            if needed > 0:
+                limits.append(int(math.floor((avail - committed) / needed)))
+        return max(0, min(limits))
+
+    def _terminate_runner(self, runner):
+        host = runner.host
+        try:
+            ray.get(host.handle.remove_trainable.remote(runner.trial_id))
+        finally:
+            host.trial_ids.discard(runner.trial_id)
+            resources = self._find_resources(host)
+            if host.trial_ids:
+                # Keep the slot reserved for the next trial on this host,
+                # the caller returns the resources of the stopped trial.
+                self._commit_resources(resources)
+            else:
+                self._hosts[resources].remove(host)
+                self._return_resources(_scale(resources, host.num_slots - 1))
+                host.handle.__ray_terminate__.remote()
+
+    def _find_resources(self, host):
+        for resources, hosts in self._hosts.items():
+            if host in hosts:
+                return resources
+        raise ValueError("Unknown host actor", host)
+
+    def has_resources(self, resources):
+        """Returns whether a trial with these resources can be started."""
+
+        for host in self._hosts.get(resources, []):
+            if host.num_free_slots() > 0:
+                return True
+        return super(MultiplexedTrialExecutor, self).has_resources(resources)
+
+
+class _TrainableHost(object):
+    """Actor that hosts the trainables of several trials.
+
+    The trainables share the working directory of the actor process, which
+    is not changed to their logdir, so they should write any files under
+    their logdir instead of the working directory.
+    """
+
+    def __init__(self):
+        self._trainables = {}
+
+    def add_trainable(self, trial_id, trainable_name, config, logger_creator):
+        cls = _global_registry.get(TRAINABLE_CLASS, trainable_name)
+        self._trainables[trial_id] = cls(
+            config=config, logger_creator=logger_creator)
+
+    def call(self, trial_id, method, *args):
+        return getattr(self._trainables[trial_id], method)(*args)
+
+    def remove_trainable(self, trial_id):
+        trainable = self._trainables.pop(trial_id, None)
+        if trainable:
+            trainable.stop()
+
+
+class _HostState(object):
+    def __init__(self, handle, num_slots):
+        self.handle = handle
+        self.num_slots = num_slots
+        self.trial_ids = set()
+
+    def num_free_slots(self):
+        return self.num_slots - len(self.trial_ids)
+
+
+class _MultiplexedRunner(object):
+    """Stand-in for the actor handle of a trainable in a host actor.
+
+    Calls such as `runner.train.remote()` are forwarded to the trainable of
+    the trial through the host actor.
+    """
+
+    def __init__(self, host, trial_id):
+        self.host = host
+        self.trial_id = trial_id
+
+    def __getattr__(self, method):
+        if method.startswith("_"):
+            raise AttributeError(method)
+        return _RemoteMethod(self.host.handle, self.trial_id, method)
+
+
+class _RemoteMethod(object):
+    def __init__(self, handle, trial_id, method):
+        self._handle = handle
+        self._trial_id = trial_id
+        self._method = method
+
+    def remote(self, *args):
+        return self._handle.call.remote(self._trial_id, self._method, *args)
+
+
+def _scale(resources, k):
+    return Resources(
+        cpu=resources.cpu * k,
+        gpu=resources.gpu * k,
+        extra_cpu=resources.extra_cpu * k,
+        extra_gpu=resources.extra_gpu * k)
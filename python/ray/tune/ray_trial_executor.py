@@ -9,6 +9,7 @@ import time
 import traceback
 
 import ray
+from ray.tune.log_sync import LOG_UPDATES, apply_log_updates
 from ray.tune.logger import NoopLogger
 from ray.tune.trial import Trial, Resources, Checkpoint
 from ray.tune.trial_executor import TrialExecutor
@@ -19,7 +20,7 @@ logger = logging.getLogger(__name__)
 class RayTrialExecutor(TrialExecutor):
     """An implemention of TrialExecutor based on Ray."""
 
-    def __init__(self, queue_trials=False):
+    def __init__(self, queue_trials=False, reuse_actors=False):
         super(RayTrialExecutor, self).__init__(queue_trials)
         self._running = {}
         # Since trial resume after paused should not run
@@ -29,15 +30,35 @@ class RayTrialExecutor(TrialExecutor):
         self._avail_resources = Resources(cpu=0, gpu=0)
         self._committed_resources = Resources(cpu=0, gpu=0)
         self._resources_initialized = False
+        # Idle trainable actors kept for reuse, keyed by (trainable name,
+        # resources). Cached actors still hold their cluster resources,
+        # which are tracked in self._cached_resources.
+        self._reuse_actors = reuse_actors
+        self._cached_actors = {}
+        self._cached_resources = Resources(cpu=0, gpu=0)
+        self._no_reuse = set()
         if ray.is_initialized():
             self._update_avail_resources()
 
     def _setup_runner(self, trial):
-        cls = ray.remote(
-            num_cpus=trial.resources.cpu,
-            num_gpus=trial.resources.gpu)(trial._get_trainable_cls())
-
         trial.init_logger()
+        logger_creator = self._make_logger_creator(trial)
+        runner = self._reuse_cached_actor(trial, logger_creator)
+        if runner is None:
+            self._evict_cached_actors()
+            cls = ray.remote(
+                num_cpus=trial.resources.cpu,
+                num_gpus=trial.resources.gpu)(trial._get_trainable_cls())
+            # Logging for trials is handled centrally by TrialRunner, so
+            # configure the remote runner to use a noop-logger.
+            runner = cls.remote(
+                config=trial.config, logger_creator=logger_creator)
+
+        # Have runners on other nodes push their logdir with results
+        runner.enable_log_push.remote(ray.services.get_node_ip_address())
+        return runner
+
+    def _make_logger_creator(self, trial):
         remote_logdir = trial.logdir
 
         def logger_creator(config):
@@ -47,9 +68,93 @@ class RayTrialExecutor(TrialExecutor):
             os.chdir(remote_logdir)
             return NoopLogger(config, remote_logdir)
 
-        # Logging for trials is handled centrally by TrialRunner, so
-        # configure the remote runner to use a noop-logger.
-        return cls.remote(config=trial.config, logger_creator=logger_creator)
+        return logger_creator
+
+    def _pull_log_updates(self, trial):
+        """Fetches the log updates not yet pushed by the trial runner."""
+
+        try:
+            while True:
+                updates = ray.get(trial.runner.pull_log_updates.remote())
+                if not updates:
+                    break
+                apply_log_updates(trial.logdir, updates)
+        except Exception:
+            logger.exception("Error pulling log updates.")
+
+    def _actor_key(self, trial):
+        return (trial.trainable_name, trial.resources)
+
+    def _reuse_cached_actor(self, trial, logger_creator):
+        """Returns a cached actor reset for the trial, or None."""
+
+        key = self._actor_key(trial)
+        cached = self._cached_actors.get(key)
+        if not cached:
+            return None
+        runner = cached.pop()
+        if not cached:
+            del self._cached_actors[key]
+        self._uncache_resources(trial.resources)
+
+        try:
+            if ray.get(runner.reset.remote(trial.config, logger_creator)):
+                logger.debug("Reusing cached runner for {}".format(trial))
+                return runner
+            logger.info(
+                "Trainable {} does not support reset_config(), so its actors "
+                "will not be reused.".format(trial.trainable_name))
+            self._no_reuse.add(trial.trainable_name)
+            self._evict(key)
+        except Exception:
+            logger.exception("Error resetting cached runner.")
+        self._terminate_runner(runner)
+        return None
+
+    def _cache_actor(self, trial):
+        """Keeps the runner of a stopped trial for reuse by later trials."""
+
+        key = self._actor_key(trial)
+        self._cached_actors.setdefault(key, []).append(trial.runner)
+        self._cached_resources = Resources(
+            self._cached_resources.cpu + trial.resources.cpu_total(),
+            self._cached_resources.gpu + trial.resources.gpu_total())
+
+    def _uncache_resources(self, resources):
+        self._cached_resources = Resources(
+            self._cached_resources.cpu - resources.cpu_total(),
+            self._cached_resources.gpu - resources.gpu_total())
+
+    def _evict_cached_actors(self):
+        """Terminates cached actors until committed resources fit.
+
+        This is called before creating a new actor, at which point the
+        resources of the new trial have already been committed.
+        """
+
+        def fits():
+            return (self._committed_resources.cpu + self._cached_resources.cpu
+                    <= self._avail_resources.cpu and
+                    self._committed_resources.gpu + self._cached_resources.gpu
+                    <= self._avail_resources.gpu)
+
+        for key in list(self._cached_actors):
+            if fits():
+                return
+            self._evict(key)
+
+    def _evict(self, key):
+        _, resources = key
+        for runner in self._cached_actors.pop(key, []):
+            self._uncache_resources(resources)
+            self._terminate_runner(runner)
+
+    def _terminate_runner(self, runner):
+        stop_tasks = []
+        stop_tasks.append(runner.stop.remote())
+        stop_tasks.append(runner.__ray_terminate__.remote())
+        # TODO(ekl)  seems like wait hangs when killing actors
+        _, unfinished = ray.wait(stop_tasks, num_returns=2, timeout=250)
 
     def _train(self, trial):
         """Start one iteration of training and save remote id."""
@@ -95,12 +200,13 @@ class RayTrialExecutor(TrialExecutor):
         try:
             trial.write_error_log(error_msg)
             if hasattr(trial, 'runner') and trial.runner:
-                stop_tasks = []
-                stop_tasks.append(trial.runner.stop.remote())
-                stop_tasks.append(trial.runner.__ray_terminate__.remote())
-                # TODO(ekl)  seems like wait hangs when killing actors
-                _, unfinished = ray.wait(
-                    stop_tasks, num_returns=2, timeout=250)
+                if not error:
+                    self._pull_log_updates(trial)
+                if (self._reuse_actors and not error
+                        and trial.trainable_name not in self._no_reuse):
+                    self._cache_actor(trial)
+                else:
+                    self._terminate_runner(trial.runner)
         except Exception:
             logger.exception("Error stopping runner.")
             trial.status = Trial.ERROR
@@ -209,17 +315,21 @@ class RayTrialExecutor(TrialExecutor):
             raise ValueError("Trial was not running.")
         self._running.pop(trial_future[0])
         result = ray.get(trial_future[0])
+        updates = result.pop(LOG_UPDATES, None)
+        if updates is not None:
+            apply_log_updates(trial.logdir, updates)
         return result
 
     def _commit_resources(self, resources):
+        # Round to avoid accumulating float errors from fractional resources
         self._committed_resources = Resources(
-            self._committed_resources.cpu + resources.cpu_total(),
-            self._committed_resources.gpu + resources.gpu_total())
+            round(self._committed_resources.cpu + resources.cpu_total(), 6),
+            round(self._committed_resources.gpu + resources.gpu_total(), 6))
 
     def _return_resources(self, resources):
         self._committed_resources = Resources(
-            self._committed_resources.cpu - resources.cpu_total(),
-            self._committed_resources.gpu - resources.gpu_total())
+            round(self._committed_resources.cpu - resources.cpu_total(), 6),
+            round(self._committed_resources.gpu - resources.gpu_total(), 6))
         assert self._committed_resources.cpu >= 0
         assert self._committed_resources.gpu >= 0
 
@@ -235,6 +345,8 @@ class RayTrialExecutor(TrialExecutor):
 
         cpu_avail = self._avail_resources.cpu - self._committed_resources.cpu
         gpu_avail = self._avail_resources.gpu - self._committed_resources.gpu
+        # Resources held by cached actors are not counted here, since those
+        # actors are either reused or evicted when the trial is started.
 
         have_space = (resources.cpu_total() <= cpu_avail
                       and resources.gpu_total() <= gpu_avail)
@@ -284,6 +396,12 @@ class RayTrialExecutor(TrialExecutor):
 
         self._update_avail_resources()
 
+    def cleanup(self):
+        """Terminates all cached actors."""
+
+        for key in list(self._cached_actors):
+            self._evict(key)
+
     def save(self, trial, storage=Checkpoint.DISK):
         """Saves the trial's state to a checkpoint."""
         trial._checkpoint.storage = storage
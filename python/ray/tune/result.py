@@ -39,6 +39,10 @@ TIME_TOTAL_S = "time_total_s"
 
 # (Auto-filled) The index of this training iteration.
 TRAINING_ITERATION = "training_iteration"
+
+# (Optional) The results reported since the previous result, which are logged
+# before this one. They are not kept in the result of the trial.
+INTERMEDIATE_RESULTS = "intermediate_results"
 # __sphinx_doc_end__
 # yapf: enable
 
@@ -0,0 +1,103 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ray.tune.log_sync import LogTailer, apply_log_updates
+
+
+class LogTailerTest(unittest.TestCase):
+    def setUp(self):
+        self.src = tempfile.mkdtemp()
+        self.dst = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.src)
+        shutil.rmtree(self.dst)
+
+    def _write(self, relpath, data, mode="ab"):
+        path = os.path.join(self.src, relpath)
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, mode) as f:
+            f.write(data)
+
+    def _read(self, relpath):
+        with open(os.path.join(self.dst, relpath), "rb") as f:
+            return f.read()
+
+    def testOnlyAppendedBytes(self):
+        tailer = LogTailer(self.src)
+        self._write("result.json", b"hello")
+        self._write("ckpt/checkpoint-1", b"abc")
+        apply_log_updates(self.dst, tailer.collect())
+        self.assertEqual(self._read("result.json"), b"hello")
+        self.assertEqual(self._read("ckpt/checkpoint-1"), b"abc")
+
+        self._write("result.json", b" world")
+        updates = tailer.collect()
+        self.assertEqual(updates, [("result.json", 5, b" world")])
+        apply_log_updates(self.dst, updates)
+        self.assertEqual(self._read("result.json"), b"hello world")
+        self.assertEqual(tailer.collect(), [])
+
+    def testRewrittenFile(self):
+        tailer = LogTailer(self.src)
+        self._write("result.json", b"hello")
+        apply_log_updates(self.dst, tailer.collect())
+        self._write("result.json", b"bye", mode="wb")
+        apply_log_updates(self.dst, tailer.collect())
+        self.assertEqual(self._read("result.json"), b"bye")
+
+    def testRewrittenFileThatGrew(self):
+        tailer = LogTailer(self.src)
+        self._write("progress.csv", b"a,b\n1,2\n")
+        apply_log_updates(self.dst, tailer.collect())
+        self._write("progress.csv", b"a,b,c\n1,2,3\n", mode="wb")
+        updates = tailer.collect()
+        self.assertEqual(updates, [("progress.csv", 0, b"a,b,c\n1,2,3\n")])
+        apply_log_updates(self.dst, updates)
+        self.assertEqual(self._read("progress.csv"), b"a,b,c\n1,2,3\n")
+
+    def testReplacedFile(self):
+        tailer = LogTailer(self.src)
+        self._write("result.json", b"hello")
+        apply_log_updates(self.dst, tailer.collect())
+        self._write("result.json.tmp", b"HELLO world")
+        os.rename(
+            os.path.join(self.src, "result.json.tmp"),
+            os.path.join(self.src, "result.json"))
+        apply_log_updates(self.dst, tailer.collect())
+        self.assertEqual(self._read("result.json"), b"HELLO world")
+
+    def testOtherFilesSentInFull(self):
+        tailer = LogTailer(self.src)
+        self._write("params.json", b"{}")
+        apply_log_updates(self.dst, tailer.collect())
+        self._write("params.json", b"{\"a\": 1}", mode="wb")
+        updates = tailer.collect()
+        self.assertEqual(updates, [("params.json", 0, b"{\"a\": 1}")])
+        apply_log_updates(self.dst, updates)
+        self.assertEqual(self._read("params.json"), b"{\"a\": 1}")
+        self.assertEqual(tailer.collect(), [])
+
+    def testMaxBytes(self):
+        tailer = LogTailer(self.src)
+        self._write("result.json", b"0123456789")
+        self._write("params.json", b"abcdef")
+        updates = tailer.collect(max_bytes=4)
+        self.assertEqual(updates, [("params.json", 0, b"abcd")])
+        apply_log_updates(self.dst, updates)
+        while updates:
+            updates = tailer.collect(max_bytes=4)
+            apply_log_updates(self.dst, updates)
+        self.assertEqual(self._read("result.json"), b"0123456789")
+        self.assertEqual(self._read("params.json"), b"abcdef")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -3,11 +3,13 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import os
 import unittest
 
 import ray
 from ray.rllib import _register_all
-from ray.tune import Trainable
+from ray.tune import Trainable, grid_search
+from ray.tune.multiplexed_trial_executor import MultiplexedTrialExecutor
 from ray.tune.ray_trial_executor import RayTrialExecutor
 from ray.tune.registry import _global_registry, TRAINABLE_CLASS
 from ray.tune.suggest import BasicVariantGenerator
@@ -104,11 +106,126 @@ class RayTrialExecutorTest(unittest.TestCase):
         self.assertEqual(trial.experiment_tag, "modified_mock")
         self.assertEqual(Trial.RUNNING, trial.status)
 
+    def testReuseActors(self):
+        """Tests that stopped actors are reused by the next trial."""
+
+        class B(Trainable):
+            def _train(self):
+                return dict(timesteps_this_iter=1, pid=os.getpid())
+
+            def reset_config(self, config):
+                return True
+
+        executor = RayTrialExecutor(queue_trials=False, reuse_actors=True)
+        trials = self.generate_trials({
+            "run": B,
+            "config": {
+                "foo": grid_search([0, 1])
+            },
+        }, "grid_search")
+        executor.start_trial(trials[0])
+        pid = executor.fetch_result(trials[0])["pid"]
+        executor.stop_trial(trials[0])
+        executor.start_trial(trials[1])
+        result = executor.fetch_result(trials[1])
+        self.assertEqual(result["pid"], pid)
+        self.assertEqual(result["training_iteration"], 1)
+        executor.stop_trial(trials[1])
+        executor.cleanup()
+        self.assertEqual(executor._cached_actors, {})
+
+    def testNoReuseWithoutReset(self):
+        """Tests that a fresh actor is used if reset_config() fails."""
+
+        class B(Trainable):
+            def _train(self):
+                return dict(timesteps_this_iter=1, pid=os.getpid())
+
+        executor = RayTrialExecutor(queue_trials=False, reuse_actors=True)
+        trials = self.generate_trials({
+            "run": B,
+            "config": {
+                "foo": grid_search([0, 1])
+            },
+        }, "grid_search")
+        executor.start_trial(trials[0])
+        pid = executor.fetch_result(trials[0])["pid"]
+        executor.stop_trial(trials[0])
+        executor.start_trial(trials[1])
+        self.assertEqual(Trial.RUNNING, trials[1].status)
+        self.assertNotEqual(executor.fetch_result(trials[1])["pid"], pid)
+        executor.stop_trial(trials[1])
+        self.assertEqual(executor._cached_actors, {})
+
     def generate_trials(self, spec, name):
         suggester = BasicVariantGenerator()
         suggester.add_configurations({name: spec})
         return suggester.next_trials()
 
 
+class MultiplexedTrialExecutorTest(unittest.TestCase):
+    def setUp(self):
+        ray.init(num_cpus=2)
+        self.trial_executor = MultiplexedTrialExecutor(trials_per_actor=4)
+
+    def tearDown(self):
+        ray.shutdown()
+        _register_all()  # re-register the evicted objects
+
+    def testSharedHost(self):
+        trials = [
+            Trial("__fake", resources=Resources(0.25, 0)) for _ in range(5)
+        ]
+        for trial in trials:
+            self.assertTrue(self.trial_executor.has_resources(trial.resources))
+            self.trial_executor.start_trial(trial)
+            self.assertEqual(Trial.RUNNING, trial.status)
+        # The first host takes 4 slots, and the second all that fit
+        self.assertEqual(self.trial_executor._committed_resources.cpu, 2)
+        hosts = self.trial_executor._hosts[trials[0].resources]
+        self.assertEqual([h.num_slots for h in hosts], [4, 4])
+        pids = [
+            self.trial_executor.fetch_result(trial)["pid"] for trial in trials
+        ]
+        self.assertEqual(len(set(pids[:4])), 1)
+        self.assertNotEqual(pids[0], pids[4])
+        self.assertEqual(len(set(trial.logdir for trial in trials)), 5)
+
+        for trial in trials:
+            self.trial_executor.stop_trial(trial)
+            self.assertEqual(Trial.TERMINATED, trial.status)
+        self.assertEqual(self.trial_executor._committed_resources.cpu, 0)
+        self.assertEqual(self.trial_executor._hosts[trials[0].resources], [])
+
+    def testSharedWorkingDirectory(self):
+        class B(Trainable):
+            def _train(self):
+                return dict(timesteps_this_iter=1, cwd=os.getcwd())
+
+        _global_registry.register(TRAINABLE_CLASS, "cwd", B)
+        trials = [Trial("cwd", resources=Resources(0.25, 0)) for _ in range(2)]
+        for trial in trials:
+            self.trial_executor.start_trial(trial)
+        cwds = [
+            self.trial_executor.fetch_result(trial)["cwd"] for trial in trials
+        ]
+        # Adding a trainable does not change the working directory of the
+        # host, but still creates the logdir.
+        self.assertEqual(cwds[0], cwds[1])
+        for trial in trials:
+            self.assertNotEqual(cwds[0], trial.logdir)
+            self.assertTrue(os.path.isdir(trial.logdir))
+            self.trial_executor.stop_trial(trial)
+
+    def testSaveRestore(self):
+        trial = Trial("__fake", resources=Resources(0.5, 0))
+        self.trial_executor.start_trial(trial)
+        self.trial_executor.save(trial, Checkpoint.DISK)
+        self.assertTrue(trial._checkpoint.value.startswith(trial.logdir))
+        self.assertTrue(self.trial_executor.restore(trial))
+        self.trial_executor.stop_trial(trial)
+        self.assertEqual(Trial.TERMINATED, trial.status)
+
+
 if __name__ == "__main__":
     unittest.main(verbosity=2)
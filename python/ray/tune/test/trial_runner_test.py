@@ -2,6 +2,7 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import csv
 import os
 import sys
 import time
@@ -17,12 +18,14 @@ from ray.tune.ray_trial_executor import RayTrialExecutor
 from ray.tune.schedulers import TrialScheduler, FIFOScheduler
 from ray.tune.registry import _global_registry, TRAINABLE_CLASS
 from ray.tune.result import (DEFAULT_RESULTS_DIR, TIMESTEPS_TOTAL, DONE,
-                             EPISODES_TOTAL)
+                             EPISODES_TOTAL, EXPR_PROGRESS_FILE,
+                             INTERMEDIATE_RESULTS)
 from ray.tune.logger import Logger
 from ray.tune.util import pin_in_object_store, get_pinned_object
 from ray.tune.experiment import Experiment
 from ray.tune.trial import Trial, Resources
 from ray.tune.trial_runner import TrialRunner
+from ray.tune.trainable import wrap_function
 from ray.tune.suggest import grid_search, BasicVariantGenerator
 from ray.tune.suggest.suggestion import (_MockSuggestionAlgorithm,
                                          SuggestionAlgorithm)
@@ -428,6 +431,53 @@ class TrainableFunctionApiTest(unittest.TestCase):
         self.assertEqual(trial.status, Trial.TERMINATED)
         self.assertEqual(trial.last_result['mean_accuracy'], float('inf'))
 
+    def testReportAllResults(self):
+        def train(config, reporter):
+            for i in range(10):
+                reporter(mean_accuracy=i)
+
+        trainable = wrap_function(train)()
+        accs = [trainable.train()["mean_accuracy"] for _ in range(10)]
+        self.assertEqual(accs, list(range(10)))
+        self.assertTrue(trainable.train()[DONE])
+        trainable.stop()
+
+    def testBatchResults(self):
+        def train(config, reporter):
+            for i in range(10):
+                reporter(timesteps_total=i)
+
+        trainable = wrap_function(train)({"script_batch_results": True})
+        trainable._runner.join()
+        result = trainable.train()
+        self.assertEqual(result[TIMESTEPS_TOTAL], 9)
+        self.assertEqual(result["timesteps_this_iter"], 9)
+        self.assertEqual(
+            [r[TIMESTEPS_TOTAL] for r in result[INTERMEDIATE_RESULTS]],
+            list(range(9)))
+        trainable.stop()
+
+    def testBatchResultsLogged(self):
+        def train(config, reporter):
+            for i in range(10):
+                reporter(timesteps_total=i, mean_accuracy=i)
+
+        [trial] = run_experiments({
+            "foo": {
+                "run": train,
+                "config": {
+                    "script_batch_results": True,
+                },
+            }
+        })
+        self.assertNotIn(INTERMEDIATE_RESULTS, trial.last_result)
+        with open(os.path.join(trial.logdir, EXPR_PROGRESS_FILE)) as f:
+            rows = list(csv.DictReader(f))
+        # Every reported result is logged once, in order
+        self.assertNotIn(INTERMEDIATE_RESULTS, rows[0])
+        self.assertEqual([float(row["mean_accuracy"]) for row in rows][:10],
+                         list(range(10)))
+
     def testReportTimeStep(self):
         def train(config, reporter):
             for i in range(100):
@@ -16,6 +16,7 @@ import time
 import uuid
 
 import ray
+from ray.tune.log_sync import LogTailer, LOG_UPDATES
 from ray.tune.logger import UnifiedLogger
 from ray.tune.result import (DEFAULT_RESULTS_DIR, TIME_THIS_ITER_S,
                              TIMESTEPS_THIS_ITER, DONE, TIMESTEPS_TOTAL,
@@ -84,6 +85,7 @@ class Trainable(object):
         self._timesteps_since_restore = 0
         self._iterations_since_restore = 0
         self._restored = False
+        self._log_tailer = None
         self._setup(copy.deepcopy(self.config))
         self._local_ip = ray.services.get_node_ip_address()
 
@@ -199,8 +201,38 @@ class Trainable(object):
 
         self._result_logger.on_result(result)
 
+        if self._log_tailer:
+            result[LOG_UPDATES] = self._log_tailer.collect()
+
         return result
 
+    def enable_log_push(self, driver_ip):
+        """Pushes files written to the logdir to the driver with results.
+
+        If enabled, new bytes of files in ``self.logdir`` are attached to
+        the results returned by ``train()``, so that the driver doesn't need
+        to rsync the logdir from this node.
+
+        Args:
+            driver_ip (str): Node ip of the driver. Logs are not pushed if
+                this trainable runs on the same node.
+        """
+
+        if driver_ip != self._local_ip:
+            self._log_tailer = LogTailer(self.logdir)
+
+    def pull_log_updates(self):
+        """Returns log updates not yet attached to any result.
+
+        Returns:
+            List of updates for ``ray.tune.log_sync.apply_log_updates()``.
+            This is empty if there are none, or if log push is disabled.
+        """
+
+        if not self._log_tailer:
+            return []
+        return self._log_tailer.collect()
+
     def save(self, checkpoint_dir=None):
         """Saves the current model state to a checkpoint.
 
@@ -335,6 +367,43 @@ class Trainable(object):
         """
         return False
 
+    def reset(self, new_config, logger_creator=None):
+        """Resets this trainable so that it can be reused for a new trial.
+
+        This calls ``reset_config()`` and, if that succeeds, clears the
+        training progress counters and switches to a new result logger.
+
+        Args:
+            new_config (dict): Configuration of the new trial.
+            logger_creator (func): Function that creates the logger of the
+                new trial. If unspecified, the current logger is kept.
+
+        Returns:
+            True if the trainable was reset successfully else False.
+        """
+
+        if not self.reset_config(new_config):
+            return False
+
+        self.config = new_config
+        if logger_creator:
+            self._result_logger.close()
+            self._result_logger = logger_creator(self.config)
+            self.logdir = self._result_logger.logdir
+            if self._log_tailer:
+                self._log_tailer = LogTailer(self.logdir)
+
+        self._experiment_id = uuid.uuid4().hex
+        self._iteration = 0
+        self._time_total = 0.0
+        self._timesteps_total = None
+        self._episodes_total = None
+        self._time_since_restore = 0.0
+        self._timesteps_since_restore = 0
+        self._iterations_since_restore = 0
+        self._restored = False
+        return True
+
     def stop(self):
         """Releases all resources used by this trainable."""
 
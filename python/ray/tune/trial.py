@@ -17,8 +17,9 @@ from ray.tune.logger import pretty_print, UnifiedLogger
 # need because there are cyclic imports that may cause specific names to not
 # have been defined yet. See https://github.com/ray-project/ray/issues/1716.
 import ray.tune.registry
-from ray.tune.result import (DEFAULT_RESULTS_DIR, DONE, HOSTNAME, PID,
-                             TIME_TOTAL_S, TRAINING_ITERATION, TIMESTEPS_TOTAL)
+from ray.tune.result import (DEFAULT_RESULTS_DIR, DONE, HOSTNAME,
+                             INTERMEDIATE_RESULTS, PID, TIME_TOTAL_S,
+                             TRAINING_ITERATION, TIMESTEPS_TOTAL)
 from ray.utils import random_string, binary_to_hex
 
 DEBUG_PRINT_INTERVAL = 5
@@ -300,6 +301,13 @@ class Trial(object):
     def update_last_result(self, result, terminate=False):
         if terminate:
             result.update(done=True)
+        # Log the results reported before this one as rows of their own.
+        # They take the auto-filled fields of this result, and only its
+        # columns, since the CSV columns are fixed by the first row.
+        for intermediate in result.pop(INTERMEDIATE_RESULTS, []):
+            row = dict(result, done=False)
+            row.update((k, v) for k, v in intermediate.items() if k in row)
+            self.result_logger.on_result(row)
         if self.verbose and (terminate or time.time() - self.last_debug >
                              DEBUG_PRINT_INTERVAL):
             logger.info("Result for {}:".format(self))
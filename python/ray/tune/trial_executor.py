@@ -115,6 +115,10 @@ class TrialExecutor(object):
         """A hook called after running one step of the trial event loop."""
         pass
 
+    def cleanup(self):
+        """Releases any resources kept after all trials have finished."""
+        pass
+
     def get_next_available_trial(self):
         """Blocking call that waits until one result is ready.
 
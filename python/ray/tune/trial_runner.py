@@ -56,6 +56,7 @@ class TrialRunner(object):
                  server_port=TuneServer.DEFAULT_PORT,
                  verbose=True,
                  queue_trials=False,
+                 reuse_actors=False,
                  trial_executor=None):
         """Initializes a new TrialRunner.
 
@@ -71,13 +72,17 @@ class TrialRunner(object):
                 not currently have enough resources to launch one. This should
                 be set to True when running on an autoscaling cluster to enable
                 automatic scale-up.
+            reuse_actors (bool): Whether to reuse actors between different
+                trials when possible. This requires the trainable to
+                implement reset_config().
             trial_executor (TrialExecutor): Defaults to RayTrialExecutor.
         """
         self._search_alg = search_alg
         self._scheduler_alg = scheduler or FIFOScheduler()
         self._trials = []
         self.trial_executor = trial_executor or \
-            RayTrialExecutor(queue_trials=queue_trials)
+            RayTrialExecutor(queue_trials=queue_trials,
+                             reuse_actors=reuse_actors)
 
         # For debugging, it may be useful to halt trials after some time has
         # elapsed. TODO(ekl) consider exposing this in the API.
@@ -142,6 +147,8 @@ class TrialRunner(object):
             if self.is_finished():
                 self._server.shutdown()
         self.trial_executor.on_step_end()
+        if self.is_finished():
+            self.trial_executor.cleanup()
 
     def get_trial(self, tid):
         trial = [t for t in self._trials if t.trial_id == tid]
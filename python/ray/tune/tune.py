@@ -39,6 +39,7 @@ def run_experiments(experiments=None,
                     server_port=TuneServer.DEFAULT_PORT,
                     verbose=True,
                     queue_trials=False,
+                    reuse_actors=False,
                     trial_executor=None,
                     raise_on_failed_trial=True):
     """Runs and blocks until all trials finish.
@@ -59,6 +60,11 @@ def run_experiments(experiments=None,
             not currently have enough resources to launch one. This should
             be set to True when running on an autoscaling cluster to enable
             automatic scale-up.
+        reuse_actors (bool): Whether to reuse actors between different trials
+            when possible. This can drastically speed up experiments that
+            start and stop actors often (e.g., PBT in time-multiplexing mode).
+            This requires trials to have the same resource requirements and
+            the trainable to implement reset_config().
         trial_executor (TrialExecutor): Manage the execution of trials.
         raise_on_failed_trial (bool): Raise TuneError if there exists failed
             trial (of ERROR state) when the experiments complete.
@@ -99,6 +105,7 @@ def run_experiments(experiments=None,
         server_port=server_port,
         verbose=verbose,
         queue_trials=queue_trials,
+        reuse_actors=reuse_actors,
         trial_executor=trial_executor)
 
     logger.info(runner.debug_string(max_debug=99999))
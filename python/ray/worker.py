@@ -25,10 +25,12 @@ import ray.cloudpickle as pickle
 import ray.experimental.state as state
 import ray.gcs_utils
 import ray.memory_monitor as memory_monitor
+import ray.metrics as metrics
 import ray.remote_function
 import ray.serialization as serialization
 import ray.services as services
 import ray.signature
+import ray.spill_manager as spill_manager
 import ray.tempfile_services as tempfile_services
 import ray.raylet
 import ray.plasma
@@ -67,6 +69,30 @@ DEFAULT_ACTOR_CREATION_CPUS_SIMPLE_CASE = 0
 DEFAULT_ACTOR_METHOD_CPUS_SPECIFIED_CASE = 0
 DEFAULT_ACTOR_CREATION_CPUS_SPECIFIED_CASE = 1
 
+# Runtime metrics of this process, see ray.metrics.
+_registry = metrics.get_registry()
+_get_seconds = _registry.histogram("ray_get_seconds",
+                                   "Time to get objects from the store.")
+_put_seconds = _registry.histogram("ray_put_seconds",
+                                   "Time to put an object in the store.")
+_put_bytes = _registry.histogram(
+    "ray_put_bytes", "Serialized size of the objects put in the store.",
+    metrics.SIZE_BUCKETS)
+_wait_seconds = _registry.histogram("ray_wait_seconds",
+                                    "Time spent in ray.wait calls.")
+_tasks_submitted = _registry.counter("ray_tasks_submitted",
+                                     "Number of tasks submitted.")
+_task_idle_seconds = _registry.histogram(
+    "ray_task_idle_seconds", "Time a worker waited for its next task.")
+_task_deserialize_seconds = _registry.histogram(
+    "ray_task_deserialize_seconds", "Time to get the arguments of tasks.")
+_task_execute_seconds = _registry.histogram("ray_task_execute_seconds",
+                                            "Time to execute tasks.")
+_task_store_outputs_seconds = _registry.histogram(
+    "ray_task_store_outputs_seconds", "Time to store the outputs of tasks.")
+_task_failures = _registry.counter("ray_task_failures",
+                                   "Number of tasks that failed.")
+
 # Logger for this module. It should be configured at the entry point
 # into the program using Ray. Ray configures it by default automatically
 # using logging.basicConfig in its entry/init points.
@@ -219,6 +245,10 @@ class Worker(object):
         self.original_gpu_ids = ray.utils.get_cuda_visible_devices()
         self.profiler = None
         self.memory_monitor = memory_monitor.MemoryMonitor()
+        # Whether objects are spilled to disk in the cluster, and the
+        # directory they are spilled to on this node, if any.
+        self.spill_enabled = False
+        self.spill_directory = None
         self.state_lock = threading.Lock()
         # A dictionary that maps from driver id to SerializationContext
         # TODO: clean up the SerializationContext once the job finished.
@@ -334,12 +364,18 @@ class Worker(object):
                                 "type {}.".format(type(value)))
             counter += 1
             try:
-                self.plasma_client.put(
-                    value,
-                    object_id=pyarrow.plasma.ObjectID(object_id.id()),
-                    memcopy_threads=self.memcopy_threads,
-                    serialization_context=self.get_serialization_context(
-                        self.task_driver_id))
+                # This does what plasma_client.put does, but keeps the size
+                # of the serialized object for the metrics.
+                serialized = pyarrow.serialize(
+                    value, self.get_serialization_context(self.task_driver_id))
+                plasma_id = pyarrow.plasma.ObjectID(object_id.id())
+                buf = self.plasma_client.create(plasma_id,
+                                                serialized.total_bytes)
+                stream = pyarrow.FixedSizeBufferWriter(buf)
+                stream.set_memcopy_threads(self.memcopy_threads)
+                serialized.write_to(stream)
+                self.plasma_client.seal(plasma_id)
+                _put_bytes.observe(serialized.total_bytes)
                 break
             except pyarrow.SerializationCallbackError as e:
                 try:
@@ -403,6 +439,7 @@ class Worker(object):
                             "call 'put' on it (or return it).")
 
         # Serialize and put the object in the object store.
+        start_time = time.time()
         try:
             self.store_and_register(object_id, value)
         except pyarrow.PlasmaObjectExists:
@@ -425,6 +462,7 @@ class Worker(object):
                                .format(type(value)))
             logger.warning(warning_message)
             self.store_and_register(object_id, value)
+        _put_seconds.observe(time.time() - start_time)
 
     def retrieve_and_deserialize(self, object_ids, timeout, error_timeout=10):
         start_time = time.time()
@@ -494,6 +532,7 @@ class Worker(object):
             if not isinstance(object_id, ray.ObjectID):
                 raise Exception("Attempting to call `get` on the value {}, "
                                 "which is not an ObjectID.".format(object_id))
+        start_time = time.time()
         # Do an initial fetch for remote objects. We divide the fetch into
         # smaller fetches so as to not block the manager for a prolonged period
         # of time in a single call.
@@ -516,6 +555,18 @@ class Worker(object):
             if val is plasma.ObjectNotAvailable
         }
 
+        # Restore the objects that were spilled to disk, before the local
+        # scheduler is asked to reconstruct them.
+        if len(unready_ids) > 0 and self.spill_enabled:
+            restored_ids = spill_manager.restore_objects(
+                self.redis_client, self.plasma_client, self.spill_directory,
+                [plasma.ObjectID(unready_id) for unready_id in unready_ids])
+            results = self.retrieve_and_deserialize(restored_ids, 0)
+            for i, val in enumerate(results):
+                if val is not plasma.ObjectNotAvailable:
+                    object_id = restored_ids[i].binary()
+                    final_results[unready_ids.pop(object_id)] = val
+
         if len(unready_ids) > 0:
             with self.state_lock:
                 # Get the task ID, to notify the backend which task is blocked.
@@ -561,6 +612,7 @@ class Worker(object):
                 self.local_scheduler_client.notify_unblocked(current_task_id)
 
         assert len(final_results) == len(object_ids)
+        _get_seconds.observe(time.time() - start_time)
         return final_results
 
     def submit_task(self,
@@ -613,6 +665,7 @@ class Worker(object):
         Returns:
             The return object IDs for this task.
         """
+        _tasks_submitted.inc()
         with profiling.profile("submit_task", worker=self):
             if actor_id is None:
                 assert actor_handle_id is None
@@ -675,10 +728,35 @@ class Worker(object):
                 actor_creation_id, actor_creation_dummy_object_id, actor_id,
                 actor_handle_id, actor_counter, execution_dependencies,
                 resources, placement_resources)
+            if self.spill_enabled:
+                self._pin_arguments(task)
             self.local_scheduler_client.submit(task)
 
             return task.returns()
 
+    def _pin_arguments(self, task):
+        """Keeps the object arguments of a task from being spilled.
+
+        The arguments are pinned until the task fetches them, and the ones
+        that were already spilled are restored, since the raylet would try
+        to reconstruct them instead.
+
+        Args:
+            task: The task, before it is submitted.
+        """
+        object_ids = [
+            arg.id() for arg in task.arguments()
+            if isinstance(arg, ray.ObjectID)
+        ]
+        if len(object_ids) == 0:
+            return
+        spill_manager.pin_task_arguments(self.redis_client,
+                                         task.task_id().id(),
+                                         task.driver_id().id(), object_ids)
+        spill_manager.restore_objects(
+            self.redis_client, self.plasma_client, self.spill_directory,
+            [plasma.ObjectID(object_id) for object_id in object_ids])
+
     def run_function_on_all_workers(self, function,
                                     run_on_other_drivers=False):
         """Run arbitrary code on all of the workers.
@@ -839,9 +917,11 @@ class Worker(object):
             if function_name != "__ray_terminate__":
                 self.reraise_actor_init_error()
             self.memory_monitor.raise_if_low_memory()
+            start_time = time.time()
             with profiling.profile("task:deserialize_arguments", worker=self):
                 arguments = self._get_arguments_for_execution(
                     function_name, args)
+            _task_deserialize_seconds.observe(time.time() - start_time)
         except (RayGetError, RayGetArgumentError) as e:
             self._handle_process_task_failure(function_id, function_name,
                                               return_object_ids, e, None)
@@ -851,9 +931,16 @@ class Worker(object):
                 function_id, function_name, return_object_ids, e,
                 ray.utils.format_error_message(traceback.format_exc()))
             return
+        finally:
+            if self.spill_enabled:
+                # This is a no-op for reconstructed tasks.
+                spill_manager.unpin_task_arguments(self.redis_client,
+                                                   task.task_id().id(),
+                                                   task.driver_id().id())
 
         # Execute the task.
         try:
+            start_time = time.time()
             with profiling.profile("task:execute", worker=self):
                 if task.actor_id().id() == NIL_ACTOR_ID:
                     outputs = function_executor(*arguments)
@@ -861,6 +948,7 @@ class Worker(object):
                     outputs = function_executor(
                         dummy_return_id, self.actors[task.actor_id().id()],
                         *arguments)
+            _task_execute_seconds.observe(time.time() - start_time)
         except Exception as e:
             # Determine whether the exception occured during a task, not an
             # actor method.
@@ -874,6 +962,7 @@ class Worker(object):
 
         # Store the outputs in the local object store.
         try:
+            start_time = time.time()
             with profiling.profile("task:store_outputs", worker=self):
                 # If this is an actor task, then the last object ID returned by
                 # the task is a dummy output, not returned by the function
@@ -882,6 +971,7 @@ class Worker(object):
                 if num_returns == 1:
                     outputs = (outputs, )
                 self._store_outputs_in_object_store(return_object_ids, outputs)
+            _task_store_outputs_seconds.observe(time.time() - start_time)
         except Exception as e:
             self._handle_process_task_failure(
                 function_id, function_name, return_object_ids, e,
@@ -889,6 +979,7 @@ class Worker(object):
 
     def _handle_process_task_failure(self, function_id, function_name,
                                      return_object_ids, error, backtrace):
+        _task_failures.inc()
         failure_object = RayTaskError(function_name, error, backtrace)
         failure_objects = [
             failure_object for _ in range(len(return_object_ids))
@@ -995,8 +1086,10 @@ class Worker(object):
         Returns:
             A task from the local scheduler.
         """
+        start_time = time.time()
         with profiling.profile("worker_idle", worker=self):
             task = self.local_scheduler_client.get_task()
+        _task_idle_seconds.observe(time.time() - start_time)
 
         # Automatically restrict the GPUs available to this task.
         ray.utils.set_cuda_visible_devices(ray.get_gpu_ids())
@@ -1362,6 +1455,8 @@ def _init(address_info=None,
           plasma_store_socket_name=None,
           raylet_socket_name=None,
           temp_dir=None,
+          object_spill_directory=None,
+          object_spill_bandwidth=None,
           _internal_config=None):
     """Helper method to connect to an existing Ray cluster or start a new one.
 
@@ -1429,6 +1524,11 @@ def _init(address_info=None,
             used by the raylet process.
         temp_dir (str): If provided, it will specify the root temporary
             directory for the Ray process.
+        object_spill_directory (str): If provided, objects are spilled from
+            the object store to files in this directory when it is nearly
+            full, and restored when they are needed again.
+        object_spill_bandwidth (int): The max number of bytes spilled per
+            second. If None, this is not limited.
         _internal_config (str): JSON configuration for overriding
             RayConfig defaults. For testing purposes ONLY.
 
@@ -1507,6 +1607,8 @@ def _init(address_info=None,
             plasma_store_socket_name=plasma_store_socket_name,
             raylet_socket_name=raylet_socket_name,
             temp_dir=temp_dir,
+            object_spill_directory=object_spill_directory,
+            object_spill_bandwidth=object_spill_bandwidth,
             _internal_config=_internal_config)
     else:
         if redis_address is None:
@@ -1551,6 +1653,12 @@ def _init(address_info=None,
         if raylet_socket_name is not None:
             raise Exception("When connecting to an existing cluster, "
                             "raylet_socket_name must not be provided.")
+        if object_spill_directory is not None:
+            raise Exception("When connecting to an existing cluster, "
+                            "object_spill_directory must not be provided.")
+        if object_spill_bandwidth is not None:
+            raise Exception("When connecting to an existing cluster, "
+                            "object_spill_bandwidth must not be provided.")
         if _internal_config is not None:
             raise Exception("When connecting to an existing cluster, "
                             "_internal_config must not be provided.")
@@ -1619,6 +1727,8 @@ def init(redis_address=None,
          plasma_store_socket_name=None,
          raylet_socket_name=None,
          temp_dir=None,
+         object_spill_directory=None,
+         object_spill_bandwidth=None,
          _internal_config=None,
          use_raylet=None):
     """Connect to an existing Ray cluster or start one and connect to it.
@@ -1696,6 +1806,11 @@ def init(redis_address=None,
             used by the raylet process.
         temp_dir (str): If provided, it will specify the root temporary
             directory for the Ray process.
+        object_spill_directory (str): If provided, objects are spilled from
+            the object store to files in this directory when it is nearly
+            full, and restored when they are needed again.
+        object_spill_bandwidth (int): The max number of bytes spilled per
+            second. If None, this is not limited.
         _internal_config (str): JSON configuration for overriding
             RayConfig defaults. For testing purposes ONLY.
 
@@ -1765,6 +1880,8 @@ def init(redis_address=None,
         plasma_store_socket_name=plasma_store_socket_name,
         raylet_socket_name=raylet_socket_name,
         temp_dir=temp_dir,
+        object_spill_directory=object_spill_directory,
+        object_spill_bandwidth=object_spill_bandwidth,
         _internal_config=_internal_config)
     for hook in _post_init_hooks:
         hook()
@@ -2093,6 +2210,16 @@ def connect(info,
     worker.plasma_client = thread_safe_client(
         plasma.connect(info["store_socket_name"], "", 64))
 
+    # Find out whether objects are spilled, and where to on this node.
+    spill_directories = worker.redis_client.hgetall(
+        spill_manager.SPILL_MANAGERS_KEY)
+    worker.spill_enabled = len(spill_directories) > 0
+    spill_directory = spill_directories.get(
+        spill_manager.location(worker.node_ip_address,
+                               info["store_socket_name"]))
+    worker.spill_directory = (ray.utils.decode(spill_directory)
+                              if spill_directory is not None else None)
+
     raylet_socket = info["raylet_socket_name"]
 
     # If this is a driver, set the current task ID, the task driver ID, and set
@@ -2177,6 +2304,8 @@ def connect(info,
     # a background thread to periodically flush profiling data to the GCS.
     if mode != LOCAL_MODE:
         worker.profiler.start_flush_thread()
+        metrics.start_push_thread(worker.redis_client, worker.node_ip_address,
+                                  worker.worker_id)
 
     if mode == SCRIPT_MODE:
         # Add the directory containing the script that is running to the Python
@@ -2213,6 +2342,8 @@ def disconnect(worker=global_worker):
     # the remote functions will be exported. This is mostly relevant for the
     # tests.
     worker.connected = False
+    worker.spill_enabled = False
+    worker.spill_directory = None
     worker.cached_functions_to_run = []
     worker.function_actor_manager.reset_cache()
     worker.serialization_context_map.clear()
@@ -2509,8 +2640,10 @@ def wait(object_ids, num_returns=1, timeout=None, worker=global_worker):
             current_task_id = worker.get_current_thread_task_id()
 
         timeout = timeout if timeout is not None else 2**30
+        start_time = time.time()
         ready_ids, remaining_ids = worker.local_scheduler_client.wait(
             object_ids, num_returns, timeout, False, current_task_id)
+        _wait_seconds.observe(time.time() - start_time)
         return ready_ids, remaining_ids
 
 
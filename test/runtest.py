@@ -1059,6 +1059,70 @@ def test_profiling_api(shutdown_only):
             break
 
 
+def test_chrome_tracing_dump(shutdown_only, tmpdir):
+    ray.init(num_cpus=1)
+
+    @ray.remote
+    def f():
+        time.sleep(0.1)
+
+    ray.get(f.remote())
+    middle = time.time()
+    ray.get(f.remote())
+
+    # Wait until the profiling information of both tasks has been flushed.
+    start_time = time.time()
+    while True:
+        assert time.time() - start_time < 20
+        events = ray.global_state.chrome_tracing_dump()
+        if len([e for e in events if e["cat"] == "task:execute"]) == 2:
+            break
+        time.sleep(1)
+
+    window = ray.global_state.chrome_tracing_dump(start_time=middle)
+    assert len([e for e in window if e["cat"] == "task:execute"]) == 1
+    assert all(e["ts"] + e["dur"] >= middle * 10**6 for e in window)
+
+    json_filename = str(tmpdir.join("timeline.json"))
+    ray.global_state.chrome_tracing_dump(filename=json_filename)
+    with open(json_filename) as f:
+        assert len(json.load(f)) >= len(events)
+
+    binary_filename = str(tmpdir.join("timeline.bin"))
+    ray.global_state.chrome_tracing_dump(
+        filename=binary_filename, start_time=middle, binary=True)
+    loaded = list(
+        ray.experimental.state.load_chrome_tracing_dump(binary_filename))
+    assert len(loaded) >= len(window)
+    assert {e["cat"] for e in window} <= {e["cat"] for e in loaded}
+
+
+def test_profiler_ring_buffer():
+    profiler = ray.profiling.Profiler(None, sample_rate=1, buffer_size=3)
+    for i in range(5):
+        profiler.add_event("event", i, i + 1,
+                           json.dumps({
+                               "i": str(i)
+                           }) if i % 2 else None)
+    events = profiler.take_events()
+    assert [event["start_time"] for event in events] == [2, 3, 4]
+    assert [event["extra_data"]
+            for event in events] == ["{}", json.dumps({
+                "i": "3"
+            }), "{}"]
+    assert profiler.num_dropped == 2
+    assert profiler.take_events() == []
+
+    class Worker(object):
+        pass
+
+    worker = Worker()
+    worker.profiler = ray.profiling.Profiler(worker, sample_rate=0)
+    with ray.profile("event", worker=worker) as span:
+        span.set_attribute("key", "value")
+    assert worker.profiler.take_events() == []
+
+
 @pytest.fixture()
 def ray_start_cluster():
     cluster = ray.test.cluster_utils.Cluster()